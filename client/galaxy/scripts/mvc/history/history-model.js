@@ -211,8 +211,15 @@ var History = Backbone.Model.extend( BASE_MVC.LoggableMixin ).extend(
         if( detailIds.length ){
             options.data.details = detailIds.join( ',' );
         }
+        // only fetch the contents updated since the last refresh and merge them into the collection
+        if( this.contentsUpdateTime ){
+            options.data.update_time_gt = this.contentsUpdateTime;
+            options.remove = false;
+        }
         var xhr = this.contents.fetch( options );
         xhr.done( function( models ){
+            // the server's time of the query: the cursor of the next refresh
+            history.contentsUpdateTime = xhr.getResponseHeader( 'X-Galaxy-Contents-Update-Time' );
             history.checkForUpdates( function(){
                 // fetch the history inside onReadyCallback in order to recalc history size
                 this.fetch();
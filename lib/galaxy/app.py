@@ -5,8 +5,10 @@ import os
 import time
 from galaxy import config, jobs
 import galaxy.model
+from galaxy.datatypes.dataproviders import line_index
 import galaxy.security
 import galaxy.queues
+from galaxy.managers.api_keys import ApiKeyPrincipalCache
 from galaxy.managers.collections import DatasetCollectionManager
 import galaxy.quota
 from galaxy.managers.tags import GalaxyTagManager
@@ -43,6 +45,8 @@ class UniverseApplication( object, config.ConfiguresGalaxyMixin ):
         # control_worker *can* be initialized with a queue, but here we don't
         # want to and we'll allow postfork to bind and start it.
         self.control_worker = GalaxyQueueWorker(self)
+        # Users of recently used API keys, cleared through the control queue
+        self.api_key_principals = ApiKeyPrincipalCache()
 
         self._configure_tool_shed_registry()
         self._configure_object_store( fsmon=True )
@@ -59,6 +63,8 @@ class UniverseApplication( object, config.ConfiguresGalaxyMixin ):
 
         self._configure_datatypes_registry( self.installed_repository_manager )
         galaxy.model.set_datatypes_registry( self.datatypes_registry )
+        # Indexes of the lines of datasets, for dataproviders
+        line_index.configure( self.config.line_index_path )
 
         # Security helper
         self._configure_security()
@@ -75,7 +81,7 @@ class UniverseApplication( object, config.ConfiguresGalaxyMixin ):
         # Genomes
         self.genomes = Genomes( self )
         # Data providers registry.
-        self.data_provider_registry = DataProviderRegistry()
+        self.data_provider_registry = DataProviderRegistry( self.config )
 
         # Initialize job metrics manager, needs to be in place before
         # config so per-destination modifications can be made.
@@ -154,11 +160,15 @@ class UniverseApplication( object, config.ConfiguresGalaxyMixin ):
         # Must be initialized after job_config.
         self.workflow_scheduling_manager = scheduling_manager.WorkflowSchedulingManager( self )
 
+        from galaxy.tools.execute import BackgroundToolExecutor
+        self.background_tool_executor = BackgroundToolExecutor( self )
+
         self.model.engine.dispose()
         self.server_starttime = int(time.time())  # used for cachebusting
 
     def shutdown( self ):
         self.workflow_scheduling_manager.shutdown()
+        self.background_tool_executor.shutdown()
         self.job_manager.shutdown()
         self.object_store.shutdown()
         if self.heartbeat:
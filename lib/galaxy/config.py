@@ -147,6 +147,8 @@ class Configuration( object ):
         self.id_secret = kwargs.get( "id_secret", "USING THE DEFAULT IS NOT SECURE!" )
         self.retry_metadata_internally = string_as_bool( kwargs.get( "retry_metadata_internally", "True" ) )
         self.max_metadata_value_size = int( kwargs.get( "max_metadata_value_size", 5242880 ) )
+        self.metadata_processes = int( kwargs.get( "metadata_processes", 1 ) )
+        self.metadata_daemon_socket = kwargs.get( "metadata_daemon_socket", None )
         self.use_remote_user = string_as_bool( kwargs.get( "use_remote_user", "False" ) )
         self.normalize_remote_user_email = string_as_bool( kwargs.get( "normalize_remote_user_email", "False" ) )
         self.remote_user_maildomain = kwargs.get( "remote_user_maildomain", None )
@@ -207,6 +209,7 @@ class Configuration( object ):
         self.smtp_password = kwargs.get( 'smtp_password', None )
         self.smtp_ssl = kwargs.get( 'smtp_ssl', None )
         self.track_jobs_in_database = string_as_bool( kwargs.get( 'track_jobs_in_database', 'True') )
+        self.job_readiness_sweep_interval = int( kwargs.get( 'job_readiness_sweep_interval', 60 ) )
         self.start_job_runners = listify(kwargs.get( 'start_job_runners', '' ))
         self.expose_dataset_path = string_as_bool( kwargs.get( 'expose_dataset_path', 'False' ) )
         # External Service types used in sample tracking
@@ -311,6 +314,7 @@ class Configuration( object ):
         self.object_store = kwargs.get( 'object_store', 'disk' )
         self.object_store_check_old_style = string_as_bool( kwargs.get( 'object_store_check_old_style', False ) )
         self.object_store_cache_path = resolve_path( kwargs.get( "object_store_cache_path", "database/object_store_cache" ), self.root )
+        self.line_index_path = resolve_path( kwargs.get( "line_index_path", "database/line_indexes" ), self.root )
         # Handle AWS-specific config options for backward compatibility
         if kwargs.get( 'aws_access_key', None) is not None:
             self.os_access_key = kwargs.get( 'aws_access_key', None )
@@ -439,6 +443,9 @@ class Configuration( object ):
             self.visualization_plugins_directory = ie_dirs
         elif ie_dirs:
             self.visualization_plugins_directory += ",%s" % ie_dirs
+        # Caches of the genome data providers of visualizations
+        self.genome_data_cache_size = int( kwargs.get( 'genome_data_cache_size', 64 ) )
+        self.genome_data_open_files = int( kwargs.get( 'genome_data_open_files', 32 ) )
 
         self.proxy_session_map = self.resolve_path( kwargs.get( "dynamic_proxy_session_map", "database/session_map.sqlite" ) )
         self.manage_dynamic_proxy = string_as_bool( kwargs.get( "dynamic_proxy_manage", "True" ) )  # Set to false if being launched externally
@@ -618,7 +625,7 @@ class Configuration( object ):
         for path in (self.new_file_path, self.template_cache, self.ftp_upload_dir,
                      self.library_import_dir, self.user_library_import_dir,
                      self.nginx_upload_store, self.whoosh_index_dir,
-                     self.object_store_cache_path):
+                     self.object_store_cache_path, self.line_index_path):
             self._ensure_directory( path )
         # Check that required files exist
         tool_configs = self.tool_configs
@@ -1,7 +1,6 @@
 """Binary classes"""
 
 import binascii
-import gzip
 import logging
 import os
 import shutil
@@ -17,6 +16,7 @@ from bx.seq.twobit import TWOBIT_MAGIC_NUMBER, TWOBIT_MAGIC_NUMBER_SWAP, TWOBIT_
 
 from galaxy.datatypes.metadata import MetadataElement, MetadataParameter, ListParameter, DictParameter
 from galaxy.datatypes import metadata
+from galaxy.datatypes.sniff import build_sniff_from_prefix
 from galaxy.util import nice_size, sqlite
 from . import data, dataproviders
 
@@ -111,18 +111,14 @@ class Ab1( Binary ):
 Binary.register_unsniffable_binary_ext("ab1")
 
 
+@build_sniff_from_prefix
 class Idat( Binary ):
     """Binary data in idat format"""
     file_ext = "idat"
+    sniff_magic_prefixes = [ 'IDAT' ]
 
-    def sniff( self, filename ):
-        try:
-            header = open( filename ).read(4)
-            if binascii.b2a_hex( header ) == binascii.hexlify( 'IDAT' ):
-                return True
-            return False
-        except:
-            return False
+    def sniff_prefix( self, file_prefix ):
+        return file_prefix.startswith( 'IDAT' )
 
 Binary.register_sniffable_binary_format("idat", "idat", Idat)
 
@@ -159,6 +155,7 @@ class GenericAsn1Binary( Binary ):
 Binary.register_unsniffable_binary_ext("asn1-binary")
 
 
+@build_sniff_from_prefix
 @dataproviders.decorators.has_dataproviders
 class Bam( Binary ):
     """Class describing a BAM binary file"""
@@ -166,6 +163,7 @@ class Bam( Binary ):
     file_ext = "bam"
     track_type = "ReadTrack"
     data_sources = { "data": "bai", "index": "bigwig" }
+    sniff_magic_prefixes = [ 'BAM\1' ]
 
     MetadataElement( name="bam_index", desc="BAM Index File", param=metadata.FileParameter, file_ext="bai", readonly=True, no_value=None, visible=False, optional=True )
     MetadataElement( name="bam_version", default=None, desc="BAM Version", param=MetadataParameter, readonly=True, visible=False, optional=True, no_value=None )
@@ -350,16 +348,10 @@ class Bam( Binary ):
         except:
             pass
 
-    def sniff( self, filename ):
+    def sniff_prefix( self, file_prefix ):
         # BAM is compressed in the BGZF format, and must not be uncompressed in Galaxy.
         # The first 4 bytes of any bam file is 'BAM\1', and the file is binary.
-        try:
-            header = gzip.open( filename ).read(4)
-            if binascii.b2a_hex( header ) == binascii.hexlify( 'BAM\1' ):
-                return True
-            return False
-        except:
-            return False
+        return file_prefix.uncompressed_startswith( 'BAM\1' )
 
     def set_peek( self, dataset, is_multi_byte=False ):
         if not dataset.dataset.purged:
@@ -460,23 +452,19 @@ class Bam( Binary ):
 Binary.register_sniffable_binary_format("bam", "bam", Bam)
 
 
+@build_sniff_from_prefix
 class Bcf( Binary):
     """Class describing a BCF file"""
     edam_format = "format_3020"
     file_ext = "bcf"
+    sniff_magic_prefixes = [ 'BCF' ]
 
     MetadataElement( name="bcf_index", desc="BCF Index File", param=metadata.FileParameter, file_ext="csi", readonly=True, no_value=None, visible=False, optional=True )
 
-    def sniff( self, filename ):
+    def sniff_prefix( self, file_prefix ):
         # BCF is compressed in the BGZF format, and must not be uncompressed in Galaxy.
         # The first 3 bytes of any bcf file is 'BCF', and the file is binary.
-        try:
-            header = gzip.open( filename ).read(3)
-            if binascii.b2a_hex( header ) == binascii.hexlify( 'BCF' ):
-                return True
-            return False
-        except:
-            return False
+        return file_prefix.uncompressed_startswith( 'BCF' )
 
     def set_meta( self, dataset, overwrite=True, **kwd ):
         """ Creates the index for the BCF file. """
@@ -552,21 +540,17 @@ class Scf( Binary ):
 Binary.register_unsniffable_binary_ext("scf")
 
 
+@build_sniff_from_prefix
 class Sff( Binary ):
     """ Standard Flowgram Format (SFF) """
     edam_format = "format_3284"
     file_ext = "sff"
+    sniff_magic_prefixes = [ '.sff' ]
 
-    def sniff( self, filename ):
+    def sniff_prefix( self, file_prefix ):
         # The first 4 bytes of any sff file is '.sff', and the file is binary. For details
         # about the format, see http://www.ncbi.nlm.nih.gov/Traces/trace.cgi?cmd=show&f=formats&m=doc&s=format
-        try:
-            header = open( filename ).read(4)
-            if binascii.b2a_hex( header ) == binascii.hexlify( '.sff' ):
-                return True
-            return False
-        except:
-            return False
+        return file_prefix.startswith( '.sff' )
 
     def set_peek( self, dataset, is_multi_byte=False ):
         if not dataset.dataset.purged:
@@ -585,6 +569,7 @@ class Sff( Binary ):
 Binary.register_sniffable_binary_format("sff", "sff", Sff)
 
 
+@build_sniff_from_prefix
 class BigWig(Binary):
     """
     Accessing binary BigWig files from UCSC.
@@ -594,6 +579,7 @@ class BigWig(Binary):
     edam_format = "format_3006"
     track_type = "LineTrack"
     data_sources = { "data_standalone": "bigwig" }
+    sniff_magic_prefixes = [ struct.pack( "I", 0x888FFC26 ) ]
 
     def __init__( self, **kwd ):
         Binary.__init__( self, **kwd )
@@ -603,9 +589,9 @@ class BigWig(Binary):
     def _unpack( self, pattern, handle ):
         return struct.unpack( pattern, handle.read( struct.calcsize( pattern ) ) )
 
-    def sniff( self, filename ):
+    def sniff_prefix( self, file_prefix ):
         try:
-            magic = self._unpack( "I", open( filename ) )
+            magic = struct.unpack_from( "I", file_prefix.contents_header )
             return magic[0] == self._magic
         except:
             return False
@@ -631,6 +617,7 @@ class BigBed(BigWig):
     """BigBed support from UCSC."""
     edam_format = "format_3004"
     data_sources = { "data_standalone": "bigbed" }
+    sniff_magic_prefixes = [ struct.pack( "I", 0x8789F2EB ) ]
 
     def __init__( self, **kwd ):
         Binary.__init__( self, **kwd )
@@ -640,22 +627,19 @@ class BigBed(BigWig):
 Binary.register_sniffable_binary_format("bigbed", "bigbed", BigBed)
 
 
+@build_sniff_from_prefix
 class TwoBit (Binary):
     """Class describing a TwoBit format nucleotide file"""
     edam_format = "format_3009"
     file_ext = "twobit"
+    sniff_magic_prefixes = [ struct.pack( ">L", TWOBIT_MAGIC_NUMBER ), struct.pack( ">L", TWOBIT_MAGIC_NUMBER_SWAP ) ]
 
-    def sniff(self, filename):
-        try:
-            # All twobit files start with a 16-byte header. If the file is smaller than 16 bytes, it's obviously not a valid twobit file.
-            if os.path.getsize(filename) < 16:
-                return False
-            input = file(filename)
-            magic = struct.unpack(">L", input.read(TWOBIT_MAGIC_SIZE))[0]
-            if magic == TWOBIT_MAGIC_NUMBER or magic == TWOBIT_MAGIC_NUMBER_SWAP:
-                return True
-        except IOError:
+    def sniff_prefix(self, file_prefix):
+        # All twobit files start with a 16-byte header. If the file is smaller than 16 bytes, it's obviously not a valid twobit file.
+        if len(file_prefix.contents_header) < 16:
             return False
+        magic = struct.unpack(">L", file_prefix.contents_header[:TWOBIT_MAGIC_SIZE])[0]
+        return magic == TWOBIT_MAGIC_NUMBER or magic == TWOBIT_MAGIC_NUMBER_SWAP
 
     def set_peek(self, dataset, is_multi_byte=False):
         if not dataset.dataset.purged:
@@ -673,9 +657,11 @@ class TwoBit (Binary):
 Binary.register_sniffable_binary_format("twobit", "twobit", TwoBit)
 
 
+@build_sniff_from_prefix
 @dataproviders.decorators.has_dataproviders
 class SQlite ( Binary ):
     """Class describing a Sqlite database """
+    sniff_magic_prefixes = [ 'SQLite format 3\0' ]
     MetadataElement( name="tables", default=[], param=ListParameter, desc="Database Tables", readonly=True, visible=True, no_value=[] )
     MetadataElement( name="table_columns", default={}, param=DictParameter, desc="Database Table Columns", readonly=True, visible=True, no_value={} )
     MetadataElement( name="table_row_count", default={}, param=DictParameter, desc="Database Table Row Count", readonly=True, visible=True, no_value={} )
@@ -714,16 +700,10 @@ class SQlite ( Binary ):
         except Exception as exc:
             log.warn( '%s, set_meta Exception: %s', self, exc )
 
-    def sniff( self, filename ):
+    def sniff_prefix( self, file_prefix ):
         # The first 16 bytes of any SQLite3 database file is 'SQLite format 3\0', and the file is binary. For details
         # about the format, see http://www.sqlite.org/fileformat.html
-        try:
-            header = open(filename).read(16)
-            if binascii.b2a_hex(header) == binascii.hexlify('SQLite format 3\0'):
-                return True
-            return False
-        except:
-            return False
+        return file_prefix.startswith( 'SQLite format 3\0' )
 
     def set_peek( self, dataset, is_multi_byte=False ):
         if not dataset.dataset.purged:
@@ -766,8 +746,10 @@ class SQlite ( Binary ):
 # Binary.register_sniffable_binary_format("sqlite", "sqlite", SQlite)
 
 
+@build_sniff_from_prefix
 class GeminiSQLite( SQlite ):
     """Class describing a Gemini Sqlite database """
+    sniff_magic_prefixes = SQlite.sniff_magic_prefixes
     MetadataElement( name="gemini_version", default='0.10.0' , param=MetadataParameter, desc="Gemini Version",
                      readonly=True, visible=True, no_value='0.10.0' )
     file_ext = "gemini.sqlite"
@@ -785,12 +767,12 @@ class GeminiSQLite( SQlite ):
         except Exception as e:
             log.warn( '%s, set_meta Exception: %s', self, e )
 
-    def sniff( self, filename ):
-        if super( GeminiSQLite, self ).sniff( filename ):
+    def sniff_prefix( self, file_prefix ):
+        if super( GeminiSQLite, self ).sniff_prefix( file_prefix ):
             gemini_table_names = [ "gene_detailed", "gene_summary", "resources", "sample_genotype_counts", "sample_genotypes", "samples",
                                    "variant_impacts", "variants", "version" ]
             try:
-                conn = sqlite.connect( filename )
+                conn = sqlite.connect( file_prefix.filename )
                 c = conn.cursor()
                 tables_query = "SELECT name FROM sqlite_master WHERE type='table' ORDER BY name"
                 result = c.execute( tables_query ).fetchall()
@@ -841,22 +823,17 @@ class Xlsx(Binary):
 Binary.register_sniffable_binary_format("xlsx", "xlsx", Xlsx)
 
 
+@build_sniff_from_prefix
 class Sra( Binary ):
     """ Sequence Read Archive (SRA) datatype originally from mdshw5/sra-tools-galaxy"""
     file_ext = 'sra'
+    sniff_magic_prefixes = [ 'NCBI.sra' ]
 
-    def sniff( self, filename ):
+    def sniff_prefix( self, file_prefix ):
         """ The first 8 bytes of any NCBI sra file is 'NCBI.sra', and the file is binary.
         For details about the format, see http://www.ncbi.nlm.nih.gov/books/n/helpsra/SRA_Overview_BK/#SRA_Overview_BK.4_SRA_Data_Structure
         """
-        try:
-            header = open(filename).read(8)
-            if binascii.b2a_hex(header) == binascii.hexlify('NCBI.sra'):
-                return True
-            else:
-                return False
-        except:
-            return False
+        return file_prefix.startswith( 'NCBI.sra' )
 
     def set_peek(self, dataset, is_multi_byte=False):
         if not dataset.dataset.purged:
@@ -875,22 +852,15 @@ class Sra( Binary ):
 Binary.register_sniffable_binary_format('sra', 'sra', Sra)
 
 
+@build_sniff_from_prefix
 class RData( Binary ):
     """Generic R Data file datatype implementation"""
     file_ext = 'RData'
+    sniff_magic_prefixes = [ 'RDX2\nX\n' ]
 
-    def sniff( self, filename ):
-        rdata_header = binascii.hexlify('RDX2\nX\n')
-        try:
-            header = open(filename).read(7)
-            if binascii.b2a_hex(header) == rdata_header:
-                return True
-
-            header = gzip.open( filename ).read(7)
-            if binascii.b2a_hex(header) == rdata_header:
-                return True
-        except:
-            return False
+    def sniff_prefix( self, file_prefix ):
+        rdata_header = 'RDX2\nX\n'
+        return file_prefix.startswith( rdata_header ) or file_prefix.uncompressed_startswith( rdata_header )
 
 Binary.register_sniffable_binary_format('RData', 'RData', RData)
 
@@ -898,20 +868,13 @@ Binary.register_sniffable_binary_format('RData', 'RData', RData)
 class OxliBinary(Binary):
 
     @staticmethod
-    def _sniff(filename, oxlitype):
-        try:
-            with open(filename) as fileobj:
-                header = fileobj.read(4)
-                if binascii.b2a_hex(header) == binascii.hexlify('OXLI'):
-                    fileobj.read(1)  # skip the version number
-                    ftype = fileobj.read(1)
-                    if binascii.b2a_hex(ftype) == oxlitype:
-                        return True
-            return False
-        except IOError:
-            return False
+    def _sniff(file_prefix, oxlitype):
+        # "OXLI", then one byte version number (skipped) and the file type
+        ftype = file_prefix.contents_header[5:6]
+        return file_prefix.startswith('OXLI') and binascii.b2a_hex(ftype) == oxlitype
 
 
+@build_sniff_from_prefix
 class OxliCountGraph(OxliBinary):
     """
     OxliCountGraph starts with "OXLI" + one byte version number +
@@ -928,14 +891,16 @@ class OxliCountGraph(OxliBinary):
     >>> OxliCountGraph().sniff( fname )
     True
     """
+    sniff_magic_prefixes = [ 'OXLI' ]
 
-    def sniff(self, filename):
-        return OxliBinary._sniff(filename, "01")
+    def sniff_prefix(self, file_prefix):
+        return OxliBinary._sniff(file_prefix, "01")
 
 Binary.register_sniffable_binary_format("oxli.countgraph", "oxlicg",
                                         OxliCountGraph)
 
 
+@build_sniff_from_prefix
 class OxliNodeGraph(OxliBinary):
     """
     OxliNodeGraph starts with "OXLI" + one byte version number +
@@ -952,14 +917,16 @@ class OxliNodeGraph(OxliBinary):
     >>> OxliNodeGraph().sniff( fname )
     True
     """
+    sniff_magic_prefixes = [ 'OXLI' ]
 
-    def sniff(self, filename):
-        return OxliBinary._sniff(filename, "02")
+    def sniff_prefix(self, file_prefix):
+        return OxliBinary._sniff(file_prefix, "02")
 
 Binary.register_sniffable_binary_format("oxli.nodegraph", "oxling",
                                         OxliNodeGraph)
 
 
+@build_sniff_from_prefix
 class OxliTagSet(OxliBinary):
     """
     OxliTagSet starts with "OXLI" + one byte version number +
@@ -977,13 +944,15 @@ class OxliTagSet(OxliBinary):
     >>> OxliTagSet().sniff( fname )
     True
     """
+    sniff_magic_prefixes = [ 'OXLI' ]
 
-    def sniff(self, filename):
-        return OxliBinary._sniff(filename, "03")
+    def sniff_prefix(self, file_prefix):
+        return OxliBinary._sniff(file_prefix, "03")
 
 Binary.register_sniffable_binary_format("oxli.tagset", "oxlits", OxliTagSet)
 
 
+@build_sniff_from_prefix
 class OxliStopTags(OxliBinary):
     """
     OxliStopTags starts with "OXLI" + one byte version number +
@@ -998,14 +967,16 @@ class OxliStopTags(OxliBinary):
     >>> OxliStopTags().sniff( fname )
     True
     """
+    sniff_magic_prefixes = [ 'OXLI' ]
 
-    def sniff(self, filename):
-        return OxliBinary._sniff(filename, "04")
+    def sniff_prefix(self, file_prefix):
+        return OxliBinary._sniff(file_prefix, "04")
 
 Binary.register_sniffable_binary_format("oxli.stoptags", "oxlist",
                                         OxliStopTags)
 
 
+@build_sniff_from_prefix
 class OxliSubset(OxliBinary):
     """
     OxliSubset starts with "OXLI" + one byte version number +
@@ -1023,13 +994,15 @@ class OxliSubset(OxliBinary):
     >>> OxliSubset().sniff( fname )
     True
     """
+    sniff_magic_prefixes = [ 'OXLI' ]
 
-    def sniff(self, filename):
-        return OxliBinary._sniff(filename, "05")
+    def sniff_prefix(self, file_prefix):
+        return OxliBinary._sniff(file_prefix, "05")
 
 Binary.register_sniffable_binary_format("oxli.subset", "oxliss", OxliSubset)
 
 
+@build_sniff_from_prefix
 class OxliGraphLabels(OxliBinary):
     """
     OxliGraphLabels starts with "OXLI" + one byte version number +
@@ -1047,9 +1020,10 @@ class OxliGraphLabels(OxliBinary):
     >>> OxliGraphLabels().sniff( fname )
     True
     """
+    sniff_magic_prefixes = [ 'OXLI' ]
 
-    def sniff(self, filename):
-        return OxliBinary._sniff(filename, "06")
+    def sniff_prefix(self, file_prefix):
+        return OxliBinary._sniff(file_prefix, "06")
 
 Binary.register_sniffable_binary_format("oxli.graphlabels", "oxligl",
                                         OxliGraphLabels)
@@ -2,6 +2,7 @@
 
 import sys
 from galaxy.datatypes.checkers import is_gzip
+from galaxy.datatypes.util.sequence_util import count_fastq, TOC_SEQUENCES
 
 
 def main():
@@ -21,26 +22,13 @@ def main():
         print 'Conversion is only possible for uncompressed files'
         sys.exit(1)
 
-    out_file = open(sys.argv[2], 'w')
-
-    current_line = 0
-    sequences = 1000000
-    lines_per_chunk = 4 * sequences
-    chunk_begin = 0
-
-    in_file = open(input_fname)
+    # Section offsets are found while counting the file in large blocks
+    # rather than from tell() while iterating over its (read ahead) lines.
+    sections = count_fastq(input_fname, toc_sequences=TOC_SEQUENCES).sections
 
+    out_file = open(sys.argv[2], 'w')
     out_file.write('{"sections" : [')
-
-    for line in in_file:
-        current_line += 1
-        if 0 == current_line % lines_per_chunk:
-            chunk_end = in_file.tell()
-            out_file.write('{"start":"%s","end":"%s","sequences":"%s"},' % (chunk_begin, chunk_end, sequences))
-            chunk_begin = chunk_end
-
-    chunk_end = in_file.tell()
-    out_file.write('{"start":"%s","end":"%s","sequences":"%s"}' % (chunk_begin, chunk_end, (current_line % lines_per_chunk) / 4))
+    out_file.write(','.join('{"start":"%(start)s","end":"%(end)s","sequences":"%(sequences)s"}' % section for section in sections))
     out_file.write(']}\n')
 
 
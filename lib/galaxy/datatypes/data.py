@@ -1,3 +1,4 @@
+import io
 import logging
 import mimetypes
 import os
@@ -9,7 +10,9 @@ from inspect import isclass
 
 import metadata
 from galaxy import util
+from galaxy.exceptions import ObjectNotFound
 from galaxy.datatypes.metadata import MetadataElement  # import directly to maintain ease of use in Datatype class definitions
+from galaxy.datatypes.scan import LineVisitor, scan_dataset, scan_file
 from galaxy.util import inflector
 from galaxy.util.bunch import Bunch
 from galaxy.util.odict import odict
@@ -89,6 +92,15 @@ class Data( object ):
     primary_file_name = 'index'
     # A per datatype setting (inherited): max file size (in bytes) for setting optional metadata
     _max_optional_metadata_filesize = None
+    # Signatures of the datatype, used by the datatypes registry to only try
+    # the sniffer on files that can match it (see sniff.SniffIndex).  Both
+    # are only honored for the class defining the sniffer (or subclasses of it).
+    # Byte strings one of which the file (or its content, if gzip compressed)
+    # must start with.
+    sniff_magic_prefixes = None
+    # Compiled regular expression the start of the file must match, allowing
+    # for leading whitespace.
+    sniff_header_pattern = None
 
     # Trackster track type.
     track_type = None
@@ -362,26 +374,35 @@ class Data( object ):
                 trans.response.set_content_type( "application/octet-stream" )  # force octet-stream so Safari doesn't append mime extensions to filename
                 trans.response.headers["Content-Disposition"] = 'attachment; filename="Galaxy%s-[%s].%s"' % (data.hid, fname, to_ext)
                 return open( data.file_name )
-        if not os.path.exists( data.file_name ):
-            raise paste.httpexceptions.HTTPNotFound( "File Not Found (%s)." % data.file_name )
         max_peek_size = 1000000  # 1 MB
         if isinstance(data.datatype, datatypes.images.Html):
             max_peek_size = 10000000  # 10 MB for html
         preview = util.string_as_bool( preview )
-        if not preview or isinstance(data.datatype, datatypes.images.Image) or os.stat( data.file_name ).st_size < max_peek_size:
-            if trans.app.config.sanitize_all_html and trans.response.get_content_type() == "text/html":
-                # Sanitize anytime we respond with plain text/html content.
-                # Check to see if this dataset's parent job is whitelisted
-                # We cannot currently trust imported datasets for rendering.
-                if not data.creating_job.imported and data.creating_job.tool_id in trans.app.config.sanitize_whitelist:
-                    return open(data.file_name).read()
-                return sanitize_html(open( data.file_name ).read())
-            return open( data.file_name )
-        else:
+        if preview and not isinstance(data.datatype, datatypes.images.Image) and data.get_size() >= max_peek_size:
+            # Only read the start of large datasets, without fetching the
+            # whole file from the object store
+            try:
+                data_file = data.open_range()
+            except ( IOError, ObjectNotFound ):
+                raise paste.httpexceptions.HTTPNotFound( "File Not Found (%s)." % data.id )
+            try:
+                truncated_data = data_file.read( max_peek_size )
+            finally:
+                data_file.close()
             trans.response.set_content_type( "text/html" )
             return trans.stream_template_mako( "/dataset/large_file.mako",
-                                               truncated_data=open( data.file_name ).read(max_peek_size),
+                                               truncated_data=truncated_data,
                                                data=data)
+        if not os.path.exists( data.file_name ):
+            raise paste.httpexceptions.HTTPNotFound( "File Not Found (%s)." % data.file_name )
+        if trans.app.config.sanitize_all_html and trans.response.get_content_type() == "text/html":
+            # Sanitize anytime we respond with plain text/html content.
+            # Check to see if this dataset's parent job is whitelisted
+            # We cannot currently trust imported datasets for rendering.
+            if not data.creating_job.imported and data.creating_job.tool_id in trans.app.config.sanitize_whitelist:
+                return open(data.file_name).read()
+            return sanitize_html(open( data.file_name ).read())
+        return open( data.file_name )
 
     def display_name(self, dataset):
         """Returns formatted html of dataset name"""
@@ -671,6 +692,23 @@ class Data( object ):
         trans.response.set_content_type( mime )
 
 
+class DataLinesVisitor( LineVisitor ):
+    """
+    Counts the lines of data, skipping all blank lines and comments.
+    """
+
+    def __init__( self ):
+        self.data_lines = 0
+
+    def visit( self, line ):
+        line = line.strip()
+        if line and not line.startswith( '#' ):
+            self.data_lines += 1
+
+    def finish( self, dataset ):
+        dataset.metadata.data_lines = self.data_lines
+
+
 @dataproviders.decorators.has_dataproviders
 class Text( Data ):
     edam_format = "format_2330"
@@ -718,7 +756,7 @@ class Text( Data ):
         """
         Set the number of lines of data in dataset.
         """
-        dataset.metadata.data_lines = self.count_data_lines(dataset)
+        scan_dataset( dataset, [ DataLinesVisitor() ] )
 
     def estimate_file_lines( self, dataset ):
         """
@@ -737,20 +775,16 @@ class Text( Data ):
         Count the number of lines of data in dataset,
         skipping all blank lines and comments.
         """
-        data_lines = 0
-        for line in file( dataset.file_name ):
-            line = line.strip()
-            if line and not line.startswith( '#' ):
-                data_lines += 1
-        return data_lines
+        visitor = DataLinesVisitor()
+        scan_file( dataset.file_name, [ visitor ] )
+        return visitor.data_lines
 
     def set_peek( self, dataset, line_count=None, is_multi_byte=False, WIDTH=256, skipchars=None ):
         """
         Set the peek.  This method is used by various subclasses of Text.
         """
         if not dataset.dataset.purged:
-            # The file must exist on disk for the get_file_peek() method
-            dataset.peek = get_file_peek( dataset.file_name, is_multi_byte=is_multi_byte, WIDTH=WIDTH, skipchars=skipchars )
+            dataset.peek = get_dataset_peek( dataset, is_multi_byte=is_multi_byte, WIDTH=WIDTH, skipchars=skipchars )
             if line_count is None:
                 # See if line_count is stored in the metadata
                 if dataset.metadata.data_lines:
@@ -952,9 +986,20 @@ def get_test_fname( fname ):
     return full_path
 
 
+def get_dataset_peek( dataset, **kwd ):
+    """
+    Returns the peek of `dataset` as `get_file_peek`, reading only the start of
+    the dataset from the object store where the dataset supports `open_range`.
+    """
+    if hasattr( dataset, 'open_range' ):
+        return get_file_peek( dataset.open_range(), **kwd )
+    return get_file_peek( dataset.file_name, **kwd )
+
+
 def get_file_peek( file_name, is_multi_byte=False, WIDTH=256, LINE_COUNT=5, skipchars=None ):
     """
-    Returns the first LINE_COUNT lines wrapped to WIDTH
+    Returns the first LINE_COUNT lines wrapped to WIDTH, `file_name` may also
+    be a binary file object (e.g. from `open_range`) which is closed afterwards
 
     ## >>> fname = get_test_fname('4.bed')
     ## >>> get_file_peek(fname)
@@ -972,9 +1017,15 @@ def get_file_peek( file_name, is_multi_byte=False, WIDTH=256, LINE_COUNT=5, skip
     count = 0
     file_type = None
     data_checked = False
-    temp = open( file_name, "U" )
+    if isinstance( file_name, basestring ):
+        temp = open( file_name, "U" )
+        readline = temp.readline
+    else:
+        # Read lines with universal newlines, like "U" mode, as byte strings
+        temp = io.TextIOWrapper( file_name, encoding='latin-1', newline=None )
+        readline = lambda size: temp.readline( size ).encode( 'latin-1' )
     while count <= LINE_COUNT:
-        line = temp.readline( WIDTH )
+        line = readline( WIDTH )
         if line and not is_multi_byte and not data_checked:
             # See if we have a compressed or binary file
             if line[0:2] == util.gzip_magic:
@@ -25,7 +25,8 @@ import chunk
 import line
 import hierarchy
 import column
+import aggregate
 import external
 import dataset
 
-__all__ = ['decorators', 'exceptions', 'base', 'chunk', 'line', 'hierarchy', 'column', 'external', 'dataset']
+__all__ = ['decorators', 'exceptions', 'base', 'chunk', 'line', 'hierarchy', 'column', 'aggregate', 'external', 'dataset']
@@ -0,0 +1,413 @@
+"""
+Providers that read all the rows of their source once and provide a bounded
+summary of them (e.g. histograms or samples) rather than the rows themselves.
+
+Useful for visualizing datasets too large to send to a client.
+"""
+
+import collections
+import math
+import random
+
+import column
+
+import logging
+log = logging.getLogger( __name__ )
+
+# rows parsed at a time
+DEFAULT_BATCH_SIZE = 10000
+# values used to set the range of bins when none is given
+RANGE_SAMPLE_SIZE = 10000
+
+
+class AggregatingDataProvider( column.TransposedColumnarDataProvider ):
+    """
+    Base class for providers that aggregate the columns of their source's
+    rows, reading them in batches with TransposedColumnarDataProvider.
+
+    Limit and offset select the rows that are aggregated.
+    """
+
+    def __init__( self, source, batch_size=DEFAULT_BATCH_SIZE, **kwargs ):
+        super( AggregatingDataProvider, self ).__init__( source, batch_size=batch_size, **kwargs )
+
+    def iter_batches( self ):
+        """
+        Iterate over the lists of column values of each batch of rows.
+        """
+        return super( AggregatingDataProvider, self ).__iter__()
+
+    @staticmethod
+    def is_finite( value ):
+        return not ( math.isnan( value ) or math.isinf( value ) )
+
+    def finite( self, values ):
+        """
+        Return the parsed numeric `values` that are neither missing, NaN nor
+        infinite.
+        """
+        is_finite = self.is_finite
+        return [ v for v in values if v is not None and is_finite( v ) ]
+
+
+class Bins( object ):
+    """
+    A fixed number of equal width bins over a range with an aggregate value
+    for each bin (`None` if empty).
+
+    If no range is given the range is set from the first values, and doubled
+    as necessary to include values outside it, merging pairs of bins. If only
+    its start (or end) is given, values before it (or after it) are not
+    binned and the other end of the range is set from the values.
+
+    >>> bins = Bins( 4, merge=lambda a, b: a + b )
+    >>> bins.set_range( 0, 4 )
+    >>> for x in ( 0, 0.5, 1, 4 ):
+    ...     i = bins.index( x ); bins.values[ i ] = ( bins.values[ i ] or 0 ) + 1
+    >>> bins.values
+    [2, 1, None, 1]
+    >>> bins.index( 12 )
+    3
+    >>> bins.start, bins.end, bins.values
+    (0, 16, [4, None, None, None])
+    >>> bins.edges( 1 )
+    (4.0, 8.0)
+    >>> bins = Bins( 2, merge=lambda a, b: a + b, start=0 )
+    >>> bins.set_range( -5, 1 )
+    >>> bins.index( -1 ), bins.index( 3 )
+    (None, 1)
+    >>> bins.start, bins.end
+    (0, 4)
+    """
+
+    def __init__( self, count, merge, start=None, end=None ):
+        """
+        :param count: the number of bins, rounded up to an even number
+        :param merge: function returning the aggregate of two (non-`None`) bin values
+        :param start: the fixed start of the range, values before it are not binned
+        :param end: the fixed end of the range (inclusive), values after it
+            are not binned
+        """
+        self.count = max( count + count % 2, 2 )
+        self.merge = merge
+        self.values = [ None ] * self.count
+        self.lower = start
+        self.upper = end
+        self.fixed = start is not None and end is not None
+        self.start = self.end = None
+        if self.fixed:
+            self.set_range( start, end )
+
+    def set_range( self, start, end ):
+        """
+        Set the range of the bins, keeping a fixed start or end.
+        """
+        if self.lower is not None:
+            start = self.lower
+        if self.upper is not None:
+            end = self.upper
+        if end <= start:
+            if self.lower is None:
+                start = end - 1
+            else:
+                end = start + 1
+        self.start = start
+        self.end = end
+
+    def index( self, x ):
+        """
+        Return the index of the bin `x` falls in or `None` if it is before a
+        fixed start or after a fixed end.
+        """
+        if ( self.lower is not None and x < self.lower ) or ( self.upper is not None and x > self.upper ):
+            return None
+        if x < self.start or x > self.end:
+            self.grow( x )
+        return min( int( ( x - self.start ) * self.count / ( self.end - self.start ) ), self.count - 1 )
+
+    def grow( self, x ):
+        while x < self.start:
+            self.start -= self.end - self.start
+            self._halve( upper=True )
+        while x > self.end:
+            self.end += self.end - self.start
+            self._halve( upper=False )
+
+    def _halve( self, upper ):
+        # merge pairs of bins into the upper or lower half of the bins
+        merged = []
+        for a, b in zip( self.values[ ::2 ], self.values[ 1::2 ] ):
+            merged.append( a if b is None else b if a is None else self.merge( a, b ) )
+        empty = [ None ] * ( self.count // 2 )
+        self.values = empty + merged if upper else merged + empty
+
+    def edges( self, index ):
+        """
+        Return the start and end of the bin at `index`.
+        """
+        width = float( self.end - self.start ) / self.count
+        return ( self.start + index * width, self.start + ( index + 1 ) * width )
+
+
+class HistogramDataProvider( AggregatingDataProvider ):
+    """
+    Provides the histogram of the values of a numeric column as a list of
+    `[ bin start, bin end, count ]` for each bin.
+
+    Values that are missing, not numbers or outside of a given range are not
+    counted. If no range (or only its start or end) is given, bins cover the
+    range of the values (which may be up to twice as wide).
+    """
+    settings = {
+        'column'    : 'int',
+        'bins'      : 'int',
+        'min_value' : 'float',
+        'max_value' : 'float',
+    }
+
+    def __init__( self, source, column=0, bins=20, min_value=None, max_value=None, **kwargs ):
+        """
+        :param column: the index of the column to count
+        :param bins: the number of bins (rounded up to an even number)
+        :param min_value: optionally the start of the range of the bins
+        :param max_value: optionally the end of the range of the bins
+            (either can be given without the other)
+        """
+        kwargs.update({ 'indeces' : [ column ], 'column_types' : [ 'float' ] })
+        super( HistogramDataProvider, self ).__init__( source, **kwargs )
+        self.bins = Bins( bins, merge=lambda a, b: a + b, start=min_value, end=max_value )
+
+    def __iter__( self ):
+        bins = self.bins
+        pending = []
+        for columns in self.iter_batches():
+            values = self.finite( columns[ 0 ] )
+            if bins.start is None:
+                # set the range from the first values
+                pending.extend( values )
+                if len( pending ) < RANGE_SAMPLE_SIZE:
+                    continue
+                values = pending
+            self.count( values )
+        if bins.start is None:
+            if not pending:
+                return
+            self.count( pending )
+        for index, count in enumerate( bins.values ):
+            bin_start, bin_end = bins.edges( index )
+            yield [ bin_start, bin_end, count or 0 ]
+
+    def count( self, values ):
+        bins = self.bins
+        if bins.start is None:
+            bins.set_range( min( values ), max( values ) )
+        for value in values:
+            index = bins.index( value )
+            if index is not None:
+                bins.values[ index ] = ( bins.values[ index ] or 0 ) + 1
+
+
+class MinMaxDataProvider( AggregatingDataProvider ):
+    """
+    Provides the number of rows and minimum and maximum of a numeric column
+    (y) in each of a number of equal width buckets of another column (x) or
+    the row number, as a list of `[ bucket start, bucket end, count, min y,
+    max y ]` for each bucket with rows.
+
+    Enough to draw a line or scatter plot of many rows at the resolution of a
+    bucket (e.g. a pixel) wide.
+    """
+    settings = {
+        'x_column'  : 'int',
+        'y_column'  : 'int',
+        'buckets'   : 'int',
+        'min_value' : 'float',
+        'max_value' : 'float',
+    }
+
+    def __init__( self, source, x_column=None, y_column=0, buckets=1000, min_value=None, max_value=None, **kwargs ):
+        """
+        :param x_column: the index of the column to bucket by, or `None` to
+            bucket by row number (counting from the offset)
+        :param y_column: the index of the column to summarize
+        :param buckets: the number of buckets (rounded up to an even number)
+        :param min_value: optionally the start of the range of x
+        :param max_value: optionally the end of the range of x (either can
+            be given without the other)
+        """
+        self.x_column = x_column
+        indeces = [ y_column ] if x_column is None else [ y_column, x_column ]
+        kwargs.update({ 'indeces' : indeces, 'column_types' : [ 'float' ] * len( indeces ) })
+        super( MinMaxDataProvider, self ).__init__( source, **kwargs )
+        self.buckets = Bins( buckets, merge=self.merge, start=min_value, end=max_value )
+
+    @staticmethod
+    def merge( a, b ):
+        return [ a[0] + b[0], min( a[1], b[1] ), max( a[2], b[2] ) ]
+
+    def __iter__( self ):
+        buckets = self.buckets
+        pending = []
+        row_number = self.offset
+        for columns in self.iter_batches():
+            if self.x_column is None:
+                xs = xrange( row_number, row_number + len( columns[0] ) )
+                row_number += len( columns[0] )
+            else:
+                xs = columns[1]
+            points = [ ( x, y ) for x, y in zip( xs, columns[0] )
+                       if x is not None and y is not None and self.is_finite( x ) and self.is_finite( y ) ]
+            if buckets.start is None:
+                # set the range from the first values
+                pending.extend( points )
+                if len( pending ) < RANGE_SAMPLE_SIZE:
+                    continue
+                points = pending
+            self.add( points )
+        if buckets.start is None:
+            if not pending:
+                return
+            self.add( pending )
+        for index, bucket in enumerate( buckets.values ):
+            if bucket is not None:
+                bucket_start, bucket_end = buckets.edges( index )
+                yield [ bucket_start, bucket_end ] + bucket
+
+    def add( self, points ):
+        buckets = self.buckets
+        if buckets.start is None:
+            xs = [ x for x, y in points ]
+            buckets.set_range( min( xs ), max( xs ) )
+        for x, y in points:
+            index = buckets.index( x )
+            if index is None:
+                continue
+            bucket = buckets.values[ index ]
+            if bucket is None:
+                buckets.values[ index ] = [ 1, y, y ]
+            else:
+                bucket[0] += 1
+                if y < bucket[1]:
+                    bucket[1] = y
+                elif y > bucket[2]:
+                    bucket[2] = y
+
+
+class SampleDataProvider( AggregatingDataProvider ):
+    """
+    Provides a uniform random sample of `size` rows (the columns selected with
+    `indeces`, as ColumnarDataProvider does) in the order they are read.
+
+    Rows are sampled with reservoir sampling ("Algorithm L"), skipping over
+    the rows that will not be sampled.
+    """
+    settings = {
+        'size'  : 'int',
+        'seed'  : 'int',
+    }
+
+    def __init__( self, source, size=1000, seed=None, **kwargs ):
+        """
+        :param size: the number of rows to sample
+        :param seed: optionally the seed of the random number generator, for
+            repeatable samples
+        """
+        super( SampleDataProvider, self ).__init__( source, **kwargs )
+        self.size = max( size, 0 )
+        self.random = random.Random( seed )
+
+    def __iter__( self ):
+        size = self.size
+        if not size:
+            return
+        # ( row number, row )
+        reservoir = []
+        weight = None
+        next_row = None
+        rows_read = 0
+        for columns in self.iter_batches():
+            batch_length = len( columns[0] )
+            index = 0
+            while len( reservoir ) < size and index < batch_length:
+                reservoir.append( ( rows_read + index, [ values[ index ] for values in columns ] ) )
+                index += 1
+            if weight is None and len( reservoir ) == size:
+                weight = self._weight( 1.0 )
+                next_row = size + self._skip( weight )
+            while next_row is not None and next_row < rows_read + batch_length:
+                index = next_row - rows_read
+                reservoir[ self.random.randrange( size ) ] = ( next_row, [ values[ index ] for values in columns ] )
+                weight = self._weight( weight )
+                next_row += self._skip( weight ) + 1
+            rows_read += batch_length
+        reservoir.sort( key=lambda sampled: sampled[0] )
+        for row_number, row in reservoir:
+            yield row
+
+    def _uniform( self ):
+        # uniform in ( 0, 1 )
+        value = 0.0
+        while value == 0.0:
+            value = self.random.random()
+        return value
+
+    def _weight( self, weight ):
+        return weight * math.exp( math.log( self._uniform() ) / self.size )
+
+    def _skip( self, weight ):
+        # the number of rows to skip before the next sampled row
+        if weight >= 1.0:
+            return 0
+        return int( math.floor( math.log( self._uniform() ) / math.log( 1.0 - weight ) ) )
+
+
+class ChromosomeSummaryDataProvider( AggregatingDataProvider ):
+    """
+    Provides a summary of the regions on each chromosome as dictionaries with
+    the keys 'chrom', 'count' (the number of regions), 'start' (the lowest
+    start), 'end' (the highest end) and 'length' (the total length of the
+    regions), in the order the chromosomes are first read.
+    """
+    settings = {
+        'chrom_column'  : 'int',
+        'start_column'  : 'int',
+        'end_column'    : 'int',
+    }
+
+    def __init__( self, source, chrom_column=None, start_column=None, end_column=None, end_inclusive=False, **kwargs ):
+        """
+        :param chrom_column: the chrom column index
+        :param start_column: the start column index
+        :param end_column: the end column index
+        :param end_inclusive: whether regions include their end (e.g. 1-based
+            GFF features) rather than end before it (0-based, half-open BED
+            regions)
+        """
+        indeces = [ chrom_column, start_column, end_column ]
+        if any( i is None for i in indeces ):
+            raise ValueError( "Could not determine proper column indeces for" +
+                              " chrom, start, end: %s" % ( str( indeces ) ) )
+        kwargs.update({ 'indeces' : indeces, 'column_types' : [ 'str', 'int', 'int' ] })
+        super( ChromosomeSummaryDataProvider, self ).__init__( source, **kwargs )
+        self.end_inclusive = end_inclusive
+
+    def __iter__( self ):
+        summaries = collections.OrderedDict()
+        extra_length = 1 if self.end_inclusive else 0
+        for chroms, starts, ends in self.iter_batches():
+            for chrom, start, end in zip( chroms, starts, ends ):
+                if chrom is None or start is None or end is None:
+                    continue
+                length = end - start + extra_length
+                summary = summaries.get( chrom )
+                if summary is None:
+                    summaries[ chrom ] = [ 1, start, end, length ]
+                    continue
+                summary[0] += 1
+                if start < summary[1]:
+                    summary[1] = start
+                if end > summary[2]:
+                    summary[2] = end
+                summary[3] += length
+        for chrom, ( count, start, end, length ) in summaries.items():
+            yield dict( chrom=chrom, count=count, start=start, end=end, length=length )
@@ -3,6 +3,8 @@ Providers that provide lists of lists generally where each line of a source
 is further subdivided into multiple data (e.g. columns from a line).
 """
 
+import itertools
+import operator
 import urllib
 import re
 
@@ -10,9 +12,6 @@ import line
 
 _TODO = """
 move ColumnarDataProvider parsers to more sensible location
-
-TransposedColumnarDataProvider: provides each column as a single array
-    - see existing visualizations/dataprovider/basic.ColumnDataProvider
 """
 
 import logging
@@ -97,6 +96,11 @@ class ColumnarDataProvider( line.RegexLineDataProvider ):
         # if no indeces given, infer from column_count
         if not self.selected_column_indeces and self.column_count:
             self.selected_column_indeces = list( xrange( self.column_count ) )
+        # split lines only as far as the last selected column (-1: split all),
+        # negative indeces count from the end of the line so need all columns
+        self.max_split = -1
+        if self.selected_column_indeces and min( self.selected_column_indeces ) >= 0:
+            self.max_split = max( self.selected_column_indeces ) + 1
 
         self.deliminator = deliminator
 
@@ -242,6 +246,9 @@ class ColumnarDataProvider( line.RegexLineDataProvider ):
             # 'gffstrand': # -, +, ?, or '.' for None, etc.
         }
 
+    def filters_only_lines( self ):
+        return super( ColumnarDataProvider, self ).filters_only_lines() and not self.column_filters
+
     def filter( self, line ):
         line = super( ColumnarDataProvider, self ).filter( line )
         if line is None:
@@ -256,7 +263,7 @@ class ColumnarDataProvider( line.RegexLineDataProvider ):
         :type line: str
         """
         # TODO: too much going on in this loop - the above should all be precomputed AMAP...
-        all_columns = line.split( self.deliminator )
+        all_columns = line.split( self.deliminator, self.max_split )
         # if no indeces were passed to init, return all columns
         selected_indeces = self.selected_column_indeces or list( xrange( len( all_columns ) ) )
         parsed_columns = []
@@ -316,6 +323,147 @@ class ColumnarDataProvider( line.RegexLineDataProvider ):
         return columns
 
 
+class TransposedColumnarDataProvider( ColumnarDataProvider ):
+    """
+    Data provider that provides the columns of batches of rows from its
+    source: each datum is a list with a list of values for each column
+    (e.g. `[ [ 1, 2, 3 ], [ 'a', 'b', 'c' ] ]`).
+
+    Rather than parsing each row, the rows of a batch are only split and each
+    column is parsed at once, which is much faster for sources with many rows
+    (e.g. when charting a few columns of a large dataset).
+
+    Unless there are regex or column filters, lines are also read, filtered
+    and split in chunks rather than passed one at a time through the filters.
+
+    Column filters, limit and offset apply to rows as in ColumnarDataProvider.
+    """
+    settings = {
+        'batch_size'    : 'int',
+    }
+    # lines read from the source at a time when there are no filters other
+    #   than those of blank lines and comments
+    lines_per_read = 10000
+
+    def __init__( self, source, batch_size=None, **kwargs ):
+        """
+        :param batch_size: the number of rows in each datum.
+            Optional: defaults to `None`, providing all rows as one datum.
+        :type batch_size: int
+        """
+        super( TransposedColumnarDataProvider, self ).__init__( source, **kwargs )
+        self.batch_size = batch_size if batch_size and batch_size > 0 else None
+
+    def filter( self, line ):
+        if self.column_filters:
+            # rows need to be parsed to be filtered
+            return super( TransposedColumnarDataProvider, self ).filter( line )
+        line = super( ColumnarDataProvider, self ).filter( line )
+        if line is None:
+            return line
+        # parsed by column in parse_rows
+        return line.split( self.deliminator, self.max_split )
+
+    def __iter__( self ):
+        if self.filters_only_lines():
+            rows_gen = self.iter_unfiltered_rows()
+        else:
+            rows_gen = super( TransposedColumnarDataProvider, self ).__iter__()
+        while True:
+            rows = list( itertools.islice( rows_gen, self.batch_size ) )
+            if not rows:
+                return
+            yield self.parse_rows( rows )
+
+    def iter_unfiltered_rows( self ):
+        """
+        Split rows from chunks of `lines_per_read` lines of the source when
+        only blank lines and comments are filtered, maintaining the counters
+        and applying limit and offset as FilteredLineDataProvider does.
+        """
+        if self.limit is not None and self.limit <= 0:
+            return
+        with self:
+            self.seek_to_offset()
+            source = iter( self.source )
+            while True:
+                lines = list( itertools.islice( source, self.lines_per_read ) )
+                if not lines:
+                    return
+                self.num_data_read += len( lines )
+                lines = self.filter_lines( lines )
+                # skip to the offset, stop at the limit
+                first = max( self.offset - self.num_valid_data_read, 0 )
+                last = len( lines )
+                if self.limit is not None:
+                    last = min( last, first + self.limit - self.num_data_returned )
+                self.num_valid_data_read += last
+                self.num_data_returned += max( last - first, 0 )
+                for data_line in lines[ first:last ]:
+                    yield data_line.split( self.deliminator, self.max_split )
+                if self.limit is not None and self.num_data_returned >= self.limit:
+                    return
+
+    def filter_lines( self, lines ):
+        """
+        Return the list of `lines` that are not blank or comments (stripping
+        them as set), as `FilteredLineDataProvider.filter` would.
+        """
+        if self.strip_lines:
+            lines = [ data_line.strip() for data_line in lines ]
+        elif self.strip_newlines:
+            lines = [ data_line.strip( '\n' ) for data_line in lines ]
+        if not self.provide_blank:
+            lines = [ data_line for data_line in lines if data_line != '' ]
+        if self.comment_char:
+            comment_char = self.comment_char
+            lines = [ data_line for data_line in lines if not data_line.startswith( comment_char ) ]
+        return lines
+
+    def parse_rows( self, rows ):
+        """
+        Return a list of the desired, parsed columns of `rows`.
+        :param rows: the rows to parse, as split or (if there are column
+            filters) parsed columns
+        :type rows: list of lists
+        """
+        if self.column_filters:
+            # already selected and parsed
+            return self.transpose( rows, xrange( max( len( row ) for row in rows ) ) )
+        indeces = self.selected_column_indeces or xrange( max( len( row ) for row in rows ) )
+        columns = self.transpose( rows, indeces )
+        return [ self.parse_column( column, self.get_column_type( parser_index ) )
+                 for parser_index, column in enumerate( columns ) ]
+
+    def transpose( self, rows, indeces ):
+        """
+        Return a list of the values of each of the `indeces` in `rows`, `None`
+        where a row is too short.
+        """
+        columns = []
+        for index in indeces:
+            try:
+                columns.append( map( operator.itemgetter( index ), rows ) )
+            except IndexError:
+                columns.append( [ row[ index ] if index < len( row ) else None for row in rows ] )
+        return columns
+
+    def parse_column( self, values, type ):
+        """
+        Parse all `values` of a column based on the given type.
+        .. seealso:: ColumnarDataProvider.parse_value
+        """
+        if type == 'str' or type not in self.parsers:
+            return values
+        if None not in values:
+            try:
+                return map( self.parsers[ type ], values )
+            except ValueError:
+                pass
+        # bad or missing values - parse one at a time
+        return [ None if value is None else self.parse_value( value, type ) for value in values ]
+
+
 class DictDataProvider( ColumnarDataProvider ):
     """
     Data provider that zips column_names and columns from the source's contents
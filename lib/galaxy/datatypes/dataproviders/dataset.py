@@ -9,6 +9,7 @@ Dataproviders that use either:
 
 import base
 import line
+import line_index
 import column
 import external
 from galaxy.util import sqlite
@@ -50,8 +51,19 @@ class DatasetDataProvider( base.DataProvider ):
         # precondition: dataset is a galaxy.model.DatasetInstance
         self.dataset = dataset
         # this dataset file is obviously the source
-        # TODO: this might be a good place to interface with the object_store...
-        super( DatasetDataProvider, self ).__init__( open( dataset.file_name, 'rb' ) )
+        # read through the object_store, which need not fetch the whole file
+        # for providers that only read part of it
+        super( DatasetDataProvider, self ).__init__( dataset.open_range() )
+        self._line_index = None
+
+    def get_line_index( self ):
+        """
+        Return the sparse line offset index of the dataset, building it if
+        necessary, or `None` if the dataset cannot be indexed.
+        """
+        if self._line_index is None:
+            self._line_index = line_index.dataset_line_index( self.dataset )
+        return self._line_index
 
     # TODO: this is a bit of a mess
     @classmethod
@@ -195,6 +207,21 @@ class DatasetColumnarDataProvider( column.ColumnarDataProvider ):
         super( DatasetColumnarDataProvider, self ).__init__( dataset_source, **kwargs )
 
 
+class DatasetTransposedColumnarDataProvider( column.TransposedColumnarDataProvider ):
+    """
+    Data provider that uses a DatasetDataProvider as its source and the
+    dataset's metadata to build settings for the TransposedColumnarDataProvider
+    it's inherited from.
+    .. seealso:: DatasetColumnarDataProvider
+    """
+    def __init__( self, dataset, **kwargs ):
+        dataset_source = DatasetDataProvider( dataset )
+        if not kwargs.get( 'column_types', None ):
+            indeces = kwargs.get( 'indeces', None )
+            kwargs[ 'column_types' ] = dataset_source.get_metadata_column_types( indeces=indeces )
+        super( DatasetTransposedColumnarDataProvider, self ).__init__( dataset_source, **kwargs )
+
+
 class DatasetDictDataProvider( column.DictDataProvider ):
     """
     Data provider that uses a DatasetDataProvider as its source and the
@@ -5,14 +5,12 @@ Dataproviders that iterate over lines from their sources.
 import collections
 import re
 import base
+import line_index
 
 import logging
 log = logging.getLogger( __name__ )
 
 _TODO = """
-line offsets (skip to some place in a file) needs to work more efficiently than simply iterating till we're there
-    capture tell() when provider is done
-        def stop( self ): self.endpoint = source.tell(); raise StopIteration()
 a lot of the hierarchy here could be flattened since we're implementing pipes
 """
 
@@ -80,6 +78,44 @@ class FilteredLineDataProvider( base.LimitedOffsetDataProvider ):
 
         return super( FilteredLineDataProvider, self ).filter( line )
 
+    def __iter__( self ):
+        self.seek_to_offset()
+        parent_gen = super( FilteredLineDataProvider, self ).__iter__()
+        for datum in parent_gen:
+            yield datum
+
+    def filters_only_lines( self ):
+        """
+        Does this provider provide every line its line filtering passes
+        (i.e. it has no further filters)?
+        """
+        return self.filter_fn is None
+
+    def seek_to_offset( self ):
+        """
+        Seek the source close to the `offset` datum using the source's line
+        offset index (see `DatasetDataProvider.get_line_index`), if it has one
+        and it applies to the lines this provider filters out, rather than
+        reading and discarding all the data before `offset`.
+        """
+        if self.offset < line_index.DEFAULT_LINES_PER_ENTRY or not self.filters_only_lines():
+            return
+        if self.strip_lines and not self.provide_blank and self.comment_char == self.DEFAULT_COMMENT_CHAR:
+            # the lines the index counts as data lines
+            data_lines_only = True
+        elif self.provide_blank and not self.comment_char:
+            data_lines_only = False
+        else:
+            return
+        get_line_index = getattr( self.source, 'get_line_index', None )
+        index = get_line_index() if get_line_index else None
+        if index is None:
+            return
+        position, lines, data_lines = index.position( self.offset, data_lines_only=data_lines_only )
+        self.source.seek( position )
+        self.num_data_read = lines
+        self.num_valid_data_read = data_lines if data_lines_only else lines
+
 
 class RegexLineDataProvider( FilteredLineDataProvider ):
     """
@@ -113,6 +149,9 @@ class RegexLineDataProvider( FilteredLineDataProvider ):
         self.invert = invert
         # NOTE: no support for flags
 
+    def filters_only_lines( self ):
+        return super( RegexLineDataProvider, self ).filters_only_lines() and not self.compiled_regex_list
+
     def filter( self, line ):
         # NOTE: filter_fn will occur BEFORE any matching
         line = super( RegexLineDataProvider, self ).filter( line )
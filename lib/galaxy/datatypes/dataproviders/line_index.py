@@ -0,0 +1,216 @@
+"""
+Sparse indexes of the byte offsets of lines in datasets, allowing line based
+dataproviders to seek close to the first datum they provide rather than
+reading and discarding every line before it.
+
+An index records, for every `lines_per_entry` lines of a file, the byte
+offset of the line and the number of data lines before it: lines that are
+neither blank nor comments (starting with '#' after any whitespace), the
+lines `FilteredLineDataProvider` provides with its default settings.
+
+The index of a dataset is built the first time it is needed and kept in
+memory and, if configured (see `configure`), in a directory of indexes keyed
+by dataset id, apart from the dataset and its extra files.
+"""
+
+import bisect
+import json
+import logging
+import os
+import re
+import tempfile
+
+from galaxy.util.lrucache import LRUCache
+
+log = logging.getLogger( __name__ )
+
+INDEX_VERSION = 1
+DEFAULT_LINES_PER_ENTRY = 10000
+BLOCK_SIZE = 2 ** 22
+# Number of indexes of recently provided datasets kept in memory
+RECENT_INDEXES = 100
+
+# Directory the indexes of datasets are stored in, if any, see configure
+index_path = None
+_recent_indexes = LRUCache( RECENT_INDEXES )
+
+# Lines skipped by FilteredLineDataProvider by default: blank once stripped,
+# or comments.
+_SKIPPED_LINE_RE = re.compile( r'^[ \t\r\x0b\x0c]*(?:#[^\n]*)?\n', re.MULTILINE )
+
+
+def _skipped_lines( data, start=0, end=None ):
+    end = len( data ) if end is None else end
+    skipped = len( _SKIPPED_LINE_RE.findall( data, start, end ) )
+    if end > start and data[ end - 1 ] != '\n':
+        # final line without a newline
+        last_line = data[ data.rfind( '\n', start, end ) + 1:end ].strip()
+        if not last_line or last_line.startswith( '#' ):
+            skipped += 1
+    return skipped
+
+
+class LineOffsetIndex( object ):
+    """
+    The byte offset (`offsets`) and number of preceding data lines
+    (`data_lines`) of every `lines_per_entry` lines of a file of `size` bytes.
+
+    >>> from StringIO import StringIO
+    >>> index = LineOffsetIndex.build( StringIO( 'a\\n#b\\nc\\n\\nd\\ne' ), lines_per_entry=2 )
+    >>> index.offsets, index.data_lines, index.lines, index.total_data_lines
+    ([0, 5, 8], [0, 1, 2], 6, 4)
+    >>> index.position( 3 )
+    (8, 4, 2)
+    >>> index.position( 3, data_lines_only=False )
+    (5, 2, 1)
+    >>> LineOffsetIndex.from_json( index.to_json() ).offsets
+    [0, 5, 8]
+    """
+
+    def __init__( self, size, lines_per_entry, offsets, data_lines, lines, total_data_lines ):
+        self.size = size
+        self.lines_per_entry = lines_per_entry
+        self.offsets = offsets
+        self.data_lines = data_lines
+        self.lines = lines
+        self.total_data_lines = total_data_lines
+
+    @classmethod
+    def build( cls, source, lines_per_entry=DEFAULT_LINES_PER_ENTRY, block_size=BLOCK_SIZE ):
+        """
+        Index the lines read from the binary file object `source`.
+        """
+        # Matches the next lines_per_entry lines, scanning in C
+        entry_re = re.compile( r'(?:[^\n]*\n){%d}' % lines_per_entry )
+        offsets = [ 0 ]
+        data_lines = [ 0 ]
+        skipped = 0
+        # byte offset of the start of buffer
+        buffer_offset = 0
+        buffer = ''
+        while True:
+            block = source.read( block_size )
+            buffer = buffer + block if buffer else block
+            start = 0
+            while True:
+                match = entry_re.match( buffer, start )
+                if match is None:
+                    break
+                skipped += _skipped_lines( buffer, start, match.end() )
+                offsets.append( buffer_offset + match.end() )
+                data_lines.append( len( data_lines ) * lines_per_entry - skipped )
+                start = match.end()
+            buffer_offset += start
+            buffer = buffer[ start: ]
+            if not block:
+                break
+        lines = ( len( offsets ) - 1 ) * lines_per_entry + buffer.count( '\n' )
+        if buffer and not buffer.endswith( '\n' ):
+            lines += 1
+        skipped += _skipped_lines( buffer )
+        return cls( buffer_offset + len( buffer ), lines_per_entry, offsets, data_lines, lines, lines - skipped )
+
+    def position( self, offset, data_lines_only=True ):
+        """
+        Return the byte offset, line number and number of preceding data lines
+        of the indexed line closest before the `offset` (0 based) data line or,
+        if `data_lines_only` is False, line.
+        """
+        if data_lines_only:
+            entry = bisect.bisect_right( self.data_lines, offset ) - 1
+        else:
+            entry = min( offset // self.lines_per_entry, len( self.offsets ) - 1 )
+        return self.offsets[ entry ], entry * self.lines_per_entry, self.data_lines[ entry ]
+
+    def to_json( self ):
+        return json.dumps( dict( version=INDEX_VERSION, size=self.size, lines_per_entry=self.lines_per_entry,
+                                 offsets=self.offsets, data_lines=self.data_lines, lines=self.lines,
+                                 total_data_lines=self.total_data_lines ) )
+
+    @classmethod
+    def from_json( cls, data ):
+        """
+        Return the index serialized in `data` or None if it is not a valid
+        index of this version.
+        """
+        try:
+            index = json.loads( data )
+            if index.get( 'version' ) != INDEX_VERSION:
+                return None
+            return cls( index[ 'size' ], index[ 'lines_per_entry' ], index[ 'offsets' ], index[ 'data_lines' ],
+                        index[ 'lines' ], index[ 'total_data_lines' ] )
+        except ( ValueError, KeyError, AttributeError ):
+            return None
+
+
+def configure( path ):
+    """
+    Store the indexes of datasets in the directory `path`, so they outlive the
+    process, or only keep them in memory if `path` is None.
+    """
+    global index_path
+    index_path = path
+    _recent_indexes.clear()
+
+
+def _index_file_name( dataset_id ):
+    return os.path.join( index_path, "%03d" % ( dataset_id // 1000 ), "dataset_%d_lines.json" % dataset_id )
+
+
+def dataset_line_index( dataset, lines_per_entry=DEFAULT_LINES_PER_ENTRY ):
+    """
+    Return the `LineOffsetIndex` of `dataset` (a DatasetInstance), from memory
+    or the directory of indexes or built (and stored there), or None if the
+    dataset cannot be indexed.
+    """
+    if dataset.dataset.external_filename:
+        # not managed by the object store
+        return None
+    dataset_id = dataset.dataset.id
+    size = dataset.dataset.object_store.size( dataset.dataset )
+    # indexes are only valid for the size of the dataset they were built for
+    key = ( dataset_id, size, lines_per_entry )
+    index = _recent_indexes.get( key )
+    if index is not None:
+        return index
+    index_file_name = _index_file_name( dataset_id ) if index_path else None
+    if index_file_name and os.path.exists( index_file_name ):
+        try:
+            with open( index_file_name ) as index_file:
+                index = LineOffsetIndex.from_json( index_file.read() )
+        except Exception, e:
+            log.warning( "Could not read line offset index of dataset %s: %s", dataset.id, e )
+        if index is not None and index.size == size and index.lines_per_entry == lines_per_entry:
+            _recent_indexes[ key ] = index
+            return index
+    source = dataset.open_range()
+    try:
+        index = LineOffsetIndex.build( source, lines_per_entry=lines_per_entry )
+    finally:
+        source.close()
+    if index.size != size:
+        log.warning( "Size of dataset %s changed while indexing lines", dataset.id )
+        return None
+    _recent_indexes[ key ] = index
+    if index_file_name:
+        _store_index( index, index_file_name, dataset )
+    return index
+
+
+def _store_index( index, index_file_name, dataset ):
+    try:
+        index_dir = os.path.dirname( index_file_name )
+        if not os.path.exists( index_dir ):
+            try:
+                os.makedirs( index_dir )
+            except OSError:
+                # created concurrently
+                if not os.path.isdir( index_dir ):
+                    raise
+        # written to a temporary file first so a partial index is never read
+        temp_fd, temp_name = tempfile.mkstemp( prefix='line_offsets_', dir=index_dir )
+        with os.fdopen( temp_fd, 'w' ) as temp:
+            temp.write( index.to_json() )
+        os.rename( temp_name, index_file_name )
+    except Exception, e:
+        log.warning( "Could not store line offset index of dataset %s: %s", dataset.id, e )
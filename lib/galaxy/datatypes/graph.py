@@ -26,7 +26,7 @@ class Xgmml( xml.GenericXml ):
         Set the peek and blurb text
         """
         if not dataset.dataset.purged:
-            dataset.peek = data.get_file_peek( dataset.file_name, is_multi_byte=is_multi_byte )
+            dataset.peek = data.get_dataset_peek( dataset, is_multi_byte=is_multi_byte )
             dataset.blurb = 'XGMML data'
         else:
             dataset.peek = 'file does not exist'
@@ -72,7 +72,7 @@ class Sif( tabular.Tabular ):
         Set the peek and blurb text
         """
         if not dataset.dataset.purged:
-            dataset.peek = data.get_file_peek( dataset.file_name, is_multi_byte=is_multi_byte )
+            dataset.peek = data.get_dataset_peek( dataset, is_multi_byte=is_multi_byte )
             dataset.blurb = 'SIF data'
         else:
             dataset.peek = 'file does not exist'
@@ -111,7 +111,7 @@ class Rdf( xml.GenericXml ):
     def set_peek( self, dataset, is_multi_byte=False ):
         """Set the peek and blurb text"""
         if not dataset.dataset.purged:
-            dataset.peek = data.get_file_peek( dataset.file_name, is_multi_byte=is_multi_byte )
+            dataset.peek = data.get_dataset_peek( dataset, is_multi_byte=is_multi_byte )
             dataset.blurb = 'RDF data'
         else:
             dataset.peek = 'file does not exist'
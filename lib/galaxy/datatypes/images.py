@@ -4,12 +4,12 @@ Image classes
 
 import imghdr
 import logging
+import re
 import zipfile
 from urllib import quote_plus
 
 from galaxy.datatypes.binary import Binary
-from galaxy.datatypes.sniff import get_headers
-from galaxy.datatypes.util.image_util import check_image_type
+from galaxy.datatypes.sniff import build_sniff_from_prefix, get_headers
 from galaxy.util import nice_size
 from . import data
 
@@ -34,9 +34,12 @@ log = logging.getLogger(__name__)
 # to our main public instance.
 
 
+@build_sniff_from_prefix
 class Image( data.Data ):
     """Class describing an image"""
     edam_format = "format_3547"
+    # Image formats, as reported by image_util.image_type, sniffed as this datatype
+    image_formats = None
 
     def set_peek( self, dataset, is_multi_byte=False ):
         if not dataset.dataset.purged:
@@ -46,7 +49,10 @@ class Image( data.Data ):
             dataset.peek = 'file does not exist'
             dataset.blurb = 'file purged from disk'
 
-    def sniff( self, filename ):
+    def sniff_prefix( self, file_prefix ):
+        if self.image_formats is not None:
+            return file_prefix.image_type in self.image_formats
+        filename = file_prefix.filename
         # First check if we can  use PIL
         if PIL is not None:
             try:
@@ -64,149 +70,99 @@ class Image( data.Data ):
 
 class Jpg( Image ):
     file_ext = "jpg"
-
-    def sniff(self, filename, image=None):
-        """Determine if the file is in jpg format."""
-        return check_image_type( filename, ['JPEG'], image )
+    image_formats = ['JPEG']
 
 
 class Png( Image ):
     file_ext = "png"
-
-    def sniff(self, filename, image=None):
-        """Determine if the file is in png format."""
-        return check_image_type( filename, ['PNG'], image )
+    image_formats = ['PNG']
 
 
 class Tiff( Image ):
     file_ext = "tiff"
-
-    def sniff(self, filename, image=None):
-        """Determine if the file is in tiff format."""
-        return check_image_type( filename, ['TIFF'], image )
+    image_formats = ['TIFF']
 
 
 class Bmp( Image ):
     file_ext = "bmp"
-
-    def sniff(self, filename, image=None):
-        """Determine if the file is in bmp format."""
-        return check_image_type( filename, ['BMP'], image )
+    image_formats = ['BMP']
 
 
 class Gif( Image ):
     edam_format = "format_3467"
     file_ext = "gif"
-
-    def sniff(self, filename, image=None):
-        """Determine if the file is in gif format."""
-        return check_image_type( filename, ['GIF'], image )
+    image_formats = ['GIF']
 
 
 class Im( Image ):
     file_ext = "im"
-
-    def sniff(self, filename, image=None):
-        """Determine if the file is in im format."""
-        return check_image_type( filename, ['IM'], image )
+    image_formats = ['IM']
 
 
 class Pcd( Image ):
     file_ext = "pcd"
-
-    def sniff(self, filename, image=None):
-        """Determine if the file is in pcd format."""
-        return check_image_type( filename, ['PCD'], image )
+    image_formats = ['PCD']
 
 
 class Pcx( Image ):
     file_ext = "pcx"
-
-    def sniff(self, filename, image=None):
-        """Determine if the file is in pcx format."""
-        return check_image_type( filename, ['PCX'], image )
+    image_formats = ['PCX']
 
 
 class Ppm( Image ):
     file_ext = "ppm"
-
-    def sniff(self, filename, image=None):
-        """Determine if the file is in ppm format."""
-        return check_image_type( filename, ['PPM'], image )
+    image_formats = ['PPM']
 
 
 class Psd( Image ):
     file_ext = "psd"
-
-    def sniff(self, filename, image=None):
-        """Determine if the file is in psd format."""
-        return check_image_type( filename, ['PSD'], image )
+    image_formats = ['PSD']
 
 
 class Xbm( Image ):
     file_ext = "xbm"
-
-    def sniff(self, filename, image=None):
-        """Determine if the file is in XBM format."""
-        return check_image_type( filename, ['XBM'], image )
+    image_formats = ['XBM']
 
 
 class Xpm( Image ):
     file_ext = "xpm"
-
-    def sniff(self, filename, image=None):
-        """Determine if the file is in XPM format."""
-        return check_image_type( filename, ['XPM'], image )
+    image_formats = ['XPM']
 
 
 class Rgb( Image ):
     file_ext = "rgb"
-
-    def sniff(self, filename, image=None):
-        """Determine if the file is in RGB format."""
-        return check_image_type( filename, ['RGB'], image )
+    image_formats = ['RGB']
 
 
 class Pbm( Image ):
     file_ext = "pbm"
-
-    def sniff(self, filename, image=None):
-        """Determine if the file is in PBM format"""
-        return check_image_type( filename, ['PBM'], image )
+    image_formats = ['PBM']
 
 
 class Pgm( Image ):
     file_ext = "pgm"
-
-    def sniff(self, filename, image=None):
-        """Determine if the file is in PGM format"""
-        return check_image_type( filename, ['PGM'], image )
+    image_formats = ['PGM']
 
 
 class Eps( Image ):
     edam_format = "format_3466"
     file_ext = "eps"
-
-    def sniff(self, filename, image=None):
-        """Determine if the file is in eps format."""
-        return check_image_type( filename, ['EPS'], image )
+    image_formats = ['EPS']
 
 
 class Rast( Image ):
     file_ext = "rast"
-
-    def sniff(self, filename, image=None):
-        """Determine if the file is in rast format"""
-        return check_image_type( filename, ['RAST'], image )
+    image_formats = ['RAST']
 
 
 class Pdf( Image ):
     edam_format = "format_3508"
     file_ext = "pdf"
+    sniff_header_pattern = re.compile( r'[ \t\r\f\v]*%PDF' )
 
-    def sniff(self, filename):
+    def sniff_prefix(self, file_prefix):
         """Determine if the file is in pdf format."""
-        headers = get_headers(filename, None, 1)
+        headers = get_headers(file_prefix, None, 1)
         try:
             if headers[0][0].startswith("%PDF"):
                 return True
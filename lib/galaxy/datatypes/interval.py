@@ -17,8 +17,9 @@ from bx.intervals.io import GenomicIntervalReader, ParseError
 from galaxy import util
 from galaxy.datatypes import metadata
 from galaxy.datatypes.metadata import MetadataElement
-from galaxy.datatypes.sniff import get_headers
-from galaxy.datatypes.tabular import Tabular
+from galaxy.datatypes.sniff import build_sniff_from_prefix, get_headers
+from galaxy.datatypes.scan import LineVisitor, scan_dataset
+from galaxy.datatypes.tabular import ColumnTypesVisitor, Tabular
 from galaxy.datatypes.util.gff_util import parse_gff_attributes
 from galaxy.web import url_for
 
@@ -50,6 +51,137 @@ VIEWPORT_READLINE_BUFFER_SIZE = 1048576  # 1MB
 VIEWPORT_MAX_READS_PER_LINE = 10
 
 
+def is_bed_data_line( line ):
+    """
+    Does the line look like the first line of bed data (at least three
+    columns, starting with a known chromosome name prefix)?
+    """
+    line = line.rstrip( '\r\n' )
+    if line and not line.startswith( '#' ) and len( line.split( '\t' ) ) > 2:
+        lower_line = line.lower()
+        for startswith in data.col1_startswith:
+            if lower_line.startswith( startswith ):
+                return True
+    return False
+
+
+class IntervalColumnsVisitor( LineVisitor ):
+    """
+    Finds either a header line naming the chromosome, start, end, strand and
+    name columns, or the first data line from which the positions of these
+    columns can be guessed.  Only up to ``num_check_lines`` non empty lines
+    are examined.
+    """
+
+    def __init__( self, datatype, overwrite=True, first_line_is_header=False, num_check_lines=100 ):
+        self.datatype = datatype
+        self.overwrite = overwrite
+        self.first_line_is_header = first_line_is_header
+        self.num_check_lines = num_check_lines  # only check up to this many non empty lines
+        self.line_index = 0
+        self.empty_line_count = 0
+        self.header = None
+        self.data_elems = None
+
+    def visit( self, line ):
+        i = self.line_index
+        self.line_index += 1
+        line = line.rstrip( '\r\n' )
+        if not line:
+            self.empty_line_count += 1
+            return
+        if ( self.first_line_is_header or line[0] == '#' ):
+            self.header = line
+            self.done = True
+            return
+        # Header lines in Interval files are optional. For example, BED is Interval but has no header.
+        # We'll make a best guess at the location of the metadata columns.
+        elems = line.split( '\t' )
+        if len( elems ) > 2:
+            for str in data.col1_startswith:
+                if line.lower().startswith( str ):
+                    self.data_elems = elems
+                    self.done = True
+                    return
+        if ( i - self.empty_line_count ) > self.num_check_lines:
+            self.done = True  # we examined 100 non-empty lines
+
+    def finish( self, dataset ):
+        if self.header is not None:
+            self.datatype.init_meta( dataset )
+            elems = self.header.strip( '#' ).split( '\t' )
+            for meta_name, header_list in alias_spec.iteritems():
+                for header_val in header_list:
+                    if header_val in elems:
+                        # found highest priority header to meta_name
+                        setattr( dataset.metadata, meta_name, elems.index( header_val ) + 1 )
+                        break  # next meta_name
+        elif self.data_elems is not None:
+            self._guess_columns( dataset, self.data_elems )
+
+    def _guess_columns( self, dataset, elems ):
+        overwrite = self.overwrite
+        if overwrite or not dataset.metadata.element_is_set( 'chromCol' ):
+            dataset.metadata.chromCol = 1
+        try:
+            int( elems[1] )
+            if overwrite or not dataset.metadata.element_is_set( 'startCol' ):
+                dataset.metadata.startCol = 2
+        except:
+            pass  # Metadata default will be used
+        try:
+            int( elems[2] )
+            if overwrite or not dataset.metadata.element_is_set( 'endCol' ):
+                dataset.metadata.endCol = 3
+        except:
+            pass  # Metadata default will be used
+        # we no longer want to guess that this column is the 'name', name must now be set manually for interval files
+        # we will still guess at the strand, as we can make a more educated guess
+        # if len( elems ) > 3:
+        #    try:
+        #        int( elems[3] )
+        #    except:
+        #        if overwrite or not dataset.metadata.element_is_set( 'nameCol' ):
+        #            dataset.metadata.nameCol = 4
+        if len( elems ) < 6 or elems[5] not in data.valid_strand:
+            if overwrite or not dataset.metadata.element_is_set(  'strandCol' ):
+                dataset.metadata.strandCol = 0
+        else:
+            if overwrite or not dataset.metadata.element_is_set( 'strandCol' ):
+                dataset.metadata.strandCol = 6
+
+
+class BedColumnsVisitor( LineVisitor ):
+    """
+    Sets the name and strand columns of bed data from the number of columns
+    of the first bed data line.
+    """
+
+    def __init__( self, overwrite=True ):
+        self.overwrite = overwrite
+        self.columns = None
+
+    def visit( self, line ):
+        if is_bed_data_line( line ):
+            self.columns = len( line.rstrip( '\r\n' ).split( '\t' ) )
+            self.done = True
+
+    def finish( self, dataset ):
+        if self.columns is None:
+            return
+        overwrite = self.overwrite
+        if self.columns > 3:
+            if overwrite or not dataset.metadata.element_is_set( 'nameCol' ):
+                dataset.metadata.nameCol = 4
+        if self.columns < 6:
+            if overwrite or not dataset.metadata.element_is_set( 'strandCol' ):
+                dataset.metadata.strandCol = 0
+        else:
+            if overwrite or not dataset.metadata.element_is_set( 'strandCol' ):
+                dataset.metadata.strandCol = 6
+
+
+@build_sniff_from_prefix
 @dataproviders.decorators.has_dataproviders
 class Interval( Tabular ):
     """Tab delimited data containing interval information"""
@@ -77,66 +209,8 @@ class Interval( Tabular ):
 
     def set_meta( self, dataset, overwrite=True, first_line_is_header=False, **kwd ):
         """Tries to guess from the line the location number of the column for the chromosome, region start-end and strand"""
-        Tabular.set_meta( self, dataset, overwrite=overwrite, skip=0 )
-        if dataset.has_data():
-            empty_line_count = 0
-            num_check_lines = 100  # only check up to this many non empty lines
-            for i, line in enumerate( file( dataset.file_name ) ):
-                line = line.rstrip( '\r\n' )
-                if line:
-                    if ( first_line_is_header or line[0] == '#' ):
-                        self.init_meta( dataset )
-                        line = line.strip( '#' )
-                        elems = line.split( '\t' )
-                        for meta_name, header_list in alias_spec.iteritems():
-                            for header_val in header_list:
-                                if header_val in elems:
-                                    # found highest priority header to meta_name
-                                    setattr( dataset.metadata, meta_name, elems.index( header_val ) + 1 )
-                                    break  # next meta_name
-                        break  # Our metadata is set, so break out of the outer loop
-                    else:
-                        # Header lines in Interval files are optional. For example, BED is Interval but has no header.
-                        # We'll make a best guess at the location of the metadata columns.
-                        metadata_is_set = False
-                        elems = line.split( '\t' )
-                        if len( elems ) > 2:
-                            for str in data.col1_startswith:
-                                if line.lower().startswith( str ):
-                                    if overwrite or not dataset.metadata.element_is_set( 'chromCol' ):
-                                        dataset.metadata.chromCol = 1
-                                    try:
-                                        int( elems[1] )
-                                        if overwrite or not dataset.metadata.element_is_set( 'startCol' ):
-                                            dataset.metadata.startCol = 2
-                                    except:
-                                        pass  # Metadata default will be used
-                                    try:
-                                        int( elems[2] )
-                                        if overwrite or not dataset.metadata.element_is_set( 'endCol' ):
-                                            dataset.metadata.endCol = 3
-                                    except:
-                                        pass  # Metadata default will be used
-                                    # we no longer want to guess that this column is the 'name', name must now be set manually for interval files
-                                    # we will still guess at the strand, as we can make a more educated guess
-                                    # if len( elems ) > 3:
-                                    #    try:
-                                    #        int( elems[3] )
-                                    #    except:
-                                    #        if overwrite or not dataset.metadata.element_is_set( 'nameCol' ):
-                                    #            dataset.metadata.nameCol = 4
-                                    if len( elems ) < 6 or elems[5] not in data.valid_strand:
-                                        if overwrite or not dataset.metadata.element_is_set(  'strandCol' ):
-                                            dataset.metadata.strandCol = 0
-                                    else:
-                                        if overwrite or not dataset.metadata.element_is_set( 'strandCol' ):
-                                            dataset.metadata.strandCol = 6
-                                    metadata_is_set = True
-                                    break
-                        if metadata_is_set or ( i - empty_line_count ) > num_check_lines:
-                            break  # Our metadata is set or we examined 100 non-empty lines, so break out of the outer loop
-                else:
-                    empty_line_count += 1
+        scan_dataset( dataset, [ ColumnTypesVisitor( skip=0 ),
+                                 IntervalColumnsVisitor( self, overwrite=overwrite, first_line_is_header=first_line_is_header ) ] )
 
     def displayable( self, dataset ):
         try:
@@ -299,7 +373,7 @@ class Interval( Tabular ):
         """Return options for removing errors along with a description"""
         return [("lines", "Remove erroneous lines")]
 
-    def sniff( self, filename ):
+    def sniff_prefix( self, file_prefix ):
         """
         Checks for 'intervalness'
 
@@ -314,7 +388,7 @@ class Interval( Tabular ):
         >>> Interval().sniff( fname )
         True
         """
-        headers = get_headers( filename, '\t' )
+        headers = get_headers( file_prefix, '\t' )
         try:
             """
             If we got here, we already know the file is_column_based and is not bed,
@@ -375,6 +449,16 @@ class Interval( Tabular ):
         settings[ 'named_columns' ] = True
         return self.interval_dataprovider( dataset, **settings )
 
+    @dataproviders.decorators.dataprovider_factory( 'chromosome-summary',
+                                                    dataproviders.aggregate.ChromosomeSummaryDataProvider.settings )
+    def chromosome_summary_dataprovider( self, dataset, **settings ):
+        dataset_source = dataproviders.dataset.DatasetDataProvider( dataset )
+        region_indeces = dataset_source.get_genomic_region_indeces()
+        for name, index in zip( ( 'chrom_column', 'start_column', 'end_column' ), region_indeces ):
+            if settings.get( name, None ) is None:
+                settings[ name ] = index
+        return dataproviders.aggregate.ChromosomeSummaryDataProvider( dataset_source, **settings )
+
 
 class BedGraph( Interval ):
     """Tab delimited chrom/start/end/datavalue dataset"""
@@ -397,6 +481,7 @@ class BedGraph( Interval ):
         return Interval.get_estimated_display_viewport( self, dataset, chrom_col=chrom_col, start_col=start_col, end_col=end_col )
 
 
+@build_sniff_from_prefix
 class Bed( Interval ):
     """Tab delimited data in BED format"""
     edam_format = "format_3003"
@@ -415,30 +500,10 @@ class Bed( Interval ):
 
     def set_meta( self, dataset, overwrite=True, **kwd ):
         """Sets the metadata information for datasets previously determined to be in bed format."""
-        i = 0
         if dataset.has_data():
-            for i, line in enumerate( file(dataset.file_name) ):
-                metadata_set = False
-                line = line.rstrip('\r\n')
-                if line and not line.startswith('#'):
-                    elems = line.split('\t')
-                    if len(elems) > 2:
-                        for startswith in data.col1_startswith:
-                            if line.lower().startswith( startswith ):
-                                if len( elems ) > 3:
-                                    if overwrite or not dataset.metadata.element_is_set( 'nameCol' ):
-                                        dataset.metadata.nameCol = 4
-                                if len(elems) < 6:
-                                    if overwrite or not dataset.metadata.element_is_set( 'strandCol' ):
-                                        dataset.metadata.strandCol = 0
-                                else:
-                                    if overwrite or not dataset.metadata.element_is_set( 'strandCol' ):
-                                        dataset.metadata.strandCol = 6
-                                metadata_set = True
-                                break
-                if metadata_set:
-                    break
-            Tabular.set_meta( self, dataset, overwrite=overwrite, skip=i )
+            # Lines before the first bed data line are counted as comments
+            scan_dataset( dataset, [ BedColumnsVisitor( overwrite=overwrite ),
+                                     ColumnTypesVisitor( skip_until=is_bed_data_line ) ] )
 
     def as_ucsc_display_file( self, dataset, **kwd ):
         """Returns file contents with only the bed data. If bed 6+, treat as interval."""
@@ -478,7 +543,7 @@ class Bed( Interval ):
         except:
             return "This item contains no content"
 
-    def sniff( self, filename ):
+    def sniff_prefix( self, file_prefix ):
         """
         Checks for 'bedness'
 
@@ -502,7 +567,7 @@ class Bed( Interval ):
         >>> Bed().sniff( fname )
         True
         """
-        headers = get_headers( filename, '\t' )
+        headers = get_headers( file_prefix, '\t' )
         try:
             if not headers:
                 return False
@@ -641,6 +706,7 @@ class _RemoteCallMixin:
         return link
 
 
+@build_sniff_from_prefix
 @dataproviders.decorators.has_dataproviders
 class Gff( Tabular, _RemoteCallMixin ):
     """Tab delimited data in Gff format"""
@@ -827,7 +893,7 @@ class Gff( Tabular, _RemoteCallMixin ):
                     ret_val.append( ( site_name, link ) )
         return ret_val
 
-    def sniff( self, filename ):
+    def sniff_prefix( self, file_prefix ):
         """
         Determines whether the file is in gff format
 
@@ -843,7 +909,7 @@ class Gff( Tabular, _RemoteCallMixin ):
         >>> Gff().sniff( fname )
         True
         """
-        headers = get_headers( filename, '\t' )
+        headers = get_headers( file_prefix, '\t' )
         try:
             if len(headers) < 2:
                 return False
@@ -893,7 +959,18 @@ class Gff( Tabular, _RemoteCallMixin ):
         settings[ 'named_columns' ] = True
         return self.interval_dataprovider( dataset, **settings )
 
+    @dataproviders.decorators.dataprovider_factory( 'chromosome-summary',
+                                                    dataproviders.aggregate.ChromosomeSummaryDataProvider.settings )
+    def chromosome_summary_dataprovider( self, dataset, **settings ):
+        dataset_source = dataproviders.dataset.DatasetDataProvider( dataset )
+        for name, index in zip( ( 'chrom_column', 'start_column', 'end_column' ), ( 0, 3, 4 ) ):
+            if settings.get( name, None ) is None:
+                settings[ name ] = index
+        # GFF features are 1-based and include their end
+        return dataproviders.aggregate.ChromosomeSummaryDataProvider( dataset_source, end_inclusive=True, **settings )
+
 
+@build_sniff_from_prefix
 class Gff3( Gff ):
     """Tab delimited data in Gff3 format"""
     edam_format = "format_1975"
@@ -940,7 +1017,7 @@ class Gff3( Gff ):
                         break
         Tabular.set_meta( self, dataset, overwrite=overwrite, skip=i )
 
-    def sniff( self, filename ):
+    def sniff_prefix( self, file_prefix ):
         """
         Determines whether the file is in gff version 3 format
 
@@ -970,7 +1047,7 @@ class Gff3( Gff ):
         >>> Gff3().sniff( fname )
         True
         """
-        headers = get_headers( filename, '\t' )
+        headers = get_headers( file_prefix, '\t' )
         try:
             if len(headers) < 2:
                 return False
@@ -1007,6 +1084,7 @@ class Gff3( Gff ):
             return False
 
 
+@build_sniff_from_prefix
 class Gtf( Gff ):
     """Tab delimited data in Gtf format"""
     edam_format = "format_2306"
@@ -1019,7 +1097,7 @@ class Gtf( Gff ):
     MetadataElement( name="column_types", default=['str', 'str', 'str', 'int', 'int', 'float', 'str', 'int', 'list'],
                      param=metadata.ColumnTypesParameter, desc="Column types", readonly=True, visible=False )
 
-    def sniff( self, filename ):
+    def sniff_prefix( self, file_prefix ):
         """
         Determines whether the file is in gtf format
 
@@ -1044,7 +1122,7 @@ class Gtf( Gff ):
         >>> Gtf().sniff( fname )
         True
         """
-        headers = get_headers( filename, '\t' )
+        headers = get_headers( file_prefix, '\t' )
         try:
             if len(headers) < 2:
                 return False
@@ -1081,6 +1159,7 @@ class Gtf( Gff ):
             return False
 
 
+@build_sniff_from_prefix
 @dataproviders.decorators.has_dataproviders
 class Wiggle( Tabular, _RemoteCallMixin ):
     """Tab delimited data in wiggle format"""
@@ -1215,7 +1294,7 @@ class Wiggle( Tabular, _RemoteCallMixin ):
             max_data_lines = 100
         Tabular.set_meta( self, dataset, overwrite=overwrite, skip=i, max_data_lines=max_data_lines )
 
-    def sniff( self, filename ):
+    def sniff_prefix( self, file_prefix ):
         """
         Determines wether the file is in wiggle format
 
@@ -1238,7 +1317,7 @@ class Wiggle( Tabular, _RemoteCallMixin ):
         >>> Wiggle().sniff( fname )
         True
         """
-        headers = get_headers( filename, None )
+        headers = get_headers( file_prefix, None )
         try:
             for hdr in headers:
                 if len(hdr) > 1 and hdr[0] == 'track' and hdr[1].startswith('type=wiggle'):
@@ -1289,6 +1368,7 @@ class Wiggle( Tabular, _RemoteCallMixin ):
         return dataproviders.dataset.WiggleDataProvider( dataset_source, **settings )
 
 
+@build_sniff_from_prefix
 class CustomTrack ( Tabular ):
     """UCSC CustomTrack"""
     file_ext = "customtrack"
@@ -1376,7 +1456,7 @@ class CustomTrack ( Tabular ):
                     ret_val.append( (site_name, link) )
         return ret_val
 
-    def sniff( self, filename ):
+    def sniff_prefix( self, file_prefix ):
         """
         Determines whether the file is in customtrack format.
 
@@ -1393,7 +1473,7 @@ class CustomTrack ( Tabular ):
         >>> CustomTrack().sniff( fname )
         True
         """
-        headers = get_headers( filename, None )
+        headers = get_headers( file_prefix, None )
         first_line = True
         for hdr in headers:
             if first_line:
@@ -727,6 +727,7 @@ class JobExternalOutputMetadataWrapper( object ):
                                  config_file=None, datatypes_config=None,
                                  job_metadata=None, compute_tmp_dir=None,
                                  include_command=True, max_metadata_value_size=0,
+                                 metadata_processes=None, metadata_daemon_socket=None,
                                  kwds=None):
         kwds = kwds or {}
         if tmp_dir is None:
@@ -834,12 +835,24 @@ class JobExternalOutputMetadataWrapper( object ):
             # return command required to build
             fd, fp = tempfile.mkstemp( suffix='.py', dir=tmp_dir, prefix="set_metadata_" )
             metadata_script_file = abspath( fp )
-            os.fdopen( fd, 'w' ).write( 'from galaxy_ext.metadata.set_metadata import set_metadata; set_metadata()' )
+            os.fdopen( fd, 'w' ).write( self.__metadata_script( metadata_processes, metadata_daemon_socket ) )
             return 'python "%s" %s' % ( metadata_path_on_compute(metadata_script_file), args )
         else:
             # return args to galaxy_ext.metadata.set_metadata required to build
             return args
 
+    def __metadata_script( self, metadata_processes, metadata_daemon_socket ):
+        processes = ""
+        if metadata_processes and metadata_processes > 1:
+            processes = "processes=%d" % metadata_processes
+        if metadata_daemon_socket:
+            # hand the work to a warm metadata daemon, set_metadata_via_daemon
+            # falls back to setting metadata locally if it is not running
+            if processes:
+                processes = ", %s" % processes
+            return 'from galaxy_ext.metadata.daemon import set_metadata_via_daemon; set_metadata_via_daemon(%r%s)' % ( str( metadata_daemon_socket ), processes )
+        return 'from galaxy_ext.metadata.set_metadata import set_metadata; set_metadata(%s)' % processes
+
     def external_metadata_set_successfully( self, dataset, sa_session ):
         metadata_files = self.get_output_filenames_by_dataset( dataset, sa_session )
         if not metadata_files:
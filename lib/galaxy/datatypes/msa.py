@@ -2,7 +2,7 @@ import logging
 import os
 
 from galaxy.datatypes.binary import Binary
-from galaxy.datatypes.data import get_file_peek, Text
+from galaxy.datatypes.data import get_dataset_peek, Text
 from galaxy.datatypes.metadata import MetadataElement
 from galaxy.datatypes.util import generic_util
 from galaxy.util import nice_size
@@ -15,7 +15,7 @@ class Hmmer( Text ):
 
     def set_peek(self, dataset, is_multi_byte=False):
         if not dataset.dataset.purged:
-            dataset.peek = get_file_peek( dataset.file_name, is_multi_byte=is_multi_byte )
+            dataset.peek = get_dataset_peek( dataset, is_multi_byte=is_multi_byte )
             dataset.blurb = "HMMER Database"
         else:
             dataset.peek = 'file does not exist'
@@ -91,12 +91,12 @@ class Stockholm_1_0( Text ):
 
     def set_peek( self, dataset, is_multi_byte=False ):
         if not dataset.dataset.purged:
-            dataset.peek = get_file_peek( dataset.file_name, is_multi_byte=is_multi_byte )
+            dataset.peek = get_dataset_peek( dataset, is_multi_byte=is_multi_byte )
             if (dataset.metadata.number_of_models == 1):
                 dataset.blurb = "1 alignment"
             else:
                 dataset.blurb = "%s alignments" % dataset.metadata.number_of_models
-            dataset.peek = get_file_peek( dataset.file_name, is_multi_byte=is_multi_byte )
+            dataset.peek = get_dataset_peek( dataset, is_multi_byte=is_multi_byte )
         else:
             dataset.peek = 'file does not exist'
             dataset.blurb = 'file purged from disc'
@@ -174,12 +174,12 @@ class MauveXmfa( Text ):
 
     def set_peek( self, dataset, is_multi_byte=False ):
         if not dataset.dataset.purged:
-            dataset.peek = get_file_peek( dataset.file_name, is_multi_byte=is_multi_byte )
+            dataset.peek = get_dataset_peek( dataset, is_multi_byte=is_multi_byte )
             if (dataset.metadata.number_of_models == 1):
                 dataset.blurb = "1 alignment"
             else:
                 dataset.blurb = "%s alignments" % dataset.metadata.number_of_models
-            dataset.peek = get_file_peek( dataset.file_name, is_multi_byte=is_multi_byte )
+            dataset.peek = get_dataset_peek( dataset, is_multi_byte=is_multi_byte )
         else:
             dataset.peek = 'file does not exist'
             dataset.blurb = 'file purged from disc'
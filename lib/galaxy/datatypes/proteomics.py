@@ -112,7 +112,7 @@ class ProteomicsXml(GenericXml):
     def set_peek(self, dataset, is_multi_byte=False):
         """Set the peek and blurb text"""
         if not dataset.dataset.purged:
-            dataset.peek = data.get_file_peek(dataset.file_name, is_multi_byte=is_multi_byte)
+            dataset.peek = data.get_dataset_peek(dataset, is_multi_byte=is_multi_byte)
             dataset.blurb = self.blurb
         else:
             dataset.peek = 'file does not exist'
@@ -200,7 +200,7 @@ class Mgf(Text):
     def set_peek(self, dataset, is_multi_byte=False):
         """Set the peek and blurb text"""
         if not dataset.dataset.purged:
-            dataset.peek = data.get_file_peek(dataset.file_name, is_multi_byte=is_multi_byte)
+            dataset.peek = data.get_dataset_peek(dataset, is_multi_byte=is_multi_byte)
             dataset.blurb = 'mgf Mascot Generic Format'
         else:
             dataset.peek = 'file does not exist'
@@ -226,7 +226,7 @@ class MascotDat(Text):
     def set_peek(self, dataset, is_multi_byte=False):
         """Set the peek and blurb text"""
         if not dataset.dataset.purged:
-            dataset.peek = data.get_file_peek(dataset.file_name, is_multi_byte=is_multi_byte)
+            dataset.peek = data.get_dataset_peek(dataset, is_multi_byte=is_multi_byte)
             dataset.blurb = 'mascotdat Mascot Search Results'
         else:
             dataset.peek = 'file does not exist'
@@ -309,7 +309,7 @@ class SPLibNoIndex( Text ):
     def set_peek( self, dataset, is_multi_byte=False ):
         """Set the peek and blurb text"""
         if not dataset.dataset.purged:
-            dataset.peek = data.get_file_peek( dataset.file_name, is_multi_byte=is_multi_byte )
+            dataset.peek = data.get_dataset_peek( dataset, is_multi_byte=is_multi_byte )
             dataset.blurb = 'Spectral Library without index files'
         else:
             dataset.peek = 'file does not exist'
@@ -349,7 +349,7 @@ class SPLib(Msp):
     def set_peek(self, dataset, is_multi_byte=False):
         """Set the peek and blurb text"""
         if not dataset.dataset.purged:
-            dataset.peek = data.get_file_peek(dataset.file_name, is_multi_byte=is_multi_byte)
+            dataset.peek = data.get_dataset_peek(dataset, is_multi_byte=is_multi_byte)
             dataset.blurb = 'splib Spectral Library Format'
         else:
             dataset.peek = 'file does not exist'
@@ -4,6 +4,9 @@ Qualityscore class
 
 import data
 import logging
+
+from galaxy.datatypes.sniff import build_sniff_from_prefix
+
 log = logging.getLogger(__name__)
 
 
@@ -14,13 +17,14 @@ class QualityScore ( data.Text ):
     file_ext = "qual"
 
 
+@build_sniff_from_prefix
 class QualityScoreSOLiD ( QualityScore ):
     """
     until we know more about quality score formats
     """
     file_ext = "qualsolid"
 
-    def sniff( self, filename ):
+    def sniff_prefix( self, file_prefix ):
         """
         >>> from galaxy.datatypes.sniff import get_test_fname
         >>> fname = get_test_fname( 'sequence.fasta' )
@@ -31,7 +35,7 @@ class QualityScoreSOLiD ( QualityScore ):
         True
         """
         try:
-            fh = open( filename )
+            fh = file_prefix.line_reader()
             readlen = None
             goodblock = 0
             while True:
@@ -71,13 +75,14 @@ class QualityScoreSOLiD ( QualityScore ):
         return QualityScore.set_meta( self, dataset, **kwd )
 
 
+@build_sniff_from_prefix
 class QualityScore454 ( QualityScore ):
     """
     until we know more about quality score formats
     """
     file_ext = "qual454"
 
-    def sniff( self, filename ):
+    def sniff_prefix( self, file_prefix ):
         """
         >>> from galaxy.datatypes.sniff import get_test_fname
         >>> fname = get_test_fname( 'sequence.fasta' )
@@ -88,7 +93,7 @@ class QualityScore454 ( QualityScore ):
         True
         """
         try:
-            fh = open( filename )
+            fh = file_prefix.line_reader()
             while True:
                 line = fh.readline()
                 if not line:
@@ -15,6 +15,7 @@ import xml
 import coverage
 import tracks
 import binary
+import sniff
 import galaxy.util
 from galaxy.util.odict import odict
 from display_applications.application import DisplayApplication
@@ -40,6 +41,8 @@ class Registry( object ):
         self.available_tracks = []
         self.set_external_metadata_tool = None
         self.sniff_order = []
+        # Index of sniff_order by datatype signatures, see sniff.SniffIndex
+        self.sniff_index = None
         self.upload_file_formats = []
         # Datatype elements defined in local datatypes_conf.xml that contain display applications.
         self.display_app_containers = []
@@ -306,6 +309,8 @@ class Registry( object ):
                 if not included:
                     self.sniff_order.append( datatype )
         append_to_sniff_order()
+        # Sniffers are all loaded, so index them for guess_ext.
+        self.sniff_index = sniff.SniffIndex( self.sniff_order )
 
     def load_build_sites( self, root ):
         if root.find( 'build_sites' ) is not None:
@@ -0,0 +1,100 @@
+"""
+Single pass scanning of dataset files for setting metadata.
+
+Rather than each piece of metadata (line counts, column types, interval column
+guesses, ...) being computed by separately opening and reading the dataset,
+datatypes contribute small ``LineVisitor`` objects which are all fed each line
+of the file during one read.  The read stops as soon as every visitor has seen
+all the lines it needs, so datatypes that only examine the start of a file
+never read the rest of it.
+"""
+
+
+class LineVisitor( object ):
+    """
+    Receives the lines of a dataset from ``scan_file``.
+
+    ``visit`` is called with each line (including its line terminator) until
+    the visitor sets ``done`` or the file is exhausted, ``finish`` is then
+    called once by ``scan_dataset`` to set the collected metadata on the
+    dataset.
+    """
+    done = False
+
+    def visit( self, line ):
+        raise NotImplementedError()
+
+    def finish( self, dataset ):
+        pass
+
+
+class FileScan( object ):
+    """
+    The result of ``scan_file``, ``lines`` is the number of lines read and
+    ``complete`` is True if reading stopped at the end of the file rather
+    than because all visitors were done.
+    """
+
+    def __init__( self, file_name ):
+        self.file_name = file_name
+        self.lines = 0
+        self.complete = False
+
+
+def scan_file( file_name, visitors ):
+    """
+    Read ``file_name`` once, passing each line to every visitor which is not
+    yet done.
+
+    >>> from galaxy.datatypes.sniff import get_test_fname
+    >>> class Counter( LineVisitor ):
+    ...     def __init__( self, limit=None ):
+    ...         self.count = 0
+    ...         self.limit = limit
+    ...     def visit( self, line ):
+    ...         self.count += 1
+    ...         self.done = self.count == self.limit
+    >>> everything, first_two = Counter(), Counter( 2 )
+    >>> result = scan_file( get_test_fname( '1.bed' ), [ everything, first_two ] )
+    >>> everything.count, first_two.count, result.lines, result.complete
+    (65, 2, 65, True)
+    >>> first_two = Counter( 2 )
+    >>> result = scan_file( get_test_fname( '1.bed' ), [ first_two ] )
+    >>> first_two.count, result.lines, result.complete
+    (2, 2, False)
+    """
+    scan = FileScan( file_name )
+    # Bind visit methods once, this loop runs for every line of large files.
+    active = [ ( visitor, visitor.visit ) for visitor in visitors if not visitor.done ]
+    if not active:
+        return scan
+    lines = 0
+    with open( file_name ) as fh:
+        for line in fh:
+            lines += 1
+            finished = False
+            for visitor, visit in active:
+                visit( line )
+                if visitor.done:
+                    finished = True
+            if finished:
+                active = [ ( visitor, visit ) for visitor, visit in active if not visitor.done ]
+                if not active:
+                    break
+        else:
+            scan.complete = True
+    scan.lines = lines
+    return scan
+
+
+def scan_dataset( dataset, visitors ):
+    """
+    Scan the file of ``dataset`` (if it has any data) with ``visitors`` and
+    let each of them set its metadata on the dataset, in the order given.
+    """
+    scan = None
+    if dataset.has_data():
+        scan = scan_file( dataset.file_name, visitors )
+    for visitor in visitors:
+        visitor.finish( dataset )
+    return scan
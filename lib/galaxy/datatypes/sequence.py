@@ -2,7 +2,6 @@
 Sequence classes
 """
 
-import gzip
 import json
 import logging
 import os
@@ -14,8 +13,8 @@ from galaxy import eggs, util
 from galaxy.datatypes import metadata
 from galaxy.datatypes.checkers import is_gzip
 from galaxy.datatypes.metadata import MetadataElement
-from galaxy.datatypes.sniff import get_headers
-from galaxy.datatypes.util.image_util import check_image_type
+from galaxy.datatypes.sniff import build_sniff_from_prefix, get_headers
+from galaxy.datatypes.util.sequence_util import count_fasta, count_fastq, count_lines
 from galaxy.util import nice_size
 from . import data
 
@@ -47,7 +46,7 @@ class SequenceSplitLocations( data.Text ):
             try:
                 parsed_data = json.load(open(dataset.file_name))
                 # dataset.peek = json.dumps(data, sort_keys=True, indent=4)
-                dataset.peek = data.get_file_peek( dataset.file_name, is_multi_byte=is_multi_byte )
+                dataset.peek = data.get_dataset_peek( dataset, is_multi_byte=is_multi_byte )
                 dataset.blurb = '%d sections' % len(parsed_data['sections'])
             except Exception:
                 dataset.peek = 'Not FQTOC file'
@@ -82,24 +81,13 @@ class Sequence( data.Text ):
         """
         Set the number of sequences and the number of data lines in dataset.
         """
-        data_lines = 0
-        sequences = 0
-        for line in file( dataset.file_name ):
-            line = line.strip()
-            if line and line.startswith( '#' ):
-                # We don't count comment lines for sequence data types
-                continue
-            if line and line.startswith( '>' ):
-                sequences += 1
-                data_lines += 1
-            else:
-                data_lines += 1
+        data_lines, sequences = count_fasta( dataset.file_name )
         dataset.metadata.data_lines = data_lines
         dataset.metadata.sequences = sequences
 
     def set_peek( self, dataset, is_multi_byte=False ):
         if not dataset.dataset.purged:
-            dataset.peek = data.get_file_peek( dataset.file_name, is_multi_byte=is_multi_byte )
+            dataset.peek = data.get_dataset_peek( dataset, is_multi_byte=is_multi_byte )
             if dataset.metadata.sequences:
                 dataset.blurb = "%s sequences" % util.commaify( str( dataset.metadata.sequences ) )
             else:
@@ -130,27 +118,11 @@ class Sequence( data.Text ):
 
     def do_slow_split( cls, input_datasets, subdir_generator_function, split_params):
         # count the sequences so we can split
-        # TODO: if metadata is present, take the number of lines / 4
         if input_datasets[0].metadata is not None and input_datasets[0].metadata.sequences is not None:
             total_sequences = input_datasets[0].metadata.sequences
         else:
-            input_file = input_datasets[0].file_name
-            compress = is_gzip(input_file)
-            if compress:
-                # gzip is really slow before python 2.7!
-                in_file = gzip.GzipFile(input_file, 'r')
-            else:
-                # TODO
-                # if a file is not compressed, seek locations can be calculated and stored
-                # ideally, this would be done in metadata
-                # TODO
-                # Add BufferedReader if python 2.7?
-                in_file = open(input_file, 'rt')
-            total_sequences = long(0)
-            for i, line in enumerate(in_file):
-                total_sequences += 1
-            in_file.close()
-            total_sequences /= 4
+            # gzip compressed input is decompressed with zlib as it is read
+            total_sequences = long(count_lines(input_datasets[0].file_name)) / 4
 
         sequences_per_file = cls.get_sequences_per_file(total_sequences, split_params)
         return cls.write_split_files(input_datasets, None, subdir_generator_function, sequences_per_file)
@@ -309,12 +281,14 @@ class Alignment( data.Text ):
         raise NotImplementedError("Can't split generic alignment files")
 
 
+@build_sniff_from_prefix
 class Fasta( Sequence ):
     """Class representing a FASTA sequence"""
     edam_format = "format_1929"
     file_ext = "fasta"
+    sniff_header_pattern = re.compile( r'\s*>' )
 
-    def sniff( self, filename ):
+    def sniff_prefix( self, file_prefix ):
         """
         Determines whether the file is in fasta format
 
@@ -350,7 +324,7 @@ class Fasta( Sequence ):
         """
 
         try:
-            fh = open( filename )
+            fh = file_prefix.line_reader()
             while True:
                 line = fh.readline()
                 if not line:
@@ -500,12 +474,13 @@ class Fasta( Sequence ):
     _count_split = classmethod(_count_split)
 
 
+@build_sniff_from_prefix
 class csFasta( Sequence ):
     """ Class representing the SOLID Color-Space sequence ( csfasta ) """
     edam_format = "format_1929"
     file_ext = "csfasta"
 
-    def sniff( self, filename ):
+    def sniff_prefix( self, file_prefix ):
         """
         Color-space sequence:
             >2_15_85_F3
@@ -520,7 +495,7 @@ class csFasta( Sequence ):
         True
         """
         try:
-            fh = open( filename )
+            fh = file_prefix.line_reader()
             while True:
                 line = fh.readline()
                 if not line:
@@ -551,10 +526,12 @@ class csFasta( Sequence ):
         return Sequence.set_meta( self, dataset, **kwd )
 
 
+@build_sniff_from_prefix
 class Fastq ( Sequence ):
     """Class representing a generic FASTQ sequence"""
     edam_format = "format_1930"
     file_ext = "fastq"
+    sniff_header_pattern = re.compile( r'[ \t\r\f\v]*@' )
 
     def set_meta( self, dataset, **kwd ):
         """
@@ -566,29 +543,11 @@ class Fastq ( Sequence ):
             dataset.metadata.data_lines = None
             dataset.metadata.sequences = None
             return
-        data_lines = 0
-        sequences = 0
-        seq_counter = 0     # blocks should be 4 lines long
-        for line in file( dataset.file_name ):
-            line = line.strip()
-            if line and line.startswith( '#' ) and not data_lines:
-                # We don't count comment lines for sequence data types
-                continue
-            seq_counter += 1
-            data_lines += 1
-            if line and line.startswith( '@' ):
-                if seq_counter >= 4:
-                    # count previous block
-                    # blocks should be 4 lines long
-                    sequences += 1
-                    seq_counter = 1
-        if seq_counter >= 4:
-            # count final block
-            sequences += 1
-        dataset.metadata.data_lines = data_lines
-        dataset.metadata.sequences = sequences
+        count = count_fastq( dataset.file_name )
+        dataset.metadata.data_lines = count.data_lines
+        dataset.metadata.sequences = count.sequences
 
-    def sniff( self, filename ):
+    def sniff_prefix( self, file_prefix ):
         """
         Determines whether the file is in generic fastq format
         For details, see http://maq.sourceforge.net/fastq.shtml
@@ -604,7 +563,7 @@ class Fastq ( Sequence ):
         >>> Fastq().sniff( fname )
         True
         """
-        headers = get_headers( filename, None )
+        headers = get_headers( file_prefix, None )
         bases_regexp = re.compile( "^[NGTAC]*" )
         # check that first block looks like a fastq block
         try:
@@ -689,10 +648,12 @@ class FastqCSSanger( Fastq ):
     file_ext = "fastqcssanger"
 
 
+@build_sniff_from_prefix
 class Maf( Alignment ):
     """Class describing a Maf alignment"""
     edam_format = "format_3008"
     file_ext = "maf"
+    sniff_header_pattern = re.compile( r'[ \t\r\f\v]*##maf(\s|$)' )
 
     # Readonly and optional, users can't unset it, but if it is not set, we are generally ok; if required use a metadata validator in the tool definition
     MetadataElement( name="blocks", default=0, desc="Number of blocks", readonly=True, optional=True, visible=False, no_value=0 )
@@ -733,8 +694,7 @@ class Maf( Alignment ):
 
     def set_peek( self, dataset, is_multi_byte=False ):
         if not dataset.dataset.purged:
-            # The file must exist on disk for the get_file_peek() method
-            dataset.peek = data.get_file_peek( dataset.file_name, is_multi_byte=is_multi_byte )
+            dataset.peek = data.get_dataset_peek( dataset, is_multi_byte=is_multi_byte )
             if dataset.metadata.blocks:
                 dataset.blurb = "%s blocks" % util.commaify( str( dataset.metadata.blocks ) )
             else:
@@ -772,7 +732,7 @@ class Maf( Alignment ):
             out = "Can't create peek %s" % exc
         return out
 
-    def sniff( self, filename ):
+    def sniff_prefix( self, file_prefix ):
         """
         Determines wether the file is in maf format
 
@@ -795,7 +755,7 @@ class Maf( Alignment ):
         >>> Maf().sniff( fname )
         False
         """
-        headers = get_headers( filename, None )
+        headers = get_headers( file_prefix, None )
         try:
             if len(headers) > 1 and headers[0][0] and headers[0][0] == "##maf":
                 return True
@@ -843,6 +803,7 @@ class MafCustomTrack( data.Text ):
             pass
 
 
+@build_sniff_from_prefix
 class Axt( data.Text ):
     """Class describing an axt alignment"""
 
@@ -852,7 +813,7 @@ class Axt( data.Text ):
 
     file_ext = "axt"
 
-    def sniff( self, filename ):
+    def sniff_prefix( self, file_prefix ):
         """
         Determines whether the file is in axt format
 
@@ -878,7 +839,7 @@ class Axt( data.Text ):
         >>> Axt().sniff( fname )
         False
         """
-        headers = get_headers( filename, None )
+        headers = get_headers( file_prefix, None )
         if len(headers) < 4:
             return False
         for hdr in headers:
@@ -897,16 +858,18 @@ class Axt( data.Text ):
                     return True
 
 
+@build_sniff_from_prefix
 class Lav( data.Text ):
     """Class describing a LAV alignment"""
     edam_format = "format_3014"
     file_ext = "lav"
+    sniff_header_pattern = re.compile( r'[ \t\r\f\v]*#:lav' )
 
     # gvk- 11/19/09 - This is really an alignment, but we no longer have tools that use this data type, and it is
     # here simply for backward compatibility ( although it is still in the datatypes registry ).  Subclassing
     # from data.Text eliminates managing metadata elements inherited from the Alignemnt class.
 
-    def sniff( self, filename ):
+    def sniff_prefix( self, file_prefix ):
         """
         Determines whether the file is in lav format
 
@@ -923,7 +886,7 @@ class Lav( data.Text ):
         >>> Lav().sniff( fname )
         False
         """
-        headers = get_headers( filename, None )
+        headers = get_headers( file_prefix, None )
         try:
             if len(headers) > 1 and headers[0][0] and headers[0][0].startswith('#:lav'):
                 return True
@@ -933,6 +896,7 @@ class Lav( data.Text ):
             return False
 
 
+@build_sniff_from_prefix
 class RNADotPlotMatrix( data.Data ):
     edam_format = "format_3466"
     file_ext = "rna_eps"
@@ -945,24 +909,23 @@ class RNADotPlotMatrix( data.Data ):
             dataset.peek = 'file does not exist'
             dataset.blurb = 'file purged from disk'
 
-    def sniff(self, filename):
+    def sniff_prefix(self, file_prefix):
         """Determine if the file is in RNA dot plot format."""
-        if check_image_type( filename, ['EPS'] ):
+        if file_prefix.image_type in ['EPS']:
             seq = False
             coor = False
             pairs = False
-            with open( filename ) as handle:
-                for line in handle:
-                    line = line.strip()
-                    if line:
-                        if line.startswith('/sequence'):
-                            seq = True
-                        elif line.startswith('/coor'):
-                            coor = True
-                        elif line.startswith('/pairs'):
-                            pairs = True
-                    if seq and coor and pairs:
-                        return True
+            for line in file_prefix.line_iterator():
+                line = line.strip()
+                if line:
+                    if line.startswith('/sequence'):
+                        seq = True
+                    elif line.startswith('/coor'):
+                        coor = True
+                    elif line.startswith('/pairs'):
+                        pairs = True
+                if seq and coor and pairs:
+                    return True
         return False
 
 
@@ -10,12 +10,14 @@ import shutil
 import sys
 import tempfile
 import zipfile
+import zlib
 
+from cStringIO import StringIO
 from encodings import search_function as encodings_search_function
 
 from galaxy import util
 from galaxy.datatypes.checkers import check_binary, check_html, is_gzip
-from galaxy.datatypes.binary import Binary
+from galaxy.datatypes.util.image_util import image_type
 
 log = logging.getLogger(__name__)
 
@@ -185,16 +187,248 @@ def convert_newlines_sep2tabs( fname, in_place=True, patt="\\s+", tmp_dir=None,
         return ( i + 1, temp_name )
 
 
+SNIFF_PREFIX_BYTES = 2 ** 20  # 1Mb
+
+
+class FilePrefix( object ):
+    """
+    Bounded prefix of a file, read once and shared by all the sniffers tried
+    against that file.
+
+    Sniffers opting in to this (see ``build_sniff_from_prefix``) inspect the
+    buffered bytes instead of reopening the file.  Lines and headers are read
+    past the prefix only when a sniffer asks for more than it holds, so they
+    are always the same as reading the file itself.
+
+    >>> file_prefix = FilePrefix( get_test_fname( '1.bam' ) )
+    >>> file_prefix.compressed_type
+    'gzip'
+    >>> file_prefix.uncompressed_startswith( 'BAM\\1' )
+    True
+    >>> file_prefix = FilePrefix( get_test_fname( 'complete.bed' ), prefix_size=64 )
+    >>> file_prefix.truncated
+    True
+    >>> len( list( file_prefix.line_iterator() ) ) == len( open( file_prefix.filename ).readlines() )
+    True
+    >>> get_headers( file_prefix, '\\t' ) == get_headers( file_prefix.filename, '\\t' )
+    True
+    """
+
+    def __init__( self, filename, prefix_size=SNIFF_PREFIX_BYTES ):
+        self.filename = filename
+        with open( filename, 'rb' ) as f:
+            self.contents_header = f.read( prefix_size )
+            # A single extra byte tells whether the prefix holds the whole file.
+            self.truncated = bool( f.read( 1 ) )
+        self.compressed_type = None
+        if self.contents_header.startswith( util.gzip_magic ):
+            self.compressed_type = 'gzip'
+        self._uncompressed_header = None
+        self._image_type_checked = False
+        self._image_type = None
+
+    @property
+    def uncompressed_header( self ):
+        """
+        Decompressed start of a gzip (or BGZF) file, up to the prefix size,
+        and the raw prefix otherwise.
+        """
+        if self._uncompressed_header is None:
+            if self.compressed_type == 'gzip':
+                try:
+                    decompressor = zlib.decompressobj( 16 + zlib.MAX_WBITS )
+                    self._uncompressed_header = decompressor.decompress( self.contents_header, len( self.contents_header ) )
+                except zlib.error:
+                    self._uncompressed_header = ''
+            else:
+                self._uncompressed_header = self.contents_header
+        return self._uncompressed_header
+
+    @property
+    def image_type( self ):
+        """
+        Image format of the file (as reported by ``image_util.image_type``),
+        determined once for all the image datatypes.
+        """
+        if not self._image_type_checked:
+            self._image_type = image_type( self.filename )
+            self._image_type_checked = True
+        return self._image_type
+
+    def startswith( self, prefix ):
+        return self.contents_header.startswith( prefix )
+
+    def uncompressed_startswith( self, prefix ):
+        return self.compressed_type is not None and self.uncompressed_header.startswith( prefix )
+
+    def search( self, pattern ):
+        """ Search the buffered prefix using a compiled regular expression. """
+        return pattern.search( self.contents_header ) is not None
+
+    def line_iterator( self ):
+        """
+        Iterate over the lines of the file as ``file( filename )`` would,
+        serving them from the buffered prefix first.
+        """
+        if not self.truncated:
+            for line in StringIO( self.contents_header ):
+                yield line
+            return
+        end = self.contents_header.rfind( '\n' ) + 1
+        for line in StringIO( self.contents_header[ :end ] ):
+            yield line
+        with open( self.filename ) as f:
+            f.seek( end )
+            for line in f:
+                yield line
+
+    def line_reader( self ):
+        """
+        File-like object with ``readline`` over ``line_iterator``, for
+        sniffers written against an open file handle.
+        """
+        return _LineReader( self.line_iterator() )
+
+
+class _LineReader( object ):
+
+    def __init__( self, lines ):
+        self.lines = lines
+
+    def readline( self ):
+        return next( self.lines, '' )
+
+    def __iter__( self ):
+        return self.lines
+
+    def close( self ):
+        self.lines.close()
+
+
+def build_sniff_from_prefix( klass ):
+    """
+    Class decorator for datatypes implementing ``sniff_prefix( file_prefix )``,
+    providing the ``sniff( filename )`` method expected by existing callers.
+    ``guess_ext`` calls ``sniff_prefix`` directly with a shared ``FilePrefix``.
+    """
+    def auto_sniff( self, filename ):
+        return self.sniff_prefix( FilePrefix( filename ) )
+    auto_sniff.sniff_from_prefix = True
+    klass.sniff = auto_sniff
+    return klass
+
+
+def is_sniffable_from_prefix( datatype ):
+    """
+    Whether ``datatype`` sniffs from a ``FilePrefix``, i.e. it implements
+    ``sniff_prefix`` and does not override the ``sniff`` built from it.
+    """
+    return getattr( getattr( datatype, 'sniff', None ), 'sniff_from_prefix', False ) and hasattr( datatype, 'sniff_prefix' )
+
+
+class SniffIndex( object ):
+    """
+    Index of the datatypes in a sniff order by the signatures they declare
+    (``sniff_magic_prefixes`` and ``sniff_header_pattern``), so that only the
+    sniffers able to match a given file are tried, still in sniff order.
+
+    Magic prefixes are looked up by length in dictionaries, so binary and
+    other strongly signatured formats not matching a file cost nothing to
+    rule out. Datatypes without a signature are always tried, datatypes
+    without a sniffer never are.
+
+    >>> from galaxy.datatypes import binary, xml
+    >>> sniff_order = [ xml.GenericXml(), binary.Bam(), binary.Sff(), xml.Phyloxml() ]
+    >>> sniff_index = SniffIndex( sniff_order )
+    >>> [ d.file_ext for d in sniff_index.candidates( FilePrefix( get_test_fname( '1.sff' ) ) ) ]
+    ['sff', 'phyloxml']
+    >>> [ d.file_ext for d in sniff_index.candidates( FilePrefix( get_test_fname( '1.bam' ) ) ) ]
+    ['bam', 'phyloxml']
+    >>> [ d.file_ext for d in sniff_index.candidates( FilePrefix( get_test_fname( 'megablast_xml_parser_test1.blastxml' ) ) ) ]
+    ['xml', 'phyloxml']
+    """
+
+    def __init__( self, sniff_order ):
+        self.sniff_order = list( sniff_order )
+        # prefix length -> prefix -> positions in the sniff order
+        self.magic_prefixes = {}
+        # position in the sniff order -> compiled pattern
+        self.header_patterns = {}
+        self.unindexed = []
+        for position, datatype in enumerate( self.sniff_order ):
+            if not hasattr( datatype, 'sniff' ):
+                # e.g. datatypes appended to the sniff order without a sniffer
+                continue
+            magic_prefixes, header_pattern = _sniff_signature( datatype )
+            for magic_prefix in magic_prefixes or []:
+                self.magic_prefixes.setdefault( len( magic_prefix ), {} ).setdefault( magic_prefix, [] ).append( position )
+            if header_pattern is not None:
+                self.header_patterns[ position ] = header_pattern
+            if not magic_prefixes and header_pattern is None:
+                self.unindexed.append( position )
+
+    def candidates( self, file_prefix ):
+        """
+        Return the datatypes, in sniff order, that may sniff ``file_prefix``
+        successfully.
+        """
+        positions = set( self.unindexed )
+        headers = [ file_prefix.contents_header ]
+        if file_prefix.compressed_type is not None:
+            headers.append( file_prefix.uncompressed_header )
+        for length, magic_prefixes in self.magic_prefixes.iteritems():
+            for header in headers:
+                positions.update( magic_prefixes.get( header[ :length ], () ) )
+        if self.header_patterns:
+            contents_header = file_prefix.contents_header
+            # Header patterns may be preceded by any amount of whitespace.
+            undecided = file_prefix.truncated and not contents_header.strip()
+            for position, header_pattern in self.header_patterns.iteritems():
+                if undecided or header_pattern.match( contents_header ):
+                    positions.add( position )
+        return [ self.sniff_order[ position ] for position in sorted( positions ) ]
+
+
+def _sniff_signature( datatype ):
+    """
+    Return the magic prefixes and header pattern of ``datatype``, ignoring
+    those inherited from a class whose sniffer has since been overridden.
+    """
+    if is_sniffable_from_prefix( datatype ):
+        sniffer_class = _defining_class( datatype, 'sniff_prefix' )
+    else:
+        sniffer_class = _defining_class( datatype, 'sniff' )
+    signature = []
+    for attribute in ( 'sniff_magic_prefixes', 'sniff_header_pattern' ):
+        value = getattr( datatype, attribute, None )
+        if value is not None and sniffer_class is not None and not issubclass( _defining_class( datatype, attribute ), sniffer_class ):
+            value = None
+        signature.append( value )
+    return signature
+
+
+def _defining_class( datatype, attribute ):
+    for klass in datatype.__class__.__mro__:
+        if attribute in klass.__dict__:
+            return klass
+    return None
+
+
 def get_headers( fname, sep, count=60, is_multi_byte=False ):
     """
-    Returns a list with the first 'count' lines split by 'sep'
+    Returns a list with the first 'count' lines split by 'sep', ``fname`` may
+    also be a ``FilePrefix``.
 
     >>> fname = get_test_fname('complete.bed')
     >>> get_headers(fname,'\\t')
     [['chr7', '127475281', '127491632', 'NM_000230', '0', '+', '127486022', '127488767', '0', '3', '29,172,3225,', '0,10713,13126,'], ['chr7', '127486011', '127488900', 'D49487', '0', '+', '127486022', '127488767', '0', '2', '155,490,', '0,2399']]
     """
+    if isinstance( fname, FilePrefix ):
+        lines = fname.line_iterator()
+    else:
+        lines = file( fname )
     headers = []
-    for idx, line in enumerate(file(fname)):
+    for idx, line in enumerate( lines ):
         line = line.rstrip('\n\r')
         if is_multi_byte:
             # TODO: fix this - sep is never found in line
@@ -252,10 +486,12 @@ def is_column_based( fname, sep='\t', skip=0, is_multi_byte=False ):
     return True
 
 
-def guess_ext( fname, sniff_order=None, is_multi_byte=False ):
+def guess_ext( fname, sniff_order=None, is_multi_byte=False, sniff_index=None ):
     """
     Returns an extension that can be used in the datatype factory to
-    generate a data for the 'fname' file
+    generate a data for the 'fname' file.  Only the datatypes in sniff_order
+    whose signatures match the file are tried, pass the registry's
+    sniff_index to avoid rebuilding it.
 
     >>> fname = get_test_fname('megablast_xml_parser_test1.blastxml')
     >>> guess_ext(fname)
@@ -315,7 +551,12 @@ def guess_ext( fname, sniff_order=None, is_multi_byte=False ):
         datatypes_registry = registry.Registry()
         datatypes_registry.load_datatypes()
         sniff_order = datatypes_registry.sniff_order
-    for datatype in sniff_order:
+        sniff_index = datatypes_registry.sniff_index
+    if sniff_index is None:
+        sniff_index = SniffIndex( sniff_order )
+    # Read the start of the file once for every sniffer able to use it.
+    file_prefix = FilePrefix( fname )
+    for datatype in sniff_index.candidates( file_prefix ):
         """
         Some classes may not have a sniff function, which is ok.  In fact, the
         Tabular and Text classes are 2 examples of classes that should never have
@@ -325,11 +566,14 @@ def guess_ext( fname, sniff_order=None, is_multi_byte=False ):
         successfully discovered.
         """
         try:
-            if datatype.sniff( fname ):
+            if is_sniffable_from_prefix( datatype ):
+                if datatype.sniff_prefix( file_prefix ):
+                    return datatype.file_ext
+            elif datatype.sniff( fname ):
                 return datatype.file_ext
         except:
             pass
-    headers = get_headers( fname, None )
+    headers = get_headers( file_prefix, None )
     is_binary = False
     if is_multi_byte:
         is_binary = False
@@ -345,7 +589,7 @@ def guess_ext( fname, sniff_order=None, is_multi_byte=False ):
                 break
     if is_binary:
         return 'data'  # default binary data type file extension
-    if is_column_based( fname, '\t', 1, is_multi_byte=is_multi_byte ):
+    if is_column_based( file_prefix, '\t', 1, is_multi_byte=is_multi_byte ):
         return 'tabular'  # default tabular data type file extension
     return 'txt'  # default text data type file extension
 
@@ -406,9 +650,11 @@ def handle_uploaded_dataset_file( filename, datatypes_registry, ext='auto', is_m
         raise InappropriateDatasetContentError( 'The compressed uploaded file contains inappropriate content.' )
 
     if ext in AUTO_DETECT_EXTENSIONS:
-        ext = guess_ext( filename, sniff_order=datatypes_registry.sniff_order, is_multi_byte=is_multi_byte )
+        ext = guess_ext( filename, sniff_order=datatypes_registry.sniff_order, is_multi_byte=is_multi_byte, sniff_index=datatypes_registry.sniff_index )
 
     if check_binary( filename ):
+        # Imported here since binary datatypes build their sniffers with this module.
+        from galaxy.datatypes.binary import Binary
         if not Binary.is_ext_unsniffable(ext) and not datatypes_registry.get_datatype_by_extension( ext ).sniff( filename ):
             raise InappropriateDatasetContentError( 'The binary uploaded file contains inappropriate content.' )
     elif check_html( filename ):
@@ -12,7 +12,8 @@ from galaxy import util
 from galaxy.datatypes import data, metadata
 from galaxy.datatypes.checkers import is_gzip
 from galaxy.datatypes.metadata import MetadataElement
-from galaxy.datatypes.sniff import get_headers
+from galaxy.datatypes.scan import LineVisitor, scan_dataset
+from galaxy.datatypes.sniff import build_sniff_from_prefix, get_headers
 from galaxy.util.json import dumps
 
 import dataproviders
@@ -208,6 +209,45 @@ class TabularData( data.Text ):
         delimiter = dataset.metadata.delimiter
         return dataproviders.dataset.DatasetColumnarDataProvider( dataset, deliminator=delimiter, **settings )
 
+    @dataproviders.decorators.dataprovider_factory( 'column-batch',
+                                                    dataproviders.column.TransposedColumnarDataProvider.settings )
+    def column_batch_dataprovider( self, dataset, **settings ):
+        """Uses column settings that are passed in, provides lists of column values"""
+        dataset_source = dataproviders.dataset.DatasetDataProvider( dataset )
+        delimiter = dataset.metadata.delimiter
+        return dataproviders.column.TransposedColumnarDataProvider( dataset_source, deliminator=delimiter, **settings )
+
+    @dataproviders.decorators.dataprovider_factory( 'dataset-column-batch',
+                                                    dataproviders.column.TransposedColumnarDataProvider.settings )
+    def dataset_column_batch_dataprovider( self, dataset, **settings ):
+        """Attempts to get column settings from dataset.metadata, provides lists of column values"""
+        delimiter = dataset.metadata.delimiter
+        return dataproviders.dataset.DatasetTransposedColumnarDataProvider( dataset, deliminator=delimiter, **settings )
+
+    @dataproviders.decorators.dataprovider_factory( 'histogram', dataproviders.aggregate.HistogramDataProvider.settings )
+    def histogram_dataprovider( self, dataset, **settings ):
+        """Counts the values of a column in bins"""
+        dataset_source = dataproviders.dataset.DatasetDataProvider( dataset )
+        delimiter = dataset.metadata.delimiter
+        return dataproviders.aggregate.HistogramDataProvider( dataset_source, deliminator=delimiter, **settings )
+
+    @dataproviders.decorators.dataprovider_factory( 'min-max', dataproviders.aggregate.MinMaxDataProvider.settings )
+    def min_max_dataprovider( self, dataset, **settings ):
+        """Summarizes a column in buckets of another column or row numbers"""
+        dataset_source = dataproviders.dataset.DatasetDataProvider( dataset )
+        delimiter = dataset.metadata.delimiter
+        return dataproviders.aggregate.MinMaxDataProvider( dataset_source, deliminator=delimiter, **settings )
+
+    @dataproviders.decorators.dataprovider_factory( 'sample', dataproviders.aggregate.SampleDataProvider.settings )
+    def sample_dataprovider( self, dataset, **settings ):
+        """Attempts to get column settings from dataset.metadata, provides a random sample of rows"""
+        dataset_source = dataproviders.dataset.DatasetDataProvider( dataset )
+        delimiter = dataset.metadata.delimiter
+        if not settings.get( 'column_types', None ):
+            indeces = settings.get( 'indeces', None )
+            settings[ 'column_types' ] = dataset_source.get_metadata_column_types( indeces=indeces )
+        return dataproviders.aggregate.SampleDataProvider( dataset_source, deliminator=delimiter, **settings )
+
     @dataproviders.decorators.dataprovider_factory( 'dict', dataproviders.column.DictDataProvider.settings )
     def dict_dataprovider( self, dataset, **settings ):
         """Uses column settings that are passed in"""
@@ -222,6 +262,294 @@ class TabularData( data.Text ):
         return dataproviders.dataset.DatasetDictDataProvider( dataset, deliminator=delimiter, **settings )
 
 
+COLUMN_TYPE_SET_ORDER = [ 'int', 'float', 'list', 'str' ]  # Order to set column types in
+DEFAULT_COLUMN_TYPE = COLUMN_TYPE_SET_ORDER[-1]  # Default column type is lowest in list
+COLUMN_TYPE_COMPARE_ORDER = list( reversed( COLUMN_TYPE_SET_ORDER ) )  # Order to compare column types
+
+
+def type_overrules_type( column_type1, column_type2 ):
+    if column_type1 is None or column_type1 == column_type2:
+        return False
+    if column_type2 is None:
+        return True
+    for column_type in COLUMN_TYPE_COMPARE_ORDER:
+        if column_type1 == column_type:
+            return True
+        if column_type2 == column_type:
+            return False
+    # neither column type was found in our ordered list, this cannot happen
+    raise ValueError( "Tried to compare unknown column types: %s and %s" % ( column_type1, column_type2 ) )
+
+
+def is_int( column_text ):
+    try:
+        int( column_text )
+        return True
+    except:
+        return False
+
+
+def is_float( column_text ):
+    try:
+        float( column_text )
+        return True
+    except:
+        if column_text.strip().lower() == 'na':
+            return True  # na is special cased to be a float
+        return False
+
+
+def is_list( column_text ):
+    return "," in column_text
+
+
+def is_str( column_text ):
+    # anything, except an empty string, is True
+    if column_text == "":
+        return False
+    return True
+
+
+is_column_type = dict( int=is_int, float=is_float, list=is_list, str=is_str )  # Dict to store column type string to checking function
+
+
+def guess_column_type( column_text ):
+    for column_type in COLUMN_TYPE_SET_ORDER:
+        if is_column_type[column_type]( column_text ):
+            return column_type
+    return None
+
+
+# Number of data lines whose column types are guessed together.
+COLUMN_TYPE_BLOCK_SIZE = 4096
+# Columns of a block are joined with newlines (which cannot appear in a field)
+# and matched with a single regular expression.  The patterns only accept a
+# subset of what int() and float() accept, so a block matching them has the
+# same type that guess_column_type would give its fields; fields of blocks
+# not matching them are checked one at a time.
+_INT_FIELD = r'[+-]?\d+'
+_FLOAT_FIELD = r'[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?|[nN][aA]'
+INT_BLOCK_RE = re.compile( r'(?:%s)?(?:\n(?:%s)?)*\Z' % ( _INT_FIELD, _INT_FIELD ) )
+FLOAT_BLOCK_RE = re.compile( r'(?:%s)?(?:\n(?:%s)?)*\Z' % ( _FLOAT_FIELD, _FLOAT_FIELD ) )
+
+
+def guess_block_column_type( fields ):
+    """
+    Return the type of a column from all of its ``fields``, i.e. the type
+    of the field whose ``guess_column_type`` overrules all others.
+
+    >>> guess_block_column_type( [ '1', '', '-2' ] )
+    'int'
+    >>> guess_block_column_type( [ '1', '2.5', 'NA', '1e5' ] )
+    'float'
+    >>> guess_block_column_type( [ '1', ' 2 ', '3.0', '1,2' ] )
+    'list'
+    >>> guess_block_column_type( [ '1', 'inf', 'chr1', '1,2' ] )
+    'str'
+    >>> guess_block_column_type( [ '', '' ] ) is None
+    True
+    """
+    joined = '\n'.join( fields )
+    if INT_BLOCK_RE.match( joined ):
+        if joined.strip( '\n' ):
+            return 'int'
+        return None
+    if FLOAT_BLOCK_RE.match( joined ):
+        return 'float'
+    block_type = None
+    for field in fields:
+        if not field:
+            continue
+        if ',' in field:
+            # neither an int nor a float
+            field_type = 'list'
+        else:
+            field_type = guess_column_type( field )
+        if type_overrules_type( field_type, block_type ):
+            block_type = field_type
+            if block_type == DEFAULT_COLUMN_TYPE:
+                break
+    return block_type
+
+
+class ColumnTypesVisitor( LineVisitor ):
+    """
+    Counts data and comment lines and guesses the number and types of
+    columns of tab delimited data, see Tabular.set_meta for the meaning of
+    the arguments.  Instead of a fixed ``skip``, ``skip_until`` may be a
+    function of a line returning True for the first line that is not to be
+    skipped; if no line is accepted the last line is treated as the first
+    line not to be skipped.
+
+    >>> from galaxy.datatypes.sniff import get_test_fname
+    >>> from galaxy.datatypes.scan import scan_file
+    >>> visitor = ColumnTypesVisitor( skip=0 )
+    >>> scan = scan_file( get_test_fname( '1.bed' ), [ visitor ] )
+    >>> visitor.finish_column_types()
+    >>> visitor.data_lines, visitor.comment_lines, visitor.column_types
+    (65, 0, ['str', 'int', 'int', 'str', 'int', 'str'])
+    >>> visitor = ColumnTypesVisitor( skip=0, max_data_lines=10 )
+    >>> scan = scan_file( get_test_fname( '1.bed' ), [ visitor ] )
+    >>> scan.lines, visitor.truncated_at is not None
+    (10, True)
+
+    Column types are guessed for blocks of ``block_size`` lines at a time
+    (see ``guess_block_column_type``), a ``block_size`` of None guesses the
+    type of every field as it is read.
+
+    >>> import os
+    >>> test_dir = os.path.dirname( get_test_fname( '1.bed' ) )
+    >>> def column_types( path, **kwd ):
+    ...     visitor = ColumnTypesVisitor( **kwd )
+    ...     scan = scan_file( path, [ visitor ] )
+    ...     visitor.finish_column_types()
+    ...     return visitor.column_types
+    >>> [ f for f in sorted( os.listdir( test_dir ) )
+    ...   if column_types( os.path.join( test_dir, f ), block_size=3 ) != column_types( os.path.join( test_dir, f ), block_size=None ) ]
+    []
+    """
+
+    def __init__( self, skip=None, max_data_lines=100000, max_guess_type_data_lines=None, skip_until=None, block_size=COLUMN_TYPE_BLOCK_SIZE ):
+        if skip_until is not None:
+            skip = 0
+        # Store original skip value to check with later
+        self.requested_skip = skip
+        self.skip = skip or 0
+        self.max_data_lines = max_data_lines
+        self.max_guess_type_data_lines = max_guess_type_data_lines
+        self.skip_until = skip_until
+        self.skipping = skip_until is not None
+        self.last_skipped_line = None
+        self.line_index = 0
+        self.offset = 0
+        self.truncated_at = None
+        self.data_lines = 0
+        self.comment_lines = 0
+        self.column_types = []
+        self.first_line_column_types = [DEFAULT_COLUMN_TYPE]  # default value is one column of type str
+        self.block_size = block_size
+        self.block = []
+
+    def visit( self, line ):
+        self.offset += len( line )
+        i = self.line_index
+        self.line_index += 1
+        if self.skipping:
+            if not self.skip_until( line ):
+                self.comment_lines += 1
+                self.last_skipped_line = line
+                return
+            self.skipping = False
+            self.skip = i
+        self._visit_line( i, line )
+
+    def _visit_line( self, i, line ):
+        # NOTE: if skip > num_check_lines, we won't detect any metadata, and will use default
+        line = line.rstrip( '\r\n' )
+        if i < self.skip or not line or line.startswith( '#' ):
+            # We'll call blank lines comments
+            self.comment_lines += 1
+        else:
+            self.data_lines += 1
+            if self.max_guess_type_data_lines is None or self.data_lines <= self.max_guess_type_data_lines:
+                fields = line.split( '\t' )
+                if self.block_size is None or ( i == 0 and self.requested_skip is None ):
+                    self._guess_line_column_types( fields )
+                else:
+                    self.block.append( fields )
+                    if len( self.block ) >= self.block_size:
+                        self._guess_block_column_types()
+            if i == 0 and self.requested_skip is None:
+                # This is our first line, people seem to like to upload files that have a header line, but do not
+                # start with '#' (i.e. all column types would then most likely be detected as str).  We will assume
+                # that the first line is always a header (this was previous behavior - it was always skipped).  When
+                # the requested skip is None, we only use the data from the first line if we have no other data for
+                # a column.  This is far from perfect, as
+                # 1,2,3	1.1	2.2	qwerty
+                # 0	0		1,2,3
+                # will be detected as
+                # "column_types": ["int", "int", "float", "list"]
+                # instead of
+                # "column_types": ["list", "float", "float", "str"]  *** would seem to be the 'Truth' by manual
+                # observation that the first line should be included as data.  The old method would have detected as
+                # "column_types": ["int", "int", "str", "list"]
+                self.first_line_column_types = self.column_types
+                self.column_types = [ None for col in self.first_line_column_types ]
+        if self.max_data_lines is not None and self.data_lines >= self.max_data_lines:
+            self.truncated_at = self.offset
+            self.done = True
+
+    def _guess_line_column_types( self, fields ):
+        column_types = self.column_types
+        for field_count, field in enumerate( fields ):
+            if field_count >= len( column_types ):  # found a previously unknown column, we append None
+                column_types.append( None )
+            column_type = guess_column_type( field )
+            if type_overrules_type( column_type, column_types[field_count] ):
+                column_types[field_count] = column_type
+
+    def _guess_block_column_types( self ):
+        block = self.block
+        self.block = []
+        if not block:
+            return
+        column_types = self.column_types
+        columns = max( len( fields ) for fields in block )
+        if columns > len( column_types ):  # found previously unknown columns, we append None
+            column_types.extend( [ None ] * ( columns - len( column_types ) ) )
+        if all( len( fields ) == columns for fields in block ):
+            block_columns = zip( *block )
+        else:
+            # fields missing from shorter lines don't contribute to the type
+            block_columns = [ [ fields[ i ] for fields in block if len( fields ) > i ] for i in range( columns ) ]
+        for i, column in enumerate( block_columns ):
+            if column_types[i] == DEFAULT_COLUMN_TYPE:
+                continue  # nothing overrules str
+            column_type = guess_block_column_type( column )
+            if type_overrules_type( column_type, column_types[i] ):
+                column_types[i] = column_type
+
+    def finish_column_types( self ):
+        """
+        Guess the types of any remaining lines, called by ``finish``.
+        """
+        if self.skipping and self.last_skipped_line is not None:
+            # No line was accepted, the last line is the first one not skipped
+            self.skipping = False
+            self.comment_lines -= 1
+            self.skip = self.line_index - 1
+            self._visit_line( self.skip, self.last_skipped_line )
+        self._guess_block_column_types()
+
+    def finish( self, dataset ):
+        self.finish_column_types()
+        data_lines = self.data_lines
+        comment_lines = self.comment_lines
+        if self.truncated_at is not None and self.truncated_at != dataset.get_size():
+            data_lines = None  # Clear optional data_lines metadata value
+            comment_lines = None  # Clear optional comment_lines metadata value; additional comment lines could appear below this point
+        column_types = self.column_types
+        first_line_column_types = self.first_line_column_types
+        # we error on the larger number of columns
+        # first we pad our column_types by using data from first line
+        if len( first_line_column_types ) > len( column_types ):
+            for column_type in first_line_column_types[len( column_types ):]:
+                column_types.append( column_type )
+        # Now we fill any unknown (None) column_types with data from first line
+        for i in range( len( column_types ) ):
+            if column_types[i] is None:
+                if len( first_line_column_types ) <= i or first_line_column_types[i] is None:
+                    column_types[i] = DEFAULT_COLUMN_TYPE
+                else:
+                    column_types[i] = first_line_column_types[i]
+        # Set the discovered metadata values for the dataset
+        dataset.metadata.data_lines = data_lines
+        dataset.metadata.comment_lines = comment_lines
+        dataset.metadata.column_types = column_types
+        dataset.metadata.columns = len( column_types )
+        dataset.metadata.delimiter = '\t'
+
+
 @dataproviders.decorators.has_dataproviders
 class Tabular( TabularData ):
     """Tab delimited data"""
@@ -250,130 +578,11 @@ class Tabular( TabularData ):
            set_peek() method read the entire file to determine the number of lines in the file.
            Since metadata can now be processed on cluster nodes, we've merged the line count portion
            of the set_peek() processing here, and we now check the entire contents of the file.
+        4. The lines are read by a ColumnTypesVisitor, subclasses needing other
+           per-line metadata can scan the file once by passing their own visitors
+           along with it to galaxy.datatypes.scan.scan_dataset.
         """
-        # Store original skip value to check with later
-        requested_skip = skip
-        if skip is None:
-            skip = 0
-        column_type_set_order = [ 'int', 'float', 'list', 'str'  ]  # Order to set column types in
-        default_column_type = column_type_set_order[-1]  # Default column type is lowest in list
-        column_type_compare_order = list( column_type_set_order )  # Order to compare column types
-        column_type_compare_order.reverse()
-
-        def type_overrules_type( column_type1, column_type2 ):
-            if column_type1 is None or column_type1 == column_type2:
-                return False
-            if column_type2 is None:
-                return True
-            for column_type in column_type_compare_order:
-                if column_type1 == column_type:
-                    return True
-                if column_type2 == column_type:
-                    return False
-            # neither column type was found in our ordered list, this cannot happen
-            raise ValueError( "Tried to compare unknown column types: %s and %s" % ( column_type1, column_type2 ) )
-
-        def is_int( column_text ):
-            try:
-                int( column_text )
-                return True
-            except:
-                return False
-
-        def is_float( column_text ):
-            try:
-                float( column_text )
-                return True
-            except:
-                if column_text.strip().lower() == 'na':
-                    return True  # na is special cased to be a float
-                return False
-
-        def is_list( column_text ):
-            return "," in column_text
-
-        def is_str( column_text ):
-            # anything, except an empty string, is True
-            if column_text == "":
-                return False
-            return True
-        is_column_type = {}  # Dict to store column type string to checking function
-        for column_type in column_type_set_order:
-            is_column_type[column_type] = locals()[ "is_%s" % ( column_type ) ]
-
-        def guess_column_type( column_text ):
-            for column_type in column_type_set_order:
-                if is_column_type[column_type]( column_text ):
-                    return column_type
-            return None
-        data_lines = 0
-        comment_lines = 0
-        column_types = []
-        first_line_column_types = [default_column_type]  # default value is one column of type str
-        if dataset.has_data():
-            # NOTE: if skip > num_check_lines, we won't detect any metadata, and will use default
-            dataset_fh = open( dataset.file_name )
-            i = 0
-            while True:
-                line = dataset_fh.readline()
-                if not line:
-                    break
-                line = line.rstrip( '\r\n' )
-                if i < skip or not line or line.startswith( '#' ):
-                    # We'll call blank lines comments
-                    comment_lines += 1
-                else:
-                    data_lines += 1
-                    if max_guess_type_data_lines is None or data_lines <= max_guess_type_data_lines:
-                        fields = line.split( '\t' )
-                        for field_count, field in enumerate( fields ):
-                            if field_count >= len( column_types ):  # found a previously unknown column, we append None
-                                column_types.append( None )
-                            column_type = guess_column_type( field )
-                            if type_overrules_type( column_type, column_types[field_count] ):
-                                column_types[field_count] = column_type
-                    if i == 0 and requested_skip is None:
-                        # This is our first line, people seem to like to upload files that have a header line, but do not
-                        # start with '#' (i.e. all column types would then most likely be detected as str).  We will assume
-                        # that the first line is always a header (this was previous behavior - it was always skipped).  When
-                        # the requested skip is None, we only use the data from the first line if we have no other data for
-                        # a column.  This is far from perfect, as
-                        # 1,2,3	1.1	2.2	qwerty
-                        # 0	0		1,2,3
-                        # will be detected as
-                        # "column_types": ["int", "int", "float", "list"]
-                        # instead of
-                        # "column_types": ["list", "float", "float", "str"]  *** would seem to be the 'Truth' by manual
-                        # observation that the first line should be included as data.  The old method would have detected as
-                        # "column_types": ["int", "int", "str", "list"]
-                        first_line_column_types = column_types
-                        column_types = [ None for col in first_line_column_types ]
-                if max_data_lines is not None and data_lines >= max_data_lines:
-                    if dataset_fh.tell() != dataset.get_size():
-                        data_lines = None  # Clear optional data_lines metadata value
-                        comment_lines = None  # Clear optional comment_lines metadata value; additional comment lines could appear below this point
-                    break
-                i += 1
-            dataset_fh.close()
-
-        # we error on the larger number of columns
-        # first we pad our column_types by using data from first line
-        if len( first_line_column_types ) > len( column_types ):
-            for column_type in first_line_column_types[len( column_types ):]:
-                column_types.append( column_type )
-        # Now we fill any unknown (None) column_types with data from first line
-        for i in range( len( column_types ) ):
-            if column_types[i] is None:
-                if len( first_line_column_types ) <= i or first_line_column_types[i] is None:
-                    column_types[i] = default_column_type
-                else:
-                    column_types[i] = first_line_column_types[i]
-        # Set the discovered metadata values for the dataset
-        dataset.metadata.data_lines = data_lines
-        dataset.metadata.comment_lines = comment_lines
-        dataset.metadata.column_types = column_types
-        dataset.metadata.columns = len( column_types )
-        dataset.metadata.delimiter = '\t'
+        scan_dataset( dataset, [ ColumnTypesVisitor( skip=skip, max_data_lines=max_data_lines, max_guess_type_data_lines=max_guess_type_data_lines ) ] )
 
     def as_gbrowse_display_file( self, dataset, **kwd ):
         return open( dataset.file_name )
@@ -397,6 +606,7 @@ class Taxonomy( Tabular ):
         return Tabular.make_html_table( self, dataset, column_names=self.column_names )
 
 
+@build_sniff_from_prefix
 @dataproviders.decorators.has_dataproviders
 class Sam( Tabular ):
     edam_format = "format_2573"
@@ -415,7 +625,7 @@ class Sam( Tabular ):
         """Returns formated html of peek"""
         return Tabular.make_html_table( self, dataset, column_names=self.column_names )
 
-    def sniff( self, filename ):
+    def sniff_prefix( self, file_prefix ):
         """
         Determines whether the file is in SAM format
 
@@ -445,7 +655,7 @@ class Sam( Tabular ):
         True
         """
         try:
-            fh = open( filename )
+            fh = file_prefix.line_reader()
             count = 0
             while True:
                 line = fh.readline()
@@ -539,6 +749,33 @@ class Sam( Tabular ):
         settings[ 'comment_char' ] = '@'
         return super( Sam, self ).dataset_column_dataprovider( dataset, **settings )
 
+    @dataproviders.decorators.dataprovider_factory( 'column-batch',
+                                                    dataproviders.column.TransposedColumnarDataProvider.settings )
+    def column_batch_dataprovider( self, dataset, **settings ):
+        settings[ 'comment_char' ] = '@'
+        return super( Sam, self ).column_batch_dataprovider( dataset, **settings )
+
+    @dataproviders.decorators.dataprovider_factory( 'dataset-column-batch',
+                                                    dataproviders.column.TransposedColumnarDataProvider.settings )
+    def dataset_column_batch_dataprovider( self, dataset, **settings ):
+        settings[ 'comment_char' ] = '@'
+        return super( Sam, self ).dataset_column_batch_dataprovider( dataset, **settings )
+
+    @dataproviders.decorators.dataprovider_factory( 'histogram', dataproviders.aggregate.HistogramDataProvider.settings )
+    def histogram_dataprovider( self, dataset, **settings ):
+        settings[ 'comment_char' ] = '@'
+        return super( Sam, self ).histogram_dataprovider( dataset, **settings )
+
+    @dataproviders.decorators.dataprovider_factory( 'min-max', dataproviders.aggregate.MinMaxDataProvider.settings )
+    def min_max_dataprovider( self, dataset, **settings ):
+        settings[ 'comment_char' ] = '@'
+        return super( Sam, self ).min_max_dataprovider( dataset, **settings )
+
+    @dataproviders.decorators.dataprovider_factory( 'sample', dataproviders.aggregate.SampleDataProvider.settings )
+    def sample_dataprovider( self, dataset, **settings ):
+        settings[ 'comment_char' ] = '@'
+        return super( Sam, self ).sample_dataprovider( dataset, **settings )
+
     @dataproviders.decorators.dataprovider_factory( 'dict', dataproviders.column.DictDataProvider.settings )
     def dict_dataprovider( self, dataset, **settings ):
         settings[ 'comment_char' ] = '@'
@@ -580,6 +817,7 @@ class Sam( Tabular ):
     #     return dataproviders.dataset.SamtoolsDataProvider( dataset_source, **settings )
 
 
+@build_sniff_from_prefix
 @dataproviders.decorators.has_dataproviders
 class Pileup( Tabular ):
     """Tab delimited data in pileup (6- or 10-column) format"""
@@ -605,7 +843,7 @@ class Pileup( Tabular ):
         """Return options for removing errors along with a description"""
         return [ ("lines", "Remove erroneous lines") ]
 
-    def sniff( self, filename ):
+    def sniff_prefix( self, file_prefix ):
         """
         Checks for 'pileup-ness'
 
@@ -624,7 +862,7 @@ class Pileup( Tabular ):
         >>> Pileup().sniff( fname )
         True
         """
-        headers = get_headers( filename, '\t' )
+        headers = get_headers( file_prefix, '\t' )
         try:
             for hdr in headers:
                 if hdr and not hdr[0].startswith( '#' ):
@@ -654,12 +892,14 @@ class Pileup( Tabular ):
         return self.genomic_region_dataprovider( dataset, **settings )
 
 
+@build_sniff_from_prefix
 @dataproviders.decorators.has_dataproviders
 class Vcf( Tabular ):
     """ Variant Call Format for describing SNPs and other simple genome variations. """
     edam_format = "format_3016"
     track_type = "VariantTrack"
     data_sources = { "data": "tabix", "index": "bigwig" }
+    sniff_magic_prefixes = [ '##fileformat=VCF' ]
 
     file_ext = 'vcf'
     column_names = [ 'Chrom', 'Pos', 'ID', 'Ref', 'Alt', 'Qual', 'Filter', 'Info', 'Format', 'data' ]
@@ -669,8 +909,8 @@ class Vcf( Tabular ):
     MetadataElement( name="viz_filter_cols", desc="Score column for visualization", default=[5], param=metadata.ColumnParameter, optional=True, multiple=True, visible=False )
     MetadataElement( name="sample_names", default=[], desc="Sample names", readonly=True, visible=False, optional=True, no_value=[] )
 
-    def sniff( self, filename ):
-        headers = get_headers( filename, '\n', count=1 )
+    def sniff_prefix( self, file_prefix ):
+        headers = get_headers( file_prefix, '\n', count=1 )
         return headers[0][0].startswith("##fileformat=VCF")
 
     def display_peek( self, dataset ):
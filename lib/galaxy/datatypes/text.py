@@ -10,7 +10,7 @@ import re
 import subprocess
 import tempfile
 
-from galaxy.datatypes.data import get_file_peek, Text
+from galaxy.datatypes.data import get_dataset_peek, Text
 from galaxy.datatypes.metadata import MetadataElement
 from galaxy.util import nice_size, string_as_bool
 
@@ -23,7 +23,7 @@ class Json( Text ):
 
     def set_peek( self, dataset, is_multi_byte=False ):
         if not dataset.dataset.purged:
-            dataset.peek = get_file_peek( dataset.file_name, is_multi_byte=is_multi_byte )
+            dataset.peek = get_dataset_peek( dataset, is_multi_byte=is_multi_byte )
             dataset.blurb = "JavaScript Object Notation (JSON)"
         else:
             dataset.peek = 'file does not exist'
@@ -67,7 +67,7 @@ class Ipynb( Json ):
 
     def set_peek( self, dataset, is_multi_byte=False ):
         if not dataset.dataset.purged:
-            dataset.peek = get_file_peek( dataset.file_name, is_multi_byte=is_multi_byte )
+            dataset.peek = get_dataset_peek( dataset, is_multi_byte=is_multi_byte )
             dataset.blurb = "IPython Notebook"
         else:
             dataset.peek = 'file does not exist'
@@ -132,7 +132,7 @@ class Obo( Text ):
 
     def set_peek( self, dataset, is_multi_byte=False ):
         if not dataset.dataset.purged:
-            dataset.peek = get_file_peek( dataset.file_name, is_multi_byte=is_multi_byte )
+            dataset.peek = get_dataset_peek( dataset, is_multi_byte=is_multi_byte )
             dataset.blurb = "Open Biomedical Ontology (OBO)"
         else:
             dataset.peek = 'file does not exist'
@@ -170,7 +170,7 @@ class Arff( Text ):
 
     def set_peek( self, dataset, is_multi_byte=False ):
         if not dataset.dataset.purged:
-            dataset.peek = get_file_peek( dataset.file_name, is_multi_byte=is_multi_byte )
+            dataset.peek = get_dataset_peek( dataset, is_multi_byte=is_multi_byte )
             dataset.blurb = "Attribute-Relation File Format (ARFF)"
             dataset.blurb += ", %s comments, %s attributes" % ( dataset.metadata.comment_lines, dataset.metadata.columns )
         else:
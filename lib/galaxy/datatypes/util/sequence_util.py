@@ -0,0 +1,264 @@
+"""
+Block based counting of lines and sequences in sequence files.
+
+Rather than iterating over a file line by line in Python, files are read in
+large blocks of complete lines (gzip compressed files are decompressed with
+zlib as they are read) and newlines and record markers are located with
+``str.count`` and ``str.find``, which scan in C.  The counts match those of
+the line based ``set_meta`` methods of ``galaxy.datatypes.sequence``.
+"""
+import re
+import zlib
+
+from galaxy.datatypes.checkers import is_gzip
+
+BLOCK_SIZE = 2 ** 22
+# Characters removed by str.strip() at the start of a line.
+LEADING_WHITESPACE = ' \t\r\x0b\x0c'
+# Number of FASTQ sequences per section of a table of contents (fqtoc).
+TOC_SEQUENCES = 1000000
+
+
+def read_blocks( path, block_size=BLOCK_SIZE, decompress=False ):
+    """
+    Yield the contents of the file at ``path`` in blocks of about
+    ``block_size`` bytes.  If ``decompress`` is True and the file is gzip
+    compressed the decompressed contents (of all concatenated members) are
+    yielded instead.
+    """
+    with open( path, 'rb' ) as fh:
+        if not ( decompress and is_gzip( path ) ):
+            while True:
+                data = fh.read( block_size )
+                if not data:
+                    break
+                yield data
+            return
+        decompressor = zlib.decompressobj( 16 + zlib.MAX_WBITS )
+        while True:
+            data = fh.read( block_size )
+            if not data:
+                break
+            while data:
+                decompressed = decompressor.decompress( data )
+                if decompressed:
+                    yield decompressed
+                data = decompressor.unused_data
+                if data:
+                    # start of the next gzip member
+                    decompressed = decompressor.flush()
+                    if decompressed:
+                        yield decompressed
+                    decompressor = zlib.decompressobj( 16 + zlib.MAX_WBITS )
+        decompressed = decompressor.flush()
+        if decompressed:
+            yield decompressed
+
+
+def line_blocks( path, block_size=BLOCK_SIZE, decompress=False ):
+    """
+    Yield blocks of complete lines of the file at ``path``, every block but
+    possibly the last ends with a newline.
+
+    >>> from galaxy.datatypes.sniff import get_test_fname
+    >>> blocks = list( line_blocks( get_test_fname( '1.fastqsanger' ), block_size=100 ) )
+    >>> all( block.endswith( '\\n' ) for block in blocks[ :-1 ] ), ''.join( blocks ) == open( get_test_fname( '1.fastqsanger' ) ).read()
+    (True, True)
+    """
+    rest = ''
+    for data in read_blocks( path, block_size=block_size, decompress=decompress ):
+        if rest:
+            data = rest + data
+        end = data.rfind( '\n' ) + 1
+        if end == 0:
+            rest = data
+            continue
+        if end < len( data ):
+            rest = data[ end: ]
+            data = data[ :end ]
+        else:
+            rest = ''
+        yield data
+    if rest:
+        yield rest
+
+
+def _count_lines( block ):
+    lines = block.count( '\n' )
+    if block and not block.endswith( '\n' ):
+        lines += 1
+    return lines
+
+
+def count_lines( path, decompress=True ):
+    """
+    Count the lines in the file at ``path``, decompressing it if it is gzip
+    compressed and ``decompress`` is True.
+
+    >>> import gzip, tempfile
+    >>> from galaxy.datatypes.sniff import get_test_fname
+    >>> fastq = open( get_test_fname( '1.fastqsanger' ) ).read()
+    >>> gzipped = tempfile.NamedTemporaryFile( suffix='.gz' )
+    >>> for i in range( 2 ):
+    ...     member = gzip.GzipFile( fileobj=gzipped, mode='wb' )
+    ...     member.writelines( [ fastq, '\\n' ] )
+    ...     member.close()
+    >>> gzipped.flush()
+    >>> count_lines( get_test_fname( '1.fastqsanger' ) ), count_lines( gzipped.name ), count_lines( gzipped.name, decompress=False ) > 0
+    (8, 16, True)
+    """
+    return sum( _count_lines( block ) for block in line_blocks( path, decompress=decompress ) )
+
+
+def _line_start_regex( chars ):
+    return re.compile( r'^[%s]*[%s]' % ( re.escape( LEADING_WHITESPACE ), re.escape( chars ) ), re.MULTILINE )
+
+
+_LEADING_WHITESPACE_RE = re.compile( r'\n[%s]' % re.escape( LEADING_WHITESPACE ) )
+_FASTA_HEADER_RE = _line_start_regex( '>' )
+_COMMENT_RE = _line_start_regex( '#' )
+_FASTQ_HEADER_RE = _line_start_regex( '@' )
+
+
+def _has_leading_whitespace( block ):
+    # One regular expression search is much faster than a substring search
+    # for each whitespace character.
+    return bool( block ) and ( block[ 0 ] in LEADING_WHITESPACE or _LEADING_WHITESPACE_RE.search( block ) is not None )
+
+
+def _count_line_starts( block, char, regex, whitespace ):
+    # Number of lines starting with char, after leading whitespace if any
+    # line of the block starts with whitespace.
+    if whitespace:
+        return len( regex.findall( block ) )
+    return block.count( '\n' + char ) + block.startswith( char )
+
+
+def count_fasta( path, block_size=BLOCK_SIZE ):
+    """
+    Return the number of data lines (all lines except comments starting with
+    '#') and sequences (lines starting with '>') of the file at ``path``.
+
+    >>> from galaxy.datatypes.sniff import get_test_fname
+    >>> count_fasta( get_test_fname( 'sequence.fasta' ) )
+    (2, 1)
+    """
+    data_lines = 0
+    sequences = 0
+    for block in line_blocks( path, block_size=block_size ):
+        whitespace = _has_leading_whitespace( block )
+        comments = _count_line_starts( block, '#', _COMMENT_RE, whitespace )
+        data_lines += _count_lines( block ) - comments
+        sequences += _count_line_starts( block, '>', _FASTA_HEADER_RE, whitespace )
+    return data_lines, sequences
+
+
+class FastqCount( object ):
+    """
+    The result of ``count_fastq``: ``lines`` in the file, ``data_lines``
+    (excluding comment lines at the start of the file), ``sequences`` and,
+    if requested, the ``sections`` of a table of contents.
+    """
+
+    def __init__( self ):
+        self.lines = 0
+        self.data_lines = 0
+        self.sequences = 0
+        self.sections = None
+
+
+def count_fastq( path, block_size=BLOCK_SIZE, toc_sequences=None ):
+    """
+    Count the lines and sequences of the FASTQ file at ``path``.
+
+    A sequence is counted for each line starting with '@' that follows at
+    least three lines after the line starting the previous sequence and for
+    the final sequence if it has at least four lines.
+
+    If ``toc_sequences`` is given, ``sections`` lists the byte offsets of
+    every ``toc_sequences`` sequences (assuming four line records), in the
+    format of an fqtoc file.
+
+    >>> from galaxy.datatypes.sniff import get_test_fname
+    >>> count = count_fastq( get_test_fname( '1.fastqsanger' ), toc_sequences=1 )
+    >>> count.lines, count.data_lines, count.sequences
+    (8, 8, 2)
+    >>> count.sections
+    [{'start': 0, 'end': 89, 'sequences': 1}, {'start': 89, 'end': 177, 'sequences': 1}, {'start': 177, 'end': 177, 'sequences': 0}]
+    """
+    count = FastqCount()
+    if toc_sequences:
+        count.sections = []
+        lines_per_section = 4 * toc_sequences
+        next_boundary = lines_per_section
+        section_start = 0
+    offset = 0
+    # line number of the line starting the last counted sequence, before the
+    # first sequence is counted this behaves as if it was the first line
+    last_start = 1
+    leading_comments = True
+    for block in line_blocks( path, block_size=block_size ):
+        block_lines = _count_lines( block )
+        if toc_sequences:
+            while count.lines + block_lines >= next_boundary:
+                section_end = offset + _line_end( block, next_boundary - count.lines )
+                count.sections.append( dict( start=section_start, end=section_end, sequences=toc_sequences ) )
+                section_start = section_end
+                next_boundary += lines_per_section
+        count.lines += block_lines
+        offset += len( block )
+        if leading_comments:
+            # Comment lines are only skipped before the first data line
+            start = 0
+            while start < len( block ):
+                end = block.find( '\n', start ) + 1 or len( block )
+                if not block[ start:end ].strip().startswith( '#' ):
+                    leading_comments = False
+                    break
+                start = end
+                block_lines -= 1
+            block = block[ start: ]
+            if not block:
+                continue
+        line_number = count.data_lines + 1  # of the line starting at position
+        position = 0
+        for start in _fastq_header_starts( block ):
+            line_number += block.count( '\n', position, start )
+            position = start
+            if line_number >= last_start + 3:
+                count.sequences += 1
+                last_start = line_number
+        count.data_lines += block_lines
+    if count.data_lines - last_start + 1 >= 4:
+        # count final block
+        count.sequences += 1
+    if toc_sequences:
+        count.sections.append( dict( start=section_start, end=offset, sequences=( count.lines % lines_per_section ) / 4 ) )
+    return count
+
+
+def _fastq_header_starts( block ):
+    if _has_leading_whitespace( block ):
+        for match in _FASTQ_HEADER_RE.finditer( block ):
+            yield match.start()
+        return
+    if block.startswith( '@' ):
+        yield 0
+    position = block.find( '\n@' )
+    while position != -1:
+        yield position + 1
+        position = block.find( '\n@', position + 2 )
+
+
+def _line_end( block, line ):
+    # Position just after the end of the given (1-based) line of the block.
+    if block.count( '\n' ) < line:
+        return len( block )
+    low, high = 0, len( block )
+    while low < high:
+        middle = ( low + high ) // 2
+        if block.count( '\n', 0, middle ) < line:
+            low = middle + 1
+        else:
+            high = middle
+    return low
@@ -6,25 +6,29 @@ import data
 import logging
 import dataproviders
 
+from galaxy.datatypes.sniff import build_sniff_from_prefix
+
 log = logging.getLogger(__name__)
 
 
+@build_sniff_from_prefix
 @dataproviders.decorators.has_dataproviders
 class GenericXml( data.Text ):
     """Base format class for any XML file."""
     edam_format = "format_2332"
     file_ext = "xml"
+    sniff_magic_prefixes = [ '<?xml ' ]
 
     def set_peek( self, dataset, is_multi_byte=False ):
         """Set the peek and blurb text"""
         if not dataset.dataset.purged:
-            dataset.peek = data.get_file_peek( dataset.file_name, is_multi_byte=is_multi_byte )
+            dataset.peek = data.get_dataset_peek( dataset, is_multi_byte=is_multi_byte )
             dataset.blurb = 'XML data'
         else:
             dataset.peek = 'file does not exist'
             dataset.blurb = 'file purged from disk'
 
-    def sniff( self, filename ):
+    def sniff_prefix( self, file_prefix ):
         """
         Determines whether the file is XML or not
 
@@ -36,13 +40,8 @@ class GenericXml( data.Text ):
         >>> GenericXml().sniff( fname )
         False
         """
-        # TODO - Use a context manager on Python 2.5+ to close handle
-        handle = open(filename)
-        line = handle.readline()
-        handle.close()
-
         # TODO - Is there a more robust way to do this?
-        return line.startswith('<?xml ')
+        return file_prefix.startswith('<?xml ')
 
     def merge(split_files, output_file):
         """Merging multiple XML files is non-trivial and must be done in subclasses."""
@@ -65,7 +64,7 @@ class MEMEXml( GenericXml ):
     def set_peek( self, dataset, is_multi_byte=False ):
         """Set the peek and blurb text"""
         if not dataset.dataset.purged:
-            dataset.peek = data.get_file_peek( dataset.file_name, is_multi_byte=is_multi_byte )
+            dataset.peek = data.get_dataset_peek( dataset, is_multi_byte=is_multi_byte )
             dataset.blurb = 'MEME XML data'
         else:
             dataset.peek = 'file does not exist'
@@ -82,7 +81,7 @@ class CisML( GenericXml ):
     def set_peek( self, dataset, is_multi_byte=False ):
         """Set the peek and blurb text"""
         if not dataset.dataset.purged:
-            dataset.peek = data.get_file_peek( dataset.file_name, is_multi_byte=is_multi_byte )
+            dataset.peek = data.get_dataset_peek( dataset, is_multi_byte=is_multi_byte )
             dataset.blurb = 'CisML data'
         else:
             dataset.peek = 'file does not exist'
@@ -99,7 +98,7 @@ class Phyloxml( GenericXml ):
     def set_peek( self, dataset, is_multi_byte=False ):
         """Set the peek and blurb text"""
         if not dataset.dataset.purged:
-            dataset.peek = data.get_file_peek( dataset.file_name, is_multi_byte=is_multi_byte )
+            dataset.peek = data.get_dataset_peek( dataset, is_multi_byte=is_multi_byte )
             dataset.blurb = 'Phyloxml data'
         else:
             dataset.peek = 'file does not exist'
@@ -134,7 +133,7 @@ class Owl( GenericXml ):
 
     def set_peek( self, dataset, is_multi_byte=False ):
         if not dataset.dataset.purged:
-            dataset.peek = data.get_file_peek( dataset.file_name, is_multi_byte=is_multi_byte )
+            dataset.peek = data.get_dataset_peek( dataset, is_multi_byte=is_multi_byte )
             dataset.blurb = "Web Ontology Language OWL"
         else:
             dataset.peek = 'file does not exist'
@@ -1005,6 +1005,7 @@ class JobWrapper( object ):
 
             self.sa_session.add( job )
             self.sa_session.flush()
+            self._notify_datasets_changed( job )
         # Perform email action even on failure.
         for pja in [pjaa.post_job_action for pjaa in job.post_job_actions if pjaa.post_job_action.action_type == "EmailAction"]:
             ActionBox.execute(self.app, self.sa_session, pja, job)
@@ -1353,10 +1354,20 @@ class JobWrapper( object ):
             # If job was composed of tasks, don't attempt to recollect statisitcs
             self._collect_metrics( job )
         self.sa_session.flush()
+        self._notify_datasets_changed( job )
         log.debug( 'job %d ended (finish() executed in %s)' % (self.job_id, finish_timer) )
         delete_files = self.app.config.cleanup_job == 'always' or ( job.state == job.states.OK and self.app.config.cleanup_job == 'onsuccess' )
         self.cleanup( delete_files=delete_files )
 
+    def _notify_datasets_changed( self, job ):
+        """
+        Let the job queue know that the state of this job's outputs has
+        changed so jobs depending on them can be re-evaluated promptly.
+        """
+        datasets_changed = getattr( self.queue, 'datasets_changed', None )
+        if datasets_changed is not None:
+            datasets_changed( [ da.dataset.dataset.id for da in job.output_datasets + job.output_library_datasets ] )
+
     def check_tool_output( self, stdout, stderr, tool_exit_code, job ):
         return check_output( self.tool, stdout, stderr, tool_exit_code, job )
 
@@ -1605,6 +1616,8 @@ class JobWrapper( object ):
                                                                       datatypes_config=datatypes_config,
                                                                       job_metadata=os.path.join( self.working_directory, TOOL_PROVIDED_JOB_METADATA_FILE ),
                                                                       max_metadata_value_size=self.app.config.max_metadata_value_size,
+                                                                      metadata_processes=self.app.config.metadata_processes,
+                                                                      metadata_daemon_socket=self.app.config.metadata_daemon_socket,
                                                                       **kwds )
 
     @property
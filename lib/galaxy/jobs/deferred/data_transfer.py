@@ -110,7 +110,7 @@ class DataTransfer( object ):
                     result_dict = job.params[ 'result' ]
                 library_dataset_name = result_dict[ 'name' ]
                 # Determine the data format (see the relevant TODO item in the manual_data_transfer plugin)..
-                extension = sniff.guess_ext( result_dict[ 'local_path' ], sniff_order=self.app.datatypes_registry.sniff_order )
+                extension = sniff.guess_ext( result_dict[ 'local_path' ], sniff_order=self.app.datatypes_registry.sniff_order, sniff_index=self.app.datatypes_registry.sniff_index )
             self._update_sample_dataset_status( protocol=job.params[ 'protocol' ],
                                                 sample_id=int( job.params[ 'sample_id' ] ),
                                                 result_dict=result_dict,
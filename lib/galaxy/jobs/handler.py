@@ -14,6 +14,7 @@ from galaxy import model
 from galaxy.util.sleeper import Sleeper
 from galaxy.jobs import JobWrapper, TaskWrapper, JobDestination
 from galaxy.jobs.mapper import JobNotReadyException
+from galaxy.jobs.readiness import JobReadinessTracker, chunk_ids
 
 log = logging.getLogger( __name__ )
 
@@ -69,6 +70,12 @@ class JobHandlerQueue( object ):
         self.waiting_jobs = []
         # Contains wrappers of jobs that are limited or ready (so they aren't created unnecessarily/multiple times)
         self.job_wrappers = {}
+        # Tracks which new jobs have their inputs ready (only used if track_jobs_in_database is True)
+        self.job_readiness = None
+        if self.track_jobs_in_database:
+            self.job_readiness = JobReadinessTracker( self.sa_session,
+                                                      self.app.config.server_name,
+                                                      sweep_interval=self.app.config.job_readiness_sweep_interval )
         # Helper for interruptable sleep
         self.sleeper = Sleeper()
         self.running = True
@@ -197,41 +204,15 @@ class JobHandlerQueue( object ):
         if self.track_jobs_in_database:
             # Clear the session so we get fresh states for job and all datasets
             self.sa_session.expunge_all()
-            # Fetch all new jobs
-            hda_not_ready = self.sa_session.query(model.Job.id).enable_eagerloads(False) \
-                .join(model.JobToInputDatasetAssociation) \
-                .join(model.HistoryDatasetAssociation) \
-                .join(model.Dataset) \
-                .filter(and_( (model.Job.state == model.Job.states.NEW ),
-                              or_( ( model.HistoryDatasetAssociation._state == model.HistoryDatasetAssociation.states.FAILED_METADATA ),
-                                   ( model.HistoryDatasetAssociation.deleted == true() ),
-                                   ( model.Dataset.state != model.Dataset.states.OK ),
-                                   ( model.Dataset.deleted == true() ) ) ) ).subquery()
-            ldda_not_ready = self.sa_session.query(model.Job.id).enable_eagerloads(False) \
-                .join(model.JobToInputLibraryDatasetAssociation) \
-                .join(model.LibraryDatasetDatasetAssociation) \
-                .join(model.Dataset) \
-                .filter(and_((model.Job.state == model.Job.states.NEW),
-                        or_((model.LibraryDatasetDatasetAssociation._state != null()),
-                            (model.LibraryDatasetDatasetAssociation.deleted == true()),
-                            (model.Dataset.state != model.Dataset.states.OK),
-                            (model.Dataset.deleted == true())))).subquery()
-            if self.app.config.user_activation_on:
-                jobs_to_check = self.sa_session.query(model.Job).enable_eagerloads(False) \
-                    .outerjoin( model.User ) \
-                    .filter(and_((model.Job.state == model.Job.states.NEW),
-                                 or_((model.Job.user_id == null()), (model.User.active == true())),
-                                 (model.Job.handler == self.app.config.server_name),
-                                 ~model.Job.table.c.id.in_(hda_not_ready),
-                                 ~model.Job.table.c.id.in_(ldda_not_ready))) \
-                    .order_by(model.Job.id).all()
-            else:
-                jobs_to_check = self.sa_session.query(model.Job).enable_eagerloads(False) \
-                    .filter(and_((model.Job.state == model.Job.states.NEW),
-                                 (model.Job.handler == self.app.config.server_name),
-                                 ~model.Job.table.c.id.in_(hda_not_ready),
-                                 ~model.Job.table.c.id.in_(ldda_not_ready))) \
-                    .order_by(model.Job.id).all()
+            # Fetch new jobs whose inputs are all ready
+            ready_job_ids = self.job_readiness.ready_job_ids()
+            jobs_to_check = self.__get_new_jobs( ready_job_ids )
+            # Jobs that could not be loaded are no longer new (or belong to
+            # inactive users), the next sweep will pick them up if need be
+            loaded_job_ids = set( job.id for job in jobs_to_check )
+            for job_id in ready_job_ids:
+                if job_id not in loaded_job_ids:
+                    self.job_readiness.forget( job_id )
             # Fetch all "resubmit" jobs
             resubmit_jobs = self.sa_session.query(model.Job).enable_eagerloads(False) \
                 .filter(and_((model.Job.state == model.Job.states.RESUBMITTED),
@@ -297,6 +278,8 @@ class JobHandlerQueue( object ):
                 else:
                     log.error( "(%d) Job in unknown state '%s'" % ( job.id, job_state ) )
                     new_waiting_jobs.append( job.id )
+                if self.job_readiness is not None and job.id not in new_waiting_jobs:
+                    self.job_readiness.forget( job.id )
             except Exception:
                 log.exception( "failure running job %d" % job.id )
         # Update the waiting list
@@ -311,6 +294,23 @@ class JobHandlerQueue( object ):
         # Done with the session
         self.sa_session.remove()
 
+    def __get_new_jobs( self, job_ids ):
+        """
+        Load the jobs with the given ids that are still new and assigned to
+        this handler (and, if activation is enforced, belong to active users).
+        """
+        jobs = []
+        for chunk in chunk_ids( job_ids ):
+            query = self.sa_session.query(model.Job).enable_eagerloads(False)
+            if self.app.config.user_activation_on:
+                query = query.outerjoin( model.User ) \
+                    .filter(or_((model.Job.user_id == null()), (model.User.active == true())))
+            jobs.extend( query.filter(and_((model.Job.state == model.Job.states.NEW),
+                                           (model.Job.handler == self.app.config.server_name),
+                                           model.Job.table.c.id.in_(chunk))).all() )
+        jobs.sort( key=lambda job: job.id )
+        return jobs
+
     def __check_job_state( self, job ):
         """
         Check if a job is ready to run by verifying that each of its input
@@ -588,6 +588,14 @@ class JobHandlerQueue( object ):
                             return JOB_WAIT
         return JOB_READY
 
+    def datasets_changed( self, dataset_ids ):
+        """
+        Notify the queue that the state of the given datasets has changed, so
+        that jobs waiting on them are re-evaluated on the next iteration.
+        """
+        if self.job_readiness is not None:
+            self.job_readiness.datasets_changed( dataset_ids )
+
     def put( self, job_id, tool_id ):
         """Add a job to the queue (by job identifier)"""
         if not self.track_jobs_in_database:
@@ -0,0 +1,220 @@
+"""
+Incremental tracking of which new jobs have all of their inputs ready.
+
+Rather than re-running anti-joins over every NEW job on each iteration of the
+handler queue, the tracker keeps an in-memory graph of NEW jobs assigned to
+this handler and the input datasets each one is still waiting on.  Only jobs
+that are newly created or whose inputs have changed state are re-evaluated
+against the database.  Changes are learned about from job wrappers in this
+process (``datasets_changed``) and from an indexed scan of recently updated
+datasets (which catches changes made by other Galaxy processes).  A periodic
+full sweep rebuilds the graph from scratch as a safety net.
+"""
+import logging
+import threading
+import time
+
+from sqlalchemy.sql.expression import and_, or_, select, true, null
+
+from galaxy import model
+from galaxy.model import UPDATE_TIME_OVERLAP
+from galaxy.model.orm.now import now
+
+log = logging.getLogger( __name__ )
+
+DEFAULT_SWEEP_INTERVAL = 60
+# Maximum number of ids used in a single IN clause.
+MAX_IN_FILTER_LENGTH = 500
+
+
+def chunk_ids( ids, size=MAX_IN_FILTER_LENGTH ):
+    ids = list( ids )
+    for i in range( 0, len( ids ), size ):
+        yield ids[ i:i + size ]
+
+
+class JobReadinessTracker( object ):
+    """
+    Maintains the set of NEW jobs (for a given handler) whose input datasets
+    are all ready, along with a job -> pending dataset graph used to decide
+    which jobs need to be re-evaluated when datasets change state.
+
+    All methods except ``datasets_changed`` must be called from a single
+    thread (the handler queue's monitor thread).
+    """
+
+    def __init__( self, sa_session, handler_id, sweep_interval=DEFAULT_SWEEP_INTERVAL ):
+        self.sa_session = sa_session
+        self.handler_id = handler_id
+        self.sweep_interval = sweep_interval
+        # job id -> set of dataset ids the job is waiting on
+        self.waiting_on = {}
+        # dataset id -> set of job ids waiting on that dataset
+        self.blocking = {}
+        # ids of jobs whose inputs are all ready
+        self.ready = set()
+        # highest job id seen, new jobs are fetched above this mark
+        self.max_job_id = 0
+        self.last_sweep = None
+        self.last_dataset_poll = None
+        self._changed_datasets = set()
+        self._lock = threading.Lock()
+
+    def datasets_changed( self, dataset_ids ):
+        """
+        Record that the state of the given datasets (``model.Dataset`` ids)
+        has changed.  Safe to call from any thread.
+        """
+        with self._lock:
+            self._changed_datasets.update( dataset_ids )
+
+    def ready_job_ids( self ):
+        """
+        Bring the tracked graph up to date and return the sorted ids of NEW
+        jobs whose inputs are all ready.
+        """
+        if self.last_sweep is None or time.time() - self.last_sweep >= self.sweep_interval:
+            self.sweep()
+        else:
+            self.update()
+        return sorted( self.ready )
+
+    def forget( self, job_id ):
+        """
+        Stop tracking a job, e.g. because it was dispatched, failed or is no
+        longer NEW.  If it is still NEW the next sweep will pick it up again.
+        """
+        self.ready.discard( job_id )
+        for dataset_id in self.waiting_on.pop( job_id, () ):
+            job_ids = self.blocking.get( dataset_id )
+            if job_ids is not None:
+                job_ids.discard( job_id )
+                if not job_ids:
+                    del self.blocking[ dataset_id ]
+
+    def sweep( self ):
+        """
+        Rebuild the graph for all NEW jobs assigned to this handler.
+        """
+        self._take_changed_datasets()
+        poll_time = now()
+        job_ids = self._new_job_ids()
+        pending = self._pending_inputs()
+        self.waiting_on = {}
+        self.blocking = {}
+        self.ready = set()
+        for job_id in job_ids:
+            self._track( job_id, pending.get( job_id ) )
+        if job_ids:
+            self.max_job_id = max( self.max_job_id, max( job_ids ) )
+        self.last_sweep = time.time()
+        self.last_dataset_poll = poll_time
+        log.debug( "Job readiness sweep found %d new jobs, %d ready, waiting on %d datasets",
+                   len( job_ids ), len( self.ready ), len( self.blocking ) )
+
+    def update( self ):
+        """
+        Re-evaluate only newly created jobs and jobs waiting on datasets that
+        have changed since the last update.
+        """
+        changed = self._take_changed_datasets()
+        poll_time = now()
+        since = self.last_dataset_poll - UPDATE_TIME_OVERLAP
+        changed.update( self._recently_updated_dataset_ids( since ) )
+        self.last_dataset_poll = poll_time
+        job_ids = set( self._new_job_ids( above_id=self.max_job_id ) )
+        if job_ids:
+            self.max_job_id = max( self.max_job_id, max( job_ids ) )
+        # Jobs created in bulk are only assigned to a handler after they have
+        # been flushed, so they may be below the high-water mark.
+        job_ids.update( self._new_job_ids( updated_since=since ) )
+        for dataset_id in changed:
+            job_ids.update( self.blocking.get( dataset_id, () ) )
+        if not job_ids:
+            return
+        pending = self._pending_inputs( job_ids )
+        for job_id in job_ids:
+            self.forget( job_id )
+            self._track( job_id, pending.get( job_id ) )
+
+    def _track( self, job_id, pending_dataset_ids ):
+        if not pending_dataset_ids:
+            self.ready.add( job_id )
+            return
+        self.waiting_on[ job_id ] = set( pending_dataset_ids )
+        for dataset_id in pending_dataset_ids:
+            self.blocking.setdefault( dataset_id, set() ).add( job_id )
+
+    def _take_changed_datasets( self ):
+        with self._lock:
+            changed = self._changed_datasets
+            self._changed_datasets = set()
+        return changed
+
+    def _new_job_ids( self, above_id=None, updated_since=None ):
+        job = model.Job.table
+        clause = and_( job.c.state == model.Job.states.NEW,
+                       job.c.handler == self.handler_id )
+        if above_id is not None:
+            clause = and_( clause, job.c.id > above_id )
+        if updated_since is not None:
+            clause = and_( clause, job.c.update_time >= updated_since )
+        return [ row[ 0 ] for row in self.sa_session.execute( select( [ job.c.id ] ).where( clause ) ) ]
+
+    def _recently_updated_dataset_ids( self, since ):
+        dataset = model.Dataset.table
+        return set( row[ 0 ] for row in self.sa_session.execute( select( [ dataset.c.id ] ).where( dataset.c.update_time >= since ) ) )
+
+    def _pending_inputs( self, job_ids=None ):
+        """
+        Return a dictionary mapping NEW job ids to the set of input dataset
+        ids that are not (yet) ready.  Jobs with all inputs ready are absent.
+        If ``job_ids`` is given, only those jobs are considered.
+        """
+        pending = {}
+        if job_ids is None:
+            self._add_pending_inputs( pending, None )
+        else:
+            for chunk in chunk_ids( job_ids ):
+                self._add_pending_inputs( pending, chunk )
+        return pending
+
+    def _add_pending_inputs( self, pending, job_ids ):
+        for statement in self._pending_input_statements( job_ids ):
+            for job_id, dataset_id in self.sa_session.execute( statement ):
+                pending.setdefault( job_id, set() ).add( dataset_id )
+
+    def _pending_input_statements( self, job_ids ):
+        # These conditions must stay in sync with JobHandlerQueue's definition
+        # of a job that is ready to run.
+        job = model.Job.table
+        dataset = model.Dataset.table
+        job_clause = and_( job.c.state == model.Job.states.NEW,
+                           job.c.handler == self.handler_id )
+        if job_ids is not None:
+            job_clause = and_( job_clause, job.c.id.in_( job_ids ) )
+
+        jtida = model.JobToInputDatasetAssociation.table
+        hda = model.HistoryDatasetAssociation.table
+        hda_from = job.join( jtida, jtida.c.job_id == job.c.id ) \
+            .join( hda, hda.c.id == jtida.c.dataset_id ) \
+            .join( dataset, dataset.c.id == hda.c.dataset_id )
+        hda_not_ready = select( [ job.c.id, dataset.c.id ], from_obj=[ hda_from ], use_labels=True ) \
+            .where( and_( job_clause,
+                          or_( ( hda.c._state == model.HistoryDatasetAssociation.states.FAILED_METADATA ),
+                               ( hda.c.deleted == true() ),
+                               ( dataset.c.state != model.Dataset.states.OK ),
+                               ( dataset.c.deleted == true() ) ) ) )
+
+        jtilda = model.JobToInputLibraryDatasetAssociation.table
+        ldda = model.LibraryDatasetDatasetAssociation.table
+        ldda_from = job.join( jtilda, jtilda.c.job_id == job.c.id ) \
+            .join( ldda, ldda.c.id == jtilda.c.ldda_id ) \
+            .join( dataset, dataset.c.id == ldda.c.dataset_id )
+        ldda_not_ready = select( [ job.c.id, dataset.c.id ], from_obj=[ ldda_from ], use_labels=True ) \
+            .where( and_( job_clause,
+                          or_( ( ldda.c._state != null() ),
+                               ( ldda.c.deleted == true() ),
+                               ( dataset.c.state != model.Dataset.states.OK ),
+                               ( dataset.c.deleted == true() ) ) ) )
+        return hda_not_ready, ldda_not_ready
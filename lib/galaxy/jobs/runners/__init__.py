@@ -4,9 +4,11 @@ Base classes for job runner plugins.
 
 import os
 import time
+import heapq
 import string
 import logging
 import datetime
+import itertools
 import threading
 import subprocess
 
@@ -35,6 +37,12 @@ JOB_RUNNER_PARAMETER_UNKNOWN_MESSAGE = "Invalid job runner parameter for this pl
 JOB_RUNNER_PARAMETER_MAP_PROBLEM_MESSAGE = "Job runner parameter '%s' value '%s' could not be converted to the correct type"
 JOB_RUNNER_PARAMETER_VALIDATION_FAILED_MESSAGE = "Job runner parameter %s failed validation"
 
+# Defaults controlling how often asynchronous runners check on watched jobs,
+# see AsynchronousJobRunner.next_check_interval.
+DEFAULT_MIN_POLL_INTERVAL = 1
+DEFAULT_MAX_POLL_INTERVAL = 30
+DEFAULT_POLL_INTERVAL_AGE_FACTOR = 60
+
 GALAXY_LIB_ADJUST_TEMPLATE = """GALAXY_LIB="%s"; if [ "$GALAXY_LIB" != "None" ]; then if [ -n "$PYTHONPATH" ]; then PYTHONPATH="$GALAXY_LIB:$PYTHONPATH"; else PYTHONPATH="$GALAXY_LIB"; fi; export PYTHONPATH; fi;"""
 
 
@@ -419,6 +427,7 @@ class AsynchronousJobState( JobState ):
         self._running = False
         self.check_count = 0
         self.start_time = None
+        self.watch_start_time = None
 
         self.job_wrapper = job_wrapper
         # job_id is the DRM's job id, not the Galaxy job id
@@ -480,16 +489,25 @@ class AsynchronousJobRunner( BaseJobRunner ):
     thread to monitor the state of asynchronous jobs and submitting those jobs
     to the correct methods (queue, finish, cleanup) at appropriate times..
     """
+    DEFAULT_SPECS = dict( BaseJobRunner.DEFAULT_SPECS,
+                          min_poll_interval=dict( map=float, valid=lambda x: float( x ) > 0, default=DEFAULT_MIN_POLL_INTERVAL ),
+                          max_poll_interval=dict( map=float, valid=lambda x: float( x ) > 0, default=DEFAULT_MAX_POLL_INTERVAL ),
+                          poll_interval_age_factor=dict( map=float, valid=lambda x: float( x ) > 0, default=DEFAULT_POLL_INTERVAL_AGE_FACTOR ) )
 
     def __init__( self, app, nworkers, **kwargs ):
         super( AsynchronousJobRunner, self ).__init__( app, nworkers, **kwargs )
         # 'watched' and 'queue' are both used to keep track of jobs to watch.
         # 'queue' is used to add new watched jobs, and can be called from
         # any thread (usually by the 'queue_job' method). 'watched' must only
-        # be modified by the monitor thread, which will move items from 'queue'
-        # to 'watched' and then manage the watched jobs.
+        # be modified by the monitor thread, which will move items that are
+        # due to be checked from 'check_schedule' to 'watched' and then
+        # manage the watched jobs.
         self.watched = []
         self.monitor_queue = Queue()
+        # Heap of ( next check time, sequence number, job state ) for jobs
+        # that are being watched but are not yet due to be checked.
+        self.check_schedule = []
+        self.check_sequence = itertools.count()
 
     def _init_monitor_thread(self):
         self.monitor_thread = threading.Thread( name="%s.monitor_thread" % self.runner_name, target=self.monitor )
@@ -503,27 +521,84 @@ class AsynchronousJobRunner( BaseJobRunner ):
     def monitor( self ):
         """
         Watches jobs currently in the monitor queue and deals with state
-        changes (queued to running) and job completion.
+        changes (queued to running) and job completion.  Jobs are checked
+        when they are due according to ``next_check_interval``, in between
+        the monitor thread sleeps until the next check is due or a new job is
+        added to the monitor queue.
         """
         while True:
-            # Take any new watched jobs and put them on the monitor list
+            # Wait for new watched jobs (or the next due check) and schedule
+            # any new jobs for checking
             try:
+                async_job_state = self.monitor_queue.get( timeout=self.__time_until_next_check() )
                 while True:
-                    async_job_state = self.monitor_queue.get_nowait()
                     if async_job_state is STOP_SIGNAL:
                         # TODO: This is where any cleanup would occur
                         self.handle_stop()
                         return
-                    self.watched.append( async_job_state )
+                    self.schedule_check( async_job_state )
+                    async_job_state = self.monitor_queue.get_nowait()
             except Empty:
                 pass
-            # Iterate over the list of watched jobs and check state
+            self.watched = self.__pop_due_checks()
+            if not self.watched:
+                continue
+            # Iterate over the list of watched jobs that are due and check state
             try:
                 self.check_watched_items()
             except Exception:
                 log.exception('Unhandled exception checking active jobs')
-            # Sleep a bit before the next state check
-            time.sleep( 1 )
+            # Jobs still being watched are scheduled for their next check
+            for async_job_state in self.watched:
+                self.schedule_check( async_job_state )
+            self.watched = []
+
+    def schedule_check( self, job_state, now=None ):
+        """
+        Schedule the next state check of a watched job.
+        """
+        if now is None:
+            now = time.time()
+        if job_state.watch_start_time is None:
+            job_state.watch_start_time = now
+        next_check_time = now + self.next_check_interval( job_state, now )
+        heapq.heappush( self.check_schedule, ( next_check_time, next( self.check_sequence ), job_state ) )
+
+    def next_check_interval( self, job_state, now ):
+        """
+        Return the number of seconds until a watched job should be checked
+        again.  The interval grows with the time the job has been watched
+        (``age / poll_interval_age_factor``), bounded by ``min_poll_interval``
+        and ``max_poll_interval``, so new jobs are checked frequently and
+        long running jobs rarely.  Each parameter can be set on the job's
+        destination, falling back to the runner plugin's parameters.
+        """
+        min_interval = self.__poll_param( job_state, 'min_poll_interval' )
+        max_interval = self.__poll_param( job_state, 'max_poll_interval' )
+        age_factor = self.__poll_param( job_state, 'poll_interval_age_factor' )
+        age = now - job_state.watch_start_time
+        return max( min_interval, min( age / age_factor, max_interval ) )
+
+    def __poll_param( self, job_state, name ):
+        job_destination = getattr( job_state, 'job_destination', None )
+        if job_destination is not None and name in job_destination.params:
+            try:
+                return float( job_destination.params[ name ] )
+            except ValueError:
+                log.warning( "Invalid value for destination parameter %s: %s", name, job_destination.params[ name ] )
+        return self.runner_params[ name ]
+
+    def __time_until_next_check( self ):
+        if not self.check_schedule:
+            return None
+        return max( self.check_schedule[ 0 ][ 0 ] - time.time(), 0 )
+
+    def __pop_due_checks( self ):
+        due = []
+        now = time.time()
+        while self.check_schedule and self.check_schedule[ 0 ][ 0 ] <= now:
+            due.append( heapq.heappop( self.check_schedule )[ 2 ] )
+        return due
 
     def monitor_job(self, job_state):
         self.monitor_queue.put( job_state )
@@ -539,7 +614,8 @@ class AsynchronousJobRunner( BaseJobRunner ):
         """
         This method is responsible for iterating over self.watched and handling
         state changes and updating self.watched with a new list of watched job
-        states. Subclasses can opt to override this directly (as older job runners will
+        states. self.watched only contains the jobs that are due to be checked
+        on this iteration. Subclasses can opt to override this directly (as older job runners will
         initially) or just override check_watched_item and allow the list processing to
         reuse the logic here.
         """
@@ -16,8 +16,15 @@ from galaxy.jobs.handler import DEFAULT_JOB_PUT_FAILURE_MESSAGE
 from galaxy.jobs.runners import AsynchronousJobState, AsynchronousJobRunner
 from galaxy.util import asbool
 
+from .util.cli import CliInterface
+
 eggs.require( "drmaa" )
 
+try:
+    import statsd
+except ImportError:
+    statsd = None
+
 log = logging.getLogger( __name__ )
 
 __all__ = [ 'DRMAAJobRunner' ]
@@ -27,6 +34,43 @@ drmaa = None
 DRMAA_jobTemplate_attributes = [ 'args', 'remoteCommand', 'outputPath', 'errorPath', 'nativeSpecification',
                                  'workingDirectory', 'jobName', 'email', 'project' ]
 
+# How often (in seconds) a summary of the status polling cost is logged
+POLL_STATS_LOG_INTERVAL = 300
+
+
+class CliBulkJobStatus( object ):
+    """
+    Fetch the states of many DRM jobs with a single command (e.g. ``squeue``
+    or ``qstat -x``) using the job plugins of the ``cli`` runner, and map them
+    to DRMAA job states.
+
+    Only non-terminal (queued or running) states are returned, jobs that have
+    left the DRM queue or finished are left for the runner to check via
+    DRMAA, which also provides their exit status.
+    """
+
+    def __init__( self, job_plugin, shell_plugin, drmaa_job_states ):
+        cli_interface = CliInterface()
+        self.shell = cli_interface.get_shell_plugin( dict( plugin=shell_plugin ) )
+        self.job_interface = cli_interface.get_job_interface( dict( plugin=job_plugin ) )
+        self.state_map = {
+            model.Job.states.QUEUED: drmaa_job_states.QUEUED_ACTIVE,
+            model.Job.states.RUNNING: drmaa_job_states.RUNNING,
+        }
+
+    def get_states( self, job_ids ):
+        """
+        Return a dictionary of external job id to DRMAA job state for the
+        given jobs that the DRM reports as queued or running.
+        """
+        job_ids = set( job_ids )
+        cmd_out = self.shell.execute( self.job_interface.get_status( job_ids ) )
+        if cmd_out.returncode != 0:
+            log.warning( "Bulk job status command failed, falling back to checking jobs individually: %s", cmd_out.stderr )
+            return {}
+        states = self.job_interface.parse_status( cmd_out.stdout, job_ids ) or {}
+        return dict( ( job_id, self.state_map[ state ] ) for job_id, state in states.items() if state in self.state_map )
+
 
 class DRMAAJobRunner( AsynchronousJobRunner ):
     """
@@ -44,7 +88,9 @@ class DRMAAJobRunner( AsynchronousJobRunner ):
             invalidjobexception_state=dict( map=str, valid=lambda x: x in ( model.Job.states.OK, model.Job.states.ERROR ), default=model.Job.states.OK ),
             invalidjobexception_retries=dict( map=int, valid=lambda x: int >= 0, default=0 ),
             internalexception_state=dict( map=str, valid=lambda x: x in ( model.Job.states.OK, model.Job.states.ERROR ), default=model.Job.states.OK ),
-            internalexception_retries=dict( map=int, valid=lambda x: int >= 0, default=0 ) )
+            internalexception_retries=dict( map=int, valid=lambda x: int >= 0, default=0 ),
+            bulk_status_job_plugin=dict( map=str, default=None ),
+            bulk_status_shell_plugin=dict( map=str, default='LocalShell' ) )
 
         if 'runner_param_specs' not in kwargs:
             kwargs[ 'runner_param_specs' ] = dict()
@@ -86,6 +132,20 @@ class DRMAAJobRunner( AsynchronousJobRunner ):
         self.external_killJob_script = app.config.drmaa_external_killjob_script
         self.userid = None
 
+        # Optional source of many job states per DRM call
+        self.bulk_status = None
+        if self.runner_params.bulk_status_job_plugin:
+            self.bulk_status = CliBulkJobStatus( self.runner_params.bulk_status_job_plugin,
+                                                 self.runner_params.bulk_status_shell_plugin,
+                                                 drmaa.JobState )
+            log.info( 'Checking DRM job states in bulk using the %s cli job plugin', self.runner_params.bulk_status_job_plugin )
+
+        self.statsd_client = None
+        if statsd and app.config.statsd_host:
+            self.statsd_client = statsd.StatsClient( app.config.statsd_host, app.config.statsd_port, prefix='galaxy' )
+        self.poll_stats = dict( ticks=0, jobs=0, bulk=0, individual=0, time=0.0 )
+        self.poll_stats_reported = time.time()
+
         self._init_monitor_thread()
         self._init_worker_threads()
 
@@ -245,6 +305,15 @@ class DRMAAJobRunner( AsynchronousJobRunner ):
         Called by the monitor thread to look at each watched job and deal
         with state changes.
         """
+        poll_start = time.time()
+        checked = len( self.watched )
+        bulk_states = {}
+        if self.watched and self.bulk_status is not None:
+            try:
+                bulk_states = self.bulk_status.get_states( [ ajs.job_id for ajs in self.watched ] )
+            except Exception:
+                log.exception( "Unable to check job states in bulk, falling back to checking jobs individually" )
+        individual_checks = 0
         new_watched = []
         for ajs in self.watched:
             external_job_id = ajs.job_id
@@ -252,7 +321,10 @@ class DRMAAJobRunner( AsynchronousJobRunner ):
             old_state = ajs.old_state
             try:
                 assert external_job_id not in ( None, 'None' ), '(%s/%s) Invalid job id' % ( galaxy_id_tag, external_job_id )
-                state = self.ds.jobStatus( external_job_id )
+                state = bulk_states.get( external_job_id )
+                if state is None:
+                    individual_checks += 1
+                    state = self.ds.jobStatus( external_job_id )
             except ( drmaa.InternalException, drmaa.InvalidJobException ) as e:
                 if isinstance( e , drmaa.InvalidJobException ):
                     ecn = "InvalidJobException".lower()
@@ -301,6 +373,26 @@ class DRMAAJobRunner( AsynchronousJobRunner ):
             new_watched.append( ajs )
         # Replace the watch list with the updated version
         self.watched = new_watched
+        self.__record_poll( checked, len( bulk_states ), individual_checks, time.time() - poll_start )
+
+    def __record_poll( self, jobs, bulk, individual, elapsed ):
+        stats = self.poll_stats
+        watched = len( self.watched ) + len( self.check_schedule )
+        stats[ 'ticks' ] += 1
+        stats[ 'jobs' ] += jobs
+        stats[ 'bulk' ] += bulk
+        stats[ 'individual' ] += individual
+        stats[ 'time' ] += elapsed
+        if self.statsd_client is not None:
+            self.statsd_client.timing( 'jobs.runners.%s.status_poll' % self.runner_name, int( elapsed * 1000 ) )
+            self.statsd_client.gauge( 'jobs.runners.%s.watched' % self.runner_name, watched )
+        now = time.time()
+        if now - self.poll_stats_reported >= POLL_STATS_LOG_INTERVAL:
+            log.debug( "%s status polling: %d jobs checked in %d iterations (%d from bulk status, %d individually), %0.3f ms per iteration, %d jobs watched",
+                       self.runner_name, stats[ 'jobs' ], stats[ 'ticks' ], stats[ 'bulk' ], stats[ 'individual' ],
+                       stats[ 'time' ] * 1000.0 / stats[ 'ticks' ], watched )
+            self.poll_stats = dict( ticks=0, jobs=0, bulk=0, individual=0, time=0.0 )
+            self.poll_stats_reported = now
 
     def stop_job( self, job ):
         """Attempts to delete a job from the DRM queue"""
@@ -2,6 +2,8 @@
 Mixins for Annotatable model managers and serializers.
 """
 
+from galaxy.util import unicodify
+
 import logging
 log = logging.getLogger( __name__ )
 
@@ -49,6 +51,8 @@ class AnnotatableSerializerMixin( object ):
 
     def add_serializers( self ):
         self.serializers[ 'annotation' ] = self.serialize_annotation
+        self.eager_loads[ 'annotation' ] = [ 'annotations' ]
+        self.batch_serializers[ 'annotation' ] = self.serialize_annotations
 
     def serialize_annotation( self, item, key, user=None, **context ):
         """
@@ -59,6 +63,21 @@ class AnnotatableSerializerMixin( object ):
         returned = item.get_item_annotation_str( sa_session, user, item )
         return returned
 
+    def serialize_annotations( self, items, key, user=None, **context ):
+        """
+        Get and serialize the annotations of `items` from their (preloaded)
+        annotation associations.
+        """
+        user_id = user.id if user else None
+        returned = {}
+        for item in items:
+            returned[ item ] = None
+            for annotation_assoc in item.annotations:
+                if annotation_assoc.user_id == user_id:
+                    returned[ item ] = unicodify( annotation_assoc.annotation )
+                    break
+        return returned
+
 
 class AnnotatableDeserializerMixin( object ):
 
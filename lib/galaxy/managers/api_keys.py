@@ -1,3 +1,19 @@
+import logging
+
+from galaxy import eggs
+eggs.require( "SQLAlchemy >= 0.4" )
+from sqlalchemy.orm.exc import NoResultFound
+
+import galaxy.queue_worker
+from galaxy.util.lrucache import LRUCache
+
+log = logging.getLogger( __name__ )
+
+# The users of API keys are remembered for at most API_KEY_CACHE_TTL seconds;
+# creating keys and (un)deleting users also clears the caches of all processes
+# through the control queue.
+API_KEY_CACHE_SIZE = 10000
+API_KEY_CACHE_TTL = 60
 
 
 class ApiKeyManager( object ):
@@ -13,6 +29,7 @@ class ApiKeyManager( object ):
         sa_session = self.app.model.context
         sa_session.add( new_key )
         sa_session.flush()
+        invalidate_api_key_principals( self.app )
         return guid
 
     def get_or_create_api_key( self, user ):
@@ -24,3 +41,51 @@ class ApiKeyManager( object ):
         else:
             key = self.create_api_key( user )
         return key
+
+
+def load_api_key_principal( sa_session, model, api_key ):
+    """
+    Return ( user id, whether api_key is the user's newest key, whether the
+    user is deleted ) for api_key or None if there is no such key.
+    """
+    try:
+        provided_key = sa_session.query( model.APIKeys ).filter( model.APIKeys.table.c.key == api_key ).one()
+    except NoResultFound:
+        return None
+    user = provided_key.user
+    return ( user.id, user.api_keys[0].key == provided_key.key, user.deleted )
+
+
+class ApiKeyPrincipalCache( object ):
+    """
+    Size bounded, short lived cache of the principals (see
+    `load_api_key_principal`) of recently used API keys, sparing API requests
+    the queries authenticating their key.
+    """
+
+    def __init__( self, num_elements=API_KEY_CACHE_SIZE, ttl=API_KEY_CACHE_TTL ):
+        self.principals = LRUCache( num_elements, ttl=ttl )
+
+    def get_principal( self, sa_session, model, api_key ):
+        principal = self.principals.get( api_key )
+        if principal is None:
+            principal = load_api_key_principal( sa_session, model, api_key )
+            # Unknown keys are not remembered, so new keys work at once.
+            if principal is not None:
+                self.principals[ api_key ] = principal
+        return principal
+
+    def clear( self ):
+        self.principals.clear()
+
+
+def invalidate_api_key_principals( app ):
+    """
+    Clear the API key principal caches of this and (through the control queue)
+    the other processes of app, after keys are created or users (un)deleted.
+    """
+    principals = getattr( app, 'api_key_principals', None )
+    if principals is None:
+        return
+    principals.clear()
+    galaxy.queue_worker.send_control_task( app, 'invalidate_api_key_principals', noop_self=True )
@@ -40,6 +40,9 @@ from galaxy.model import tool_shed_install
 import logging
 log = logging.getLogger( __name__ )
 
+# items (and the relations they need) are loaded in batches of at most this many
+PRELOAD_BATCH_SIZE = 500
+
 
 # ==== accessors from base/controller.py
 def security_check( trans, item, check_ownership=False, check_accessible=False ):
@@ -535,6 +538,12 @@ class ModelSerializer( object ):
         self.serializable_keyset = set([])
         # a map of dictionary keys to the functions (often lambdas) that create the values for those keys
         self.serializers = {}
+        # a map of dictionary keys to the relations (paths like 'dataset.actions') their serializers use:
+        #   `serialize_many` loads them for all items at once
+        self.eager_loads = {}
+        # a map of dictionary keys to functions that create the values for those keys for many items at once,
+        #   returning a dictionary of item -> value (items left out are skipped): used by `serialize_many`
+        self.batch_serializers = {}
         # add subclass serializers defined there
         self.add_serializers()
         # update the keyset by the serializers (removing the responsibility from subclasses)
@@ -620,13 +629,21 @@ class ModelSerializer( object ):
         date = getattr( item, key )
         return date.isoformat() if date is not None else None
 
-    def serialize_id( self, item, key, **context ):
+    def serialize_id( self, item, key, encoded_ids=None, **context ):
         """
         Serialize an id attribute of `item`.
+
+        Ids encoded beforehand (e.g. all at once with `encode_ids`) can be
+        passed in the context as `encoded_ids`, a dictionary of ids to
+        encoded ids.
         """
         id = getattr( item, key )
+        if id is None:
+            return None
+        if encoded_ids and id in encoded_ids:
+            return encoded_ids[ id ]
         # Note: it may not be best to encode the id at this layer
-        return self.app.security.encode_id( id ) if id is not None else None
+        return self.app.security.encode_id( id )
 
     # serializing to a view where a view is a predefied list of keys to serialize
     def serialize_to_view( self, item, view=None, keys=None, default_view=None, **context ):
@@ -640,6 +657,69 @@ class ModelSerializer( object ):
             no `view` or `keys`: use the `default_view` if any
             `view` and `keys`: combine both into one list of keys
         """
+        all_keys = self._view_and_keys_to_keys( view=view, keys=keys, default_view=default_view )
+        return self.serialize( item, all_keys, **context )
+
+    def serialize_many( self, items, view=None, keys=None, default_view=None, **context ):
+        """
+        Serialize each of `items` to the keys of a view and/or `keys` (as
+        `serialize_to_view` does) and return the list of dictionaries.
+
+        Before serializing any item, the relations the keys need (`eager_loads`)
+        are loaded for all items at once (see `preload`) and the keys having
+        `batch_serializers` are serialized for all items at once, so the
+        number of queries does not grow with the number of items.
+        """
+        items = list( items )
+        all_keys = self._view_and_keys_to_keys( view=view, keys=keys, default_view=default_view )
+        # keep what was loaded referenced (and so in the session) while serializing
+        preloaded = self.preload( items, all_keys, **context )
+
+        batched = {}
+        for key in set( all_keys ):
+            if key in self.batch_serializers:
+                batched[ key ] = self.batch_serializers[ key ]( items, key, **context )
+        item_keys = [ key for key in all_keys if key not in batched ]
+
+        serialized = []
+        for item in items:
+            # serialize may alter the list of keys
+            returned = self.serialize( item, list( item_keys ), **context )
+            for key, values in batched.items():
+                if item in values:
+                    returned[ key ] = values[ item ]
+            serialized.append( returned )
+        del preloaded
+        return serialized
+
+    def preload( self, items, keys, **context ):
+        """
+        Load the relations listed in `eager_loads` for `keys` for all `items`
+        (model instances of the same class) at once and return the list of
+        loaded objects.
+
+        Override to load whatever else serializing `keys` would otherwise
+        query for item by item.
+        """
+        paths = set()
+        for key in keys:
+            paths.update( self.eager_loads.get( key, [] ) )
+        if not items or not paths:
+            return []
+        model_class = items[0].__class__
+        options = [ sqlalchemy.orm.subqueryload_all( path ) for path in sorted( paths ) ]
+        # querying the (already loaded) items loads the relations they have not loaded yet
+        query = self.app.model.context.query( model_class ).options( *options )
+        ids = [ item.id for item in items ]
+        loaded = []
+        for i in range( 0, len( ids ), PRELOAD_BATCH_SIZE ):
+            loaded.extend( query.filter( model_class.id.in_( ids[ i:i + PRELOAD_BATCH_SIZE ] ) ).all() )
+        return loaded
+
+    def _view_and_keys_to_keys( self, view=None, keys=None, default_view=None ):
+        """
+        Return the list of keys of `view` and/or `keys` (see `serialize_to_view`).
+        """
         # TODO: default view + view makes no sense outside the API.index context - move default view there
         all_keys = []
         keys = keys or []
@@ -654,8 +734,7 @@ class ModelSerializer( object ):
                 all_keys = keys
             elif default_view:
                 all_keys = self._view_to_keys( default_view )
-
-        return self.serialize( item, all_keys, **context )
+        return all_keys
 
     def _view_to_keys( self, view=None ):
         """
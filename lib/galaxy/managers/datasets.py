@@ -401,6 +401,11 @@ class _UnflattenedMetadataDatasetAssociationSerializer( base.ModelSerializer,
             'converted'     : self.serialize_converted_datasets,
             # TODO: metadata/extra files
         })
+        self.eager_loads.update({
+            'permissions'   : [ 'dataset.actions.role' ],
+            'creating_job'  : [ 'creating_job_associations.job' ],
+            'rerunnable'    : [ 'creating_job_associations.job' ],
+        })
         # this an abstract superclass, so no views created
         # because of that: we need to add a few keys that will use the default serializer
         self.serializable_keyset.update([ 'name', 'state', 'tool_version', 'extension', 'visible', 'dbkey' ])
@@ -11,6 +11,7 @@ import gettext
 from galaxy import model
 from galaxy import exceptions
 from galaxy import datatypes
+from galaxy.managers import base
 from galaxy.managers import datasets
 from galaxy.managers import secured
 from galaxy.managers import taggable
@@ -182,6 +183,25 @@ class HDAManager( datasets.DatasetAssociationManager,
                   .filter( model.JobStateHistory.state == job_states.RESUBMITTED ) )
         return self.app.model.context.query( query.exists() ).scalar()
 
+    def resubmitted_ids( self, hdas ):
+        """
+        Return the set of the ids of those `hdas` whose jobs were resubmitted
+        at any point.
+        """
+        session = self.app.model.context
+        JobToOutputDatasetAssociation = model.JobToOutputDatasetAssociation
+        JobStateHistory = model.JobStateHistory
+        hda_ids = [ hda.id for hda in hdas ]
+        resubmitted = set()
+        for i in range( 0, len( hda_ids ), base.PRELOAD_BATCH_SIZE ):
+            query = ( session.query( JobToOutputDatasetAssociation.dataset_id )
+                      .filter( JobToOutputDatasetAssociation.dataset_id.in_( hda_ids[ i:i + base.PRELOAD_BATCH_SIZE ] ) )
+                      .filter( JobStateHistory.job_id == JobToOutputDatasetAssociation.job_id )
+                      .filter( JobStateHistory.state == model.Job.states.RESUBMITTED )
+                      .distinct() )
+            resubmitted.update( hda_id for ( hda_id, ) in query )
+        return resubmitted
+
     def _job_state_history_query( self, hda ):
         """
         Return a query of the job's state history for the job that created this hda.
@@ -260,7 +280,9 @@ class HDASerializer(  # datasets._UnflattenedMetadataDatasetAssociationSerialize
             'dataset_id',
             'state', 'extension',
             'deleted', 'purged', 'visible',
-            'type', 'url'
+            'type', 'url',
+            # lets clients poll for the contents updated since
+            'update_time'
         ])
         self.add_view( 'detailed', [
             'model_class',
@@ -337,22 +359,47 @@ class HDASerializer(  # datasets._UnflattenedMetadataDatasetAssociationSerialize
             #   see also: https://trello.com/c/5d6j4X5y
             #   see also: https://sentry.galaxyproject.org/galaxy/galaxy-main/group/20769/events/9352883/
             'url'           : lambda i, k, **c: self.url_for( 'history_content',
-                                                              history_id=self.app.security.encode_id( i.history_id ),
-                                                              id=self.app.security.encode_id( i.id ) ),
+                                                              history_id=self.serialize_id( i, 'history_id', **c ),
+                                                              id=self.serialize_id( i, 'id', **c ) ),
             'urls'          : self.serialize_urls,
 
             # TODO: backwards compat: need to go away
             'download_url'  : lambda i, k, **c: self.url_for( 'history_contents_display',
-                                                              history_id=self.app.security.encode_id( i.history.id ),
-                                                              history_content_id=self.app.security.encode_id( i.id ) ),
+                                                              history_id=self.serialize_id( i, 'history_id', **c ),
+                                                              history_content_id=self.serialize_id( i, 'id', **c ) ),
             'parent_id'     : self.serialize_id,
             'accessible'    : lambda *a, **c: True,
             'api_type'      : lambda *a, **c: 'file',
             'type'          : lambda *a, **c: 'file'
         })
 
+        self.batch_serializers.update({
+            'resubmitted'   : self.serialize_resubmitted,
+        })
+
+    def preload( self, hdas, keys, **context ):
+        """
+        Also load the metadata files of `hdas` at once if their metadata is
+        serialized.
+        """
+        loaded = super( HDASerializer, self ).preload( hdas, keys, **context )
+        if hdas and 'metadata' in keys:
+            MetadataFile = model.MetadataFile
+            query = self.app.model.context.query( MetadataFile )
+            hda_ids = [ hda.id for hda in hdas ]
+            for i in range( 0, len( hda_ids ), base.PRELOAD_BATCH_SIZE ):
+                loaded.extend( query.filter( MetadataFile.table.c.hda_id.in_( hda_ids[ i:i + base.PRELOAD_BATCH_SIZE ] ) ).all() )
+        return loaded
+
+    def serialize_resubmitted( self, hdas, key, **context ):
+        """
+        Return whether the jobs of `hdas` were resubmitted, for all of them at once.
+        """
+        resubmitted_ids = self.hda_manager.resubmitted_ids( hdas )
+        return dict( ( hda, hda.id in resubmitted_ids ) for hda in hdas )
+
     def serialize_type_id( self, hda, key, **context ):
-        return 'dataset-' + self.serializers[ 'id' ]( hda, 'id' )
+        return 'dataset-' + self.serializers[ 'id' ]( hda, 'id', **context )
 
     def serialize_display_apps( self, hda, key, trans=None, **context ):
         """
@@ -415,7 +462,7 @@ class HDASerializer(  # datasets._UnflattenedMetadataDatasetAssociationSerialize
         Return web controller urls useful for this HDA.
         """
         url_for = self.url_for
-        encoded_id = self.app.security.encode_id( hda.id )
+        encoded_id = self.serialize_id( hda, 'id', **context )
         urls = {
             'purge'         : url_for( controller='dataset', action='purge_async', dataset_id=encoded_id ),
             'display'       : url_for( controller='dataset', action='display', dataset_id=encoded_id, preview=True ),
@@ -64,6 +64,7 @@ class TaggableSerializerMixin( object ):
 
     def add_serializers( self ):
         self.serializers[ 'tags' ] = self.serialize_tags
+        self.eager_loads[ 'tags' ] = [ 'tags' ]
 
     def serialize_tags( self, item, key, **context ):
         """
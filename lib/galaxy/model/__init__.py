@@ -6,6 +6,7 @@ the relationship cardinalities are obvious (e.g. prefer Dataset to Data)
 """
 import codecs
 import errno
+import io
 import json
 import logging
 import numbers
@@ -14,14 +15,14 @@ import os
 import socket
 import time
 from datetime import datetime, timedelta
-from itertools import ifilter
+from itertools import islice
 from string import Template
 from uuid import UUID, uuid4
 
 from galaxy import eggs
 eggs.require('SQLAlchemy')
 from sqlalchemy import and_, func, not_, or_, true, join, select
-from sqlalchemy.orm import joinedload, object_session, aliased
+from sqlalchemy.orm import aliased, contains_eager, joinedload, object_session
 from sqlalchemy.ext import hybrid
 
 try:
@@ -60,6 +61,14 @@ datatypes_registry.load_datatypes()
 # this be unlimited - filter in Python if over this limit.
 MAX_IN_FILTER_LENGTH = 100
 
+# Number of history contents loaded at once when iterating over them.
+CONTENTS_PAGE_SIZE = 500
+
+# Overlap used when looking for objects updated since a given time, to
+# tolerate clock skew between the Galaxy processes writing update_time (and
+# changes committed after they were stamped).
+UPDATE_TIME_OVERLAP = timedelta( seconds=5 )
+
 PEXPECT_IMPORT_MESSAGE = ('The Python pexpect package is required to use this '
                           'feature, please install it')
 
@@ -1300,6 +1309,14 @@ class History( object, Dictifiable, UsesAnnotations, HasName ):
     def contents_iter( self, **kwds ):
         """
         Fetch filtered list of contents of history.
+
+        Besides `types`, `deleted`, `visible` and `ids`, contents may be
+        filtered by `state` and `extension` (lists or comma separated strings),
+        `hid_gt` and `hid_lt` (keyset pagination), `update_time_gt` (a datetime,
+        to poll for the contents changed since) and at most `limit` of them are
+        returned, ordered by hid or, if `order` is 'hid-dsc', by descending hid.
+        Unless filtered by `ids`, contents are loaded lazily, `page_size` at a
+        time.
         """
         default_contents_types = [
             'dataset',
@@ -1310,37 +1327,119 @@ class History( object, Dictifiable, UsesAnnotations, HasName ):
             iters.append( self.__dataset_contents_iter( **kwds ) )
         if 'dataset_collection' in types:
             iters.append( self.__collection_contents_iter( **kwds ) )
-        return galaxy.util.merge_sorted_iterables( operator.attrgetter( "hid" ), *iters )
+        if kwds.get( 'order', None ) == 'hid-dsc':
+            contents = galaxy.util.merge_sorted_iterables( lambda content: -content.hid, *iters )
+        else:
+            contents = galaxy.util.merge_sorted_iterables( operator.attrgetter( "hid" ), *iters )
+        limit = kwds.get( 'limit', None )
+        if limit is not None:
+            contents = islice( contents, limit )
+        return contents
 
     def __dataset_contents_iter(self, **kwds):
-        return self.__filter_contents( HistoryDatasetAssociation, **kwds )
-
-    def __filter_contents( self, content_class, **kwds ):
+        query = self.__filter_contents_query( HistoryDatasetAssociation, **kwds )
+        states = galaxy.util.listify( kwds.get( 'state', None ) )
+        update_time_gt = kwds.get( 'update_time_gt', None )
+        if states or update_time_gt is not None:
+            query = query.join( HistoryDatasetAssociation.dataset ).options( contains_eager( HistoryDatasetAssociation.dataset ) )
+        if states:
+            # the state of the dataset unless the HDA has its own (see HDA.get_dataset_state)
+            hda_state = HistoryDatasetAssociation.table.c._state
+            query = query.filter( or_( hda_state.in_( states ),
+                                       and_( or_( hda_state == None, hda_state == '' ),  # noqa: E711
+                                             Dataset.table.c.state.in_( states ) ) ) )
+        extensions = galaxy.util.listify( kwds.get( 'extension', None ) )
+        if extensions:
+            query = query.filter( HistoryDatasetAssociation.table.c.extension.in_( extensions ) )
+        if update_time_gt is not None:
+            # state changes update the dataset
+            query = query.filter( or_( HistoryDatasetAssociation.table.c.update_time > update_time_gt,
+                                       Dataset.table.c.update_time > update_time_gt ) )
+        return self.__filter_contents( HistoryDatasetAssociation, query, **kwds )
+
+    def __filter_contents_query( self, content_class, **kwds ):
         db_session = object_session( self )
         assert db_session is not None
         query = db_session.query( content_class ).filter( content_class.table.c.history_id == self.id )
-        query = query.order_by( content_class.table.c.hid.asc() )
-        python_filter = None
+        if kwds.get( 'order', None ) == 'hid-dsc':
+            query = query.order_by( content_class.table.c.hid.desc() )
+        else:
+            query = query.order_by( content_class.table.c.hid.asc() )
         deleted = galaxy.util.string_as_bool_or_none( kwds.get( 'deleted', None ) )
         if deleted is not None:
             query = query.filter( content_class.deleted == deleted )
         visible = galaxy.util.string_as_bool_or_none( kwds.get( 'visible', None ) )
         if visible is not None:
             query = query.filter( content_class.visible == visible )
+        hid_gt = kwds.get( 'hid_gt', None )
+        if hid_gt is not None:
+            query = query.filter( content_class.table.c.hid > hid_gt )
+        hid_lt = kwds.get( 'hid_lt', None )
+        if hid_lt is not None:
+            query = query.filter( content_class.table.c.hid < hid_lt )
+        return query
+
+    def __filter_contents( self, content_class, query, **kwds ):
+        limit = kwds.get( 'limit', None )
         if 'ids' in kwds:
-            ids = kwds['ids']
+            ids = list( kwds['ids'] )
             max_in_filter_length = kwds.get('max_in_filter_length', MAX_IN_FILTER_LENGTH)
-            if len(ids) < max_in_filter_length:
-                query = query.filter( content_class.id.in_(ids) )
-            else:
-                python_filter = lambda content: content.id in ids
-        if python_filter:
-            return ifilter(python_filter, query)
-        else:
+            if len(ids) >= max_in_filter_length:
+                # too many ids for one IN clause: query them in chunks and merge the results
+                contents = []
+                for i in range( 0, len( ids ), max_in_filter_length ):
+                    contents.extend( query.filter( content_class.id.in_( ids[ i:i + max_in_filter_length ] ) ) )
+                contents.sort( key=operator.attrgetter( "hid" ), reverse=kwds.get( 'order', None ) == 'hid-dsc' )
+                return contents[ :limit ] if limit is not None else contents
+            query = query.filter( content_class.id.in_(ids) )
+            if limit is not None:
+                query = query.limit( limit )
             return query
+        page_size = kwds.get( 'page_size', CONTENTS_PAGE_SIZE )
+        return self.__paged_contents( content_class, query, limit, kwds.get( 'order', None ) == 'hid-dsc', page_size )
+
+    def __paged_contents( self, content_class, query, limit, descending, page_size ):
+        # Each page continues after the (hid, id) of the last content of the
+        # previous one, so that only a page of contents is loaded at a time.
+        hid_column = content_class.table.c.hid
+        id_column = content_class.table.c.id
+        query = query.order_by( id_column.desc() if descending else id_column.asc() )
+        last = None
+        while limit is None or limit > 0:
+            page_query = query
+            if last is not None:
+                last_hid, last_id = last
+                if descending:
+                    page_query = page_query.filter( or_( hid_column < last_hid, and_( hid_column == last_hid, id_column < last_id ) ) )
+                else:
+                    page_query = page_query.filter( or_( hid_column > last_hid, and_( hid_column == last_hid, id_column > last_id ) ) )
+            size = page_size if limit is None else min( page_size, limit )
+            page = page_query.limit( size ).all()
+            for content in page:
+                yield content
+            if len( page ) < size:
+                return
+            if limit is not None:
+                limit -= len( page )
+            last = ( page[ -1 ].hid, page[ -1 ].id )
 
     def __collection_contents_iter( self, **kwds ):
-        return self.__filter_contents( HistoryDatasetCollectionAssociation, **kwds )
+        query = self.__filter_contents_query( HistoryDatasetCollectionAssociation, **kwds )
+        if kwds.get( 'extension', None ):
+            # collections have no extension
+            return []
+        states = galaxy.util.listify( kwds.get( 'state', None ) )
+        update_time_gt = kwds.get( 'update_time_gt', None )
+        if states or update_time_gt is not None:
+            query = query.join( HistoryDatasetCollectionAssociation.collection )
+        if states:
+            # the populated state of the collection
+            query = query.filter( DatasetCollection.table.c.populated_state.in_( states ) )
+        if update_time_gt is not None:
+            # populating the collection updates the collection
+            query = query.filter( or_( HistoryDatasetCollectionAssociation.table.c.update_time > update_time_gt,
+                                       DatasetCollection.table.c.update_time > update_time_gt ) )
+        return self.__filter_contents( HistoryDatasetCollectionAssociation, query, **kwds )
 
     def copy_tags_from(self, target_user, source_history):
         for src_shta in source_history.tags:
@@ -1582,6 +1681,20 @@ class Dataset( object ):
             self.external_filename = filename
     file_name = property( get_file_name, set_file_name )
 
+    def open_range( self, start=0 ):
+        """
+        Return a binary file object reading the dataset from offset ``start``,
+        unlike ``file_name`` this does not require the object store to make
+        the whole file available locally.
+        """
+        if not self.external_filename:
+            assert self.id is not None, "ID must be set before data is read (commit the object)"
+            assert self.object_store is not None, "Object Store has not been initialized for dataset %s" % self.id
+            return self.object_store.open_range( self, start=start )
+        data_file = io.open( self.external_filename, 'rb' )
+        data_file.seek( start )
+        return data_file
+
     def get_extra_files_path( self ):
         # Unlike get_file_name - external_extra_files_path is not backed by an
         # actual database column so if SA instantiates this object - the
@@ -1760,6 +1873,9 @@ class DatasetInstance( object ):
         return self.dataset.set_file_name( filename )
     file_name = property( get_file_name, set_file_name )
 
+    def open_range( self, start=0 ):
+        return self.dataset.open_range( start=start )
+
     @property
     def extra_files_path( self ):
         return self.dataset.extra_files_path
@@ -696,7 +696,8 @@ model.HistoryDatasetCollectionAssociation.table = Table(
     Column( "deleted", Boolean, default=False ),
     Column( "copied_from_history_dataset_collection_association_id", Integer,
         ForeignKey( "history_dataset_collection_association.id" ), nullable=True ),
-    Column( "implicit_output_name", Unicode(255), nullable=True ) )
+    Column( "implicit_output_name", Unicode(255), nullable=True ),
+    Column( "update_time", DateTime, default=now, onupdate=now ) )
 
 model.LibraryDatasetCollectionAssociation.table = Table(
     "library_dataset_collection_association", metadata,
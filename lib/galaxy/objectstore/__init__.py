@@ -4,18 +4,23 @@ all providers ensure that data can be accessed on the filesystem for running
 tools
 """
 
+import bisect
+import io
 import os
 import random
 import shutil
 import logging
 import threading
+import time
 from xml.etree import ElementTree
 
-from galaxy.util import umask_fix_perms, force_symlink
+from Queue import Queue
+from galaxy.util import force_symlink, string_as_bool, umask_fix_perms
 from galaxy.exceptions import ObjectInvalid, ObjectNotFound
 from galaxy.util.sleeper import Sleeper
 from galaxy.util.directory_hash import directory_hash_id
 from galaxy.util.odict import odict
+from .caching import CacheIndex, DetachedObject, LocationCache, object_class_name
 try:
     from sqlalchemy.orm import object_session
 except ImportError:
@@ -151,6 +156,24 @@ class ObjectStore(object):
         """
         raise NotImplementedError()
 
+    def open_range(self, obj, start=0, **kwargs):
+        """
+        Return a binary file object reading the object identified by `obj`
+        from offset `start`, for reading part of an object, e.g. a preview,
+        without first fetching the whole object.  This default opens the file
+        from `get_filename`, stores that keep their objects remotely override
+        it to read them directly.
+        If the object does not exist raises `ObjectNotFound`.
+        See `exists` method for the description of other fields.
+
+        :type start: int
+        :param start: Set the position to start reading the dataset file
+        """
+        data_file = io.open(self.get_filename(obj, **kwargs), 'rb')
+        if start:
+            data_file.seek(start)
+        return data_file
+
     def update_from_file(self, obj, base_dir=None, extra_dir=None, extra_dir_at_root=False, alt_name=None, obj_dir=False, file_name=None, create=False):
         """
         Inform the store that the file associated with the object has been
@@ -369,10 +392,411 @@ class CachingObjectStore(ObjectStore):
     """
     Object store that uses a directory for caching files, but defers and writes
     back to another object store.
+
+    Files are read through the cache: the first request for an object copies
+    it from the backend into the cache (concurrent requests for the same
+    object wait for that single copy) and later requests are served from the
+    cache.  The least recently used files are evicted once the cache grows
+    beyond its size limit.  Updated files are written to the cache and then
+    to the backend, either before ``update_from_file`` returns or, with
+    ``write_back`` enabled, by a pool of upload threads.  Files are not
+    evicted before they have been written to the backend.  Without
+    ``write_back`` a failed write raises, with it the write is retried
+    ``UPLOAD_RETRIES`` times (waiting twice as long before each retry) and
+    is then reported by ``cache_statistics`` and ``flush_uploads``.  Files of
+    new objects are also not evicted between ``create`` and their first
+    ``update_from_file`` (while a job writes them), for at most
+    ``output_lease`` hours.
+
+    The backend can be any object store, configured like::
+
+        <object_store type="caching">
+            <cache path="database/object_store_cache" size="100" write_back="True" upload_threads="2" output_lease="168"/>
+            <backend type="irods">
+                ...
+            </backend>
+        </object_store>
+
+    where ``size`` is the cache size limit in GB (-1 for no limit).
     """
+    UPLOAD_RETRIES = 3
+    # seconds before the first retry of a failed upload
+    UPLOAD_RETRY_DELAY = 5
+
+    def __init__(self, config, config_xml=None, fsmon=False, backend=None, cache_path=None, cache_size=-1, write_back=False, upload_threads=2, output_lease=168):
+        super(CachingObjectStore, self).__init__(config, config_xml=config_xml)
+        if config_xml is not None:
+            c_xml = config_xml.find('cache')
+            cache_path = c_xml.get('path') or config.object_store_cache_path
+            cache_size = float(c_xml.get('size', -1))
+            write_back = string_as_bool(c_xml.get('write_back', 'False'))
+            upload_threads = int(c_xml.get('upload_threads', upload_threads))
+            output_lease = float(c_xml.get('output_lease', output_lease))
+            backend = build_object_store_from_config(config, fsmon=fsmon, config_xml=config_xml.find('backend'))
+        self.backend = backend
+        self.extra_dirs = backend.extra_dirs
+        # Only used to construct paths in the cache directory
+        self.cache = DiskObjectStore(config, file_path=cache_path)
+        self.cache_index = CacheIndex(cache_path)
+        # Convert GBs to bytes for comparison
+        self.cache_size = cache_size * 1073741824 if cache_size != -1 else -1
+        self._fetching = {}
+        # cache path -> number of updates not yet written to the backend
+        self._pending = {}
+        # cache path -> error of the last write back attempt, for uploads
+        # that failed every retry
+        self._failed_uploads = {}
+        # cache path -> time the file of a new object may be evicted again if
+        # it has not been updated by then, None once that time has passed
+        self._leases = {}
+        # Convert hours to seconds
+        self.output_lease = output_lease * 3600
+        self._lock = threading.Lock()
+        self.sleeper = Sleeper()
+        self.cache_monitor_thread = threading.Thread(target=self.__cache_monitor)
+        self.cache_monitor_thread.setDaemon(True)
+        self.cache_monitor_thread.start()
+        self.upload_queue = None
+        self.upload_threads = []
+        if write_back:
+            self.upload_queue = Queue()
+            for i in range(upload_threads):
+                upload_thread = threading.Thread(target=self.__upload_worker)
+                upload_thread.setDaemon(True)
+                upload_thread.start()
+                self.upload_threads.append(upload_thread)
+        log.debug("Caching %s in %s (size limit %s, write back %s)", backend.__class__.__name__, cache_path,
+                  convert_bytes(self.cache_size) if self.cache_size != -1 else "none", write_back)
+
+    def shutdown(self):
+        super(CachingObjectStore, self).shutdown()
+        while self.cache_monitor_thread.is_alive():
+            # The monitor may be between checking self.running and sleeping
+            self.sleeper.wake()
+            self.cache_monitor_thread.join(0.1)
+        # Finish pending uploads, cached files not yet written back would
+        # otherwise be lost.
+        for upload_thread in self.upload_threads:
+            self.upload_queue.put(None)
+        for upload_thread in self.upload_threads:
+            upload_thread.join()
+        self.backend.shutdown()
+
+    def __cache_monitor(self):
+        self.cache_index.rebuild()
+        while self.running:
+            self._clean_cache()
+            self.sleeper.sleep(30)
+
+    def _clean_cache(self):
+        """
+        Evict the least recently used files once the cache is within 10% of
+        its size limit, leaving at least 10% of the cache free.
+        """
+        self._expire_leases()
+        if self.cache_size == -1:
+            return
+        cache_limit = self.cache_size * 0.9
+        if self.cache_index.size > cache_limit:
+            log.info("Initiating cache cleaning: current cache size: %s; clean until smaller than: %s",
+                     convert_bytes(self.cache_index.size), convert_bytes(cache_limit))
+            freed = self.cache_index.evict(cache_limit)
+            log.debug("Cache cleaning done. Total space freed: %s", convert_bytes(freed))
+
+    def cache_statistics(self):
+        """
+        Return the size of the cache and counts of cache hits, misses and
+        evictions, for monitoring.
+        """
+        statistics = self.cache_index.statistics()
+        statistics['pending_uploads'] = self.upload_queue.qsize() if self.upload_queue is not None else 0
+        with self._lock:
+            statistics['failed_uploads'] = len(self._failed_uploads)
+        return statistics
+
+    def _cache_path(self, obj, **kwargs):
+        return self.cache._construct_path(obj, **kwargs)
+
+    def _cache_add(self, path):
+        self.cache_index.add(path)
+        if self.cache_size != -1 and self.cache_index.size > self.cache_size * 0.9:
+            self.sleeper.wake()
+
+    def _fetch(self, obj, cache_path, **kwargs):
+        """
+        Copy the object from the backend into the cache, if another thread is
+        already doing so wait for it instead.  Return True if the object is
+        then in the cache.
+        """
+        with self._lock:
+            fetched = self._fetching.get(cache_path)
+            if fetched is None:
+                fetched = self._fetching[cache_path] = threading.Event()
+                leader = True
+            else:
+                leader = False
+        if not leader:
+            fetched.wait()
+            return os.path.exists(cache_path)
+        try:
+            if os.path.exists(cache_path):
+                # Fetched by another thread since checking
+                return True
+            self.cache_index.miss()
+            source = self.backend.get_filename(obj, **kwargs)
+            cache_dir = os.path.dirname(cache_path)
+            if not os.path.exists(cache_dir):
+                try:
+                    os.makedirs(cache_dir)
+                except OSError:
+                    # Created concurrently
+                    if not os.path.isdir(cache_dir):
+                        raise
+            # Copy to a temporary name so that a partial file is never seen
+            # in the cache.
+            partial_path = "%s.%s.part" % (cache_path, threading.current_thread().ident)
+            try:
+                shutil.copyfile(source, partial_path)
+                os.rename(partial_path, cache_path)
+            except Exception:
+                # The cache index does not know partial files, they would
+                # never be evicted.
+                if os.path.exists(partial_path):
+                    os.remove(partial_path)
+                raise
+            self._cache_add(cache_path)
+            return True
+        finally:
+            with self._lock:
+                del self._fetching[cache_path]
+            fetched.set()
+
+    def __upload_worker(self):
+        while True:
+            upload = self.upload_queue.get()
+            try:
+                if upload is None:
+                    return
+                obj, cache_path, kwargs = upload
+                self.__write_back(obj, cache_path, **kwargs)
+            finally:
+                self.upload_queue.task_done()
+
+    def __write_back(self, obj, cache_path, **kwargs):
+        delay = self.UPLOAD_RETRY_DELAY
+        for attempt in range(self.UPLOAD_RETRIES + 1):
+            if attempt:
+                time.sleep(delay)
+                delay *= 2
+            try:
+                self._upload(obj, cache_path, **kwargs)
+                return
+            except Exception, e:
+                error = str(e)
+                if not os.path.exists(cache_path):
+                    # Deleted since queued
+                    return
+                log.warning("Failed to write back cached file '%s' for %s %s (attempt %d): %s",
+                            cache_path, object_class_name(obj), obj.id, attempt + 1, e)
+                if not self.running:
+                    # Shutting down, do not hold it up retrying
+                    break
+        # The file stays pinned so the only up to date copy of the object is
+        # not evicted, a later update of the object writes it back again.
+        log.error("Failed to write back cached file '%s' for %s %s, it is kept in the cache but not in the backend",
+                  cache_path, object_class_name(obj), obj.id)
+        with self._lock:
+            self._failed_uploads[cache_path] = error
+
+    def _pin(self, cache_path):
+        with self._lock:
+            self._pending[cache_path] = self._pending.get(cache_path, 0) + 1
+        self.cache_index.pin(cache_path)
+
+    def _unpin(self, cache_path):
+        with self._lock:
+            pending = self._pending.pop(cache_path, 1) - 1
+            if pending:
+                self._pending[cache_path] = pending
+            leased = self._leases.get(cache_path) is not None
+        if not pending and not leased:
+            self.cache_index.unpin(cache_path)
+
+    def _lease(self, cache_path):
+        """
+        Protect the file of a new object from eviction until it is updated or
+        deleted, or the lease expires.
+        """
+        with self._lock:
+            self._leases[cache_path] = time.time() + self.output_lease
+        self.cache_index.pin(cache_path)
+
+    def _end_lease(self, cache_path):
+        with self._lock:
+            leased = self._leases.pop(cache_path, None) is not None
+            pending = cache_path in self._pending
+        if leased and not pending:
+            self.cache_index.unpin(cache_path)
+
+    def _expire_leases(self):
+        now = time.time()
+        expired = []
+        with self._lock:
+            for cache_path, expires in self._leases.items():
+                if expires is not None and expires <= now:
+                    # Still remembered so that update_from_file notices if
+                    # the file is evicted.
+                    self._leases[cache_path] = None
+                    if cache_path not in self._pending:
+                        expired.append(cache_path)
+        for cache_path in expired:
+            log.warning("Cached file '%s' of a new object was not updated within %s hours, it may be evicted",
+                        cache_path, self.output_lease / 3600)
+            self.cache_index.unpin(cache_path)
+
+    def _upload(self, obj, cache_path, **kwargs):
+        self.backend.update_from_file(obj, file_name=cache_path, **kwargs)
+        with self._lock:
+            self._failed_uploads.pop(cache_path, None)
+        self._unpin(cache_path)
+
+    def flush_uploads(self):
+        """
+        Wait until all queued write-back uploads have completed.  Return the
+        cached files that could not be written back, with their errors.
+        """
+        if self.upload_queue is not None:
+            self.upload_queue.join()
+        with self._lock:
+            return dict(self._failed_uploads)
+
+    def exists(self, obj, **kwargs):
+        if kwargs.get('base_dir') is None and not kwargs.get('dir_only') and os.path.exists(self._cache_path(obj, **kwargs)):
+            return True
+        return self.backend.exists(obj, **kwargs)
+
+    def file_ready(self, obj, **kwargs):
+        if kwargs.get('base_dir') is None and not kwargs.get('dir_only') and os.path.exists(self._cache_path(obj, **kwargs)):
+            return True
+        return self.backend.file_ready(obj, **kwargs)
+
+    def create(self, obj, **kwargs):
+        self.backend.create(obj, **kwargs)
+        if kwargs.get('base_dir') is None and not kwargs.get('dir_only'):
+            # New (output) datasets are written in the cache. They are pinned
+            # while they are written, until updated (see update_from_file),
+            # for at most output_lease so that datasets that never are can
+            # still be evicted.
+            cache_path = self._cache_path(obj, **kwargs)
+            self._lease(cache_path)
+            if not os.path.exists(cache_path):
+                self.cache.create(obj, **kwargs)
+            self.cache_index.add(cache_path)
+
+    def empty(self, obj, **kwargs):
+        if self.exists(obj, **kwargs):
+            return self.size(obj, **kwargs) == 0
+        raise ObjectNotFound( 'objectstore.empty, object does not exist: %s, kwargs: %s' % ( str( obj ), str( kwargs ) ) )
+
+    def size(self, obj, **kwargs):
+        if kwargs.get('base_dir') is None and not kwargs.get('dir_only'):
+            try:
+                return os.path.getsize(self._cache_path(obj, **kwargs))
+            except OSError:
+                pass
+        return self.backend.size(obj, **kwargs)
+
+    def delete(self, obj, entire_dir=False, **kwargs):
+        if kwargs.get('base_dir') is None:
+            cache_path = self._cache_path(obj, **kwargs)
+            try:
+                if entire_dir and (kwargs.get('extra_dir') or kwargs.get('obj_dir')):
+                    if os.path.isdir(cache_path):
+                        self.cache_index.remove_tree(cache_path)
+                        shutil.rmtree(cache_path)
+                elif os.path.exists(cache_path):
+                    with self._lock:
+                        self._pending.pop(cache_path, None)
+                        self._failed_uploads.pop(cache_path, None)
+                        self._leases.pop(cache_path, None)
+                    self.cache_index.remove(cache_path)
+                    os.remove(cache_path)
+            except OSError, ex:
+                log.warning("Could not delete cached file '%s': %s", cache_path, ex)
+        return self.backend.delete(obj, entire_dir=entire_dir, **kwargs)
 
-    def __init__(self, path, backend):
-        super(CachingObjectStore, self).__init__(self, path, backend)
+    def get_data(self, obj, start=0, count=-1, **kwargs):
+        data_file = open(self.get_filename(obj, **kwargs), 'r')
+        try:
+            data_file.seek(start)
+            return data_file.read(count)
+        finally:
+            data_file.close()
+
+    def open_range(self, obj, start=0, **kwargs):
+        # Read from the cache if the object is there, otherwise directly from
+        # the backend rather than fetching the whole object into the cache
+        cache_path = self._cache_path(obj, **kwargs)
+        if os.path.exists(cache_path):
+            return super(CachingObjectStore, self).open_range(obj, start=start, **kwargs)
+        return self.backend.open_range(obj, start=start, **kwargs)
+
+    def get_filename(self, obj, **kwargs):
+        if kwargs.get('base_dir') is not None or kwargs.get('dir_only'):
+            # Directories are not cached
+            return self.backend.get_filename(obj, **kwargs)
+        cache_path = self._cache_path(obj, **kwargs)
+        if os.path.exists(cache_path):
+            self.cache_index.touch(cache_path)
+            return cache_path
+        if self.backend.exists(obj, **kwargs) and self._fetch(obj, cache_path, **kwargs):
+            return cache_path
+        raise ObjectNotFound( 'objectstore.get_filename, no cache_path: %s, kwargs: %s' % ( str( obj ), str( kwargs ) ) )
+
+    def update_from_file(self, obj, file_name=None, create=False, **kwargs):
+        if not file_name and kwargs.get('base_dir') is None and not kwargs.get('dir_only'):
+            cache_path = self._cache_path(obj, **kwargs)
+            with self._lock:
+                leased = cache_path in self._leases
+            if leased and not os.path.exists(cache_path):
+                # Written in the cache since created, but evicted after the
+                # lease expired: there is nothing to write to the backend.
+                self._end_lease(cache_path)
+                raise ObjectNotFound( 'objectstore.update_from_file, cached file was evicted before it was updated: %s, kwargs: %s' % ( str( obj ), str( kwargs ) ) )
+        if create:
+            self.create(obj, **kwargs)
+        if kwargs.get('base_dir') is not None or kwargs.get('dir_only'):
+            return self.backend.update_from_file(obj, file_name=file_name, **kwargs)
+        cache_path = self._cache_path(obj, **kwargs)
+        if file_name and os.path.abspath(file_name) != cache_path:
+            self._pin(cache_path)
+            self._end_lease(cache_path)
+            cache_dir = os.path.dirname(cache_path)
+            if not os.path.exists(cache_dir):
+                os.makedirs(cache_dir)
+            shutil.copy(file_name, cache_path)
+        elif not os.path.exists(cache_path):
+            # Not written through the cache
+            return self.backend.update_from_file(obj, file_name=file_name, **kwargs)
+        else:
+            self._pin(cache_path)
+            self._end_lease(cache_path)
+        self._cache_add(cache_path)
+        if self.upload_queue is not None:
+            self.upload_queue.put((DetachedObject(obj), cache_path, kwargs))
+        else:
+            try:
+                self._upload(obj, cache_path, **kwargs)
+            except Exception:
+                # The caller learns that the object is not in the backend.
+                self._unpin(cache_path)
+                raise
+
+    def get_object_url(self, obj, **kwargs):
+        return self.backend.get_object_url(obj, **kwargs)
+
+    def get_store_usage_percent(self):
+        return self.backend.get_store_usage_percent()
 
 
 class NestedObjectStore(ObjectStore):
@@ -384,10 +808,21 @@ class NestedObjectStore(ObjectStore):
     def __init__(self, config, config_xml=None):
         super(NestedObjectStore, self).__init__(config, config_xml=config_xml)
         self.backends = {}
+        self.location_cache = LocationCache()
+
+    def _configure_location_cache(self, backends_xml):
+        """
+        Keep the location cache in the database file given by the
+        `location_cache` attribute of the `backends` element, if any.
+        """
+        path = backends_xml.get('location_cache') if backends_xml is not None else None
+        if path:
+            self.location_cache = LocationCache(path)
 
     def shutdown(self):
         for store in self.backends.values():
             store.shutdown()
+        self.location_cache.close()
         super(NestedObjectStore, self).shutdown()
 
     def exists(self, obj, **kwargs):
@@ -414,6 +849,9 @@ class NestedObjectStore(ObjectStore):
     def get_filename(self, obj, **kwargs):
         return self._call_method('get_filename', obj, ObjectNotFound, True, **kwargs)
 
+    def open_range(self, obj, **kwargs):
+        return self._call_method('open_range', obj, ObjectNotFound, True, **kwargs)
+
     def update_from_file(self, obj, **kwargs):
         if kwargs.get('create', False):
             self.create(obj, **kwargs)
@@ -427,20 +865,58 @@ class NestedObjectStore(ObjectStore):
         """
         Check all children object stores for the first one with the dataset
         """
-        for key, store in self.backends.items():
-            if store.exists(obj, **kwargs):
-                return store.__getattribute__(method)(obj, **kwargs)
+        store = self._store_for(obj, **kwargs)
+        if store is not None:
+            return store.__getattribute__(method)(obj, **kwargs)
         if default_is_exception:
             raise default( 'objectstore, _call_method failed: %s on %s, kwargs: %s' % ( method, str( obj ), str( kwargs ) ) )
         else:
             return default
 
+    def _backend_id(self, location):
+        """
+        Convert a backend id from the location cache (a string) to a key of
+        `self.backends`.
+        """
+        return location
+
+    def _store_for(self, obj, **kwargs):
+        """
+        Return the child object store holding `obj` or None, checking the
+        store recorded in the location cache before the others.
+        """
+        location = self.location_cache.get(obj)
+        if location is not None:
+            store = self.backends.get(self._backend_id(location))
+            if store is not None and store.exists(obj, **kwargs):
+                return store
+        backend_id = self.locate(obj, **kwargs)
+        if backend_id is not None:
+            return self.backends[backend_id]
+        return None
+
+    def locate(self, obj, **kwargs):
+        """
+        Find the child object store holding `obj` by checking each of them in
+        turn, record it in the location cache and return its id, or None if
+        `obj` does not exist.
+        """
+        for backend_id, store in self.backends.items():
+            if store.exists(obj, **kwargs):
+                self.location_cache.set(obj, backend_id)
+                return backend_id
+        return None
+
 
 class DistributedObjectStore(NestedObjectStore):
     """
     ObjectStore that defers to a list of backends, for getting objects the
     first store where the object exists is used, objects are created in a
     store selected randomly, but with weighting.
+
+    When the filesystem monitor is running the weights are scaled by the
+    free space of each backend, so emptier backends receive more of the new
+    objects, and backends over their `maxpctfull` receive none.
     """
 
     def __init__(self, config, config_xml=None, fsmon=False):
@@ -451,14 +927,18 @@ class DistributedObjectStore(NestedObjectStore):
                                                         "requires a config file, please set one in " \
                                                         "'distributed_object_store_config_file')"
         self.backends = {}
+        self.weights = odict()
         self.weighted_backend_ids = []
         self.original_weighted_backend_ids = []
         self.max_percent_full = {}
         self.global_max_percent_full = 0.0
+        # Percentage of each backend used, as last measured by the monitor
+        self.backend_usage = {}
         random.seed()
         self.__parse_distributed_config(config, config_xml)
+        self.update_placement()
         self.sleeper = None
-        if fsmon and ( self.global_max_percent_full or filter( lambda x: x != 0.0, self.max_percent_full.values() ) ):
+        if fsmon:
             self.sleeper = Sleeper()
             self.filesystem_monitor_thread = threading.Thread(target=self.__filesystem_monitor)
             self.filesystem_monitor_thread.setDaemon( True )
@@ -473,6 +953,7 @@ class DistributedObjectStore(NestedObjectStore):
             root = config_xml.find('backends')
             log.debug('Loading backends for distributed object store from %s' % config_xml.get('id'))
         self.global_max_percent_full = float(root.get('maxpctfull', 0))
+        self._configure_location_cache(root)
         for elem in [ e for e in root if e.tag == 'backend' ]:
             id = elem.get('id')
             weight = int(elem.get('weight', 1))
@@ -493,12 +974,11 @@ class DistributedObjectStore(NestedObjectStore):
                     log.debug("    Extra directories:")
                     for type, dir in extra_dirs.items():
                         log.debug("        %s: %s" % (type, dir))
+            self.weights[id] = weight
             for i in range(0, weight):
-                # The simplest way to do weighting: add backend ids to a
-                # sequence the number of times equalling weight, then randomly
-                # choose a backend from that sequence at creation
-                self.weighted_backend_ids.append(id)
-        self.original_weighted_backend_ids = self.weighted_backend_ids
+                # Backend ids repeated by weight, backends that are too full
+                # are removed by the filesystem monitor
+                self.original_weighted_backend_ids.append(id)
 
     def shutdown(self):
         super(DistributedObjectStore, self).shutdown()
@@ -507,15 +987,48 @@ class DistributedObjectStore(NestedObjectStore):
 
     def __filesystem_monitor(self):
         while self.running:
-            new_weighted_backend_ids = self.original_weighted_backend_ids
+            usage = {}
             for id, backend in self.backends.items():
-                maxpct = self.max_percent_full[id] or self.global_max_percent_full
-                pct = backend.get_store_usage_percent()
-                if pct > maxpct:
-                    new_weighted_backend_ids = filter(lambda x: x != id, new_weighted_backend_ids)
-            self.weighted_backend_ids = new_weighted_backend_ids
+                usage[id] = backend.get_store_usage_percent()
+            self.backend_usage = usage
+            self.update_placement(usage)
             self.sleeper.sleep(120)  # Test free space every 2 minutes
 
+    def update_placement(self, usage=None):
+        """
+        Set the probabilities of creating new objects in each backend from
+        their weights and, if `usage` (the percentage used of each backend)
+        is given, their free space, leaving out backends over `maxpctfull`.
+        """
+        full = set()
+        cumulative_weights = []
+        backend_ids = []
+        total = 0.0
+        for id, weight in self.weights.items():
+            if usage is not None and id in usage:
+                maxpct = self.max_percent_full[id] or self.global_max_percent_full
+                if maxpct and usage[id] > maxpct:
+                    full.add(id)
+                    continue
+                weight *= max(100.0 - usage[id], 0.0) / 100.0
+            if weight > 0:
+                total += weight
+                cumulative_weights.append(total)
+                backend_ids.append(id)
+        # Replaced in a single assignment, read without locking by create()
+        self.placement = (cumulative_weights, backend_ids)
+        self.weighted_backend_ids = [id for id in self.original_weighted_backend_ids if id not in full]
+
+    def _select_backend_id(self):
+        """
+        Return the id of a backend, selected randomly according to the
+        placement probabilities.
+        """
+        cumulative_weights, backend_ids = self.placement
+        if not backend_ids:
+            raise IndexError('No backends available')
+        return backend_ids[bisect.bisect_right(cumulative_weights, random.random() * cumulative_weights[-1])]
+
     def create(self, obj, **kwargs):
         """
         create() is the only method in which obj.object_store_id may be None
@@ -523,7 +1036,7 @@ class DistributedObjectStore(NestedObjectStore):
         if obj.object_store_id is None or not self.exists(obj, **kwargs):
             if obj.object_store_id is None or obj.object_store_id not in self.weighted_backend_ids:
                 try:
-                    obj.object_store_id = random.choice(self.weighted_backend_ids)
+                    obj.object_store_id = self._select_backend_id()
                 except IndexError:
                     raise ObjectInvalid( 'objectstore.create, could not generate obj.object_store_id: %s, kwargs: %s' % ( str( obj ), str( kwargs ) ) )
                 create_object_in_session( obj )
@@ -544,18 +1057,23 @@ class DistributedObjectStore(NestedObjectStore):
     def __get_store_id_for(self, obj, **kwargs):
         if obj.object_store_id is not None and obj.object_store_id in self.backends:
             return obj.object_store_id
-        else:
-            # if this instance has been switched from a non-distributed to a
-            # distributed object store, or if the object's store id is invalid,
-            # try to locate the object
-            log.warning('The backend object store ID (%s) for %s object with ID %s is invalid' % (obj.object_store_id, obj.__class__.__name__, obj.id))
-            for id, store in self.backends.items():
-                if store.exists(obj, **kwargs):
-                    log.warning('%s object with ID %s found in backend object store with ID %s' % (obj.__class__.__name__, obj.id, id))
-                    obj.object_store_id = id
-                    create_object_in_session( obj )
-                    return id
-        return None
+        # if this instance has been switched from a non-distributed to a
+        # distributed object store, or if the object's store id is invalid,
+        # use the location recorded for it (only a hint, so check the object
+        # is there before persisting it) or try to locate the object
+        id = self.location_cache.get(obj)
+        if id not in self.backends or not self.backends[id].exists(obj, **kwargs):
+            log.warning('The backend object store ID (%s) for %s object with ID %s is invalid' % (obj.object_store_id, object_class_name(obj), obj.id))
+            id = self.locate(obj, **kwargs)
+            if id is None:
+                self.location_cache.remove(obj)
+                return None
+            log.warning('%s object with ID %s found in backend object store with ID %s' % (object_class_name(obj), obj.id, id))
+        obj.object_store_id = id
+        if not isinstance(obj, DetachedObject):
+            # the object itself is updated when next used in its session
+            create_object_in_session( obj )
+        return id
 
 
 class HierarchicalObjectStore(NestedObjectStore):
@@ -570,15 +1088,17 @@ class HierarchicalObjectStore(NestedObjectStore):
         self.backends = odict()
         for b in sorted(config_xml.find('backends'), key=lambda b: int(b.get('order'))):
             self.backends[int(b.get('order'))] = build_object_store_from_config(config, fsmon=fsmon, config_xml=b)
+        self._configure_location_cache(config_xml.find('backends'))
+
+    def _backend_id(self, location):
+        return int(location)
 
     def exists(self, obj, **kwargs):
         """
-        Exists must check all child object stores
+        Exists must check all child object stores, starting with the one
+        recorded in the location cache
         """
-        for store in self.backends.values():
-            if store.exists(obj, **kwargs):
-                return True
-        return False
+        return self._store_for(obj, **kwargs) is not None
 
     def create(self, obj, **kwargs):
         """
@@ -616,6 +1136,8 @@ def build_object_store_from_config(config, fsmon=False, config_xml=None):
         return DistributedObjectStore(config=config, fsmon=fsmon, config_xml=config_xml)
     elif store == 'hierarchical':
         return HierarchicalObjectStore(config=config, config_xml=config_xml)
+    elif store == 'caching':
+        return CachingObjectStore(config=config, fsmon=fsmon, config_xml=config_xml)
     elif store == 'irods':
         from .rods import IRODSObjectStore
         return IRODSObjectStore(config=config, config_xml=config_xml)
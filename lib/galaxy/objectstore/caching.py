@@ -0,0 +1,302 @@
+"""
+Bookkeeping for the local caches of object stores backed by remote storage
+and for the locations of objects in nested object stores.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+
+from collections import OrderedDict
+
+log = logging.getLogger( __name__ )
+
+
+class CacheIndex(object):
+    """
+    In-memory index of the files in a cache directory, kept in least recently
+    used order.
+
+    The directory is walked once (``rebuild``) and the index is then updated
+    as files are added to (``add``), read from (``touch``) and removed from
+    (``remove``, ``remove_tree``) the cache, so the size of the cache is known
+    and the least recently used files can be evicted (``evict``) without
+    scanning the cache again.  Files can be pinned (``pin``) to protect them
+    from eviction, e.g. until they have been written back to the backing
+    store.  Counters of cache hits, misses and evictions are available from
+    ``statistics``.
+    """
+
+    def __init__(self, cache_path):
+        # Paths are indexed as absolute paths, like S3ObjectStore._get_cache_path
+        self.cache_path = os.path.abspath(cache_path)
+        # path -> size, least recently used first
+        self._entries = OrderedDict()
+        # path -> size of pinned files, these are not in _entries
+        self._pinned = {}
+        self._lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.evicted_bytes = 0
+
+    def __len__(self):
+        return len(self._entries) + len(self._pinned)
+
+    def __contains__(self, path):
+        return path in self._entries or path in self._pinned
+
+    def rebuild(self):
+        """
+        Index the files in the cache directory by walking it, ordered by their
+        last access times.  Files added or used while the directory is being
+        walked are considered more recently used than any found by the walk.
+        """
+        found = []
+        for dirpath, _, filenames in os.walk(self.cache_path):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    # Removed since listing the directory
+                    continue
+                found.append((stat.st_atime, path, stat.st_size))
+        found.sort()
+        with self._lock:
+            entries = OrderedDict((path, size) for _, path, size in found if path not in self)
+            entries.update(self._entries)
+            self._entries = entries
+            self.size = sum(entries.itervalues()) + sum(self._pinned.itervalues())
+        log.debug("Indexed %d files (%d bytes) in cache %s", len(self), self.size, self.cache_path)
+
+    def add(self, path, size=None):
+        """
+        Record ``path`` as the most recently used file in the cache, with size
+        ``size`` (read from the file if not given).
+        """
+        if size is None:
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                self.remove(path)
+                return
+        with self._lock:
+            if path in self._pinned:
+                self.size += size - self._pinned[path]
+                self._pinned[path] = size
+            else:
+                self.size += size - self._entries.pop(path, 0)
+                self._entries[path] = size
+
+    def touch(self, path):
+        """
+        Record a cache hit for ``path`` making it the most recently used file.
+        """
+        with self._lock:
+            self.hits += 1
+            if path in self._pinned:
+                return
+            size = self._entries.pop(path, None)
+            if size is not None:
+                self._entries[path] = size
+                return
+        self.add(path)
+
+    def miss(self):
+        """
+        Record a cache miss.
+        """
+        with self._lock:
+            self.misses += 1
+
+    def pin(self, path):
+        """
+        Protect ``path`` from eviction until it is unpinned, the file need not
+        exist yet.
+        """
+        with self._lock:
+            if path not in self._pinned:
+                self._pinned[path] = self._entries.pop(path, 0)
+
+    def unpin(self, path):
+        """
+        Allow ``path`` to be evicted again, as the most recently used file.
+        """
+        with self._lock:
+            if path in self._pinned:
+                self._entries[path] = self._pinned.pop(path)
+
+    def remove(self, path):
+        with self._lock:
+            self.size -= self._entries.pop(path, 0) + self._pinned.pop(path, 0)
+
+    def remove_tree(self, path):
+        """
+        Remove the files below directory ``path`` from the index, call before
+        removing the directory itself.
+        """
+        for dirpath, _, filenames in os.walk(path):
+            for filename in filenames:
+                self.remove(os.path.join(dirpath, filename))
+
+    def evict(self, target_size):
+        """
+        Delete the least recently used files from the cache until the size of
+        the cache is at most ``target_size`` bytes and return the number of
+        bytes freed.
+        """
+        freed = 0
+        while True:
+            with self._lock:
+                if self.size <= target_size or not self._entries:
+                    break
+                path, size = self._entries.popitem(last=False)
+                self.size -= size
+            try:
+                os.remove(path)
+            except OSError, e:
+                if os.path.exists(path):
+                    log.warning("Could not evict file '%s' from cache: %s", path, e)
+                    continue
+                # Already gone
+            else:
+                freed += size
+                with self._lock:
+                    self.evictions += 1
+                    self.evicted_bytes += size
+        return freed
+
+    def statistics(self):
+        """
+        Return a dictionary describing the cache and its use for monitoring.
+        """
+        with self._lock:
+            return dict(files=len(self),
+                        pinned=len(self._pinned),
+                        size=self.size,
+                        hits=self.hits,
+                        misses=self.misses,
+                        evictions=self.evictions,
+                        evicted_bytes=self.evicted_bytes)
+
+
+class DetachedObject(object):
+    """
+    Stands in for a model object that is used outside of the thread (and
+    database session) that loaded it, e.g. by write-back uploads, with the
+    object's id, object store id and class name.  Changes to its object store
+    id are not persisted.
+    """
+
+    def __init__(self, obj):
+        self.id = obj.id
+        self.object_store_id = getattr(obj, 'object_store_id', None)
+        self.class_name = object_class_name(obj)
+
+
+def object_class_name(obj):
+    """
+    Return the name of the class of ``obj``, or of the object it stands in
+    for if ``obj`` is a ``DetachedObject``.
+    """
+    if isinstance(obj, DetachedObject):
+        return obj.class_name
+    return obj.__class__.__name__
+
+
+class LocationCache(object):
+    """
+    Records which backend of a nested object store holds each object, so that
+    the object is found without checking every backend for it.
+
+    The ``max_entries`` most recently used locations are kept in memory.  If
+    ``path`` is given, all locations are also kept in an SQLite database at
+    ``path``, which persists across restarts and is shared by the Galaxy
+    processes using the same configuration.  Locations are hints: callers
+    should check the recorded backend before relying on it.
+    """
+
+    def __init__(self, path=None, max_entries=100000):
+        self.path = path
+        self.max_entries = max_entries
+        # key -> backend id, least recently used first
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+        if path:
+            directory = os.path.dirname(os.path.abspath(path))
+            if not os.path.exists(directory):
+                os.makedirs(directory)
+            # Access is serialized by _lock, autocommit each statement
+            self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+            # Losing the most recent locations in a crash only costs lookups
+            self._connection.execute('PRAGMA synchronous = OFF')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS location (object TEXT PRIMARY KEY, backend TEXT NOT NULL)')
+            log.debug("Using object location cache %s", path)
+
+    @staticmethod
+    def key(obj):
+        return '%s:%s' % (object_class_name(obj), obj.id)
+
+    def _remember(self, key, backend_id):
+        # Call with _lock held
+        self._entries.pop(key, None)
+        self._entries[key] = backend_id
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, obj):
+        """
+        Return the id (as a string) of the backend recorded for ``obj``, or
+        None if unknown.
+        """
+        key = self.key(obj)
+        with self._lock:
+            backend_id = self._entries.get(key)
+            if backend_id is None and self._connection is not None:
+                row = self._connection.execute('SELECT backend FROM location WHERE object = ?', (key,)).fetchone()
+                if row is not None:
+                    backend_id = str(row[0])
+            if backend_id is not None:
+                self._remember(key, backend_id)
+            return backend_id
+
+    def set(self, obj, backend_id):
+        """
+        Record that ``obj`` is held by the backend with id ``backend_id``.
+        """
+        self.set_many([(obj, backend_id)])
+
+    def set_many(self, locations):
+        """
+        Record the backend ids of a sequence of (object, backend id) pairs,
+        in a single transaction.
+        """
+        changed = []
+        with self._lock:
+            for obj, backend_id in locations:
+                key = self.key(obj)
+                backend_id = str(backend_id)
+                if self._entries.get(key) != backend_id:
+                    changed.append((key, backend_id))
+                self._remember(key, backend_id)
+            if changed and self._connection is not None:
+                with self._connection:
+                    self._connection.execute('BEGIN')
+                    self._connection.executemany('INSERT OR REPLACE INTO location (object, backend) VALUES (?, ?)', changed)
+
+    def remove(self, obj):
+        key = self.key(obj)
+        with self._lock:
+            self._entries.pop(key, None)
+            if self._connection is not None:
+                self._connection.execute('DELETE FROM location WHERE object = ?', (key,))
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
@@ -3,10 +3,8 @@ Object Store plugin for the Amazon Simple Storage Service (S3)
 """
 
 import logging
-import multiprocessing
 import os
 import shutil
-import subprocess
 import threading
 import time
 
@@ -16,7 +14,8 @@ from galaxy.exceptions import ObjectNotFound
 from galaxy.util import string_as_bool, umask_fix_perms
 from galaxy.util.directory_hash import directory_hash_id
 from galaxy.util.sleeper import Sleeper
-from .s3_multipart_upload import multipart_upload
+from .caching import CacheIndex
+from .s3_transfer import DEFAULT_PART_SIZE, DEFAULT_THREADS, open_key, parallel_download, parallel_upload
 from ..objectstore import ObjectStore, convert_bytes
 
 try:
@@ -50,6 +49,7 @@ class S3ObjectStore(ObjectStore):
         self._parse_config_xml(config_xml)
         self._configure_connection()
         self.bucket = self._get_bucket(self.bucket)
+        self.cache_index = CacheIndex(self.staging_path)
         # Clean cache only if value is set in galaxy.ini
         if self.cache_size != -1:
             # Convert GBs to bytes for comparison
@@ -59,12 +59,6 @@ class S3ObjectStore(ObjectStore):
             self.cache_monitor_thread = threading.Thread(target=self.__cache_monitor)
             self.cache_monitor_thread.start()
             log.info("Cache cleaner manager started")
-        # Test if 'axel' is available for parallel download and pull the key into cache
-        try:
-            subprocess.call('axel')
-            self.use_axel = True
-        except OSError:
-            self.use_axel = False
 
     def _configure_connection(self):
         log.debug("Configuring S3 Connection")
@@ -89,6 +83,12 @@ class S3ObjectStore(ObjectStore):
             self.multipart = string_as_bool(cn_xml.get('multipart', 'True'))
             self.is_secure = string_as_bool(cn_xml.get('is_secure', 'True'))
             self.conn_path = cn_xml.get('conn_path', '/')
+            t_xml = config_xml.find('transfer')
+            if t_xml is None:
+                t_xml = {}
+            # Size (in MB) of the parts of parallel downloads and uploads
+            self.transfer_part_size = int(float(t_xml.get('part_size', DEFAULT_PART_SIZE / 1048576.0)) * 1048576)
+            self.transfer_threads = int(t_xml.get('threads', DEFAULT_THREADS))
             c_xml = config_xml.findall('cache')[0]
             self.cache_size = float(c_xml.get('size', -1))
             self.staging_path = c_xml.get('path', self.config.object_store_cache_path)
@@ -98,16 +98,6 @@ class S3ObjectStore(ObjectStore):
 
             log.debug("Object cache dir:    %s", self.staging_path)
             log.debug("       job work dir: %s", self.extra_dirs['job_work'])
-
-            # for multipart upload
-            self.s3server = {'access_key': self.access_key,
-                             'secret_key': self.secret_key,
-                             'is_secure': self.is_secure,
-                             'max_chunk_size': self.max_chunk_size,
-                             'host': self.host,
-                             'port': self.port,
-                             'use_rr': self.use_rr,
-                             'conn_path': self.conn_path}
         except Exception:
             # Toss it back up after logging, we can't continue loading at this point.
             log.exception("Malformed ObjectStore Configuration XML -- unable to continue")
@@ -115,67 +105,33 @@ class S3ObjectStore(ObjectStore):
 
     def __cache_monitor(self):
         time.sleep(2)  # Wait for things to load before starting the monitor
+        # Walk the cache once, from then on the index is kept up to date as
+        # files are pulled into, pushed from and deleted from the cache.
+        self.cache_index.rebuild()
         while self.running:
-            total_size = 0
-            # Is this going to be too expensive of an operation to be done frequently?
-            file_list = []
-            for dirpath, _, filenames in os.walk(self.staging_path):
-                for filename in filenames:
-                    filepath = os.path.join(dirpath, filename)
-                    file_size = os.path.getsize(filepath)
-                    total_size += file_size
-                    # Get the time given file was last accessed
-                    last_access_time = time.localtime(os.stat(filepath)[7])
-                    # Compose a tuple of the access time and the file path
-                    file_tuple = last_access_time, filepath, file_size
-                    file_list.append(file_tuple)
-            # Sort the file list (based on access time)
-            file_list.sort()
+            total_size = self.cache_index.size
             # Initiate cleaning once within 10% of the defined cache size?
             cache_limit = self.cache_size * 0.9
             if total_size > cache_limit:
                 log.info("Initiating cache cleaning: current cache size: %s; clean until smaller than: %s",
                          convert_bytes(total_size), convert_bytes(cache_limit))
-                # How much to delete? If simply deleting up to the cache-10% limit,
-                # is likely to be deleting frequently and may run the risk of hitting
-                # the limit - maybe delete additional #%?
                 # For now, delete enough to leave at least 10% of the total cache free
-                delete_this_much = total_size - cache_limit
-                self.__clean_cache(file_list, delete_this_much)
+                deleted_amount = self.cache_index.evict(cache_limit)
+                log.debug("Cache cleaning done. Total space freed: %s", convert_bytes(deleted_amount))
+            log.debug("Cache statistics: %s", self.cache_statistics())
             self.sleeper.sleep(30)  # Test cache size every 30 seconds?
 
-    def __clean_cache(self, file_list, delete_this_much):
-        """ Keep deleting files from the file_list until the size of the deleted
-        files is greater than the value in delete_this_much parameter.
+    def _cache_add(self, rel_path):
+        """ Record the cached file for ``rel_path`` as the most recently used
+        and wake the cache monitor if the cache has grown beyond its limit. """
+        self.cache_index.add(self._get_cache_path(rel_path))
+        if self.cache_size != -1 and self.cache_index.size > self.cache_size * 0.9:
+            self.sleeper.wake()
 
-        :type file_list: list
-        :param file_list: List of candidate files that can be deleted. This method
-            will start deleting files from the beginning of the list so the list
-            should be sorted accordingly. The list must contains 3-element tuples,
-            positioned as follows: position 0 holds file last accessed timestamp
-            (as time.struct_time), position 1 holds file path, and position 2 has
-            file size (e.g., (<access time>, /mnt/data/dataset_1.dat), 472394)
-
-        :type delete_this_much: int
-        :param delete_this_much: Total size of files, in bytes, that should be deleted.
-        """
-        # Keep deleting datasets from file_list until deleted_amount does not
-        # exceed delete_this_much; start deleting from the front of the file list,
-        # which assumes the oldest files come first on the list.
-        deleted_amount = 0
-        for entry in enumerate(file_list):
-            if deleted_amount < delete_this_much:
-                deleted_amount += entry[2]
-                os.remove(entry[1])
-                # Debugging code for printing deleted files' stats
-                # folder, file_name = os.path.split(f[1])
-                # file_date = time.strftime("%m/%d/%y %H:%M:%S", f[0])
-                # log.debug("%s. %-25s %s, size %s (deleted %s/%s)" \
-                #     % (i, file_name, convert_bytes(f[2]), file_date, \
-                #     convert_bytes(deleted_amount), convert_bytes(delete_this_much)))
-            else:
-                log.debug("Cache cleaning done. Total space freed: %s", convert_bytes(deleted_amount))
-                return
+    def cache_statistics(self):
+        """ Return the size of the cache and counts of cache hits, misses and
+        evictions, for monitoring. """
+        return self.cache_index.statistics()
 
     def _get_bucket(self, bucket_name):
         """ Sometimes a handle to a bucket is not established right away so try
@@ -300,12 +256,15 @@ class S3ObjectStore(ObjectStore):
         if not os.path.exists(self._get_cache_path(rel_path_dir)):
             os.makedirs(self._get_cache_path(rel_path_dir))
         # Now pull in the file
+        self.cache_index.miss()
         file_ok = self._download(rel_path)
         self._fix_permissions(self._get_cache_path(rel_path_dir))
+        if file_ok:
+            self._cache_add(rel_path)
         return file_ok
 
     def _transfer_cb(self, complete, total):
-        self.transfer_progress += 10
+        self.transfer_progress = 100 * complete / total if total else 100
 
     def _download(self, rel_path):
         try:
@@ -316,19 +275,14 @@ class S3ObjectStore(ObjectStore):
                 log.critical("File %s is larger (%s) than the cache size (%s). Cannot download.",
                              rel_path, key.size, self.cache_size)
                 return False
-            if self.use_axel:
-                log.debug("Parallel pulled key '%s' into cache to %s", rel_path, self._get_cache_path(rel_path))
-                ncores = multiprocessing.cpu_count()
-                url = key.generate_url(7200)
-                ret_code = subprocess.call("axel -a -n %s '%s'" % (ncores, url))
-                if ret_code == 0:
-                    return True
-            else:
-                log.debug("Pulled key '%s' into cache to %s", rel_path, self._get_cache_path(rel_path))
-                self.transfer_progress = 0  # Reset transfer progress counter
-                key.get_contents_to_filename(self._get_cache_path(rel_path), cb=self._transfer_cb, num_cb=10)
-                return True
-        except S3ResponseError:
+            self.transfer_progress = 0  # Reset transfer progress counter
+            # Fetches byte ranges in parallel, resumes an interrupted download
+            # of the same key and verifies the result against the key's ETag
+            parallel_download(key, self._get_cache_path(rel_path), part_size=self.transfer_part_size,
+                              threads=self.transfer_threads, cb=self._transfer_cb)
+            log.debug("Pulled key '%s' into cache to %s", rel_path, self._get_cache_path(rel_path))
+            return True
+        except (S3ResponseError, IOError):
             log.exception("Problem downloading key '%s' from S3 bucket '%s'", rel_path, self.bucket.name)
         return False
 
@@ -353,18 +307,23 @@ class S3ObjectStore(ObjectStore):
                 else:
                     start_time = datetime.now()
                     log.debug("Pushing cache file '%s' of size %s bytes to key '%s'", source_file, os.path.getsize(source_file), rel_path)
-                    mb_size = os.path.getsize(source_file) / 1e6
-                    if mb_size < 10 or (not self.multipart):
-                        self.transfer_progress = 0  # Reset transfer progress counter
+                    self.transfer_progress = 0  # Reset transfer progress counter
+                    if os.path.getsize(source_file) < 2 * self.transfer_part_size or (not self.multipart):
                         key.set_contents_from_filename(source_file,
                                                        reduced_redundancy=self.use_rr,
                                                        cb=self._transfer_cb,
                                                        num_cb=10)
                     else:
-                        multipart_upload(self.s3server, self.bucket, key.name, source_file, mb_size)
+                        # Parts no larger than max_chunk_size (MB)
+                        part_size = min(self.transfer_part_size, self.max_chunk_size * 1048576)
+                        parallel_upload(self.bucket, key.name, source_file, part_size=part_size,
+                                        threads=self.transfer_threads, reduced_redundancy=self.use_rr,
+                                        cb=self._transfer_cb)
                     end_time = datetime.now()
                     log.debug("Pushed cache file '%s' to key '%s' (%s bytes transfered in %s sec)",
                               source_file, rel_path, os.path.getsize(source_file), end_time - start_time)
+                if self._in_cache(rel_path):
+                    self._cache_add(rel_path)
                 return True
             else:
                 log.error("Tried updating key '%s' from source file '%s', but source file does not exist.",
@@ -491,6 +450,7 @@ class S3ObjectStore(ObjectStore):
             # with all the files in it. This is easy for the local file system,
             # but requires iterating through each individual key in S3 and deleing it.
             if entire_dir and extra_dir:
+                self.cache_index.remove_tree(self._get_cache_path(rel_path))
                 shutil.rmtree(self._get_cache_path(rel_path))
                 results = self.bucket.get_all_keys(prefix=rel_path)
                 for key in results:
@@ -499,6 +459,7 @@ class S3ObjectStore(ObjectStore):
                 return True
             else:
                 # Delete from cache first
+                self.cache_index.remove(self._get_cache_path(rel_path))
                 os.unlink(self._get_cache_path(rel_path))
                 # Delete from S3 as well
                 if self._key_exists(rel_path):
@@ -515,7 +476,9 @@ class S3ObjectStore(ObjectStore):
     def get_data(self, obj, start=0, count=-1, **kwargs):
         rel_path = self._construct_path(obj, **kwargs)
         # Check cache first and get file if not there
-        if not self._in_cache(rel_path):
+        if self._in_cache(rel_path):
+            self.cache_index.touch(self._get_cache_path(rel_path))
+        else:
             self._pull_into_cache(rel_path)
         # Read the file content from cache
         data_file = open(self._get_cache_path(rel_path), 'r')
@@ -524,6 +487,21 @@ class S3ObjectStore(ObjectStore):
         data_file.close()
         return content
 
+    def open_range(self, obj, start=0, **kwargs):
+        rel_path = self._construct_path(obj, **kwargs)
+        if self._in_cache(rel_path):
+            return super(S3ObjectStore, self).open_range(obj, start=start, **kwargs)
+        # Read with ranged GETs rather than pulling the whole object into cache
+        try:
+            key = self.bucket.get_key(rel_path)
+        except S3ResponseError:
+            log.exception("Could not open key '%s' from S3", rel_path)
+            key = None
+        if key is None:
+            raise ObjectNotFound( 'objectstore.open_range, object does not exist: %s, kwargs: %s'
+                                  % ( str( obj ), str( kwargs ) ) )
+        return open_key(key, start=start)
+
     def get_filename(self, obj, **kwargs):
         base_dir = kwargs.get('base_dir', None)
         dir_only = kwargs.get('dir_only', False)
@@ -545,6 +523,7 @@ class S3ObjectStore(ObjectStore):
         #     return cache_path
         # Check if the file exists in the cache first
         if self._in_cache(rel_path):
+            self.cache_index.touch(cache_path)
             return cache_path
         # Check if the file exists in persistent storage and, if it does, pull it into cache
         elif self.exists(obj, **kwargs):
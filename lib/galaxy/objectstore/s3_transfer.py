@@ -0,0 +1,301 @@
+"""
+Parallel transfers of large objects to and from S3 compatible object stores.
+
+Downloads fetch byte ranges of an object from several threads into a partial
+file next to the destination, recording the completed parts so that an
+interrupted download is resumed rather than restarted, and verify the result
+against the size and ETag of the object.  Uploads use the multipart upload
+API, sending the parts of the file from several threads.  ``open_key``
+reads parts of an object as a file without downloading all of it.
+"""
+
+import hashlib
+import io
+import logging
+import os
+import threading
+
+from multiprocessing.pool import ThreadPool
+
+log = logging.getLogger( __name__ )
+
+DEFAULT_PART_SIZE = 16 * 1024 * 1024
+DEFAULT_THREADS = 4
+# S3 requires all parts of a multipart upload but the last to be at least
+# 5MB and allows at most 10000 parts.
+MIN_UPLOAD_PART_SIZE = 5 * 1024 * 1024
+MAX_UPLOAD_PARTS = 10000
+ATTEMPTS = 3
+PARTIAL_SUFFIX = '.partial'
+PROGRESS_SUFFIX = '.progress'
+# Bytes fetched by each ranged GET of a file opened with open_key
+DEFAULT_READ_SIZE = 1024 * 1024
+
+
+def part_ranges(size, part_size):
+    """
+    Split ``size`` bytes into parts of ``part_size`` bytes, returning a list
+    of (index, first byte, last byte) tuples.
+
+    >>> part_ranges(10, 4)
+    [(0, 0, 3), (1, 4, 7), (2, 8, 9)]
+    >>> part_ranges(0, 4)
+    []
+    """
+    return [(i, start, min(start + part_size, size) - 1) for i, start in enumerate(xrange(0, size, part_size))]
+
+
+def parallel_download(key, file_name, part_size=DEFAULT_PART_SIZE, threads=DEFAULT_THREADS, cb=None):
+    """
+    Download the object of boto ``key`` to ``file_name`` fetching parts of
+    ``part_size`` bytes from ``threads`` threads.  ``cb``, if given, is
+    called with the number of bytes transferred and the total size after
+    each part.
+
+    The object is downloaded to ``file_name`` + '.partial' and completed parts
+    are recorded in ``file_name`` + '.progress', a later call for the same
+    (unchanged) object only fetches the remaining parts.  Raises ``IOError``
+    if the downloaded file does not match the size or checksum of the object.
+    """
+    size = key.size
+    etag = (key.etag or '').strip('"')
+    partial_name = file_name + PARTIAL_SUFFIX
+    progress_name = file_name + PROGRESS_SUFFIX
+    parts = part_ranges(size, part_size)
+    completed = _completed_parts(partial_name, progress_name, etag, size, part_size)
+    if completed:
+        log.debug("Resuming download of key '%s' to %s, %d of %d parts done", key.name, file_name, len(completed), len(parts))
+    else:
+        with open(partial_name, 'wb') as partial:
+            partial.truncate(size)
+        with open(progress_name, 'w') as progress:
+            progress.write('%s %d %d\n' % (etag, size, part_size))
+    remaining = [part for part in parts if part[0] not in completed]
+    if remaining:
+        progress = open(progress_name, 'a')
+        progress_lock = threading.Lock()
+        transferred = [size - sum(end - start + 1 for _, start, end in remaining)]
+
+        def fetch(part):
+            _retry(_download_part, key, partial_name, part)
+            with progress_lock:
+                progress.write('%d\n' % part[0])
+                progress.flush()
+                transferred[0] += part[2] - part[1] + 1
+                if cb is not None:
+                    cb(transferred[0], size)
+        try:
+            _map(fetch, remaining, threads)
+        finally:
+            progress.close()
+    verify_download(partial_name, size, etag, part_size)
+    os.rename(partial_name, file_name)
+    os.remove(progress_name)
+
+
+def _completed_parts(partial_name, progress_name, etag, size, part_size):
+    # Parts recorded as completed for a download of the same object
+    try:
+        with open(progress_name) as progress:
+            if progress.readline().split() != [etag, str(size), str(part_size)]:
+                return set()
+            completed = set()
+            for line in progress:
+                if line.endswith('\n'):
+                    completed.add(int(line))
+    except (IOError, ValueError):
+        return set()
+    if not os.path.exists(partial_name) or os.path.getsize(partial_name) != size:
+        return set()
+    return completed
+
+
+def _download_part(key, file_name, part):
+    index, start, end = part
+    # Keys keep the state of their current request, so each part uses its own
+    part_key = key.bucket.new_key(key.name)
+    with open(file_name, 'r+b') as fh:
+        fh.seek(start)
+        part_key.get_contents_to_file(fh, headers={'Range': 'bytes=%d-%d' % (start, end)})
+        if fh.tell() != end + 1:
+            raise IOError("Received %d bytes for part %d of key '%s', expected %d" % (fh.tell() - start, index, key.name, end - start + 1))
+
+
+def verify_download(file_name, size, etag, part_size=DEFAULT_PART_SIZE):
+    """
+    Check that ``file_name`` has ``size`` bytes and, where possible, that it
+    matches ``etag``.  The ETag of objects uploaded in one request is the MD5
+    of their contents, that of multipart uploads is the MD5 of the MD5s of
+    their parts, which can only be checked if the part size can be guessed.
+    """
+    if os.path.getsize(file_name) != size:
+        raise IOError("Downloaded file %s has %d bytes, expected %d" % (file_name, os.path.getsize(file_name), size))
+    if not etag:
+        return
+    if '-' not in etag:
+        if _md5(file_name) != etag:
+            raise IOError("Checksum of downloaded file %s does not match ETag %s" % (file_name, etag))
+        return
+    try:
+        part_count = int(etag.split('-')[1])
+    except ValueError:
+        return
+    # Part sizes used by this module and by most clients (a whole number of MB)
+    mb = 1024 * 1024
+    candidates = set([part_size, ((size / part_count + mb - 1) / mb) * mb, upload_part_size(size, part_size)])
+    for candidate in candidates:
+        if len(part_ranges(size, candidate)) == part_count and multipart_etag(file_name, candidate) == etag:
+            return
+    log.warning("Could not verify checksum of %s against multipart ETag %s", file_name, etag)
+
+
+def _md5(file_name, start=0, length=None):
+    digest = hashlib.md5()
+    with open(file_name, 'rb') as fh:
+        fh.seek(start)
+        remaining = length
+        while remaining is None or remaining > 0:
+            data = fh.read(1024 * 1024 if remaining is None else min(1024 * 1024, remaining))
+            if not data:
+                break
+            digest.update(data)
+            if remaining is not None:
+                remaining -= len(data)
+    return digest.hexdigest()
+
+
+def multipart_etag(file_name, part_size):
+    """
+    Return the ETag S3 gives ``file_name`` when uploaded in parts of
+    ``part_size`` bytes.
+    """
+    parts = part_ranges(os.path.getsize(file_name), part_size)
+    digests = ''.join(_md5(file_name, start, end - start + 1).decode('hex') for _, start, end in parts)
+    return '%s-%d' % (hashlib.md5(digests).hexdigest(), len(parts))
+
+
+def upload_part_size(size, part_size=DEFAULT_PART_SIZE):
+    """
+    Return the part size to use for uploading ``size`` bytes, at least
+    ``part_size`` bytes, and within the limits of S3.
+    """
+    return max(part_size, MIN_UPLOAD_PART_SIZE, -(-size // MAX_UPLOAD_PARTS))
+
+
+def parallel_upload(bucket, key_name, file_name, part_size=DEFAULT_PART_SIZE, threads=DEFAULT_THREADS, reduced_redundancy=False, cb=None):
+    """
+    Upload ``file_name`` to ``key_name`` in boto ``bucket`` as a multipart
+    upload, sending parts of (at least) ``part_size`` bytes from ``threads``
+    threads.  Each part is checksummed by S3 as it is received, the upload is
+    cancelled if any part fails.
+    """
+    size = os.path.getsize(file_name)
+    parts = part_ranges(size, upload_part_size(size, part_size))
+    multipart = bucket.initiate_multipart_upload(key_name, reduced_redundancy=reduced_redundancy)
+    progress_lock = threading.Lock()
+    transferred = [0]
+
+    def send(part):
+        _retry(_upload_part, multipart, file_name, part)
+        with progress_lock:
+            transferred[0] += part[2] - part[1] + 1
+            if cb is not None:
+                cb(transferred[0], size)
+    try:
+        _map(send, parts, threads)
+        return multipart.complete_upload()
+    except:
+        multipart.cancel_upload()
+        raise
+
+
+def _upload_part(multipart, file_name, part):
+    index, start, end = part
+    with open(file_name, 'rb') as fh:
+        fh.seek(start)
+        multipart.upload_part_from_file(fh, index + 1, size=end - start + 1)
+
+
+def _map(func, parts, threads):
+    # Run func for each part, from up to threads threads, stopping at the
+    # first error.
+    if len(parts) <= 1 or threads <= 1:
+        for part in parts:
+            func(part)
+        return
+    pool = ThreadPool(min(threads, len(parts)))
+    try:
+        for _ in pool.imap_unordered(func, parts):
+            pass
+    finally:
+        pool.terminate()
+
+
+def _retry(func, *args):
+    for attempt in range(1, ATTEMPTS + 1):
+        try:
+            return func(*args)
+        except Exception, e:
+            if attempt == ATTEMPTS:
+                raise
+            log.warning("Transfer of part %s failed (attempt %d of %d): %s", args[-1][0], attempt, ATTEMPTS, e)
+
+
+class KeyRangeReader(io.RawIOBase):
+    """
+    Unbuffered, seekable, read only file reading the object of a boto key
+    with ranged GET requests, use ``open_key`` for a buffered file.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.size = key.size
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise IOError("Invalid position %d in key '%s'" % (offset, self.key.name))
+        self.position = offset
+        return self.position
+
+    def readinto(self, buffer):
+        count = min(len(buffer), self.size - self.position)
+        if count <= 0:
+            return 0
+        end = self.position + count - 1
+        # Keys keep the state of their current request, so each read uses its own
+        data = _retry(_get_range, self.key.bucket.new_key(self.key.name), (self.position, self.position, end))
+        if len(data) != count:
+            raise IOError("Received %d bytes of key '%s' at %d, expected %d" % (len(data), self.key.name, self.position, count))
+        buffer[:count] = data
+        self.position += count
+        return count
+
+
+def _get_range(key, part):
+    return key.get_contents_as_string(headers={'Range': 'bytes=%d-%d' % part[1:]})
+
+
+def open_key(key, start=0, buffer_size=DEFAULT_READ_SIZE):
+    """
+    Return a binary file object reading the object of boto ``key`` from byte
+    ``start``, each read from S3 fetches ``buffer_size`` bytes (or more if a
+    larger read is requested).
+    """
+    reader = io.BufferedReader(KeyRangeReader(key), buffer_size=buffer_size)
+    if start:
+        reader.seek(start)
+    return reader
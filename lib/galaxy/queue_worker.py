@@ -82,10 +82,18 @@ def admin_job_lock(app, **kwargs):
     log.info("Administrative Job Lock is now set to %s. Jobs will %s dispatch."
              % (job_lock, "not" if job_lock else "now"))
 
+
+def invalidate_api_key_principals(app, **kwargs):
+    log.debug("Executing API key principal cache invalidation.")
+    principals = getattr(app, 'api_key_principals', None)
+    if principals is not None:
+        principals.clear()
+
 control_message_to_task = { 'reload_tool': reload_tool,
                             'reload_display_application': reload_display_application,
                             'reload_tool_data_tables': reload_tool_data_tables,
                             'admin_job_lock': admin_job_lock,
+                            'invalidate_api_key_principals': invalidate_api_key_principals,
                             'reload_sanitize_whitelist': reload_sanitize_whitelist}
 
 
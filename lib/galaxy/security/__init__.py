@@ -94,7 +94,7 @@ class RBACAgent:
     def history_set_default_permissions( self, history, permissions=None, dataset=False, bypass_manage_permission=False ):
         raise "Unimplemented Method"
 
-    def set_all_dataset_permissions( self, dataset, permissions ):
+    def set_all_dataset_permissions( self, dataset, permissions, flush=True ):
         raise "Unimplemented Method"
 
     def set_dataset_permission( self, dataset, permission ):
@@ -895,7 +895,7 @@ class GalaxyRBACAgent( RBACAgent ):
                 permissions[ action ] = [ dhp.role ]
         return permissions
 
-    def set_all_dataset_permissions( self, dataset, permissions={} ):
+    def set_all_dataset_permissions( self, dataset, permissions={}, flush=True ):
         """
         Set new full permissions on a dataset, eliminating all current permissions.
         Permission looks like: { Action : [ Role, Role ] }
@@ -924,7 +924,7 @@ class GalaxyRBACAgent( RBACAgent ):
             for dp in [ self.model.DatasetPermissions( action, dataset, role ) for role in roles ]:
                 self.sa_session.add( dp )
                 flush_needed = True
-        if flush_needed:
+        if flush_needed and flush:
             self.sa_session.flush()
         return ""
 
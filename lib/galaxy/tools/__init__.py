@@ -1367,17 +1367,37 @@ class Tool( object, Dictifiable ):
                 template, template_vars = self.__handle_page_advance( trans, state, errors )
         return template, template_vars
 
+    def check_input( self, trans, incoming, history=None, process_state='update', source='html' ):
+        """
+        Expand and check the incoming parameters for this tool as
+        `handle_input` does before executing it, without executing it. Only
+        the parameters of the first execution are checked, so that checking
+        a request mapping the tool over a large collection stays cheap;
+        errors in the parameters of the other executions are found when the
+        tool is executed. Return the errors found, or an empty dict.
+        """
+        # Expanding the meta parameters consumes them
+        incoming = dict( incoming )
+        expanded_incomings, collection_info = expand_meta_parameters( trans, self, incoming )
+        if not expanded_incomings:
+            raise exceptions.MessageException( "Tool execution failed, trying to run a tool over an empty collection." )
+        all_pages = ( process_state == "populate" )
+        expanded_incoming = expanded_incomings[ 0 ]
+        state, state_new = self.__fetch_state( trans, expanded_incoming, history, all_pages=all_pages )
+        errors, params = self.__check_param_values( trans, expanded_incoming, state, None, process_state, history=history, source=source )
+        return errors
+
     def __should_refresh_state( self, incoming ):
         return not( 'runtool_btn' in incoming or 'URL' in incoming or 'ajax_upload' in incoming )
 
-    def handle_single_execution( self, trans, rerun_remap_job_id, params, history, mapping_over_collection ):
+    def handle_single_execution( self, trans, rerun_remap_job_id, params, history, mapping_over_collection, execution_cache=None, flush_job=True ):
         """
         Return a pair with whether execution is successful as well as either
         resulting output data or an error message indicating the problem.
         """
         try:
             params = self.__remove_meta_properties( params )
-            job, out_data = self.execute( trans, incoming=params, history=history, rerun_remap_job_id=rerun_remap_job_id, mapping_over_collection=mapping_over_collection )
+            job, out_data = self.execute( trans, incoming=params, history=history, rerun_remap_job_id=rerun_remap_job_id, mapping_over_collection=mapping_over_collection, execution_cache=execution_cache, flush_job=flush_job )
         except httpexceptions.HTTPFound, e:
             # if it's a paste redirect exception, pass it up the stack
             raise e
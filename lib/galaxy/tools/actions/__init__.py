@@ -23,15 +23,87 @@ class ToolAction( object ):
         raise TypeError("Abstract method")
 
 
+class ToolExecutionCache( object ):
+    """ An object meant to cache calculations that would otherwise be repeated
+    for each job when executing the same tool many times in one request (e.g.
+    mapping it over a collection), and to collect jobs whose creation has been
+    deferred so they can be persisted in bulk.
+    """
+
+    def __init__( self, trans ):
+        self.trans = trans
+        self._current_user_roles = None
+        self.chrom_info = {}
+        self.deferred_jobs = []
+
+    @property
+    def current_user_roles( self ):
+        if self._current_user_roles is None:
+            self._current_user_roles = self.trans.get_current_user_roles()
+        return self._current_user_roles
+
+    def get_chrom_info( self, tool_id, input_dbkey ):
+        custom_build_hack_get_len_from_fasta_conversion = tool_id != 'CONVERTER_fasta_to_len'
+        key = ( input_dbkey, custom_build_hack_get_len_from_fasta_conversion )
+        if key not in self.chrom_info:
+            self.chrom_info[ key ] = self.trans.app.genome_builds.get_chrom_info( input_dbkey, trans=self.trans, custom_build_hack_get_len_from_fasta_conversion=custom_build_hack_get_len_from_fasta_conversion )
+        return self.chrom_info[ key ]
+
+    def defer_job( self, job, object_store_populator, output_datasets, handler ):
+        self.deferred_jobs.append( ( job, object_store_populator, output_datasets, handler ) )
+
+    def flush_deferred_jobs( self ):
+        """
+        Persist all deferred jobs and their outputs with a couple of flushes,
+        create the outputs in the object store and only then assign the jobs
+        to a handler and queue them. Returns the list of jobs.
+        """
+        if not self.deferred_jobs:
+            return []
+        trans = self.trans
+        deferred_jobs = self.deferred_jobs
+        self.deferred_jobs = []
+        # Datasets need ids before the object store can create them. Jobs
+        # are not yet assigned a handler so they cannot be picked up until
+        # their outputs exist.
+        trans.sa_session.flush()
+        for job, object_store_populator, output_datasets, handler in deferred_jobs:
+            for data in output_datasets:
+                object_store_populator.set_object_store_id( data )
+                self._add_quota_usage( data )
+            job.object_store_id = object_store_populator.object_store_id
+            job.set_handler( handler )
+        trans.sa_session.flush()
+        jobs = []
+        for job, object_store_populator, output_datasets, handler in deferred_jobs:
+            trans.app.job_queue.put( job.id, job.tool_id )
+            trans.log_event( "Added job to the job queue, id: %s" % str(job.id), tool_id=job.tool_id )
+            jobs.append( job )
+        return jobs
+
+    def _add_quota_usage( self, data ):
+        # Deferred outputs are added to their history without counting
+        # toward the quota, as their size can only be computed once they have
+        # an id.
+        history = data.history
+        if history is None or history.user is None:
+            return
+        # setting the size first spares get_total_size a flush per output
+        data.dataset.set_total_size()
+        history.user.total_disk_usage += data.quota_amount( history.user )
+
+
 class DefaultToolAction( object ):
     """Default tool action is to run an external command"""
 
-    def collect_input_datasets( self, tool, param_values, trans ):
+    def collect_input_datasets( self, tool, param_values, trans, current_user_roles=None ):
         """
         Collect any dataset inputs from incoming. Returns a mapping from
         parameter name to Dataset instance for each tool parameter that is
         of the DataToolParameter type.
         """
+        if current_user_roles is None:
+            current_user_roles = trans.get_current_user_roles()
         input_datasets = odict()
 
         def visitor( prefix, input, value, parent=None ):
@@ -59,7 +131,6 @@ class DefaultToolAction( object ):
                             trans.sa_session.add( assoc )
                             trans.sa_session.flush()
                             data = new_data
-                current_user_roles = trans.get_current_user_roles()
                 if not trans.app.security_agent.can_access_dataset( current_user_roles, data.dataset ):
                     raise "User does not have permission to use a dataset (%s) provided for input." % data.id
                 return data
@@ -113,7 +184,6 @@ class DefaultToolAction( object ):
                     return
                 for i, v in enumerate( value.collection.dataset_instances ):
                     data = v
-                    current_user_roles = trans.get_current_user_roles()
                     if not trans.app.security_agent.can_access_dataset( current_user_roles, data.dataset ):
                         raise Exception( "User does not have permission to use a dataset (%s) provided for input." % data.id )
                     # Skipping implicit conversion stuff for now, revisit at
@@ -149,16 +219,25 @@ class DefaultToolAction( object ):
         tool.visit_inputs( param_values, visitor )
         return input_dataset_collections
 
-    def execute(self, tool, trans, incoming={}, return_job=False, set_output_hid=True, set_output_history=True, history=None, job_params=None, rerun_remap_job_id=None, mapping_over_collection=False):
+    def execute(self, tool, trans, incoming={}, return_job=False, set_output_hid=True, set_output_history=True, history=None, job_params=None, rerun_remap_job_id=None, mapping_over_collection=False, execution_cache=None, flush_job=True):
         """
         Executes a tool, creating job and tool outputs, associating them, and
         submitting the job to the job queue. If history is not specified, use
         trans.history as destination for tool's output datasets.
+
+        If ``flush_job`` is False (and the job does not need to be remapped or
+        redirected), nothing is flushed to the database and the job is not
+        queued - instead the job is deferred on ``execution_cache`` and it is
+        up to the caller to call ``flush_deferred_jobs`` on it.
         """
         assert tool.allow_user_access( trans.user ), "User (%s) is not allowed to access this tool." % ( trans.user )
         # Set history.
         if not history:
             history = tool.get_default_history_by_trans( trans, create=True )
+        if execution_cache is None:
+            execution_cache = ToolExecutionCache( trans )
+        if rerun_remap_job_id is not None or 'REDIRECT_URL' in incoming:
+            flush_job = True
 
         out_data = odict()
         out_collections = {}
@@ -167,7 +246,7 @@ class DefaultToolAction( object ):
         # input datasets can process these normally.
         inp_dataset_collections = self.collect_input_dataset_collections( tool, incoming )
         # Collect any input datasets from the incoming parameters
-        inp_data = self.collect_input_datasets( tool, incoming, trans )
+        inp_data = self.collect_input_datasets( tool, incoming, trans, execution_cache.current_user_roles )
 
         # Deal with input dataset names, 'dbkey' and types
         input_names = []
@@ -198,7 +277,7 @@ class DefaultToolAction( object ):
                 incoming[ "%s|__identifier__" % name ] = identifier
 
         # Collect chromInfo dataset and add as parameters to incoming
-        ( chrom_info, db_dataset ) = trans.app.genome_builds.get_chrom_info( input_dbkey, trans=trans, custom_build_hack_get_len_from_fasta_conversion=tool.id != 'CONVERTER_fasta_to_len' )
+        ( chrom_info, db_dataset ) = execution_cache.get_chrom_info( tool.id, input_dbkey )
         if db_dataset:
             inp_data.update( { "chromInfo": db_dataset } )
         incoming[ "chromInfo" ] = chrom_info
@@ -223,6 +302,8 @@ class DefaultToolAction( object ):
         parent_to_child_pairs = []
         child_dataset_names = set()
         object_store_populator = ObjectStorePopulator( trans.app )
+        # Outputs still to be created in the object store if flush_job is False
+        deferred_outputs = []
 
         def handle_output( name, output ):
             if output.parent:
@@ -239,15 +320,23 @@ class DefaultToolAction( object ):
                 out_data[name] = data
             else:
                 ext = determine_output_format( output, wrapped_params.params, inp_data, input_ext )
-                data = trans.app.model.HistoryDatasetAssociation( extension=ext, create_dataset=True, sa_session=trans.sa_session )
+                if flush_job:
+                    data = trans.app.model.HistoryDatasetAssociation( extension=ext, create_dataset=True, sa_session=trans.sa_session )
+                else:
+                    dataset = trans.app.model.Dataset( state=trans.app.model.Dataset.states.NEW )
+                    data = trans.app.model.HistoryDatasetAssociation( extension=ext, dataset=dataset, sa_session=trans.sa_session )
                 if output.hidden:
                     data.visible = False
-                # Commit the dataset immediately so it gets database assigned unique id
                 trans.sa_session.add( data )
-                trans.sa_session.flush()
-                trans.app.security_agent.set_all_dataset_permissions( data.dataset, output_permissions )
+                if flush_job:
+                    # Commit the dataset immediately so it gets database assigned unique id
+                    trans.sa_session.flush()
+                trans.app.security_agent.set_all_dataset_permissions( data.dataset, output_permissions, flush=flush_job )
 
-            object_store_populator.set_object_store_id( data )
+            if flush_job:
+                object_store_populator.set_object_store_id( data )
+            else:
+                deferred_outputs.append( data )
 
             # This may not be neccesary with the new parent/child associations
             data.designation = name
@@ -268,7 +357,8 @@ class DefaultToolAction( object ):
             data.dbkey = str(input_dbkey)
             # Set state
             # FIXME: shouldn't this be NEW until the job runner changes it?
-            data.state = data.states.QUEUED
+            # (Set on the dataset directly, setting the HDA state flushes.)
+            data.dataset.state = data.states.QUEUED
             data.blurb = "queued"
             # Set output label
             data.name = self.get_output_name( output, data, tool, on_text, trans, incoming, history, wrapped_params.params, job_params )
@@ -280,7 +370,8 @@ class DefaultToolAction( object ):
                 output_action_params.update( incoming )
                 output.actions.apply_action( data, output_action_params )
             # Store all changes to database
-            trans.sa_session.flush()
+            if flush_job:
+                trans.sa_session.flush()
             return data
 
         for name, output in tool.outputs.items():
@@ -323,9 +414,11 @@ class DefaultToolAction( object ):
                         child_dataset_names.add( effective_output_name )
 
                         if set_output_history:
-                            history.add_dataset( element, set_hid=set_output_hid )
+                            # deferred outputs count toward quotas once they exist, see flush_deferred_jobs
+                            history.add_dataset( element, set_hid=set_output_hid, quota=flush_job )
                         trans.sa_session.add( element )
-                        trans.sa_session.flush()
+                        if flush_job:
+                            trans.sa_session.flush()
 
                         current_element_identifiers.append({
                             "__object__": element,
@@ -368,16 +461,18 @@ class DefaultToolAction( object ):
             if name not in child_dataset_names and name not in incoming:  # don't add children; or already existing datasets, i.e. async created
                 data = out_data[ name ]
                 if set_output_history:
-                    history.add_dataset( data, set_hid=set_output_hid )
+                    history.add_dataset( data, set_hid=set_output_hid, quota=flush_job )
                 trans.sa_session.add( data )
-                trans.sa_session.flush()
+                if flush_job:
+                    trans.sa_session.flush()
         # Add all the children to their parents
         for parent_name, child_name in parent_to_child_pairs:
             parent_dataset = out_data[ parent_name ]
             child_dataset = out_data[ child_name ]
             parent_dataset.children.append( child_dataset )
         # Store data after custom code runs
-        trans.sa_session.flush()
+        if flush_job:
+            trans.sa_session.flush()
         # Create the job object
         job = trans.app.model.Job()
 
@@ -407,7 +502,7 @@ class DefaultToolAction( object ):
             job.add_input_dataset_collection( name, dataset_collection )
         for name, value in tool.params_to_strings( incoming, trans.app ).iteritems():
             job.add_parameter( name, value )
-        current_user_roles = trans.get_current_user_roles()
+        current_user_roles = execution_cache.current_user_roles
         access_timer = ExecutionTimer()
         for name, dataset in inp_data.iteritems():
             if dataset:
@@ -423,9 +518,15 @@ class DefaultToolAction( object ):
             job.add_implicit_output_dataset_collection( name, dataset_collection )
         for name, dataset_collection_instance in out_collection_instances.iteritems():
             job.add_output_dataset_collection( name, dataset_collection_instance )
-        job.object_store_id = object_store_populator.object_store_id
         if job_params:
             job.params = dumps( job_params )
+        if not flush_job:
+            # The handler is only set once outputs exist in the object store,
+            # see ToolExecutionCache.flush_deferred_jobs.
+            trans.sa_session.add( job )
+            execution_cache.defer_job( job, object_store_populator, deferred_outputs, tool.get_job_handler( job_params ) )
+            return job, out_data
+        job.object_store_id = object_store_populator.object_store_id
         job.set_handler(tool.get_job_handler(job_params))
         trans.sa_session.add( job )
         # Now that we have a job id, we can remap any outputs if this is a rerun and the user chose to continue dependent jobs
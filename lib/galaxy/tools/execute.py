@@ -4,14 +4,22 @@ from various states, tracking results, and building implicit dataset
 collections from matched collections.
 """
 import collections
+import threading
+from Queue import Queue
+
 import galaxy.tools
 from galaxy.util import ExecutionTimer
-from galaxy.tools.actions import on_text_for_names
+from galaxy.tools.actions import on_text_for_names, ToolExecutionCache
+from galaxy.work.context import WorkRequestContext
 
 import logging
 log = logging.getLogger( __name__ )
 
 EXECUTION_SUCCESS_MESSAGE = "Tool [%s] created job [%s] %s"
+# Number of jobs created in memory before being persisted and queued at once
+# when mapping a tool over a collection.
+BULK_JOB_FLUSH_SIZE = 250
+STOP_SIGNAL = object()
 
 
 def execute( trans, tool, param_combinations, history, rerun_remap_job_id=None, collection_info=None, workflow_invocation_uuid=None ):
@@ -19,7 +27,12 @@ def execute( trans, tool, param_combinations, history, rerun_remap_job_id=None,
     Execute a tool and return object containing summary (output data, number of
     failures, etc...).
     """
+    all_jobs_timer = ExecutionTimer()
     execution_tracker = ToolExecutionTracker( tool, param_combinations, collection_info )
+    execution_cache = ToolExecutionCache( trans )
+    # Jobs mapped over a collection are persisted and queued in bulk rather
+    # than flushed one at a time.
+    flush_job = collection_info is None or rerun_remap_job_id is not None
     for params in execution_tracker.param_combinations:
         job_timer = ExecutionTimer()
         if workflow_invocation_uuid:
@@ -28,21 +41,133 @@ def execute( trans, tool, param_combinations, history, rerun_remap_job_id=None,
             # Only workflow invocation code gets to set this, ignore user supplied
             # values or rerun parameters.
             del params[ '__workflow_invocation_uuid__' ]
-        job, result = tool.handle_single_execution( trans, rerun_remap_job_id, params, history, collection_info )
+        job, result = tool.handle_single_execution( trans, rerun_remap_job_id, params, history, collection_info, execution_cache=execution_cache, flush_job=flush_job )
         if job:
-            message = EXECUTION_SUCCESS_MESSAGE % (tool.id, job.id, job_timer)
-            log.debug(message)
+            if job.id is not None:
+                message = EXECUTION_SUCCESS_MESSAGE % (tool.id, job.id, job_timer)
+                log.debug(message)
             execution_tracker.record_success( job, result )
         else:
             execution_tracker.record_error( result )
+        if len( execution_cache.deferred_jobs ) >= BULK_JOB_FLUSH_SIZE:
+            _flush_deferred_jobs( tool, execution_cache )
+    _flush_deferred_jobs( tool, execution_cache )
 
     if collection_info:
         history = history or tool.get_default_history_by_trans( trans )
         execution_tracker.create_output_collections( trans, history, params )
+        log.debug( "Executed %d job(s) for tool %s mapped over a collection %s", len( execution_tracker.successful_jobs ), tool.id, all_jobs_timer )
 
     return execution_tracker
 
 
+def _flush_deferred_jobs( tool, execution_cache ):
+    flush_timer = ExecutionTimer()
+    jobs = execution_cache.flush_deferred_jobs()
+    if jobs:
+        log.debug( "Tool [%s] created %d jobs [%s-%s] in bulk %s", tool.id, len( jobs ), jobs[ 0 ].id, jobs[ -1 ].id, flush_timer )
+
+
+class BackgroundToolExecutor( object ):
+    """
+    Executes tool requests (incoming parameters as submitted to the tools
+    API, already checked by `Tool.check_input`) in a background thread, so
+    that requests creating many jobs - e.g. mapping a tool over a large
+    collection - can return immediately. The thread is only started once the
+    first request is queued.
+
+    Requests failing to create their jobs, or still queued when Galaxy shuts
+    down, are reported to the user as an errored dataset in the history.
+    """
+
+    def __init__( self, app ):
+        self.app = app
+        self.queue = Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+        self.stopping = False
+
+    def put( self, tool_id, tool_version, user_id, history_id, incoming ):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread( name="BackgroundToolExecutor.thread", target=self.__run )
+                self.thread.setDaemon( True )
+                self.thread.start()
+        self.queue.put( ( tool_id, tool_version, user_id, history_id, incoming ) )
+
+    def shutdown( self ):
+        if self.thread is not None:
+            self.stopping = True
+            self.queue.put( STOP_SIGNAL )
+            self.thread.join()
+
+    def __run( self ):
+        while True:
+            request = self.queue.get()
+            if request is STOP_SIGNAL:
+                return
+            tool_id, tool_version, user_id, history_id, incoming = request
+            try:
+                if self.stopping:
+                    self.__report( tool_id, user_id, history_id, "Galaxy was restarted before the jobs were created, please run the tool again." )
+                else:
+                    self.__execute( *request )
+            except Exception, e:
+                log.exception( "Exception raised while executing tool request in the background." )
+                # A fresh session, the failed one may not be usable
+                self.app.model.context.remove()
+                try:
+                    self.__report( tool_id, user_id, history_id, "Error creating the jobs: %s" % e )
+                except Exception:
+                    log.exception( "Failed to report the failure of a tool request executed in the background." )
+            finally:
+                self.app.model.context.remove()
+                self.queue.task_done()
+
+    def __execute( self, tool_id, tool_version, user_id, history_id, incoming ):
+        sa_session = self.app.model.context
+        user = sa_session.query( self.app.model.User ).get( user_id )
+        history = sa_session.query( self.app.model.History ).get( history_id )
+        tool = self.app.toolbox.get_tool( tool_id, tool_version )
+        if tool is None:
+            log.error( "Cannot execute tool request in the background, tool [%s] not found.", tool_id )
+            self.__report( tool_id, user_id, history_id, "The tool was not found, the jobs were not created." )
+            return
+        trans = WorkRequestContext( self.app, user=user, history=history )
+        process_state = "update" if "tool_state" in incoming else "populate"
+        template, vars = tool.handle_input( trans, incoming, history=history, process_state=process_state, source="json" )
+        if vars.get( 'errors' ):
+            log.error( "Background execution of tool [%s] for user [%s] failed: %s", tool_id, user_id, vars[ 'errors' ] )
+            self.__report( tool.name, user_id, history_id, "Invalid parameters, the jobs were not created: %s" % vars[ 'errors' ] )
+        elif 'jobs' in vars:
+            job_errors = vars.get( 'job_errors', [] )
+            log.info( "Background execution of tool [%s] for user [%s] created %d job(s) with %d error(s)",
+                      tool_id, user_id, len( vars[ 'jobs' ] ), len( job_errors ) )
+            if job_errors:
+                self.__report( tool.name, user_id, history_id, "%d of the jobs were not created: %s" % ( len( job_errors ), job_errors[ 0 ] ) )
+        else:
+            log.error( "Background execution of tool [%s] for user [%s] failed: %s", tool_id, user_id, vars.get( 'message' ) )
+            self.__report( tool.name, user_id, history_id, vars.get( 'message' ) or "The jobs were not created." )
+
+    def __report( self, tool_name, user_id, history_id, message ):
+        sa_session = self.app.model.context
+        history = sa_session.query( self.app.model.History ).get( history_id )
+        hda = self.app.model.HistoryDatasetAssociation( name="%s (jobs not created)" % tool_name,
+                                                        extension="txt",
+                                                        history=history,
+                                                        create_dataset=True,
+                                                        sa_session=sa_session )
+        hda.state = hda.states.ERROR
+        hda.info = message
+        sa_session.add( hda )
+        sa_session.flush()
+        # nothing was written, so nothing counts towards the user's quota
+        history.add_dataset( hda, quota=False )
+        permissions = self.app.security_agent.history_get_default_permissions( history )
+        self.app.security_agent.set_all_dataset_permissions( hda.dataset, permissions )
+        sa_session.flush()
+
+
 class ToolExecutionTracker( object ):
 
     def __init__( self, tool, param_combinations, collection_info ):
@@ -18,6 +18,7 @@ from galaxy.util import listify
 from galaxy.util import parse_xml
 from galaxy.util import string_as_bool
 from galaxy.util.bunch import Bunch
+from galaxy.util.lrucache import LRUCache
 
 from tool_shed.util import common_util
 
@@ -59,6 +60,10 @@ class AbstractToolBox( object, Dictifiable, ManagesIntegratedToolPanelMixin ):
         # so each will be present once in the above dictionary. The following
         # dictionary can instead hold multiple tools with different versions.
         self._tool_versions_by_id = {}
+        # Results of get_tool searches for ids of no loaded tool (e.g. old
+        # ids, guids of other versions), cleared when tools are (un)registered
+        # and expired since lineages also come from the database.
+        self._tool_search_cache = LRUCache( 1000, ttl=300 )
         self._workflows_by_id = {}
         # In-memory dictionary that defines the layout of the tool panel.
         self._tool_panel = ToolPanelElements()
@@ -381,6 +386,13 @@ class AbstractToolBox( object, Dictifiable, ManagesIntegratedToolPanelMixin ):
             # tool_id exactly matches an available tool by id (which is 'old' tool_id or guid)
             return self._tools_by_id[ tool_id ]
         # exact tool id match not found, or all versions requested, search for other options, e.g. migrated tools or different versions
+        rval = self._tool_search_cache.get_or_set( ( tool_id, tool_version, get_all_versions ),
+                                                   lambda: self._search_tool( tool_id, tool_version, get_all_versions ) )
+        if isinstance( rval, list ):
+            return list( rval )
+        return rval
+
+    def _search_tool( self, tool_id, tool_version, get_all_versions ):
         rval = []
         tool_lineage = self._lineage_map.get( tool_id )
         if tool_lineage:
@@ -754,6 +766,7 @@ class AbstractToolBox( object, Dictifiable, ManagesIntegratedToolPanelMixin ):
         return tool
 
     def register_tool( self, tool ):
+        self._tool_search_cache.clear()
         tool_id = tool.id
         version = tool.version or None
         if tool_id not in self._tool_versions_by_id:
@@ -936,6 +949,7 @@ class AbstractToolBox( object, Dictifiable, ManagesIntegratedToolPanelMixin ):
         else:
             tool = self._tools_by_id[ tool_id ]
             del self._tools_by_id[ tool_id ]
+            self._tool_search_cache.clear()
             if remove_from_panel:
                 tool_key = 'tool_' + tool_id
                 for key, val in self._tool_panel.items():
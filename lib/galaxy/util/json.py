@@ -1,6 +1,6 @@
 from __future__ import absolute_import
 
-__all__ = [ "dumps", "loads", "safe_dumps", "json_fix", "validate_jsonrpc_request", "validate_jsonrpc_response", "jsonrpc_request", "jsonrpc_response" ]
+__all__ = [ "dumps", "loads", "safe_dumps", "is_streamed", "iter_dumps", "iter_ndjson", "json_fix", "validate_jsonrpc_request", "validate_jsonrpc_response", "jsonrpc_request", "jsonrpc_response" ]
 
 import copy
 import collections
@@ -9,12 +9,16 @@ import logging
 import math
 import random
 import string
+import types
 
 dumps = json.dumps
 loads = json.loads
 
 log = logging.getLogger( __name__ )
 
+# Streamed JSON is yielded in chunks of about this many bytes
+STREAM_CHUNK_SIZE = 64 * 1024
+
 to_json_string = dumps
 from_json_string = loads
 
@@ -71,6 +75,97 @@ def safe_dumps( *args, **kwargs ):
     return dumped
 
 
+def is_streamed( obj ):
+    """
+    Return True if obj is a generator, or a dict or list with generator
+    values, so that its JSON encoding is best produced incrementally by
+    `iter_dumps`.
+    """
+    if isinstance( obj, types.GeneratorType ):
+        return True
+    if isinstance( obj, dict ):
+        return any( isinstance( value, types.GeneratorType ) for value in obj.itervalues() )
+    if isinstance( obj, list ):
+        return any( isinstance( value, types.GeneratorType ) for value in obj )
+    return False
+
+
+def iter_dumps( obj, dumps=safe_dumps, chunk_size=STREAM_CHUNK_SIZE, **kwargs ):
+    """
+    Encode obj as JSON incrementally, yielding chunks of about chunk_size
+    bytes. Generators (as obj or as the values of obj) are encoded as arrays
+    one item at a time; everything else is encoded with
+    `dumps( value, **kwargs )`.
+
+    >>> ''.join( iter_dumps( ( i * i for i in range( 4 ) ) ) )
+    '[0, 1, 4, 9]'
+    >>> ''.join( iter_dumps( dict( items=( str( i ) for i in range( 2 ) ) ) ) )
+    '{"items": ["0", "1"]}'
+    >>> list( iter_dumps( ( 'abc' for i in range( 3 ) ), chunk_size=10 ) )
+    ['["abc", "abc"', ', "abc"]']
+    """
+    buffered = []
+    size = 0
+    for part in _iter_json_parts( obj, dumps, kwargs ):
+        buffered.append( part )
+        size += len( part )
+        if size >= chunk_size:
+            yield ''.join( buffered )
+            buffered = []
+            size = 0
+    if buffered:
+        yield ''.join( buffered )
+
+
+def _iter_json_parts( obj, dumps, kwargs ):
+    separator = ',\n' if kwargs.get( 'indent' ) is not None else ', '
+    if isinstance( obj, types.GeneratorType ):
+        yield '['
+        for i, item in enumerate( obj ):
+            yield separator + dumps( item, **kwargs ) if i else dumps( item, **kwargs )
+        yield ']'
+    elif isinstance( obj, dict ) and is_streamed( obj ):
+        keys = sorted( obj ) if kwargs.get( 'sort_keys' ) else obj.keys()
+        yield '{'
+        for i, key in enumerate( keys ):
+            yield ( separator if i else '' ) + dumps( key ) + ': '
+            for part in _iter_json_parts( obj[ key ], dumps, kwargs ):
+                yield part
+        yield '}'
+    elif isinstance( obj, list ) and is_streamed( obj ):
+        yield '['
+        for i, item in enumerate( obj ):
+            if i:
+                yield separator
+            for part in _iter_json_parts( item, dumps, kwargs ):
+                yield part
+        yield ']'
+    else:
+        yield dumps( obj, **kwargs )
+
+
+def iter_ndjson( items, dumps=safe_dumps, chunk_size=STREAM_CHUNK_SIZE ):
+    """
+    Encode the items of an iterable as newline delimited JSON (one JSON
+    document per line), yielding chunks of about chunk_size bytes.
+
+    >>> ''.join( iter_ndjson( [ dict( id=1 ), [ 2 ] ] ) )
+    '{"id": 1}\\n[2]\\n'
+    """
+    buffered = []
+    size = 0
+    for item in items:
+        line = dumps( item ) + '\n'
+        buffered.append( line )
+        size += len( line )
+        if size >= chunk_size:
+            yield ''.join( buffered )
+            buffered = []
+            size = 0
+    if buffered:
+        yield ''.join( buffered )
+
+
 # Methods for handling JSON-RPC
 
 def validate_jsonrpc_request( request, regular_methods, notification_methods ):
@@ -1,68 +1,183 @@
 """
-Kanwei Li, 03/2010
+Thread safe least recently used (LRU) cache, optionally bounded by the total
+size of its values and expiring values after a time to live.
 
-Simple LRU cache that uses a dictionary to store a specified number of objects
-at a time.
+>>> cache = LRUCache( 2 )
+>>> cache[ 'a' ] = 1
+>>> cache[ 'b' ] = 2
+>>> cache[ 'a' ]
+1
+>>> cache[ 'c' ] = 3
+>>> cache[ 'b' ] is None, 'a' in cache, len( cache )
+(True, True, 2)
+>>> cache.get_or_set( 'd', lambda: 4 ), cache[ 'a' ]
+(4, None)
+>>> cache.set_many( [ ( 'e', 5 ) ] )
+>>> cache.get_many( [ 'd', 'e', 'f' ] )
+[4, 5, None]
+>>> stats = cache.stats()
+>>> stats[ 'hits' ], stats[ 'misses' ], stats[ 'evictions' ]
+(3, 4, 3)
 """
 
+import sys
+import threading
+import time
 
-class LRUCache:
-    def clear(self):
-        ''' Clears/initiates storage variables'''
-        self.key_ary = []
-        self.obj_cache = {}
+# Fields of the links of the list of entries
+PREV, NEXT, KEY, VALUE, SIZE, EXPIRES = range( 6 )
 
-    def __init__(self, num_elements):
+_MISSING = object()
+
+
+class LRUCache( object ):
+    """
+    Caches at most `num_elements` values (if not None) whose total size, as
+    computed by `sizeof( value )`, is at most `max_bytes` (if not None),
+    evicting the least recently used values first. Values are expired
+    `ttl` seconds (if not None) after they are set.
+
+    Entries are kept in a dictionary and a circular doubly linked list,
+    least recently used first, so getting and setting values are O(1); a lock
+    makes the cache safe to share between threads.
+    """
+
+    def __init__( self, num_elements=None, max_bytes=None, ttl=None, sizeof=sys.getsizeof ):
         self.num_elements = num_elements
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizeof = sizeof
+        self.lock = threading.Lock()
         self.clear()
 
-    def __getitem__(self, key):
-        ''' Return value of key, or None if key is not in cache '''
-        if key not in self.key_ary:
-            return None
+    def clear( self ):
+        ''' Clears/initiates storage variables '''
+        with self.lock:
+            # key -> [ previous link, next link, key, value, size, expiry time ]
+            self.links = {}
+            self.root = []
+            self.root[:] = [ self.root, self.root, None, None, 0, None ]
+            self.bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def _unlink( self, link ):
+        link[ PREV ][ NEXT ] = link[ NEXT ]
+        link[ NEXT ][ PREV ] = link[ PREV ]
+
+    def _append( self, link ):
+        root = self.root
+        last = root[ PREV ]
+        last[ NEXT ] = root[ PREV ] = link
+        link[ PREV ] = last
+        link[ NEXT ] = root
+
+    def _remove( self, link ):
+        self._unlink( link )
+        del self.links[ link[ KEY ] ]
+        self.bytes -= link[ SIZE ]
+
+    def _get( self, key, default, now ):
+        link = self.links.get( key )
+        if link is None:
+            self.misses += 1
+            return default
+        if link[ EXPIRES ] is not None and link[ EXPIRES ] < now:
+            self._remove( link )
+            self.misses += 1
+            return default
         # Move this key to the end
-        self.key_ary.remove(key)
-        self.key_ary.append(key)
-        return self.obj_cache[key]
-
-    def __setitem__(self, key, value):
-        ''' Sets a new value to a key '''
-        if key not in self.obj_cache:
-            if len(self.key_ary) >= self.num_elements:
-                deleted_key = self.key_ary.pop(0)  # Remove first element
-                del self.obj_cache[deleted_key]
-            self.key_ary.append(key)
-        self.obj_cache[key] = value
+        self._unlink( link )
+        self._append( link )
+        self.hits += 1
+        return link[ VALUE ]
+
+    def get( self, key, default=None ):
+        ''' Return value of key, or default if key is not in cache '''
+        with self.lock:
+            return self._get( key, default, time.time() if self.ttl is not None else None )
+
+    def get_many( self, keys, default=None ):
+        ''' Return the list of the values of keys, default for keys not in cache '''
+        with self.lock:
+            now = time.time() if self.ttl is not None else None
+            return [ self._get( key, default, now ) for key in keys ]
+
+    def __getitem__( self, key ):
+        ''' Return value of key, or None if key is not in cache '''
+        return self.get( key )
+
+    def _set( self, key, value, size, expires ):
+        link = self.links.get( key )
+        if link is not None:
+            self._remove( link )
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        link = [ None, None, key, value, size, expires ]
+        self._append( link )
+        self.links[ key ] = link
+        self.bytes += size
+        root = self.root
+        while ( ( self.num_elements is not None and len( self.links ) > self.num_elements ) or
+                ( self.max_bytes is not None and self.bytes > self.max_bytes ) ):
+            self._remove( root[ NEXT ] )
+            self.evictions += 1
+
+    def set( self, key, value ):
+        ''' Sets a new value to a key, unless it is larger than max_bytes '''
+        size = self.sizeof( value ) if self.max_bytes is not None else 0
+        expires = time.time() + self.ttl if self.ttl is not None else None
+        with self.lock:
+            self._set( key, value, size, expires )
         return value
 
-if __name__ == "__main__":
-    import unittest
-
-    class TestLRUCache(unittest.TestCase):
-        def test_lru(self):
-            lru = LRUCache(2)
-            for i in range(0, 4):  # Insert 4 numbers
-                lru[i] = i
-            self.assertEqual( lru[0], None )
-            self.assertEqual( lru[1], None )
-            self.assertEqual( lru[2], 2 )
-            self.assertEqual( lru[3], 3 )
-
-            self.assertEqual( lru.__setitem__("hello", "world"), "world")
-            self.assertEqual( lru[2], None )
-
-            lru.clear()
-            self.assertEqual( lru["hello"], None )
-            self.assertEqual( lru[3], None )
-
-            # Test if recently used item is kept
-            lru[0] = 0
-            lru[1] = 1
-            # Now saturated
-            lru[2] = 2
-            # Should keep 0, delete 1
-            self.assertEqual( lru[0], 0 )
-            self.assertEqual( lru[1], None )
-            self.assertEqual( lru[2], 2 )
-
-    unittest.main()
+    def set_many( self, items ):
+        ''' Sets the values of the ( key, value ) pairs of items '''
+        if self.max_bytes is not None:
+            items = [ ( key, value, self.sizeof( value ) ) for key, value in items ]
+        else:
+            items = [ ( key, value, 0 ) for key, value in items ]
+        expires = time.time() + self.ttl if self.ttl is not None else None
+        with self.lock:
+            for key, value, size in items:
+                self._set( key, value, size, expires )
+
+    def __setitem__( self, key, value ):
+        self.set( key, value )
+
+    def get_or_set( self, key, create ):
+        '''
+        Return value of key or, if key is not in cache, set and return the
+        value returned by create() (which is not called with the lock held).
+        '''
+        value = self.get( key, _MISSING )
+        if value is _MISSING:
+            value = self.set( key, create() )
+        return value
+
+    def pop( self, key, default=None ):
+        ''' Remove key and return its value, or default if key is not in cache '''
+        with self.lock:
+            link = self.links.get( key )
+            if link is None:
+                return default
+            self._remove( link )
+            return link[ VALUE ]
+
+    def __delitem__( self, key ):
+        self.pop( key )
+
+    def __contains__( self, key ):
+        with self.lock:
+            link = self.links.get( key )
+            return link is not None and ( link[ EXPIRES ] is None or link[ EXPIRES ] >= time.time() )
+
+    def __len__( self ):
+        return len( self.links )
+
+    def stats( self ):
+        ''' Return counters of hits, misses and evictions and the size of the cache '''
+        with self.lock:
+            requests = self.hits + self.misses
+            return dict( hits=self.hits, misses=self.misses, evictions=self.evictions,
+                         hit_rate=float( self.hits ) / requests if requests else 0.0,
+                         entries=len( self.links ), bytes=self.bytes )
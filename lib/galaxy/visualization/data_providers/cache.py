@@ -0,0 +1,212 @@
+"""
+Caches shared by the genome data providers of a Galaxy process: the data
+provided for recently requested regions and the open (indexed) data files
+they read.
+"""
+
+import logging
+import threading
+import time
+
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from galaxy.util.json import dumps, loads
+from galaxy.util.lrucache import LRUCache
+
+log = logging.getLogger( __name__ )
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_MAX_OPEN_FILES = 32
+DEFAULT_MAX_IDLE_TIME = 300
+
+
+class RegionCache( object ):
+    """
+    Thread safe least recently used cache of the data provided for regions,
+    bounded by the total size of the (JSON serialized) data.
+
+    Data are stored serialized, so each hit returns a copy the caller may
+    modify.
+    """
+
+    def __init__( self, max_bytes=DEFAULT_MAX_BYTES, max_entries=DEFAULT_MAX_ENTRIES ):
+        self.entries = LRUCache( num_elements=max_entries, max_bytes=max_bytes, sizeof=len )
+
+    @property
+    def max_bytes( self ):
+        return self.entries.max_bytes
+
+    @max_bytes.setter
+    def max_bytes( self, max_bytes ):
+        self.entries.max_bytes = max_bytes
+
+    def clear( self ):
+        self.entries.clear()
+
+    def get( self, key ):
+        """
+        Return the data cached for `key` or `None`.
+        """
+        serialized = self.entries.get( key )
+        if serialized is None:
+            return None
+        return loads( serialized )
+
+    def set( self, key, data ):
+        """
+        Cache `data` for `key` unless it is too large or cannot be serialized.
+        """
+        try:
+            serialized = dumps( data )
+        except ( TypeError, ValueError ), e:
+            log.debug( "Not caching data for %s: %s", key, e )
+            return
+        self.entries.set( key, serialized )
+
+    def get_or_read( self, key, read ):
+        """
+        Return the data cached for `key`, or read and cache it with `read()`.
+        """
+        data = self.get( key )
+        if data is None:
+            data = read()
+            self.set( key, data )
+        return data
+
+    def stats( self ):
+        return self.entries.stats()
+
+
+class FileHandlePool( object ):
+    """
+    Pool of open data files, keyed by the names of the files.
+
+    A file is used by one thread at a time: files are taken from the pool
+    (or opened) by `open` and returned to it when done with. At most
+    `max_open_files` idle files are kept open and files idle for longer than
+    `max_idle_time` seconds are closed.
+    """
+
+    def __init__( self, max_open_files=DEFAULT_MAX_OPEN_FILES, max_idle_time=DEFAULT_MAX_IDLE_TIME ):
+        self.max_open_files = max_open_files
+        self.max_idle_time = max_idle_time
+        self.lock = threading.Lock()
+        # ( key, number ) -> ( time returned, file, closer ), least recently used first
+        self.idle = OrderedDict()
+        self.counter = 0
+        self.opens = self.reuses = 0
+
+    @contextmanager
+    def open( self, key, opener, closer=None ):
+        """
+        Provide an idle file opened for `key`, or a new one opened with
+        `opener()`, returning it to the pool afterwards (or closing it with
+        `closer( file )` if there was an error).
+        """
+        data_file = self._take( key )
+        if data_file is None:
+            data_file = opener()
+            with self.lock:
+                self.opens += 1
+        try:
+            yield data_file
+        except:
+            self._close( data_file, closer )
+            raise
+        self._return( key, data_file, closer )
+
+    def _take( self, key ):
+        expired = []
+        data_file = None
+        with self.lock:
+            now = time.time()
+            for idle_key, idle in self.idle.items():
+                if now - idle[0] > self.max_idle_time:
+                    expired.append( self.idle.pop( idle_key ) )
+                elif data_file is None and idle_key[0] == key:
+                    del self.idle[ idle_key ]
+                    data_file = idle[1]
+                    self.reuses += 1
+        for returned, expired_file, closer in expired:
+            self._close( expired_file, closer )
+        return data_file
+
+    def _return( self, key, data_file, closer ):
+        evicted = []
+        with self.lock:
+            self.counter += 1
+            self.idle[ ( key, self.counter ) ] = ( time.time(), data_file, closer )
+            while len( self.idle ) > self.max_open_files:
+                evicted.append( self.idle.popitem( last=False )[1] )
+        for returned, evicted_file, evicted_closer in evicted:
+            self._close( evicted_file, evicted_closer )
+
+    def _close( self, data_file, closer=None ):
+        try:
+            if closer is not None:
+                closer( data_file )
+            else:
+                data_file.close()
+        except AttributeError:
+            # some data files do not have a close function (e.g. pysam Tabixfile)
+            pass
+        except Exception, e:
+            log.debug( "Error closing pooled data file: %s", e )
+
+    def clear( self ):
+        """
+        Close all idle files.
+        """
+        with self.lock:
+            idle = self.idle.values()
+            self.idle = OrderedDict()
+        for returned, idle_file, closer in idle:
+            self._close( idle_file, closer )
+
+    def stats( self ):
+        with self.lock:
+            requests = self.opens + self.reuses
+            return dict( opens=self.opens, reuses=self.reuses, idle=len( self.idle ),
+                         hit_rate=float( self.reuses ) / requests if requests else 0.0 )
+
+
+def tile_for( start, end ):
+    """
+    Return the start and end of the tile containing the region `start`-`end`.
+
+    Tiles are a power of two (at least twice the width of the region) wide and
+    aligned on multiples of their width or, for regions crossing such a tile,
+    offset by half their width, so regions of similar width near each other
+    share tiles.
+
+    >>> tile_for( 10, 20 )
+    (0, 32)
+    >>> tile_for( 1000, 1100 )
+    (896, 1152)
+    >>> tile_for( 1000, 1500 )
+    (512, 1536)
+    >>> tile_for( 60, 70 )
+    (48, 80)
+    """
+    width = max( end - start, 1 )
+    tile_width = 1 << ( 2 * width - 1 ).bit_length()
+    tile_start = start - start % tile_width
+    if end > tile_start + tile_width:
+        tile_start = ( start - tile_width // 2 ) // tile_width * tile_width + tile_width // 2
+    return ( tile_start, tile_start + tile_width )
+
+
+region_cache = RegionCache()
+file_pool = FileHandlePool()
+
+
+def configure( max_bytes=DEFAULT_MAX_BYTES, max_open_files=DEFAULT_MAX_OPEN_FILES ):
+    """
+    Set the limits of the caches of this process, disabling them if 0.
+    """
+    region_cache.max_bytes = max_bytes
+    file_pool.max_open_files = max_open_files
+    region_cache.clear()
+    file_pool.clear()
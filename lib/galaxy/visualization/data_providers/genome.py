@@ -9,6 +9,8 @@ import random
 import re
 import sys
 
+from contextlib import contextmanager
+
 from galaxy import eggs
 eggs.require('numpy')  # noqa
 eggs.require('bx-python')  # noqa
@@ -21,6 +23,7 @@ from pysam import csamtools, ctabix
 from galaxy.datatypes.interval import Bed, Gff, Gtf
 from galaxy.datatypes.util.gff_util import convert_gff_coords_to_bed, GFFFeature, GFFInterval, GFFReaderWrapper, parse_gff_attributes
 from galaxy.util.json import loads
+from galaxy.visualization.data_providers import cache
 from galaxy.visualization.data_providers.basic import BaseDataProvider
 from galaxy.visualization.data_providers.cigar import get_ref_based_read_seq_and_cigar
 
@@ -136,6 +139,19 @@ class GenomeDataProvider( BaseDataProvider ):
     """
     col_name_data_attr_mapping = {}
 
+    """
+    Whether data are features ( [ <uid>, <start>, <end>, ... ] ) overlapping
+    the requested region, so that the data of a region can be taken from
+    those of a larger one.
+    """
+    features_from_tiles = False
+
+    """
+    Parameters that do not identify cached data (e.g. because they are
+    determined by the region).
+    """
+    cache_ignored_params = ( 'ref_seq', )
+
     def __init__( self, converted_dataset=None, original_dataset=None, dependencies=None,
                   error_max_vals="Only the first %i %s in this region are displayed." ):
         super( GenomeDataProvider, self ).__init__( converted_dataset=converted_dataset,
@@ -186,13 +202,102 @@ class GenomeDataProvider( BaseDataProvider ):
         max_vals are used to denote the data to return: start_val is the first element to
         return and max_vals indicates the number of values to return.
 
+        Data are cached by region (see cache.RegionCache) and, if
+        features_from_tiles, taken from the data of a tile containing the
+        region so that requests for neighbouring regions read the data once.
+
         Return value must be a dictionary with the following attributes:
             dataset_type, data
         """
         start, end = int( low ), int( high )
-        data_file = self.open_data_file()
-        iterator = self.get_iterator( data_file, chrom, start, end, **kwargs )
-        data = self.process_data( iterator, start_val, max_vals, start=start, end=end, **kwargs )
+        cache_key = self.get_cache_key( chrom, **kwargs )
+        if cache_key is None:
+            return self.read_data( chrom, start, end, start_val, max_vals, **kwargs )
+
+        if self.features_from_tiles and not start_val and max_vals:
+            data = self.get_data_from_tile( cache_key, chrom, start, end, max_vals, **kwargs )
+            if data is not None:
+                return data
+
+        return cache.region_cache.get_or_read( cache_key + ( start, end, start_val, max_vals ),
+                                               lambda: self.read_data( chrom, start, end, start_val, max_vals, **kwargs ) )
+
+    def get_data_from_tile( self, cache_key, chrom, start, end, max_vals, **kwargs ):
+        """
+        Returns the features in region chrom:start-end from the (cached) data
+        of the tile containing the region, or None if the tile has too many
+        features to provide all of them.
+        """
+        tile_start, tile_end = cache.tile_for( start, end )
+        # Tiles are at most four times as wide as the region.
+        tile_max_vals = max_vals * 4
+        tile_data = cache.region_cache.get_or_read( cache_key + ( tile_start, tile_end, 0, tile_max_vals ),
+                                                    lambda: self.read_data( chrom, tile_start, tile_end, 0, tile_max_vals, **kwargs ) )
+        if tile_data.get( 'message' ):
+            return None
+
+        features = [ feature for feature in tile_data[ 'data' ]
+                     if feature[1] < end and max( feature[2], feature[1] + 1 ) > start ]
+        if len( features ) > max_vals:
+            return None
+        tile_data[ 'data' ] = features
+        return tile_data
+
+    def get_cache_key( self, chrom, **kwargs ):
+        """
+        Returns the part of the keys of cached data that identifies this
+        provider's datasets, the chromosome and the parameters, or None if
+        data cannot be cached.
+        """
+        datasets = []
+        for dataset in ( self.original_dataset, self.converted_dataset ):
+            if dataset is not None:
+                if getattr( dataset, 'id', None ) is None:
+                    return None
+                dataset = ( dataset.__class__.__name__, dataset.id, getattr( dataset, 'update_time', None ) )
+            datasets.append( dataset )
+        if datasets == [ None, None ]:
+            return None
+
+        params = tuple( sorted( ( name, value ) for name, value in kwargs.items()
+                                if name not in self.cache_ignored_params and
+                                isinstance( value, ( basestring, int, long, float, bool, type( None ) ) ) ) )
+        return ( self.__class__.__name__, tuple( datasets ), chrom, params )
+
+    def read_data( self, chrom, start, end, start_val=0, max_vals=sys.maxint, **kwargs ):
+        """
+        Reads data in region chrom:start-end from the data file; see get_data.
+        """
+        with self.data_file() as data_file:
+            iterator = self.get_iterator( data_file, chrom, start, end, **kwargs )
+            return self.process_data( iterator, start_val, max_vals, start=start, end=end, **kwargs )
+
+    @contextmanager
+    def data_file( self ):
+        """
+        Provides the open data file, taken from and returned to the pool of
+        open files (see cache.FileHandlePool) if it has a data file key.
+        """
+        key = self.get_data_file_key()
+        if key is not None:
+            with cache.file_pool.open( key, self.open_data_file, self.close_data_file ) as data_file:
+                yield data_file
+        else:
+            data_file = self.open_data_file()
+            try:
+                yield data_file
+            finally:
+                self.close_data_file( data_file )
+
+    def get_data_file_key( self ):
+        """
+        Returns the key of the data file in the pool of open files, or None if
+        the data file is not to be pooled.
+        """
+        return None
+
+    @staticmethod
+    def close_data_file( data_file ):
         try:
             data_file.close()
         except AttributeError:
@@ -202,8 +307,6 @@ class GenomeDataProvider( BaseDataProvider ):
             #  bx IntervalIndex
             pass
 
-        return data
-
     def get_genome_data( self, chroms_info, **kwargs ):
         """
         Returns data for complete genome.
@@ -351,6 +454,9 @@ class TabixDataProvider( FilterableMixin, GenomeDataProvider ):
         return ctabix.Tabixfile(self.dependencies['bgzip'].file_name,
                                 index_filename=self.converted_dataset.file_name)
 
+    def get_data_file_key( self ):
+        return ( 'tabix', self.dependencies['bgzip'].file_name, self.converted_dataset.file_name )
+
     def get_iterator( self, data_file, chrom, start, end, **kwargs ):
         start, end = int(start), int(end)
         if end >= (2 << 29):
@@ -466,7 +572,8 @@ class IntervalTabixDataProvider( TabixDataProvider, IntervalDataProvider ):
     """
     Provides data from a BED file indexed via tabix.
     """
-    pass
+
+    features_from_tiles = True
 
 
 #
@@ -570,7 +677,8 @@ class BedTabixDataProvider( TabixDataProvider, BedDataProvider ):
     """
     Provides data from a BED file indexed via tabix.
     """
-    pass
+
+    features_from_tiles = True
 
 
 class RawBedDataProvider( BedDataProvider ):
@@ -884,6 +992,9 @@ class BamDataProvider( GenomeDataProvider, FilterableMixin ):
         return csamtools.Samfile( filename=self.original_dataset.file_name, mode='rb',
                                   index_filename=self.converted_dataset.file_name )
 
+    def get_data_file_key( self ):
+        return ( 'bam', self.original_dataset.file_name, self.converted_dataset.file_name )
+
     def get_iterator( self, data_file, chrom, start, end, **kwargs ):
         """
         Returns an iterator that provides data in the region chrom:start-end
@@ -1141,13 +1252,23 @@ class BBIDataProvider( GenomeDataProvider ):
         return None
 
     def has_data( self, chrom ):
-        f, bbi = self._get_dataset()
-        all_dat = bbi.query( chrom, 0, 2147483647, 1 ) or \
-            bbi.query( _convert_between_ucsc_and_ensemble_naming( chrom ), 0, 2147483647, 1 )
-        f.close()
+        with self.data_file() as ( f, bbi ):
+            all_dat = bbi.query( chrom, 0, 2147483647, 1 ) or \
+                bbi.query( _convert_between_ucsc_and_ensemble_naming( chrom ), 0, 2147483647, 1 )
         return all_dat is not None
 
-    def get_data( self, chrom, start, end, start_val=0, max_vals=None, num_samples=1000, **kwargs ):
+    def open_data_file( self ):
+        return self._get_dataset()
+
+    def get_data_file_key( self ):
+        return ( 'bbi', self._get_file_name() )
+
+    @staticmethod
+    def close_data_file( data_file ):
+        f, bbi = data_file
+        f.close()
+
+    def read_data( self, chrom, start, end, start_val=0, max_vals=None, num_samples=1000, **kwargs ):
         start = int( start )
         end = int( end )
 
@@ -1160,109 +1281,108 @@ class BBIDataProvider( GenomeDataProvider ):
         # Bigwig can be a standalone bigwig file, in which case we use
         # original_dataset, or coming from wig->bigwig conversion in
         # which we use converted_dataset
-        f, bbi = self._get_dataset()
-
-        # If stats requested, compute overall summary data for the range
-        # start:endbut no reduced data. This is currently used by client
-        # to determine the default range.
-        if 'stats' in kwargs:
-            summary = _summarize_bbi( bbi, chrom, start, end, 1 )
-            f.close()
-
-            min_val = 0
-            max_val = 0
-            mean = 0
-            sd = 0
-            if summary is not None:
-                # Does the summary contain any defined values?
-                valid_count = summary.valid_count[0]
-                if summary.valid_count > 0:
-                    # Compute $\mu \pm 2\sigma$ to provide an estimate for upper and lower
-                    # bounds that contain ~95% of the data.
-                    mean = summary.sum_data[0] / valid_count
-                    var = max( summary.sum_squares[0] - mean, 0 )  # Prevent variance underflow.
-                    if valid_count > 1:
-                        var /= valid_count - 1
-                    sd = math.sqrt( var )
-                    min_val = summary.min_val[0]
-                    max_val = summary.max_val[0]
-
-            return dict( data=dict( min=min_val, max=max_val, mean=mean, sd=sd ) )
-
-        def summarize_region( bbi, chrom, start, end, num_points ):
-            '''
-            Returns results from summarizing a region using num_points.
-            NOTE: num_points cannot be greater than end - start or BBI
-            will return None for all positions.
-            '''
-            result = []
-
-            # Get summary; this samples at intervals of length
-            # (end - start)/num_points -- i.e. drops any fractional component
-            # of interval length.
-            summary = _summarize_bbi( bbi, chrom, start, end, num_points )
-            if summary:
-                # mean = summary.sum_data / summary.valid_count
-
-                # Standard deviation by bin, not yet used
-                # var = summary.sum_squares - mean
-                # var /= minimum( valid_count - 1, 1 )
-                # sd = sqrt( var )
-
-                pos = start
-                step_size = (end - start) / num_points
-
-                for i in range( num_points ):
-                    result.append( (pos, float_nan( summary.sum_data[i] / summary.valid_count[i] ) ) )
-                    pos += step_size
-
-            return result
-
-        # Approach is different depending on region size.
-        num_samples = int( num_samples )
-        if end - start < num_samples:
-            # Get values for individual bases in region, including start and end.
-            # To do this, need to increase end to next base and request number of points.
-            num_points = end - start + 1
-            end += 1
-        else:
-            #
-            # The goal is to sample the region between start and end uniformly
-            # using ~N (num_samples) data points. The challenge is that the size of
-            # sampled intervals rarely is full bases, so sampling using N points
-            # will leave the end of the region unsampled due to remainders for
-            # each interval. To recitify this, a new N is calculated based on the
-            # step size that covers as much of the region as possible.
-            #
-            # However, this still leaves some of the region unsampled. This
-            # could be addressed by repeatedly sampling remainder using a
-            # smaller and smaller step_size, but that would require iteratively
-            # going to BBI, which could be time consuming.
-            #
-
-            # Start with N samples.
-            num_points = num_samples
-            step_size = ( end - start ) / num_points
-            # Add additional points to sample in the remainder not covered by
-            # the initial N samples.
-            remainder_start = start + step_size * num_points
-            additional_points = ( end - remainder_start ) / step_size
-            num_points += additional_points
-
-        result = summarize_region( bbi, chrom, start, end, num_points )
-
-        # Cleanup and return.
-        f.close()
-        return {
-            'data': result,
-            'dataset_type': self.dataset_type
-        }
+        with self.data_file() as ( f, bbi ):
+            # If stats requested, compute overall summary data for the range
+            # start:endbut no reduced data. This is currently used by client
+            # to determine the default range.
+            if 'stats' in kwargs:
+                summary = _summarize_bbi( bbi, chrom, start, end, 1 )
+
+                min_val = 0
+                max_val = 0
+                mean = 0
+                sd = 0
+                if summary is not None:
+                    # Does the summary contain any defined values?
+                    valid_count = summary.valid_count[0]
+                    if summary.valid_count > 0:
+                        # Compute $\mu \pm 2\sigma$ to provide an estimate for upper and lower
+                        # bounds that contain ~95% of the data.
+                        mean = summary.sum_data[0] / valid_count
+                        var = max( summary.sum_squares[0] - mean, 0 )  # Prevent variance underflow.
+                        if valid_count > 1:
+                            var /= valid_count - 1
+                        sd = math.sqrt( var )
+                        min_val = summary.min_val[0]
+                        max_val = summary.max_val[0]
+
+                return dict( data=dict( min=min_val, max=max_val, mean=mean, sd=sd ) )
+
+            def summarize_region( bbi, chrom, start, end, num_points ):
+                '''
+                Returns results from summarizing a region using num_points.
+                NOTE: num_points cannot be greater than end - start or BBI
+                will return None for all positions.
+                '''
+                result = []
+
+                # Get summary; this samples at intervals of length
+                # (end - start)/num_points -- i.e. drops any fractional component
+                # of interval length.
+                summary = _summarize_bbi( bbi, chrom, start, end, num_points )
+                if summary:
+                    # mean = summary.sum_data / summary.valid_count
+
+                    # Standard deviation by bin, not yet used
+                    # var = summary.sum_squares - mean
+                    # var /= minimum( valid_count - 1, 1 )
+                    # sd = sqrt( var )
+
+                    pos = start
+                    step_size = (end - start) / num_points
+
+                    for i in range( num_points ):
+                        result.append( (pos, float_nan( summary.sum_data[i] / summary.valid_count[i] ) ) )
+                        pos += step_size
+
+                return result
+
+            # Approach is different depending on region size.
+            num_samples = int( num_samples )
+            if end - start < num_samples:
+                # Get values for individual bases in region, including start and end.
+                # To do this, need to increase end to next base and request number of points.
+                num_points = end - start + 1
+                end += 1
+            else:
+                #
+                # The goal is to sample the region between start and end uniformly
+                # using ~N (num_samples) data points. The challenge is that the size of
+                # sampled intervals rarely is full bases, so sampling using N points
+                # will leave the end of the region unsampled due to remainders for
+                # each interval. To recitify this, a new N is calculated based on the
+                # step size that covers as much of the region as possible.
+                #
+                # However, this still leaves some of the region unsampled. This
+                # could be addressed by repeatedly sampling remainder using a
+                # smaller and smaller step_size, but that would require iteratively
+                # going to BBI, which could be time consuming.
+                #
+
+                # Start with N samples.
+                num_points = num_samples
+                step_size = ( end - start ) / num_points
+                # Add additional points to sample in the remainder not covered by
+                # the initial N samples.
+                remainder_start = start + step_size * num_points
+                additional_points = ( end - remainder_start ) / step_size
+                num_points += additional_points
+
+            result = summarize_region( bbi, chrom, start, end, num_points )
+
+            return {
+                'data': result,
+                'dataset_type': self.dataset_type
+            }
 
 
 class BigBedDataProvider( BBIDataProvider ):
-    def _get_dataset( self ):
+    def _get_file_name( self ):
         # Nothing converts to bigBed so we don't consider converted dataset
-        f = open( self.original_dataset.file_name )
+        return self.original_dataset.file_name
+
+    def _get_dataset( self ):
+        f = open( self._get_file_name() )
         return f, BigBedFile(file=f)
 
 
@@ -1271,11 +1391,13 @@ class BigWigDataProvider ( BBIDataProvider ):
     Provides data from BigWig files; position data is reported in 1-based
     coordinate system, i.e. wiggle format.
     """
-    def _get_dataset( self ):
+    def _get_file_name( self ):
         if self.converted_dataset is not None:
-            f = open( self.converted_dataset.file_name )
-        else:
-            f = open( self.original_dataset.file_name )
+            return self.converted_dataset.file_name
+        return self.original_dataset.file_name
+
+    def _get_dataset( self ):
+        f = open( self._get_file_name() )
         return f, BigWigFile(file=f)
 
 
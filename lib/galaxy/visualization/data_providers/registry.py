@@ -1,4 +1,5 @@
 from galaxy.visualization.data_providers.basic import ColumnDataProvider
+from galaxy.visualization.data_providers import cache
 from galaxy.visualization.data_providers import genome
 from galaxy.model import NoConverterException
 from galaxy.visualization.data_providers.phyloviz import PhylovizDataProvider
@@ -13,7 +14,11 @@ class DataProviderRegistry( object ):
     Registry for data providers that enables listing and lookup.
     """
 
-    def __init__( self ):
+    def __init__( self, config=None ):
+        if config is not None:
+            cache.configure( max_bytes=config.genome_data_cache_size * 1024 * 1024,
+                             max_open_files=config.genome_data_open_files )
+
         # Mapping from dataset type name to a class that can fetch data from a file of that
         # type. First key is converted dataset type; if result is another dict, second key
         # is original dataset type.
@@ -109,3 +114,10 @@ class DataProviderRegistry( object ):
                             pass
 
         return data_provider
+
+    def get_cache_stats( self ):
+        """
+        Returns the counters (e.g. hit rates) of the caches of genome data
+        providers.
+        """
+        return dict( regions=cache.region_cache.stats(), files=cache.file_pool.stats() )
@@ -5,6 +5,7 @@ import sys
 from bx.seq.twobit import TwoBitFile
 from galaxy.util.bunch import Bunch
 from galaxy.util.json import loads
+from galaxy.util.lrucache import LRUCache
 
 log = logging.getLogger( __name__ )
 
@@ -21,6 +22,17 @@ messages = Bunch(
     OK="ok"
 )
 
+# Lines of recently read len files, bounded by their total length.
+len_file_lines = LRUCache( max_bytes=32 * 1024 * 1024, sizeof=lambda lines: sum( len( line ) for line in lines ) )
+
+
+def read_len_file( len_file ):
+    """
+    Returns the lines of a len file, read again only if it changed.
+    """
+    stat = os.stat( len_file )
+    return len_file_lines.get_or_set( ( len_file, stat.st_mtime, stat.st_size ), lambda: open( len_file ).readlines() )
+
 
 def decode_dbkey( dbkey ):
     """ Decodes dbkey and returns tuple ( username, dbkey )"""
@@ -114,7 +126,7 @@ class Genome( object ):
         #   (b) whether there are previous, next chroms;
         #   (c) index of start chrom.
         #
-        len_file_enumerate = enumerate( open( self.len_file ) )
+        len_file_enumerate = enumerate( read_len_file( self.len_file ) )
         chroms = {}
         prev_chroms = False
         start_index = 0
@@ -104,6 +104,13 @@ class BaseController( object ):
             msg = "Malformed id ( %s ) specified, unable to decode" % ( str( id ) )
             raise exceptions.MalformedId( msg, id=str( id ) )
 
+    def decode_ids( self, ids ):
+        try:
+            return self.app.security.decode_ids( map( str, ids ) )
+        except ( ValueError, TypeError ):
+            # raise the error of the malformed id
+            return map( self.decode_id, ids )
+
     def encode_all_ids( self, trans, rval, recursive=False ):
         """
         Encodes all integer values in the dict rval whose keys are 'id' or end with '_id'
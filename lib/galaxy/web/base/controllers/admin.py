@@ -9,6 +9,7 @@ from sqlalchemy import and_, false, func, or_
 
 import galaxy.queue_worker
 from galaxy import util, web
+from galaxy.managers.api_keys import invalidate_api_key_principals
 from galaxy.util import inflector
 from galaxy.web.form_builder import CheckboxField
 from tool_shed.util import shed_util_common as suc
@@ -803,6 +804,7 @@ class Admin( object ):
             trans.sa_session.add( user )
             trans.sa_session.flush()
             message += " %s " % user.email
+        invalidate_api_key_principals( trans.app )
         trans.response.send_redirect( web.url_for( controller='admin',
                                                    action='users',
                                                    message=util.sanitize_text( message ),
@@ -834,6 +836,7 @@ class Admin( object ):
             trans.sa_session.flush()
             count += 1
             undeleted_users += " %s" % user.email
+        invalidate_api_key_principals( trans.app )
         message = "Undeleted %d users: %s" % ( count, undeleted_users )
         trans.response.send_redirect( web.url_for( controller='admin',
                                                    action='users',
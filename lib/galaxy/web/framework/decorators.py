@@ -1,4 +1,5 @@
 import inspect
+import types
 from traceback import format_exc
 from functools import wraps
 
@@ -10,6 +11,9 @@ from galaxy.web.framework import url_for
 from galaxy import util
 from galaxy.exceptions import error_codes
 from galaxy.exceptions import MessageException
+from galaxy.util.json import is_streamed
+from galaxy.util.json import iter_dumps
+from galaxy.util.json import iter_ndjson
 from galaxy.util.json import loads
 from galaxy.util.json import safe_dumps as dumps
 
@@ -18,6 +22,7 @@ log = logging.getLogger( __name__ )
 
 
 JSON_CONTENT_TYPE = "application/json"
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
 
 
 def error( message ):
@@ -138,7 +143,9 @@ def expose_api( func, to_json=True, user_required=True ):
                 return "That user does not exist."
         try:
             rval = func( self, trans, *args, **kwargs)
-            if to_json and trans.debug:
+            if to_json and is_streamed( rval ):
+                rval = _streamed_json( trans, rval )
+            elif to_json and trans.debug:
                 rval = dumps( rval, indent=4, sort_keys=True )
             elif to_json:
                 rval = dumps( rval )
@@ -151,6 +158,56 @@ def expose_api( func, to_json=True, user_required=True ):
     return expose( _save_orig_fn( decorator, func ) )
 
 
+def _streamed_json( trans, rval ):
+    """
+    Encode the generator (or dict or list of generators, see
+    `galaxy.util.json.is_streamed`) returned by an API method incrementally,
+    as a JSON array or, for generators if the client accepts
+    NDJSON_CONTENT_TYPE, as newline delimited JSON.
+
+    The encoding is run up to its first chunk (`STREAM_CHUNK_SIZE` bytes)
+    here, so the errors raised before anything is sent get the usual error
+    responses. Errors raised after that can only end the response early,
+    with the usual error dictionary (``err_msg`` and ``err_code``) as its
+    last line. As NDJSON that is a last record clients need to check for;
+    otherwise it follows the truncated JSON (an array or object that is never
+    closed), so that the response fails to parse.
+    """
+    ndjson = isinstance( rval, types.GeneratorType ) and NDJSON_CONTENT_TYPE in trans.request.headers.get( 'Accept', '' )
+    if ndjson:
+        chunks = _primed( iter_ndjson( rval ) )
+        trans.response.set_content_type( NDJSON_CONTENT_TYPE )
+        return _ending_with_error( trans, chunks )
+    if trans.debug:
+        chunks = _primed( iter_dumps( rval, indent=4, sort_keys=True ) )
+    else:
+        chunks = _primed( iter_dumps( rval ) )
+    return _ending_with_error( trans, chunks, separator='\n' )
+
+
+def _primed( items ):
+    try:
+        first = next( items )
+    except StopIteration:
+        return ( item for item in () )
+
+    def resumed():
+        yield first
+        for item in items:
+            yield item
+    return resumed()
+
+
+def _ending_with_error( trans, chunks, separator='' ):
+    try:
+        for chunk in chunks:
+            yield chunk
+    except Exception as e:
+        log.exception( 'Uncaught exception streaming response of exposed API method:' )
+        error_dict = __api_error_message( trans, exception=e, traceback=format_exc() )
+        yield separator + dumps( error_dict ) + '\n'
+
+
 def __extract_payload_from_request(trans, func, kwargs):
     content_type = trans.request.headers['content-type']
     if content_type.startswith('application/x-www-form-urlencoded') or content_type.startswith('multipart/form-data'):
@@ -258,7 +315,9 @@ def _future_expose_api( func, to_json=True, user_required=True, user_or_session_
                 return __api_error_response( trans, err_code=error_code, status_code=400 )
         try:
             rval = func( self, trans, *args, **kwargs)
-            if to_json and trans.debug:
+            if to_json and is_streamed( rval ):
+                rval = _streamed_json( trans, rval )
+            elif to_json and trans.debug:
                 rval = dumps( rval, indent=4, sort_keys=True )
             elif to_json:
                 rval = dumps( rval )
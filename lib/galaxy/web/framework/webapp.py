@@ -23,7 +23,6 @@ from babel.support import Translations
 from babel import Locale
 eggs.require( "SQLAlchemy >= 0.4" )
 from sqlalchemy import and_, true
-from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.orm import joinedload
 
 from galaxy.exceptions import MessageException
@@ -34,6 +33,7 @@ from galaxy.util import safe_str_cmp
 from galaxy.util.backports.importlib import import_module
 from galaxy.util.sanitize_html import sanitize_html
 
+from galaxy.managers import api_keys
 from galaxy.managers import context
 from galaxy.web.framework import url_for
 from galaxy.web.framework import base
@@ -322,16 +322,15 @@ class GalaxyWebTransaction( base.DefaultWebTransaction,
             self.galaxy_session = None
         elif api_key_supplied:
             # Sessionless API transaction, we just need to associate a user.
-            try:
-                provided_key = self.sa_session.query( self.app.model.APIKeys ).filter( self.app.model.APIKeys.table.c.key == api_key ).one()
-            except NoResultFound:
+            principal = self._get_api_key_principal( api_key )
+            if principal is None:
                 return 'Provided API key is not valid.'
-            if provided_key.user.deleted:
+            user_id, newest_key, deleted = principal
+            if deleted:
                 return 'User account is deactivated, please contact an administrator.'
-            newest_key = provided_key.user.api_keys[0]
-            if newest_key.key != provided_key.key:
+            if not newest_key:
                 return 'Provided API key has expired.'
-            self.set_user( provided_key.user )
+            self.set_user( self.sa_session.query( self.app.model.User ).get( user_id ) )
         elif secure_id:
             # API authentication via active session
             # Associate user using existing session
@@ -341,6 +340,16 @@ class GalaxyWebTransaction( base.DefaultWebTransaction,
             self.user = None
             self.galaxy_session = None
 
+    def _get_api_key_principal( self, api_key ):
+        """
+        Return the user id, newest key and deleted user flags of api_key, from
+        the app's cache of them if it has one.
+        """
+        principals = getattr( self.app, 'api_key_principals', None )
+        if principals is not None:
+            return principals.get_principal( self.sa_session, self.app.model, api_key )
+        return api_keys.load_api_key_principal( self.sa_session, self.app.model, api_key )
+
     def _check_master_api_key( self, api_key ):
         master_api_key = getattr( self.app.config, 'master_api_key', None )
         if not master_api_key:
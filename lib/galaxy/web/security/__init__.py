@@ -7,6 +7,7 @@ import pkg_resources
 pkg_resources.require( "pycrypto" )
 
 import galaxy.exceptions
+from galaxy.util.lrucache import LRUCache
 
 from Crypto.Cipher import Blowfish
 from Crypto.Util.randpool import RandomPool
@@ -14,6 +15,9 @@ from Crypto.Util import number
 
 log = logging.getLogger( __name__ )
 
+# Number of recently encoded and decoded ids remembered by a SecurityHelper
+ID_CACHE_SIZE = 10000
+
 if os.path.exists( "/dev/urandom" ):
     # We have urandom, use it as the source of random data
     random_fd = os.open( "/dev/urandom", os.O_RDONLY )
@@ -45,17 +49,43 @@ class SecurityHelper( object ):
 
         per_kind_id_secret_base = config.get( 'per_kind_id_secret_base', self.id_secret )
         self.id_ciphers_for_kind = _cipher_cache( per_kind_id_secret_base )
+        # ( kind, id ) -> encoded id and ( kind, encoded id ) -> id
+        self.encoded_ids = LRUCache( ID_CACHE_SIZE )
+        self.decoded_ids = LRUCache( ID_CACHE_SIZE )
 
     def encode_id( self, obj_id, kind=None ):
         if obj_id is None:
             raise galaxy.exceptions.MalformedId("Attempted to encode None id")
-        id_cipher = self.__id_cipher( kind )
         # Convert to string
         s = str( obj_id )
-        # Pad to a multiple of 8 with leading "!"
-        s = ( "!" * ( 8 - len(s) % 8 ) ) + s
+        return self.encoded_ids.get_or_set( ( kind, s ), lambda: self.__encode_id( s, kind ) )
+
+    def __encode_id( self, s, kind ):
+        id_cipher = self.__id_cipher( kind )
         # Encrypt
-        return id_cipher.encrypt( s ).encode( 'hex' )
+        return id_cipher.encrypt( _pad_id( s ) ).encode( 'hex' )
+
+    def encode_ids( self, obj_ids, kind=None ):
+        """
+        Encode a list of ids, encrypting all those not recently encoded at once.
+        """
+        if None in obj_ids:
+            raise galaxy.exceptions.MalformedId("Attempted to encode None id")
+        strings = map( str, obj_ids )
+        encoded_ids = self.encoded_ids.get_many( [ ( kind, s ) for s in strings ] )
+        missing = [ i for i, encoded_id in enumerate( encoded_ids ) if encoded_id is None ]
+        if missing:
+            padded = [ _pad_id( strings[ i ] ) for i in missing ]
+            # Blowfish encrypts each 8 byte block independently (ECB), so the
+            # ids can be encrypted together and split afterwards.
+            encrypted = self.__id_cipher( kind ).encrypt( ''.join( padded ) ).encode( 'hex' )
+            start = 0
+            for i, padded_id in zip( missing, padded ):
+                end = start + 2 * len( padded_id )
+                encoded_ids[ i ] = encrypted[ start:end ]
+                start = end
+            self.encoded_ids.set_many( [ ( ( kind, strings[ i ] ), encoded_ids[ i ] ) for i in missing ] )
+        return encoded_ids
 
     def encode_dict_ids( self, a_dict, kind=None ):
         """
@@ -76,31 +106,75 @@ class SecurityHelper( object ):
         """
         if not isinstance( rval, dict ):
             return rval
-        for k, v in rval.items():
-            if ( k == 'id' or k.endswith( '_id' ) ) and v is not None and k not in [ 'tool_id', 'external_id' ]:
+        # ( dict, key ) of the ids and the lists of ids (keys ending with
+        # '_ids') to encode, encoded together with encode_ids
+        ids = []
+        id_lists = []
+        self.__find_ids( rval, recursive, ids, id_lists )
+        try:
+            encoded_ids = iter( self.encode_ids( [ d[ k ] for d, k in ids ] + [ i for d, k in id_lists for i in d[ k ] ] ) )
+        except Exception:
+            # Some id cannot be encoded, leave it as is.
+            for d, k in ids:
                 try:
-                    rval[ k ] = self.encode_id( v )
+                    d[ k ] = self.encode_id( d[ k ] )
                 except Exception:
                     pass  # probably already encoded
-            if ( k.endswith( "_ids" ) and isinstance( v, list ) ):
+            for d, k in id_lists:
                 try:
-                    o = []
-                    for i in v:
-                        o.append( self.encode_id( i ) )
-                    rval[ k ] = o
+                    d[ k ] = [ self.encode_id( i ) for i in d[ k ] ]
                 except Exception:
                     pass
-            else:
-                if recursive and isinstance( v, dict ):
-                    rval[ k ] = self.encode_all_ids( v, recursive )
-                elif recursive and isinstance( v, list ):
-                    rval[ k ] = map( lambda el: self.encode_all_ids( el, True), v )
+            return rval
+        for d, k in ids:
+            d[ k ] = next( encoded_ids )
+        for d, k in id_lists:
+            d[ k ] = [ next( encoded_ids ) for i in d[ k ] ]
         return rval
 
+    def __find_ids( self, rval, recursive, ids, id_lists ):
+        for k, v in rval.items():
+            if ( k == 'id' or k.endswith( '_id' ) ) and v is not None and k not in [ 'tool_id', 'external_id' ]:
+                ids.append( ( rval, k ) )
+            if ( k.endswith( "_ids" ) and isinstance( v, list ) ):
+                id_lists.append( ( rval, k ) )
+            elif recursive and isinstance( v, dict ):
+                self.__find_ids( v, recursive, ids, id_lists )
+            elif recursive and isinstance( v, list ):
+                for el in v:
+                    if isinstance( el, dict ):
+                        self.__find_ids( el, recursive, ids, id_lists )
+
     def decode_id( self, obj_id, kind=None ):
+        if not isinstance( obj_id, basestring ):
+            return self.__decode_id( obj_id, kind )
+        return self.decoded_ids.get_or_set( ( kind, obj_id ), lambda: self.__decode_id( obj_id, kind ) )
+
+    def __decode_id( self, obj_id, kind ):
         id_cipher = self.__id_cipher( kind )
         return int( id_cipher.decrypt( obj_id.decode( 'hex' ) ).lstrip( "!" ) )
 
+    def decode_ids( self, encoded_ids, kind=None ):
+        """
+        Decode a list of encoded ids, decrypting all those not recently decoded
+        at once.
+        """
+        ids = self.decoded_ids.get_many( [ ( kind, encoded_id ) if isinstance( encoded_id, basestring ) else None
+                                           for encoded_id in encoded_ids ] )
+        missing = [ i for i, obj_id in enumerate( ids ) if obj_id is None ]
+        if any( not isinstance( encoded_ids[ i ], basestring ) or len( encoded_ids[ i ] ) % 16 for i in missing ):
+            # Not whole blocks, decode one by one to raise the same errors
+            return [ self.decode_id( encoded_id, kind ) for encoded_id in encoded_ids ]
+        if missing:
+            decrypted = self.__id_cipher( kind ).decrypt( ''.join( encoded_ids[ i ] for i in missing ).decode( 'hex' ) )
+            start = 0
+            for i in missing:
+                end = start + len( encoded_ids[ i ] ) // 2
+                ids[ i ] = int( decrypted[ start:end ].lstrip( "!" ) )
+                start = end
+            self.decoded_ids.set_many( [ ( ( kind, encoded_ids[ i ] ), ids[ i ] ) for i in missing ] )
+        return ids
+
     def encode_guid( self, session_key ):
         # Session keys are strings
         # Pad to a multiple of 8 with leading "!"
@@ -124,10 +198,16 @@ class SecurityHelper( object ):
         return id_cipher
 
 
+def _pad_id( s ):
+    # Pad to a multiple of 8 with leading "!"
+    return ( "!" * ( 8 - len( s ) % 8 ) ) + s
+
+
 class _cipher_cache( collections.defaultdict ):
 
     def __init__( self, secret_base ):
         self.secret_base = secret_base
 
     def __missing__( self, key ):
-        return Blowfish.new( self.secret_base + "__" + key )
+        cipher = self[ key ] = Blowfish.new( self.secret_base + "__" + key )
+        return cipher
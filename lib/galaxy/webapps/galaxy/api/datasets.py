@@ -257,9 +257,11 @@ class DatasetsController( BaseAPIController, UsesVisualizationMixin ):
 
             elif dataset.datatype.has_dataprovider( provider ):
                 kwargs = dataset.datatype.dataproviders[ provider ].parse_query_string_settings( kwargs )
+                data_provider = dataset.datatype.dataprovider( dataset, provider, **kwargs )
                 # use dictionary to allow more than the data itself to be returned (data totals, other meta, etc.)
+                # the data are streamed to the client as they are provided
                 return {
-                    'data': list( dataset.datatype.dataprovider( dataset, provider, **kwargs ) )
+                    'data': ( datum for datum in data_provider )
                 }
 
             else:
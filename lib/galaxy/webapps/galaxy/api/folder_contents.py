@@ -42,7 +42,8 @@ class FolderContentsController( BaseAPIController, UsesLibraryMixin, UsesLibrary
         :param kwd: keyword dictionary with other params
         :type  kwd: dict
 
-        :returns: dictionary containing all items and metadata
+        :returns: dictionary containing all items and metadata, the items
+            streamed as they are serialized
         :type:    dict
 
         :raises: MalformedId, InconsistentDatabase, ObjectNotFound,
@@ -69,11 +70,33 @@ class FolderContentsController( BaseAPIController, UsesLibraryMixin, UsesLibrary
                 log.warning( "SECURITY: Anonymous user is trying to load restricted folder with ID of %s" % ( decoded_folder_id ) )
             raise exceptions.ObjectNotFound( 'Folder with the id provided ( %s ) was not found' % str( folder_id ) )
 
-        folder_contents = []
-        update_time = ''
-        create_time = ''
+        # The contents are serialized as the response is streamed.
+        content_items = self._load_folder_contents( trans, folder, deleted )
+        folder_contents = self.__serialized_contents( trans, folder, content_items, is_admin, current_user_roles )
+
+        # Return the reversed path so it starts with the library node.
+        full_path = self.build_path( trans, folder )[ ::-1 ]
+
+        # Check whether user can add items to the current folder
+        can_add_library_item = is_admin or trans.app.security_agent.can_add_library_item( current_user_roles, folder )
+
+        # Check whether user can modify the current folder
+        can_modify_folder = is_admin or trans.app.security_agent.can_modify_library_item( current_user_roles, folder )
+
+        parent_library_id = None
+        if folder.parent_library is not None:
+            parent_library_id = trans.security.encode_id( folder.parent_library.id )
+
+        metadata = dict( full_path=full_path,
+                         can_add_library_item=can_add_library_item,
+                         can_modify_folder=can_modify_folder,
+                         parent_library_id=parent_library_id )
+        folder_container = dict( metadata=metadata, folder_contents=folder_contents )
+        return folder_container
+
+    def __serialized_contents( self, trans, folder, content_items, is_admin, current_user_roles ):
         #  Go through every accessible item (folders, datasets) in the folder and include its metadata.
-        for content_item in self._load_folder_contents( trans, folder, deleted ):
+        for content_item in content_items:
             return_item = {}
             encoded_id = trans.security.encode_id( content_item.id )
             update_time = content_item.update_time.strftime( "%Y-%m-%d %I:%M %p" )
@@ -117,27 +140,7 @@ class FolderContentsController( BaseAPIController, UsesLibraryMixin, UsesLibrary
                                       create_time=create_time,
                                       deleted=content_item.deleted
                                       ) )
-            folder_contents.append( return_item )
-
-        # Return the reversed path so it starts with the library node.
-        full_path = self.build_path( trans, folder )[ ::-1 ]
-
-        # Check whether user can add items to the current folder
-        can_add_library_item = is_admin or trans.app.security_agent.can_add_library_item( current_user_roles, folder )
-
-        # Check whether user can modify the current folder
-        can_modify_folder = is_admin or trans.app.security_agent.can_modify_library_item( current_user_roles, folder )
-
-        parent_library_id = None
-        if folder.parent_library is not None:
-            parent_library_id = trans.security.encode_id( folder.parent_library.id )
-
-        metadata = dict( full_path=full_path,
-                         can_add_library_item=can_add_library_item,
-                         can_modify_folder=can_modify_folder,
-                         parent_library_id=parent_library_id )
-        folder_container = dict( metadata=metadata, folder_contents=folder_contents )
-        return folder_container
+            yield return_item
 
     def build_path( self, trans, folder ):
         """
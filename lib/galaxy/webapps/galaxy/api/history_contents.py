@@ -1,6 +1,8 @@
 """
 API operations on the contents of a history.
 """
+import datetime
+from itertools import islice
 
 from galaxy import exceptions
 from galaxy import util
@@ -13,11 +15,14 @@ from galaxy.web.base.controller import UsesLibraryMixin
 from galaxy.web.base.controller import UsesLibraryMixinItems
 from galaxy.web.base.controller import UsesTagsMixin
 
+from galaxy.managers import base
 from galaxy.managers import histories
 from galaxy.managers import hdas
 from galaxy.managers import folders
 from galaxy.managers.collections_util import api_payload_to_create_params
 from galaxy.managers.collections_util import dictify_dataset_collection_instance
+from galaxy.model import UPDATE_TIME_OVERLAP
+from galaxy.model.orm.now import now
 
 import logging
 log = logging.getLogger( __name__ )
@@ -61,12 +66,30 @@ class HistoryContentsController( BaseAPIController, UsesLibraryMixin, UsesLibrar
         :param  types:      (optional) kinds of contents to index (currently just
                             dataset, but dataset_collection will be added shortly).
         :type   types:      str
-
-        :rtype:     list
-        :returns:   dictionaries containing summary or detailed HDA information
+        :param  state:      (optional) comma separated states of the contents
+                            to index (the populated state of collections)
+        :param  extension:  (optional) comma separated extensions of the
+                            datasets to index (excludes collections)
+        :param  hid_gt:     (optional) index only contents with a greater hid
+        :param  hid_lt:     (optional) index only contents with a lesser hid
+        :param  order:      (optional) 'hid-asc' (default) or 'hid-dsc'
+        :param  limit:      (optional) index at most this many contents; with
+                            ``hid_gt`` (or ``hid_lt`` and ``order=hid-dsc``)
+                            set to the last hid returned, pages through the
+                            history
+        :param  update_time_gt: (optional) an ISO 8601 time, index only the
+                            contents updated (or whose dataset or collection
+                            changed) since; pass the
+                            ``X-Galaxy-Contents-Update-Time`` header of the
+                            previous response to poll for changes (the
+                            contents changed shortly before that response
+                            are indexed again)
+
+        :rtype:     generator
+        :returns:   dictionaries containing summary or detailed HDA information,
+                    streamed as a JSON array (or as newline delimited JSON to
+                    clients accepting ``application/x-ndjson``)
         """
-        rval = []
-
         history = self.history_manager.get_accessible( self.decode_id( history_id ), trans.user, current_history=trans.history )
 
         # Allow passing in type or types - for continuity rest of methods
@@ -80,7 +103,7 @@ class HistoryContentsController( BaseAPIController, UsesLibraryMixin, UsesLibrar
 
         contents_kwds = { 'types': types }
         if ids:
-            ids = map( lambda id: self.decode_id( id ), ids.split( ',' ) )
+            ids = self.decode_ids( ids.split( ',' ) )
             contents_kwds[ 'ids' ] = ids
             # If explicit ids given, always used detailed result.
             details = 'all'
@@ -94,22 +117,77 @@ class HistoryContentsController( BaseAPIController, UsesLibraryMixin, UsesLibrar
             details = kwd.get( 'details', None ) or kwd.get( 'dataset_details', None ) or []
             if details and details != 'all':
                 details = util.listify( details )
-
-        for content in history.contents_iter( **contents_kwds ):
-            encoded_content_id = trans.security.encode_id( content.id )
-            detailed = details == 'all' or ( encoded_content_id in details )
-
-            if isinstance( content, trans.app.model.HistoryDatasetAssociation ):
-                view = 'detailed' if detailed else 'summary'
-                hda_dict = self.hda_serializer.serialize_to_view( content, view=view, user=trans.user, trans=trans )
-                rval.append( hda_dict )
-
-            elif isinstance( content, trans.app.model.HistoryDatasetCollectionAssociation ):
-                view = 'element' if detailed else 'collection'
-                collection_dict = self.__collection_dict( trans, content, view=view )
-                rval.append( collection_dict )
-
-        return rval
+        contents_kwds.update( self._parse_contents_filters( kwd ) )
+
+        # taken before querying, so the contents changed while querying are indexed
+        # again, and less an overlap for changes stamped (by other processes, maybe
+        # with skewed clocks) before but committed after the query
+        update_time = now() - UPDATE_TIME_OVERLAP
+        trans.response.headers[ 'X-Galaxy-Contents-Update-Time' ] = update_time.isoformat()
+        contents = history.contents_iter( **contents_kwds )
+        return self.__serialized_contents( trans, contents, details )
+
+    def _parse_contents_filters( self, kwd ):
+        filters = {}
+        for key in ( 'state', 'extension' ):
+            if kwd.get( key, None ):
+                filters[ key ] = util.listify( kwd[ key ] )
+        for key in ( 'hid_gt', 'hid_lt', 'limit' ):
+            if kwd.get( key, None ) is not None:
+                try:
+                    filters[ key ] = int( kwd[ key ] )
+                except ValueError:
+                    raise exceptions.RequestParameterInvalidException( "%s must be an integer: %s" % ( key, kwd[ key ] ) )
+        if filters.get( 'limit', 0 ) < 0:
+            raise exceptions.RequestParameterInvalidException( "limit must not be negative" )
+        order = kwd.get( 'order', None )
+        if order is not None:
+            if order not in ( 'hid', 'hid-asc', 'hid-dsc' ):
+                raise exceptions.RequestParameterInvalidException( "unknown order: %s" % order )
+            filters[ 'order' ] = order
+        update_time_gt = kwd.get( 'update_time_gt', None )
+        if update_time_gt:
+            filters[ 'update_time_gt' ] = self._parse_update_time( update_time_gt )
+        return filters
+
+    def _parse_update_time( self, time_string ):
+        for time_format in ( "%Y-%m-%dT%H:%M:%S.%f", "%Y-%m-%dT%H:%M:%S" ):
+            try:
+                return datetime.datetime.strptime( time_string, time_format )
+            except ValueError:
+                pass
+        raise exceptions.RequestParameterInvalidException( "update_time_gt must be an ISO 8601 time: %s" % time_string )
+
+    def __serialized_contents( self, trans, contents, details ):
+        # pulled and serialized a batch at a time, as the response is streamed
+        contents = iter( contents )
+        while True:
+            batch_contents = list( islice( contents, base.PRELOAD_BATCH_SIZE ) )
+            if not batch_contents:
+                return
+            # the ids of the batch are encoded at once and handed to the serializers
+            ids = list( set( [ content.id for content in batch_contents ] + [ content.history_id for content in batch_contents ] ) )
+            encoded_ids = dict( zip( ids, trans.security.encode_ids( ids ) ) )
+            batch = [ ( content, encoded_ids[ content.id ] ) for content in batch_contents ]
+            # the hdas of each view are serialized at once, sparing a few queries per hda
+            hdas_by_view = { 'detailed': [], 'summary': [] }
+            for content, encoded_content_id in batch:
+                if isinstance( content, trans.app.model.HistoryDatasetAssociation ):
+                    detailed = details == 'all' or ( encoded_content_id in details )
+                    hdas_by_view[ 'detailed' if detailed else 'summary' ].append( content )
+            serialized_hdas = {}
+            for view, view_hdas in hdas_by_view.items():
+                serialized = self.hda_serializer.serialize_many( view_hdas, view=view, user=trans.user, trans=trans, encoded_ids=encoded_ids )
+                serialized_hdas.update( zip( view_hdas, serialized ) )
+
+            for content, encoded_content_id in batch:
+                if isinstance( content, trans.app.model.HistoryDatasetAssociation ):
+                    yield serialized_hdas[ content ]
+
+                elif isinstance( content, trans.app.model.HistoryDatasetCollectionAssociation ):
+                    detailed = details == 'all' or ( encoded_content_id in details )
+                    view = 'element' if detailed else 'collection'
+                    yield self.__collection_dict( trans, content, view=view )
 
     def __collection_dict( self, trans, dataset_collection_instance, view="collection" ):
         return dictify_dataset_collection_instance( dataset_collection_instance,
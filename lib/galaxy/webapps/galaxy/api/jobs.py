@@ -23,6 +23,9 @@ from galaxy.web.base.controller import UsesLibraryMixinItems
 
 log = logging.getLogger( __name__ )
 
+# jobs are loaded and streamed to clients in batches of this many
+JOBS_PER_QUERY_BATCH = 1000
+
 
 class JobController( BaseAPIController, UsesLibraryMixinItems ):
 
@@ -61,8 +64,10 @@ class JobController( BaseAPIController, UsesLibraryMixinItems ):
         :type   history_id: string
         :param  history_id: limit listing of jobs to those that match the history_id. If none, all are returned.
 
-        :rtype:     list
-        :returns:   list of dictionaries containing summary job information
+        :rtype:     generator
+        :returns:   dictionaries containing summary job information, streamed
+                    as a JSON array (or as newline delimited JSON to clients
+                    accepting ``application/x-ndjson``)
         """
         state = kwd.get( 'state', None )
         is_admin = trans.user_is_admin()
@@ -100,19 +105,21 @@ class JobController( BaseAPIController, UsesLibraryMixinItems ):
             except:
                 raise exceptions.ObjectAttributeInvalidException()
 
-        out = []
         if kwd.get( 'order_by' ) == 'create_time':
             order_by = trans.app.model.Job.create_time.desc()
         else:
             order_by = trans.app.model.Job.update_time.desc()
-        for job in query.order_by( order_by ).all():
+        # the collection view needs none of the eagerly loaded relations
+        jobs = query.order_by( order_by ).enable_eagerloads( False ).yield_per( JOBS_PER_QUERY_BATCH )
+        return self.__serialized_jobs( trans, jobs, is_admin, user_details )
+
+    def __serialized_jobs( self, trans, jobs, is_admin, user_details ):
+        for job in jobs:
             job_dict = job.to_dict( 'collection', system_details=is_admin )
             j = self.encode_all_ids( trans, job_dict, True )
             if user_details:
                 j['user_email'] = job.user.email
-            out.append(j)
-
-        return out
+            yield j
 
     @expose_api
     def show( self, trans, id, **kwd ):
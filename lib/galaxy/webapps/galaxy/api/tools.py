@@ -211,6 +211,15 @@ class ToolsController( BaseAPIController, UsesVisualizationMixin ):
         """
         POST /api/tools
         Executes tool using specified inputs and returns tool's outputs.
+
+        If ``background_job_creation`` is true in the payload (and the request
+        is made by a registered user without uploading files), jobs are
+        created in a background thread and the response (status 202) does
+        not list any outputs or jobs - these appear in the target history
+        as they are created. This is useful when mapping a tool over large
+        collections. The parameters are still checked before responding;
+        failures to create the jobs later appear in the history as an
+        errored dataset.
         """
         # HACK: for now, if action is rerun, rerun tool.
         action = payload.get( 'action', None )
@@ -254,6 +263,14 @@ class ToolsController( BaseAPIController, UsesVisualizationMixin ):
         for k, v in input_patch.iteritems():
             inputs[k] = v
 
+        # Creating jobs in the background requires a history and inputs that
+        # can be handed off to another thread as is, i.e. no uploaded files or
+        # library datasets copied into the history by this request.
+        background_job_creation = util.string_as_bool( payload.get( 'background_job_creation', False ) )
+        if background_job_creation and ( trans.user is None or ( target_history or trans.history ) is None or input_patch or
+                                         [ k for k in inputs if k.startswith( "files_" ) or k.startswith( "__files_" ) ] ):
+            background_job_creation = False
+
         # HACK: add run button so that tool.handle_input will run tool.
         inputs['runtool_btn'] = 'Execute'
         # TODO: encode data ids and decode ids.
@@ -271,6 +288,25 @@ class ToolsController( BaseAPIController, UsesVisualizationMixin ):
         # through API currently).
         incoming = params.__dict__
         process_state = "update" if "tool_state" in incoming else "populate"
+        if background_job_creation:
+            # Check the parameters (of the first job) now, so that errors get
+            # the usual response, and return before creating the jobs. Outputs
+            # will appear in the history as jobs are created, failures as an
+            # errored dataset.
+            history = target_history or trans.history
+            errors = tool.check_input( trans, incoming, history=history, process_state=process_state, source="json" )
+            if errors:
+                trans.response.status = 400
+                return { "message": { "type": "error", "data" : errors } }
+            trans.app.background_tool_executor.put( tool.id, tool.version, trans.user.id, history.id, incoming )
+            trans.response.status = 202
+            return {
+                "outputs": [],
+                "output_collections": [],
+                "jobs": [],
+                "implicit_collections": [],
+                "background_job_creation": True,
+            }
         template, vars = tool.handle_input( trans, incoming, history=target_history, process_state=process_state, source="json" )
         if 'errors' in vars:
             trans.response.status = 400
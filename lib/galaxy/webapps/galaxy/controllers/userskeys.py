@@ -12,6 +12,7 @@ from sqlalchemy import false
 
 from galaxy import web
 from galaxy import util
+from galaxy.managers.api_keys import invalidate_api_key_principals
 from galaxy.web.base.controller import BaseUIController, UsesFormDefinitionsMixin
 
 log = logging.getLogger( __name__ )
@@ -48,6 +49,7 @@ class User( BaseUIController, UsesFormDefinitionsMixin ):
             new_key.key = trans.app.security.get_new_guid()
             trans.sa_session.add( new_key )
             trans.sa_session.flush()
+            invalidate_api_key_principals( trans.app )
             message = "A new web API key has been generated for (%s)" % escape( new_key.user.email )
             status = "done"
         return trans.response.send_redirect( web.url_for( controller='userskeys',
@@ -24,6 +24,7 @@ class WorkRequestContext( ProvidesAppContext, ProvidesUserContext, ProvidesHisto
         self.__user = user
         self.__history = history
         self.api_inherit_admin = False
+        self.workflow_building_mode = False
 
     def get_history( self, create=False ):
         if create:
@@ -0,0 +1,233 @@
+"""
+A long running "metadata daemon" that sets metadata on behalf of jobs.
+
+Setting metadata externally normally starts a fresh interpreter per job,
+which then has to import the Galaxy model and load the datatypes registry
+before any metadata is set.  The daemon does this once and listens on a
+local (Unix domain) socket.  Each request is handled in a forked child of the
+warm daemon process, so requests are isolated from each other and from the
+daemon while still sharing the already imported modules and loaded
+registries.
+
+Start the daemon on the host running the jobs with::
+
+    % python lib/galaxy_ext/metadata/daemon.py --socket database/metadata.sock
+
+and set ``metadata_daemon_socket`` in Galaxy's configuration to the same path.
+The command generated for jobs calls ``set_metadata_via_daemon`` which falls
+back to setting metadata in process when the daemon cannot be reached.
+
+A request is a single line of JSON with the job working directory (``cwd``),
+the set_metadata command line arguments (``argv``) and optionally the number
+of worker ``processes`` to use, the response is a single line of JSON with an
+exit ``status`` and a ``message``.
+"""
+
+import errno
+import fcntl
+import json
+import logging
+import os
+import socket
+import sys
+import SocketServer
+from argparse import ArgumentParser
+
+log = logging.getLogger( __name__ )
+
+DESCRIPTION = "Set metadata for Galaxy jobs from a warm, long running process."
+# Maximum number of datatypes registries kept loaded by the daemon.
+MAX_CACHED_REGISTRIES = 4
+
+
+def set_metadata_via_daemon( socket_path, processes=None, argv=None ):
+    """
+    Ask the metadata daemon listening on ``socket_path`` to set metadata as
+    described by ``argv`` (defaults to ``sys.argv``) for the current working
+    directory, setting it in this process if the daemon is not available.
+    """
+    if argv is None:
+        argv = sys.argv
+    request = dict( cwd=os.path.abspath( os.getcwd() ), argv=argv[1:], processes=processes )
+    sock = socket.socket( socket.AF_UNIX, socket.SOCK_STREAM )
+    try:
+        sock.connect( socket_path )
+    except socket.error, e:
+        sock.close()
+        print >> sys.stderr, "Metadata daemon unavailable at %s (%s), setting metadata locally." % ( socket_path, e )
+        from galaxy_ext.metadata.set_metadata import set_metadata
+        return set_metadata( processes=processes )
+    try:
+        sock.sendall( "%s\n" % json.dumps( request ) )
+        response = json.loads( sock.makefile( 'rb' ).readline() or '{"status": 1, "message": "No response from metadata daemon"}' )
+    finally:
+        sock.close()
+    if response[ 'status' ]:
+        print >> sys.stderr, response[ 'message' ]
+        sys.exit( response[ 'status' ] )
+
+
+class MetadataRequestHandler( SocketServer.StreamRequestHandler ):
+    """
+    Handle one request, runs in a child forked for it by the server.
+    """
+
+    def setup( self ):
+        # a stalled client only holds up its own child
+        self.timeout = self.server.request_timeout
+        SocketServer.StreamRequestHandler.setup( self )
+
+    def handle( self ):
+        request = None
+        try:
+            try:
+                request = json.loads( self.rfile.readline() )
+                datatypes_config = _datatypes_config( request )
+            except Exception:
+                raise Exception( "Malformed metadata request" )
+            self.connection.settimeout( None )
+            os.chdir( request[ 'cwd' ] )
+            sys.argv = [ "set_metadata" ] + request[ 'argv' ]
+            datatypes_registry = self.server.child_datatypes_registry( datatypes_config )
+            self.server.set_metadata( processes=request.get( 'processes' ), datatypes_registry=datatypes_registry )
+            response = dict( status=0, message="Metadata set" )
+        except Exception, e:
+            log.exception( "Failed to set metadata for request %s" % request )
+            response = dict( status=1, message="Failed to set metadata: %s" % e )
+        self.wfile.write( "%s\n" % json.dumps( response ) )
+
+
+class MetadataDaemon( SocketServer.ForkingMixIn, SocketServer.UnixStreamServer ):
+    """
+    Forking Unix socket server. Requests are read and handled in the forked
+    children, the daemon itself only accepts connections and forks, so a slow
+    client never holds up the others.
+
+    Children use the datatypes registries loaded by the daemon. A child that
+    has to load one itself reports its configuration to the daemon (through
+    a pipe), which then loads it before forking the next request so that
+    later requests reuse it, as it does for the configurations preloaded
+    with ``--datatypes_config``.
+    """
+
+    def __init__( self, socket_path, max_children=None, request_timeout=30 ):
+        if os.path.exists( socket_path ):
+            os.unlink( socket_path )
+        # Only the user running the daemon (i.e. Galaxy) may connect.
+        old_umask = os.umask( 0077 )
+        try:
+            SocketServer.UnixStreamServer.__init__( self, socket_path, MetadataRequestHandler )
+        finally:
+            os.umask( old_umask )
+        if max_children:
+            self.max_children = max_children
+        self.socket_path = socket_path
+        self.request_timeout = request_timeout
+        self._registries = {}
+        # children write the datatypes configurations they loaded to the pipe
+        self._loaded_read, self._loaded_write = os.pipe()
+        fcntl.fcntl( self._loaded_read, fcntl.F_SETFL, fcntl.fcntl( self._loaded_read, fcntl.F_GETFL ) | os.O_NONBLOCK )
+        # Importing set_metadata loads and configures the model, this is the
+        # startup cost the daemon exists to avoid paying per job.
+        from galaxy_ext.metadata import set_metadata
+        self.set_metadata = set_metadata.set_metadata
+        self._load_datatypes_registry = set_metadata.load_datatypes_registry
+
+    def process_request( self, request, client_address ):
+        self.load_reported_registries()
+        SocketServer.ForkingMixIn.process_request( self, request, client_address )
+
+    def load_reported_registries( self ):
+        """
+        Load the datatypes registries that children had to load themselves.
+        """
+        reported = ''
+        while True:
+            try:
+                data = os.read( self._loaded_read, 4096 )
+            except OSError, e:
+                if e.errno == errno.EAGAIN:
+                    break
+                raise
+            if not data:
+                break
+            reported += data
+        for datatypes_config in set( reported.splitlines() ):
+            try:
+                self.datatypes_registry( datatypes_config )
+            except Exception:
+                log.exception( "Failed to load datatypes registry from %s" % datatypes_config )
+
+    def child_datatypes_registry( self, datatypes_config ):
+        """
+        Return the datatypes registry for ``datatypes_config`` in a child,
+        reporting it to the daemon if it was not loaded yet.
+        """
+        registry = self._cached_registry( datatypes_config )
+        if registry is None:
+            registry = self.datatypes_registry( datatypes_config )
+            os.write( self._loaded_write, "%s\n" % os.path.abspath( datatypes_config ) )
+        return registry
+
+    def _cached_registry( self, datatypes_config ):
+        datatypes_config = os.path.abspath( datatypes_config )
+        cached = self._registries.get( datatypes_config )
+        if cached is None or cached[ 0 ] != os.path.getmtime( datatypes_config ):
+            return None
+        return cached[ 1 ]
+
+    def datatypes_registry( self, datatypes_config ):
+        registry = self._cached_registry( datatypes_config )
+        if registry is not None:
+            return registry
+        datatypes_config = os.path.abspath( datatypes_config )
+        if len( self._registries ) >= MAX_CACHED_REGISTRIES and datatypes_config not in self._registries:
+            # Integrated configurations are temporary files named per
+            # Galaxy start, drop the oldest.
+            oldest = min( self._registries, key=lambda k: self._registries[ k ][ 0 ] )
+            del self._registries[ oldest ]
+        log.info( "Loading datatypes registry from %s" % datatypes_config )
+        cached = ( os.path.getmtime( datatypes_config ), self._load_datatypes_registry( datatypes_config ) )
+        self._registries[ datatypes_config ] = cached
+        return cached[ 1 ]
+
+    def server_close( self ):
+        SocketServer.UnixStreamServer.server_close( self )
+        if self._loaded_read is not None:
+            os.close( self._loaded_read )
+            os.close( self._loaded_write )
+            self._loaded_read = self._loaded_write = None
+        if os.path.exists( self.socket_path ):
+            os.unlink( self.socket_path )
+
+
+def _datatypes_config( request ):
+    # The datatypes configuration is the first set_metadata argument and may
+    # be relative to the job's working directory.
+    return os.path.join( request[ 'cwd' ], request[ 'argv' ][ 0 ] )
+
+
+def main( argv=None ):
+    arg_parser = ArgumentParser( description=DESCRIPTION )
+    arg_parser.add_argument( "--socket", required=True, help="path of the Unix domain socket to listen on" )
+    arg_parser.add_argument( "--datatypes_config", action="append", default=[], help="datatypes configuration to preload (may be repeated)" )
+    arg_parser.add_argument( "--max_children", type=int, default=None, help="maximum number of requests handled concurrently" )
+    args = arg_parser.parse_args( argv )
+    logging.basicConfig( level=logging.INFO )
+
+    server = MetadataDaemon( args.socket, max_children=args.max_children )
+    for datatypes_config in args.datatypes_config:
+        server.datatypes_registry( datatypes_config )
+    log.info( "Metadata daemon listening on %s" % args.socket )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    # insert *this* galaxy before all others on sys.path
+    sys.path.insert( 1, os.path.abspath( os.path.join( os.path.dirname( __file__ ), os.pardir, os.pardir ) ) )
+    main()
@@ -9,11 +9,15 @@ Galaxy should be importable on sys.path and output_filename_override should be
 set to the path of the dataset on which metadata is being set
 (output_filename_override could previously be left empty and the path would be
 constructed automatically).
+
+Outputs may be processed in parallel by passing ``processes`` to
+``set_metadata``, see also ``galaxy_ext.metadata.daemon``.
 """
 
 import cPickle
 import json
 import logging
+import multiprocessing
 import os
 import sys
 
@@ -34,6 +38,10 @@ assert sys.version_info[:2] >= ( 2, 6 ) and sys.version_info[:2] <= ( 2, 7 ), 'P
 logging.basicConfig()
 log = logging.getLogger( __name__ )
 
+# State shared with set_metadata_for_output, populated by set_metadata before
+# any pool workers are forked.
+_worker_state = {}
+
 galaxy.model.Job()  # this looks REAL stupid, but it is REQUIRED in order for SA to insert parameters into the classes defined by the mappers --> it appears that instantiating ANY mapper'ed class would suffice here
 
 
@@ -66,7 +74,15 @@ def set_meta_with_tool_provided( dataset_instance, file_dict, set_meta_kwds, dat
         setattr( dataset_instance.metadata, metadata_name, metadata_value )
 
 
-def set_metadata():
+def set_metadata( processes=None, datatypes_registry=None ):
+    """
+    Set metadata on the datasets described by ``sys.argv``.
+
+    If ``processes`` is greater than one, datasets are handed out to a pool of
+    that many worker processes.  A preloaded ``datatypes_registry`` may be
+    supplied (e.g. by the metadata daemon) to skip loading the datatypes
+    configuration named on the command line.
+    """
     # locate galaxy_root for loading datatypes
     galaxy_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir, os.pardir))
     galaxy.datatypes.metadata.MetadataTempFile.tmp_dir = tool_job_working_directory = os.path.abspath(os.getcwd())
@@ -83,8 +99,8 @@ def set_metadata():
 
     # Set up datatypes registry
     datatypes_config = sys.argv.pop( 1 )
-    datatypes_registry = galaxy.datatypes.registry.Registry()
-    datatypes_registry.load_datatypes( root_dir=galaxy_root, config=datatypes_config )
+    if datatypes_registry is None:
+        datatypes_registry = load_datatypes_registry( datatypes_config, galaxy_root=galaxy_root )
     galaxy.model.set_datatypes_registry( datatypes_registry )
 
     job_metadata = sys.argv.pop( 1 )
@@ -101,46 +117,28 @@ def set_metadata():
             except:
                 continue
 
-    for filenames in sys.argv[1:]:
-        fields = filenames.split( ',' )
-        filename_in = fields.pop( 0 )
-        filename_kwds = fields.pop( 0 )
-        filename_out = fields.pop( 0 )
-        filename_results_code = fields.pop( 0 )
-        dataset_filename_override = fields.pop( 0 )
-        # Need to be careful with the way that these parameters are populated from the filename splitting,
-        # because if a job is running when the server is updated, any existing external metadata command-lines
-        # will not have info about the newly added override_metadata file
-        if fields:
-            override_metadata = fields.pop( 0 )
-        else:
-            override_metadata = None
-        set_meta_kwds = stringify_dictionary_keys( json.load( open( filename_kwds ) ) )  # load kwds; need to ensure our keywords are not unicode
+    _worker_state.update( datatypes_registry=datatypes_registry,
+                          existing_job_metadata_dict=existing_job_metadata_dict,
+                          tool_job_working_directory=tool_job_working_directory,
+                          max_metadata_value_size=max_metadata_value_size )
+    filenames_list = sys.argv[1:]
+    set_meta_kwds = {}
+    if filenames_list:
+        # kwds of the last output are reused for new primary datasets below
+        set_meta_kwds = _load_set_meta_kwds( filenames_list[-1].split( ',' )[1] )
+    processes = min( processes or 1, len( filenames_list ) )
+    if processes > 1:
+        # Workers are forked after the registry is loaded, so they inherit it
+        # through _worker_state rather than loading it again.
+        pool = multiprocessing.Pool( processes )
         try:
-            dataset = cPickle.load( open( filename_in ) )  # load DatasetInstance
-            dataset.dataset.external_filename = dataset_filename_override
-            files_path = os.path.abspath(os.path.join( tool_job_working_directory, "dataset_%s_files" % (dataset.dataset.id) ))
-            dataset.dataset.external_extra_files_path = files_path
-            if dataset.dataset.id in existing_job_metadata_dict:
-                dataset.extension = existing_job_metadata_dict[ dataset.dataset.id ].get( 'ext', dataset.extension )
-            # Metadata FileParameter types may not be writable on a cluster node, and are therefore temporarily substituted with MetadataTempFiles
-            if override_metadata:
-                override_metadata = json.load( open( override_metadata ) )
-                for metadata_name, metadata_file_override in override_metadata:
-                    if galaxy.datatypes.metadata.MetadataTempFile.is_JSONified_value( metadata_file_override ):
-                        metadata_file_override = galaxy.datatypes.metadata.MetadataTempFile.from_JSON( metadata_file_override )
-                    setattr( dataset.metadata, metadata_name, metadata_file_override )
-            file_dict = existing_job_metadata_dict.get( dataset.dataset.id, {} )
-            set_meta_with_tool_provided( dataset, file_dict, set_meta_kwds, datatypes_registry )
-            if max_metadata_value_size:
-                for k, v in dataset.metadata.items():
-                    if total_size(v) > max_metadata_value_size:
-                        log.info("Key %s too large for metadata, discarding" % k)
-                        dataset.metadata.remove_key(k)
-            dataset.metadata.to_JSON_dict( filename_out )  # write out results of set_meta
-            json.dump( ( True, 'Metadata has been set successfully' ), open( filename_results_code, 'wb+' ) )  # setting metadata has succeeded
-        except Exception, e:
-            json.dump( ( False, str( e ) ), open( filename_results_code, 'wb+' ) )  # setting metadata has failed somehow
+            pool.map( set_metadata_for_output, filenames_list, chunksize=1 )
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        for filenames in filenames_list:
+            set_metadata_for_output( filenames )
 
     for i, ( filename, file_dict ) in enumerate( new_job_metadata_dict.iteritems(), start=1 ):
         new_dataset = galaxy.model.Dataset( id=-i, external_filename=os.path.join( tool_job_working_directory, file_dict[ 'filename' ] ) )
@@ -156,4 +154,68 @@ def set_metadata():
             for value in existing_job_metadata_dict.values() + new_job_metadata_dict.values():
                 job_metadata_fh.write( "%s\n" % ( json.dumps( value ) ) )
 
+    _worker_state.clear()
     clear_mappers()
+
+
+def load_datatypes_registry( datatypes_config, galaxy_root=None ):
+    if galaxy_root is None:
+        galaxy_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir, os.pardir))
+    datatypes_registry = galaxy.datatypes.registry.Registry()
+    datatypes_registry.load_datatypes( root_dir=galaxy_root, config=datatypes_config )
+    return datatypes_registry
+
+
+def set_metadata_for_output( filenames ):
+    """
+    Set metadata on a single output described by a comma separated command
+    line argument, writing the results to the files it names.  Must be called
+    from within ``set_metadata`` (or a pool worker started by it).
+    """
+    datatypes_registry = _worker_state[ 'datatypes_registry' ]
+    existing_job_metadata_dict = _worker_state[ 'existing_job_metadata_dict' ]
+    tool_job_working_directory = _worker_state[ 'tool_job_working_directory' ]
+    max_metadata_value_size = _worker_state[ 'max_metadata_value_size' ]
+    fields = filenames.split( ',' )
+    filename_in = fields.pop( 0 )
+    filename_kwds = fields.pop( 0 )
+    filename_out = fields.pop( 0 )
+    filename_results_code = fields.pop( 0 )
+    dataset_filename_override = fields.pop( 0 )
+    # Need to be careful with the way that these parameters are populated from the filename splitting,
+    # because if a job is running when the server is updated, any existing external metadata command-lines
+    # will not have info about the newly added override_metadata file
+    if fields:
+        override_metadata = fields.pop( 0 )
+    else:
+        override_metadata = None
+    set_meta_kwds = _load_set_meta_kwds( filename_kwds )
+    try:
+        dataset = cPickle.load( open( filename_in ) )  # load DatasetInstance
+        dataset.dataset.external_filename = dataset_filename_override
+        files_path = os.path.abspath(os.path.join( tool_job_working_directory, "dataset_%s_files" % (dataset.dataset.id) ))
+        dataset.dataset.external_extra_files_path = files_path
+        if dataset.dataset.id in existing_job_metadata_dict:
+            dataset.extension = existing_job_metadata_dict[ dataset.dataset.id ].get( 'ext', dataset.extension )
+        # Metadata FileParameter types may not be writable on a cluster node, and are therefore temporarily substituted with MetadataTempFiles
+        if override_metadata:
+            override_metadata = json.load( open( override_metadata ) )
+            for metadata_name, metadata_file_override in override_metadata:
+                if galaxy.datatypes.metadata.MetadataTempFile.is_JSONified_value( metadata_file_override ):
+                    metadata_file_override = galaxy.datatypes.metadata.MetadataTempFile.from_JSON( metadata_file_override )
+                setattr( dataset.metadata, metadata_name, metadata_file_override )
+        file_dict = existing_job_metadata_dict.get( dataset.dataset.id, {} )
+        set_meta_with_tool_provided( dataset, file_dict, set_meta_kwds, datatypes_registry )
+        if max_metadata_value_size:
+            for k, v in dataset.metadata.items():
+                if total_size(v) > max_metadata_value_size:
+                    log.info("Key %s too large for metadata, discarding" % k)
+                    dataset.metadata.remove_key(k)
+        dataset.metadata.to_JSON_dict( filename_out )  # write out results of set_meta
+        json.dump( ( True, 'Metadata has been set successfully' ), open( filename_results_code, 'wb+' ) )  # setting metadata has succeeded
+    except Exception, e:
+        json.dump( ( False, str( e ) ), open( filename_results_code, 'wb+' ) )  # setting metadata has failed somehow
+
+
+def _load_set_meta_kwds( filename_kwds ):
+    return stringify_dictionary_keys( json.load( open( filename_kwds ) ) )  # load kwds; need to ensure our keywords are not unicode
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+"""
+Record which backend of a distributed or hierarchical object store holds each
+dataset, checking each backend for the dataset's file.
+
+For distributed object stores the `object_store_id` of datasets without a
+valid backend id (e.g. after switching from a disk object store) is set.
+The locations are also recorded in the object store's location cache (see
+the `location_cache` attribute of the `backends` element in the object store
+configuration) so that Galaxy does not need to look for the datasets.
+
+Usage: python scripts/relocate_datasets.py config/galaxy.ini [--all] [--info_only]
+"""
+
+import ConfigParser
+import os
+import sys
+from optparse import OptionParser
+
+new_path = [ os.path.join( os.getcwd(), "lib" ) ]
+new_path.extend( sys.path[1:] )  # remove scripts/ from the path
+sys.path = new_path
+
+import galaxy.config
+import galaxy.model.mapping
+from galaxy.objectstore import build_object_store_from_config, DistributedObjectStore, NestedObjectStore
+
+
+def main():
+    parser = OptionParser( usage="%prog [options] config/galaxy.ini" )
+    parser.add_option( "-a", "--all", action="store_true", dest="all", default=False,
+                       help="locate all datasets, not only those without a valid backend id (distributed object stores)" )
+    parser.add_option( "-i", "--info_only", action="store_true", dest="info_only", default=False,
+                       help="report the locations found without recording them" )
+    ( options, args ) = parser.parse_args()
+    if len( args ) != 1:
+        parser.print_help()
+        sys.exit()
+    ini_file = args[0]
+
+    config_parser = ConfigParser.ConfigParser( {'here': os.getcwd()} )
+    config_parser.read( ini_file )
+    config_dict = {}
+    for key, value in config_parser.items( "app:main" ):
+        config_dict[key] = value
+    config = galaxy.config.Configuration( **config_dict )
+
+    app = RelocateDatasetsApplication( config )
+    try:
+        if not isinstance( app.object_store, NestedObjectStore ):
+            print "The object store is not a distributed or hierarchical object store, nothing to do."
+            sys.exit( 1 )
+        relocate_datasets( app, all=options.all, info_only=options.info_only )
+    finally:
+        app.shutdown()
+
+
+def relocate_datasets( app, all=False, info_only=False ):
+    object_store = app.object_store
+    sa_session = app.sa_session
+    distributed = isinstance( object_store, DistributedObjectStore )
+    if not distributed and object_store.location_cache.path is None:
+        print "No location_cache is configured for the object store, locations will not be recorded."
+        info_only = True
+    datasets = sa_session.query( app.model.Dataset ).filter_by( purged=False )
+    dataset_count = datasets.count()
+    print "Locating %i datasets..." % dataset_count
+    located = updated = missing = 0
+    for i, dataset in enumerate( datasets.enable_eagerloads( False ).yield_per( 1000 ) ):
+        if distributed and not all and dataset.object_store_id in object_store.backends:
+            continue
+        if info_only:
+            # Look without recording the location
+            backend_id = None
+            for id, store in object_store.backends.items():
+                if store.exists( dataset ):
+                    backend_id = id
+                    break
+        else:
+            backend_id = object_store.locate( dataset )
+        if backend_id is None:
+            missing += 1
+            print "Dataset %i not found in any backend" % dataset.id
+            continue
+        located += 1
+        if distributed and dataset.object_store_id != backend_id:
+            print "Dataset %i: backend %s -> %s" % ( dataset.id, dataset.object_store_id, backend_id )
+            updated += 1
+            if not info_only:
+                dataset.object_store_id = backend_id
+                sa_session.add( dataset )
+                if not updated % 1000:
+                    sa_session.flush()
+        if not ( i + 1 ) % 10000:
+            print "Processed %i of %i datasets" % ( i + 1, dataset_count )
+    sa_session.flush()
+    print "Located %i datasets, %i backend ids %s, %i datasets not found" % ( located, updated, "to update" if info_only else "updated", missing )
+
+
+class RelocateDatasetsApplication( object ):
+    """Encapsulates the state of a Universe application"""
+    def __init__( self, config ):
+        if config.database_connection is False:
+            config.database_connection = "sqlite:///%s?isolation_level=IMMEDIATE" % config.database
+        self.object_store = build_object_store_from_config( config )
+        # Setup the database engine and ORM
+        self.model = galaxy.model.mapping.init( config.file_path, config.database_connection, engine_options={}, create_tables=False, object_store=self.object_store )
+
+    @property
+    def sa_session( self ):
+        return self.model.context.current
+
+    def shutdown( self ):
+        self.object_store.shutdown()
+
+
+if __name__ == "__main__":
+    main()
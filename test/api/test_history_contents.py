@@ -34,6 +34,28 @@ class HistoryContentsApiTestCase( api.ApiTestCase, TestsDatasets ):
         hda_details = self.__check_for_hda( contents_response, hda1 )
         self.__assert_hda_has_full_details( hda_details )
 
+    def test_index_pages_by_hid( self ):
+        hdas = [ self._new_dataset( self.history_id ) for i in range( 3 ) ]
+        first_page = self._get( "histories/%s/contents?limit=2" % self.history_id ).json()
+        assert [ c[ "id" ] for c in first_page ] == [ hdas[ 0 ][ "id" ], hdas[ 1 ][ "id" ] ]
+        second_page = self._get( "histories/%s/contents?limit=2&hid_gt=%d" % ( self.history_id, first_page[ -1 ][ "hid" ] ) ).json()
+        assert [ c[ "id" ] for c in second_page ] == [ hdas[ 2 ][ "id" ] ]
+
+    def test_index_polls_with_update_time( self ):
+        hda1 = self._new_dataset( self.history_id )
+        self._wait_for_history( self.history_id, assert_ok=True )
+        contents_response = self._get( "histories/%s/contents" % self.history_id )
+        update_time = contents_response.headers[ "X-Galaxy-Contents-Update-Time" ]
+        assert hda1[ "id" ] in [ c[ "id" ] for c in contents_response.json() ]
+        hda2 = self._new_dataset( self.history_id )
+        changed = self._get( "histories/%s/contents" % self.history_id, dict( update_time_gt=update_time ) ).json()
+        # the contents changed shortly before the first response may be sent again
+        assert hda2[ "id" ] in [ c[ "id" ] for c in changed ]
+
+    def test_index_invalid_filters( self ):
+        contents_response = self._get( "histories/%s/contents?limit=few" % self.history_id )
+        self._assert_status_code_is( contents_response, 400 )
+
     def test_show_hda( self ):
         hda1 = self._new_dataset( self.history_id )
         show_response = self.__show( hda1 )
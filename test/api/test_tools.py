@@ -5,6 +5,7 @@ from .helpers import DatasetPopulator
 from .helpers import DatasetCollectionPopulator
 from .helpers import LibraryPopulator
 from .helpers import skip_without_tool
+from .helpers import wait_on
 from base.test_data import TestDataResolver
 
 
@@ -587,6 +588,46 @@ class ToolsTestCase( api.ApiTestCase ):
         }
         self._run_and_check_simple_collection_mapping( history_id, inputs )
 
+    @skip_without_tool( "cat1" )
+    def test_map_over_collection_in_background( self ):
+        history_id = self.dataset_populator.new_history()
+        hdca_id = self.__build_pair( history_id, [ "123", "456" ] )
+        payload = self.dataset_populator.run_tool_payload(
+            tool_id="cat1",
+            inputs={ "input1": { 'batch': True, 'values': [ { 'src': 'hdca', 'id': hdca_id } ] } },
+            history_id=history_id,
+        )
+        payload[ "background_job_creation" ] = True
+        create_response = self._post( "tools", data=payload )
+        self._assert_status_code_is( create_response, 202 )
+        create = create_response.json()
+        assert create[ "background_job_creation" ]
+        self.assertEquals( len( create[ "jobs" ] ), 0 )
+
+        def implicit_collection():
+            contents = self._get( "histories/%s/contents" % history_id ).json()
+            collections = [ c for c in contents if c[ "history_content_type" ] == "dataset_collection" and c[ "id" ] != hdca_id ]
+            return collections[ 0 ] if collections else None
+
+        wait_on( implicit_collection, "implicit collection" )
+        self.dataset_populator.wait_for_history( history_id, assert_ok=True )
+        contents = self._get( "histories/%s/contents" % history_id ).json()
+        output_contents = [ self.dataset_populator.get_history_dataset_content( history_id, dataset=c ).strip() for c in contents if c[ "history_content_type" ] == "dataset" and c[ "hid" ] > 3 ]
+        self.assertEquals( sorted( output_contents ), [ "123", "456" ] )
+
+    @skip_without_tool( "multi_select" )
+    def test_validation_in_background( self ):
+        history_id = self.dataset_populator.new_history()
+        payload = self.dataset_populator.run_tool_payload(
+            tool_id="multi_select",
+            inputs={ 'select_ex': 'not_option' },
+            history_id=history_id,
+        )
+        payload[ "background_job_creation" ] = True
+        # checked before returning, not after
+        response = self._post( "tools", data=payload )
+        self._assert_status_code_is( response, 400 )
+
     @skip_without_tool( "output_action_change_format" )
     def test_map_over_with_output_format_actions( self ):
         for use_action in ["do", "dont"]:
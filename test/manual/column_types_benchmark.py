@@ -0,0 +1,74 @@
+"""
+Compare guessing the column types of tabular data one field at a time (as
+``Tabular.set_meta`` used to) against guessing them for blocks of lines at a
+time with ``guess_block_column_type``.  Unless files are given, a tabular file
+with a mix of int, float, list and str columns is generated.
+
+% python test/manual/column_types_benchmark.py --lines 1000000
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+galaxy_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir, os.path.pardir))
+sys.path[1:1] = [ os.path.join( galaxy_root, "lib" ) ]
+
+from argparse import ArgumentParser
+
+import galaxy.model  # noqa
+from galaxy.datatypes.scan import scan_file
+from galaxy.datatypes.tabular import ColumnTypesVisitor
+
+DESCRIPTION = "Benchmark column type guessing for tabular data."
+
+
+def main(argv=None):
+    arg_parser = ArgumentParser(description=DESCRIPTION)
+    arg_parser.add_argument("--lines", type=int, default=1000000, help="number of lines of the generated file")
+    arg_parser.add_argument("--max_data_lines", type=int, default=None, help="stop after this many data lines (set_meta uses 100000, default is the whole file)")
+    arg_parser.add_argument("--iterations", type=int, default=1)
+    arg_parser.add_argument("files", nargs="*", help="tabular files to guess column types of")
+    args = arg_parser.parse_args(argv)
+
+    files = args.files
+    generated = None
+    if not files:
+        generated = _generate(args.lines)
+        files = [generated]
+    try:
+        print "%-40s %12s %12s  %s" % ("file", "fields (s)", "blocks (s)", "column types")
+        for path in files:
+            field_types, field_time = _time(path, args, block_size=None)
+            block_types, block_time = _time(path, args)
+            if field_types != block_types:
+                print "MISMATCH for %s: %s != %s" % (path, block_types, field_types)
+            print "%-40s %12.3f %12.3f  %s" % (os.path.basename(path)[:40], field_time, block_time, ",".join(block_types))
+    finally:
+        if generated:
+            os.remove(generated)
+
+
+def _time(path, args, **kwd):
+    start = time.time()
+    for i in range(args.iterations):
+        visitor = ColumnTypesVisitor(skip=0, max_data_lines=args.max_data_lines, **kwd)
+        scan_file(path, [visitor])
+        visitor.finish_column_types()
+    return visitor.column_types, (time.time() - start) / args.iterations
+
+
+def _generate(lines):
+    fd, path = tempfile.mkstemp(suffix=".tabular")
+    rand = random.Random(0)
+    with os.fdopen(fd, "w") as out:
+        for i in xrange(lines):
+            out.write("chr%d\t%d\t%d\t%.3f\t%s\t%d,%d\tNA\n" % (
+                i % 22 + 1, i * 10, i * 10 + rand.randint(1, 1000), rand.random(), rand.choice("+-."), i, i + 1
+            ))
+    return path
+
+
+if __name__ == "__main__":
+    main()
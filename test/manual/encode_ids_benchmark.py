@@ -0,0 +1,58 @@
+"""
+Compare encoding and decoding ids one at a time with ``SecurityHelper.encode_id``
+and ``decode_id`` against encoding and decoding them at once with
+``encode_ids`` and ``decode_ids``, with and without recently encoded ids
+remembered, and time ``encode_all_ids`` on history contents like dictionaries.
+
+% python test/manual/encode_ids_benchmark.py --ids 50000
+"""
+import os
+import sys
+import time
+
+galaxy_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir, os.path.pardir))
+sys.path[1:1] = [ os.path.join( galaxy_root, "lib" ) ]
+
+from argparse import ArgumentParser
+
+from galaxy.web.security import SecurityHelper
+
+DESCRIPTION = "Benchmark encoding and decoding ids one at a time and at once."
+
+
+def main(argv=None):
+    arg_parser = ArgumentParser(description=DESCRIPTION)
+    arg_parser.add_argument("--ids", type=int, default=50000, help="number of ids")
+    arg_parser.add_argument("--first_id", type=int, default=1000000, help="first id")
+    args = arg_parser.parse_args(argv)
+
+    ids = range(args.first_id, args.first_id + args.ids)
+    encoded_ids = SecurityHelper(id_secret="secret").encode_ids(ids)
+    # Remembering all ids, as when serializing again or serializing other
+    # attributes of the same items.
+    warm = SecurityHelper(id_secret="secret")
+    warm.encode_ids(ids)
+    warm.decode_ids(encoded_ids)
+
+    print "%-40s %12s" % ("%d ids" % len(ids), "time (s)")
+    _time("encode_id", lambda helper: [helper.encode_id(i) for i in ids])
+    _time("encode_ids", lambda helper: helper.encode_ids(ids))
+    _time("encode_ids (remembered)", lambda helper: helper.encode_ids(ids), helper=warm)
+    _time("decode_id", lambda helper: [helper.decode_id(i) for i in encoded_ids])
+    _time("decode_ids", lambda helper: helper.decode_ids(encoded_ids))
+    _time("decode_ids (remembered)", lambda helper: helper.decode_ids(encoded_ids), helper=warm)
+
+    def contents():
+        return [dict(id=i, history_id=1, dataset_id=i + 1, name="dataset %d" % i, tags=[]) for i in ids]
+    _time("encode_all_ids (contents)", lambda helper: helper.encode_all_ids(dict(contents=contents()), recursive=True))
+
+
+def _time(name, function, helper=None):
+    helper = helper or SecurityHelper(id_secret="secret")
+    start = time.time()
+    function(helper)
+    print "%-40s %12.3f" % (name, time.time() - start)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Compare the per-iteration cost of finding runnable jobs in the job handler
+queue using the full anti-join query previously run on every iteration against
+the incremental ``JobReadinessTracker``.
+
+Seeds a SQLite database with many NEW jobs (a fraction of which wait on
+unfinished inputs), then times a number of handler "ticks" with each approach,
+finishing a few input datasets between ticks.
+
+% python test/manual/job_readiness_benchmark.py --jobs 50000
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+galaxy_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir, os.path.pardir))
+sys.path[1:1] = [ os.path.join( galaxy_root, "lib" ) ]
+
+from argparse import ArgumentParser
+
+from galaxy import eggs
+eggs.require( "SQLAlchemy" )
+from sqlalchemy.sql.expression import and_, or_, true, null
+
+from galaxy.model import mapping
+from galaxy.model.orm.now import now
+from galaxy.jobs.readiness import JobReadinessTracker
+
+DESCRIPTION = "Benchmark job readiness checks in the job handler queue."
+HANDLER_ID = "main"
+
+
+def main(argv=None):
+    arg_parser = ArgumentParser(description=DESCRIPTION)
+    arg_parser.add_argument("--jobs", type=int, default=50000)
+    arg_parser.add_argument("--pending_fraction", type=float, default=0.2, help="fraction of jobs waiting on an unfinished input")
+    arg_parser.add_argument("--ticks", type=int, default=10)
+    arg_parser.add_argument("--changes_per_tick", type=int, default=20, help="number of pending datasets finishing between ticks")
+    args = arg_parser.parse_args(argv)
+
+    db_path = tempfile.mktemp(suffix=".sqlite")
+    try:
+        model = mapping.init("/tmp", "sqlite:///%s" % db_path, create_tables=True)
+        print "Seeding %d new jobs..." % args.jobs
+        pending_dataset_ids = _seed(model, args.jobs, args.pending_fraction)
+        random.shuffle(pending_dataset_ids)
+
+        session = model.context
+        legacy_times = []
+        for i in range(args.ticks):
+            start = time.time()
+            _legacy_ready_jobs(model, session)
+            legacy_times.append(time.time() - start)
+            session.remove()
+
+        tracker = JobReadinessTracker(session, HANDLER_ID, sweep_interval=3600)
+        start = time.time()
+        tracker.ready_job_ids()
+        sweep_time = time.time() - start
+        session.remove()
+        tracker_times = []
+        for i in range(args.ticks):
+            changed = pending_dataset_ids[:args.changes_per_tick]
+            del pending_dataset_ids[:args.changes_per_tick]
+            _finish_datasets(model, changed)
+            tracker.datasets_changed(changed)
+            start = time.time()
+            tracker.ready_job_ids()
+            tracker_times.append(time.time() - start)
+            session.remove()
+
+        _report("full anti-join scan (before)", legacy_times)
+        print "%-40s %8.1f ms" % ("tracker initial sweep", sweep_time * 1000)
+        _report("incremental tracker update (after)", tracker_times)
+    finally:
+        if os.path.exists(db_path):
+            os.remove(db_path)
+
+
+def _seed(model, num_jobs, pending_fraction):
+    engine = model.engine
+    states = model.Dataset.states
+    num_pending = int(num_jobs * pending_fraction)
+    num_datasets = num_jobs
+    create_time = now()
+    engine.execute(model.Dataset.table.insert(), [
+        dict(id=i, state=(states.QUEUED if i <= num_pending else states.OK), deleted=False,
+             create_time=create_time, update_time=create_time)
+        for i in range(1, num_datasets + 1)
+    ])
+    engine.execute(model.HistoryDatasetAssociation.table.insert(), [
+        dict(id=i, dataset_id=i, deleted=False, visible=True) for i in range(1, num_datasets + 1)
+    ])
+    engine.execute(model.Job.table.insert(), [
+        dict(id=i, state=model.Job.states.NEW, handler=HANDLER_ID, tool_id="cat1") for i in range(1, num_jobs + 1)
+    ])
+    engine.execute(model.JobToInputDatasetAssociation.table.insert(), [
+        dict(job_id=i, dataset_id=i, name="input1") for i in range(1, num_jobs + 1)
+    ])
+    return range(1, num_pending + 1)
+
+
+def _finish_datasets(model, dataset_ids):
+    table = model.Dataset.table
+    model.engine.execute(table.update().where(table.c.id.in_(dataset_ids)).values(state=model.Dataset.states.OK, update_time=now()))
+
+
+def _legacy_ready_jobs(model, session):
+    # The query the handler queue ran on every iteration before the
+    # readiness tracker was introduced.
+    hda_not_ready = session.query(model.Job.id).enable_eagerloads(False) \
+        .join(model.JobToInputDatasetAssociation) \
+        .join(model.HistoryDatasetAssociation) \
+        .join(model.Dataset) \
+        .filter(and_( (model.Job.state == model.Job.states.NEW ),
+                      or_( ( model.HistoryDatasetAssociation._state == model.HistoryDatasetAssociation.states.FAILED_METADATA ),
+                           ( model.HistoryDatasetAssociation.deleted == true() ),
+                           ( model.Dataset.state != model.Dataset.states.OK ),
+                           ( model.Dataset.deleted == true() ) ) ) ).subquery()
+    ldda_not_ready = session.query(model.Job.id).enable_eagerloads(False) \
+        .join(model.JobToInputLibraryDatasetAssociation) \
+        .join(model.LibraryDatasetDatasetAssociation) \
+        .join(model.Dataset) \
+        .filter(and_((model.Job.state == model.Job.states.NEW),
+                or_((model.LibraryDatasetDatasetAssociation._state != null()),
+                    (model.LibraryDatasetDatasetAssociation.deleted == true()),
+                    (model.Dataset.state != model.Dataset.states.OK),
+                    (model.Dataset.deleted == true())))).subquery()
+    return session.query(model.Job.id).enable_eagerloads(False) \
+        .filter(and_((model.Job.state == model.Job.states.NEW),
+                     (model.Job.handler == HANDLER_ID),
+                     ~model.Job.table.c.id.in_(hda_not_ready),
+                     ~model.Job.table.c.id.in_(ldda_not_ready))) \
+        .order_by(model.Job.id).all()
+
+
+def _report(label, times):
+    times = sorted(times)
+    mean = sum(times) / len(times)
+    print "%-40s %8.1f ms mean, %8.1f ms max" % (label, mean * 1000, times[-1] * 1000)
+
+
+if __name__ == "__main__":
+    main()
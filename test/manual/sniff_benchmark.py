@@ -0,0 +1,85 @@
+"""
+Compare the cost of auto-detecting the datatype of each file in
+``lib/galaxy/datatypes/test`` when every sniffer in the sniff order opens and
+reads the file itself (calling ``sniff( filename )``) against ``guess_ext``,
+which reads the start of the file once, shares it between sniffers
+implementing ``sniff_prefix`` and only tries the sniffers whose signatures
+match the file according to the registry's ``sniff_index``.
+
+% python test/manual/sniff_benchmark.py --iterations 20
+"""
+import os
+import sys
+import time
+
+galaxy_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir, os.path.pardir))
+sys.path[1:1] = [ os.path.join( galaxy_root, "lib" ) ]
+
+from argparse import ArgumentParser
+from functools import partial
+
+import galaxy.model  # noqa
+from galaxy.datatypes import registry, sniff
+
+DESCRIPTION = "Benchmark datatype sniffing over the datatypes test files."
+TEST_DATA_DIRECTORY = os.path.join( galaxy_root, "lib", "galaxy", "datatypes", "test" )
+
+
+def main(argv=None):
+    arg_parser = ArgumentParser(description=DESCRIPTION)
+    arg_parser.add_argument("--iterations", type=int, default=10)
+    arg_parser.add_argument("--datatypes_conf", default=None, help="datatypes configuration defining the sniff order (defaults to the built-in one)")
+    arg_parser.add_argument("files", nargs="*", help="files to sniff (defaults to the datatypes test files)")
+    args = arg_parser.parse_args(argv)
+
+    datatypes_registry = registry.Registry()
+    if args.datatypes_conf:
+        datatypes_registry.load_datatypes(root_dir=galaxy_root, config=args.datatypes_conf)
+    else:
+        datatypes_registry.load_datatypes()
+    sniff_order = datatypes_registry.sniff_order
+    guess_ext = partial(sniff.guess_ext, sniff_index=datatypes_registry.sniff_index)
+
+    files = args.files or sorted( os.path.join( TEST_DATA_DIRECTORY, f ) for f in os.listdir( TEST_DATA_DIRECTORY ) )
+    legacy_total = 0.0
+    shared_total = 0.0
+    print "%-40s %-12s %12s %12s" % ("file", "datatype", "before (ms)", "after (ms)")
+    for path in files:
+        legacy_ext, legacy_time = _time(_legacy_guess_ext, path, sniff_order, args.iterations)
+        ext, shared_time = _time(guess_ext, path, sniff_order, args.iterations)
+        if ext != legacy_ext:
+            print "MISMATCH for %s: %s != %s" % (path, ext, legacy_ext)
+        legacy_total += legacy_time
+        shared_total += shared_time
+        print "%-40s %-12s %12.2f %12.2f" % (os.path.basename(path)[:40], ext, legacy_time * 1000, shared_time * 1000)
+    print "%-40s %-12s %12.2f %12.2f" % ("total", "", legacy_total * 1000, shared_total * 1000)
+
+
+def _time(guess, path, sniff_order, iterations):
+    start = time.time()
+    for i in range(iterations):
+        ext = guess(path, sniff_order=sniff_order)
+    return ext, (time.time() - start) / iterations
+
+
+def _legacy_guess_ext(fname, sniff_order):
+    # guess_ext as it was before sniffers shared a file prefix, each sniffer
+    # reads the file itself.
+    for datatype in sniff_order:
+        try:
+            if datatype.sniff( fname ):
+                return datatype.file_ext
+        except:
+            pass
+    headers = sniff.get_headers( fname, None )
+    for hdr in headers:
+        for char in hdr:
+            if sniff.util.is_binary( char ):
+                return 'data'
+    if sniff.is_column_based( fname, '\t', 1 ):
+        return 'tabular'
+    return 'txt'
+
+
+if __name__ == "__main__":
+    main()
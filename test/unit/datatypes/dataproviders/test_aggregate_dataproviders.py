@@ -0,0 +1,185 @@
+"""
+Unit tests for aggregating DataProviders.
+.. seealso:: galaxy.datatypes.dataproviders.aggregate
+"""
+
+import imp
+import os
+import random
+import unittest
+
+import logging
+log = logging.getLogger( __name__ )
+
+test_utils = imp.load_source( 'test_utils',
+    os.path.join( os.path.dirname( __file__), '../../unittest_utils/utility.py' ) )
+
+import test_base_dataproviders
+from galaxy.datatypes.dataproviders import aggregate
+
+
+class AggregateTestCase( test_base_dataproviders.BaseTestCase ):
+    provider_class = None
+
+    def provided( self, contents=None, **kwargs ):
+        filename = self.tmpfiles.create_tmpfile( self.format_tmpfile_contents( contents ) )
+        provider = self.provider_class( open( filename ), **kwargs )
+        data = list( provider )
+        log.debug( 'data: %s', str( data ) )
+        return provider, data
+
+    def rows_contents( self, rows ):
+        return ''.join( '\t'.join( map( str, row ) ) + '\n' for row in rows )
+
+
+class Test_HistogramDataProvider( AggregateTestCase ):
+    provider_class = aggregate.HistogramDataProvider
+    default_file_contents = """
+            # name	value
+            a	1
+            b	2.5
+            c	nan
+
+            d	4
+            e	x
+            f	-4
+        """
+
+    def test_range( self ):
+        """should count values in bins over the given range
+        """
+        provider, data = self.provided( column=1, bins=4, min_value=0, max_value=4 )
+        self.assertEqual( data, [ [ 0.0, 1.0, 0 ], [ 1.0, 2.0, 1 ], [ 2.0, 3.0, 1 ], [ 3.0, 4.0, 1 ] ] )
+
+    def test_range_start( self ):
+        """should count the values from a given start in bins up to their maximum
+        """
+        provider, data = self.provided( column=1, bins=4, min_value=0 )
+        self.assertEqual( data, [ [ 0.0, 1.0, 0 ], [ 1.0, 2.0, 1 ], [ 2.0, 3.0, 1 ], [ 3.0, 4.0, 1 ] ] )
+
+    def test_range_end( self ):
+        """should count the values up to a given end in bins from their minimum
+        """
+        provider, data = self.provided( column=1, bins=4, max_value=2 )
+        self.assertEqual( data, [ [ -4.0, -2.5, 1 ], [ -2.5, -1.0, 0 ], [ -1.0, 0.5, 0 ], [ 0.5, 2.0, 1 ] ] )
+
+    def test_no_range( self ):
+        """should count all numeric values in bins over their range
+        """
+        provider, data = self.provided( column=1, bins=4 )
+        self.assertEqual( data, [ [ -4.0, -2.0, 1 ], [ -2.0, 0.0, 0 ], [ 0.0, 2.0, 1 ], [ 2.0, 4.0, 2 ] ] )
+        provider, data = self.provided( column=0, bins=4 )
+        self.assertEqual( data, [] )
+
+    def test_growing_range( self ):
+        """should count values outside the range of the first values
+        """
+        rng = random.Random( 0 )
+        values = [ round( rng.uniform( 0, 10 ), 6 ) for i in range( 300 ) ] + [ round( rng.uniform( -50, 100 ), 6 ) for i in range( 300 ) ]
+        contents = self.rows_contents( [ ( value, ) for value in values ] )
+        original_sample_size = aggregate.RANGE_SAMPLE_SIZE
+        aggregate.RANGE_SAMPLE_SIZE = 100
+        try:
+            provider, data = self.provided( contents=contents, bins=10, batch_size=50 )
+        finally:
+            aggregate.RANGE_SAMPLE_SIZE = original_sample_size
+        self.assertEqual( len( data ), 10 )
+        self.assertEqual( sum( count for start, end, count in data ), len( values ) )
+        self.assertTrue( data[0][0] <= min( values ) and data[-1][1] >= max( values ) )
+        for start, end, count in data:
+            self.assertEqual( count, len( [ v for v in values if start <= v < end or v == end == data[-1][1] ] ) )
+
+
+class Test_MinMaxDataProvider( AggregateTestCase ):
+    provider_class = aggregate.MinMaxDataProvider
+
+    def test_row_numbers( self ):
+        """should summarize a column in buckets of row numbers
+        """
+        contents = self.rows_contents( [ ( i % 7, ) for i in range( 100 ) ] )
+        provider, data = self.provided( contents=contents, buckets=10, min_value=0, max_value=100 )
+        self.assertEqual( len( data ), 10 )
+        self.assertEqual( data[0], [ 0.0, 10.0, 10, 0.0, 6.0 ] )
+        self.assertEqual( sum( bucket[2] for bucket in data ), 100 )
+
+    def test_range_end( self ):
+        """should summarize the rows up to a given end of x
+        """
+        contents = self.rows_contents( [ ( 1, 5 ), ( 1.5, 3 ), ( 9, 2 ), ( 20, 1 ) ] )
+        provider, data = self.provided( contents=contents, x_column=0, y_column=1, buckets=2, max_value=9 )
+        self.assertEqual( data, [ [ 1.0, 5.0, 2, 3.0, 5.0 ], [ 5.0, 9.0, 1, 2.0, 2.0 ] ] )
+
+    def test_x_column( self ):
+        """should summarize a column in buckets of another
+        """
+        contents = self.rows_contents( [ ( 1, 5 ), ( 1.5, 3 ), ( 9, 2 ), ( 'x', 1 ), ( 10, 'x' ) ] )
+        provider, data = self.provided( contents=contents, x_column=0, y_column=1, buckets=2 )
+        self.assertEqual( data, [ [ 1.0, 5.0, 2, 3.0, 5.0 ], [ 5.0, 9.0, 1, 2.0, 2.0 ] ] )
+
+
+class Test_SampleDataProvider( AggregateTestCase ):
+    provider_class = aggregate.SampleDataProvider
+
+    def test_sample( self ):
+        """should sample rows in the order they were read
+        """
+        contents = self.rows_contents( [ ( i, 'row%d' % i ) for i in range( 1000 ) ] )
+        provider, data = self.provided( contents=contents, size=50, seed=1, column_types=[ 'int', 'str' ], batch_size=64 )
+        self.assertEqual( len( data ), 50 )
+        self.assertEqual( data, sorted( data ) )
+        self.assertEqual( len( set( row[0] for row in data ) ), 50 )
+        self.assertTrue( all( row[1] == 'row%d' % row[0] for row in data ) )
+        provider, repeated = self.provided( contents=contents, size=50, seed=1, column_types=[ 'int', 'str' ], batch_size=64 )
+        self.assertEqual( data, repeated )
+
+    def test_uniform( self ):
+        """should sample each row with the same probability
+        """
+        contents = self.rows_contents( [ ( i, ) for i in range( 20 ) ] )
+        counts = [ 0 ] * 20
+        for seed in range( 500 ):
+            provider, data = self.provided( contents=contents, size=5, seed=seed, column_types=[ 'int' ], batch_size=3 )
+            for row in data:
+                counts[ row[0] ] += 1
+        # each row is expected 125 times
+        self.assertTrue( all( 75 < count < 175 for count in counts ), counts )
+
+    def test_small( self ):
+        """should provide all rows if there are fewer than the sample size
+        """
+        provider, data = self.provided( size=10 )
+        self.assertEqual( data, [ [ 'One' ], [ 'Two' ], [ 'Three' ] ] )
+
+
+class Test_ChromosomeSummaryDataProvider( AggregateTestCase ):
+    provider_class = aggregate.ChromosomeSummaryDataProvider
+    default_file_contents = """
+            chr2	100	200	a
+            chr1	50	60	b
+            chr2	10	20	c
+            chr2	150	300	d
+            chr1	x	60	e
+        """
+
+    def test_summary( self ):
+        """should summarize the regions of each chromosome
+        """
+        provider, data = self.provided( chrom_column=0, start_column=1, end_column=2 )
+        self.assertEqual( data, [
+            dict( chrom='chr2', count=3, start=10, end=300, length=260 ),
+            dict( chrom='chr1', count=1, start=50, end=60, length=10 ) ] )
+
+    def test_end_inclusive( self ):
+        """should count the end of regions that include it in their length
+        """
+        provider, data = self.provided( chrom_column=0, start_column=1, end_column=2, end_inclusive=True )
+        self.assertEqual( [ summary[ 'length' ] for summary in data ], [ 263, 11 ] )
+
+    def test_columns_required( self ):
+        """should raise ValueError if no column indeces are given
+        """
+        self.assertRaises( ValueError, self.provided, chrom_column=0 )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+"""
+Unit tests for column DataProviders.
+.. seealso:: galaxy.datatypes.dataproviders.column
+"""
+
+import imp
+import os
+import unittest
+
+import logging
+log = logging.getLogger( __name__ )
+
+test_utils = imp.load_source( 'test_utils',
+    os.path.join( os.path.dirname( __file__), '../../unittest_utils/utility.py' ) )
+
+import test_base_dataproviders
+from galaxy.datatypes.dataproviders import column
+
+
+class Test_TransposedColumnarDataProvider( test_base_dataproviders.BaseTestCase ):
+    provider_class = column.TransposedColumnarDataProvider
+    default_file_contents = """
+            # chrom	start	score	name
+            chr1	10	0.5	a
+            chr1	20	x	b
+
+            chr2	30	1.5
+            chr2	40	2e3	d	extra
+        """
+
+    def provided( self, provider_class, lines_per_read=None, **kwargs ):
+        filename = self.tmpfiles.create_tmpfile( self.format_tmpfile_contents() )
+        provider = provider_class( open( filename ), **kwargs )
+        if lines_per_read:
+            provider.lines_per_read = lines_per_read
+        data = list( provider )
+        log.debug( 'data: %s', str( data ) )
+        return provider, data
+
+    def assertTransposes( self, **kwargs ):
+        """should provide the columns of the rows ColumnarDataProvider provides
+        """
+        columnar, rows = self.provided( column.ColumnarDataProvider, **kwargs )
+        batch_size = kwargs.get( 'batch_size' ) or len( rows ) or 1
+        # reading the source in chunks of a few lines and at once
+        for lines_per_read in ( 2, None ):
+            provider, batches = self.provided( self.provider_class, lines_per_read=lines_per_read, **kwargs )
+            self.assertEqual( len( batches ), ( len( rows ) + batch_size - 1 ) // batch_size )
+            for i, batch in enumerate( batches ):
+                batch_rows = rows[ i * batch_size:( i + 1 ) * batch_size ]
+                width = max( len( row ) for row in batch_rows )
+                padded = [ row + [ None ] * ( width - len( row ) ) for row in batch_rows ]
+                self.assertEqual( batch, map( list, zip( *padded ) ) )
+            self.assertEqual( provider.num_valid_data_read, columnar.num_valid_data_read )
+            self.assertEqual( provider.num_data_returned, columnar.num_data_returned )
+        return batches
+
+    def test_columns( self ):
+        """should provide lists of the values of the selected columns
+        """
+        batches = self.assertTransposes( indeces=[ 1, 2, 3 ], column_types=[ 'int', 'float', 'str' ] )
+        self.assertEqual( batches, [[ [ 10, 20, 30, 40 ], [ 0.5, None, 1.5, 2000.0 ], [ 'a', 'b', None, 'd' ] ]] )
+
+    def test_negative_indeces( self ):
+        """should provide columns counted from the end of each row
+        """
+        columnar, rows = self.provided( column.ColumnarDataProvider, indeces=[ -1, 0 ] )
+        self.assertEqual( rows, [ [ 'a', 'chr1' ], [ 'b', 'chr1' ], [ '1.5', 'chr2' ], [ 'extra', 'chr2' ] ] )
+        batches = self.assertTransposes( indeces=[ -2, 1 ], column_types=[ 'str', 'int' ] )
+        self.assertEqual( batches, [[ [ '0.5', 'x', '30', 'd' ], [ 10, 20, 30, 40 ] ]] )
+
+    def test_all_columns( self ):
+        """should provide all columns, None padded, if no indeces are given
+        """
+        batches = self.assertTransposes()
+        self.assertEqual( batches[0][4], [ None, None, None, 'extra' ] )
+        self.assertTransposes( parse_columns=False, column_count=6 )
+
+    def test_batch_size( self ):
+        """should provide batches of batch_size rows
+        """
+        batches = self.assertTransposes( indeces=[ 1 ], column_types=[ 'int' ], batch_size=3 )
+        self.assertEqual( batches, [ [ [ 10, 20, 30 ] ], [ [ 40 ] ] ] )
+        self.assertTransposes( indeces=[ 1 ], column_types=[ 'int' ], batch_size=4 )
+
+    def test_limit_offset( self ):
+        """should apply limit and offset to rows
+        """
+        batches = self.assertTransposes( indeces=[ 3, 1 ], column_types=[ 'str', 'int' ], limit=2, offset=1, batch_size=1 )
+        self.assertEqual( batches, [ [ [ 'b' ], [ 20 ] ], [ [ None ], [ 30 ] ] ] )
+        for offset in range( 0, 6 ):
+            for limit in ( None, 0, 1, 2, 3 ):
+                self.assertTransposes( column_types=[ 'str', 'int' ], offset=offset, limit=limit, batch_size=2 )
+
+    def test_filters( self ):
+        """should apply column filters to rows
+        """
+        batches = self.assertTransposes( column_types=[ 'str', 'int', 'float' ], filters=[ '2-ge-1' ] )
+        self.assertEqual( batches, [[ [ 'chr2', 'chr2' ], [ 30, 40 ], [ 1.5, 2000.0 ] ]] )
+        self.assertTransposes( column_types=[ 'str', 'int', 'float' ], filters=[ '1-gt-100' ] )
+
+    def test_regex( self ):
+        """should apply line filtering before splitting rows
+        """
+        batches = self.assertTransposes( indeces=[ 0, 1 ], column_types=[ 'str', 'int' ], regex_list=[ '^chr2' ] )
+        self.assertEqual( batches, [[ [ 'chr2', 'chr2' ], [ 30, 40 ] ]] )
+
+    def test_line_settings( self ):
+        """should filter lines in chunks as FilteredLineDataProvider does
+        """
+        self.assertTransposes( indeces=[ 0, 1 ], provide_blank=True )
+        self.assertTransposes( indeces=[ 0, 1 ], comment_char=None, limit=2, offset=1 )
+        self.assertTransposes( indeces=[ 0, 1 ], strip_lines=False, strip_newlines=True, provide_blank=True )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,6 +5,8 @@ Unit tests for base DataProviders.
 
 import imp
 import os
+import shutil
+import tempfile
 import unittest
 
 import logging
@@ -14,7 +16,8 @@ test_utils = imp.load_source( 'test_utils',
     os.path.join( os.path.dirname( __file__), '../../unittest_utils/utility.py' ) )
 
 import test_base_dataproviders
-from galaxy.datatypes.dataproviders import line
+from galaxy.datatypes.dataproviders import column, line, line_index
+from galaxy.util.bunch import Bunch
 
 
 # TODO: TestCase hierarchy is a bit of mess here.
@@ -300,5 +303,162 @@ class Test_BlockDataProvider( test_base_dataproviders.Test_FilteredDataProvider
         self.assertEqual( data, [{ 'id': 'One', 'seq': 'ABCD' }, { 'id': 'Two', 'seq': 'ABCDEFGH' }] )
         self.assertCounters( provider, 2, 2, 2 )
 
+
+class IndexedFile( object ):
+    """
+    File with a line offset index, as DatasetDataProvider provides.
+    """
+    def __init__( self, filename, lines_per_entry ):
+        self.file = open( filename )
+        self.index = line_index.LineOffsetIndex.build( open( filename ), lines_per_entry=lines_per_entry )
+        self.index_requests = 0
+        self.lines_read = 0
+
+    def get_line_index( self ):
+        self.index_requests += 1
+        return self.index
+
+    def seek( self, offset ):
+        self.file.seek( offset )
+
+    def __iter__( self ):
+        for data_line in self.file:
+            self.lines_read += 1
+            yield data_line
+
+    def close( self ):
+        self.file.close()
+
+
+class IndexedDataset( object ):
+    """
+    DatasetInstance with just what dataset_line_index needs.
+    """
+    def __init__( self, id, filename ):
+        self.id = id
+        self.filename = filename
+        self.opened = 0
+        object_store = Bunch( size=lambda dataset: os.path.getsize( filename ) )
+        self.dataset = Bunch( id=id, external_filename=None, object_store=object_store )
+
+    def open_range( self ):
+        self.opened += 1
+        return open( self.filename )
+
+
+class Test_LineOffsetIndex( test_base_dataproviders.BaseTestCase ):
+    lines_per_entry = 4
+    default_file_contents = """
+            # header
+            1\ta
+            2\tb
+
+            3\tc
+            # comment
+            4\td
+            5\te
+               6\tf
+            7\tg
+
+            8\th
+            9\ti
+            10\tj
+            # trailing comment
+        """
+
+    def setUp( self ):
+        super( Test_LineOffsetIndex, self ).setUp()
+        # seek with offsets over the index's small spacing
+        self.old_lines_per_entry = line_index.DEFAULT_LINES_PER_ENTRY
+        line_index.DEFAULT_LINES_PER_ENTRY = self.lines_per_entry
+
+    def tearDown( self ):
+        line_index.DEFAULT_LINES_PER_ENTRY = self.old_lines_per_entry
+        super( Test_LineOffsetIndex, self ).tearDown()
+
+    def provided( self, provider_class, source, **kwargs ):
+        provider = provider_class( source, **kwargs )
+        return provider, list( provider )
+
+    def assertSeeksTo( self, provider_class, **kwargs ):
+        filename = self.tmpfiles.create_tmpfile( self.format_tmpfile_contents() )
+        for offset in range( 0, 14 ):
+            for limit in ( None, 1, 3 ):
+                indexed = IndexedFile( filename, self.lines_per_entry )
+                provider, data = self.provided( provider_class, indexed, offset=offset, limit=limit, **kwargs )
+                unindexed, expected = self.provided( provider_class, open( filename ), offset=offset, limit=limit, **kwargs )
+                self.assertEqual( data, expected )
+                self.assertEqual( provider.num_valid_data_read, unindexed.num_valid_data_read )
+                self.assertEqual( provider.num_data_returned, unindexed.num_data_returned )
+                if offset >= self.lines_per_entry:
+                    self.assertEqual( indexed.index_requests, 1 )
+                    # lines before the indexed line are not read
+                    self.assertTrue( indexed.lines_read < unindexed.num_data_read )
+
+    def test_index( self ):
+        """should index the offsets and number of data lines of every few lines
+        """
+        contents = self.format_tmpfile_contents()
+        index = line_index.LineOffsetIndex.build( open( self.tmpfiles.create_tmpfile( contents ) ), lines_per_entry=4 )
+        lines = contents.splitlines( True )
+        self.assertEqual( index.offsets, [ len( ''.join( lines[ :n ] ) ) for n in range( 0, len( lines ) + 1, 4 ) ] )
+        self.assertEqual( index.data_lines, [ 0, 2, 5, 8 ] )
+        self.assertEqual( ( index.lines, index.total_data_lines, index.size ), ( 15, 10, len( contents ) ) )
+
+    def test_data_lines( self ):
+        """should seek to the offset data line skipping blank lines and comments
+        """
+        self.assertSeeksTo( line.FilteredLineDataProvider )
+        self.assertSeeksTo( column.ColumnarDataProvider, column_types=[ 'int', 'str' ] )
+
+    def test_all_lines( self ):
+        """should seek to the offset line if all lines are provided
+        """
+        self.assertSeeksTo( line.FilteredLineDataProvider, provide_blank=True, comment_char=None )
+
+    def test_dataset_line_index( self ):
+        """should keep dataset indexes in memory and in the directory of indexes
+        """
+        temp_directory = tempfile.mkdtemp()
+        index_path = os.path.join( temp_directory, "indexes" )
+        old_index_path = line_index.index_path
+        line_index.configure( index_path )
+        try:
+            os.mkdir( os.path.join( temp_directory, "files" ) )
+            filename = os.path.join( temp_directory, "files", "dataset_1234.dat" )
+            open( filename, "w" ).write( self.format_tmpfile_contents() )
+            dataset = IndexedDataset( 1234, filename )
+            index = line_index.dataset_line_index( dataset, lines_per_entry=4 )
+            self.assertEqual( index.total_data_lines, 10 )
+            self.assertTrue( os.path.exists( os.path.join( index_path, "001", "dataset_1234_lines.json" ) ) )
+            # the dataset's own directories are left alone
+            self.assertEqual( os.listdir( os.path.dirname( filename ) ), [ os.path.basename( filename ) ] )
+            self.assertTrue( line_index.dataset_line_index( dataset, lines_per_entry=4 ) is index )
+
+            # stored indexes are read back
+            line_index._recent_indexes.clear()
+            self.assertEqual( line_index.dataset_line_index( dataset, lines_per_entry=4 ).offsets, index.offsets )
+            self.assertEqual( dataset.opened, 1 )
+
+            # indexes of a dataset of another size are rebuilt
+            open( filename, "a" ).write( "11\tk\n" )
+            self.assertEqual( line_index.dataset_line_index( dataset, lines_per_entry=4 ).total_data_lines, 11 )
+            self.assertEqual( dataset.opened, 2 )
+        finally:
+            line_index.configure( old_index_path )
+            shutil.rmtree( temp_directory )
+
+    def test_filtered( self ):
+        """should not use the index when other filters apply
+        """
+        filename = self.tmpfiles.create_tmpfile( self.format_tmpfile_contents() )
+        for kwargs in ( dict( regex_list=[ r'^1' ] ), dict( provide_blank=True ) ):
+            indexed = IndexedFile( filename, self.lines_per_entry )
+            provider, data = self.provided( line.RegexLineDataProvider, indexed, offset=5, **kwargs )
+            unindexed, expected = self.provided( line.RegexLineDataProvider, open( filename ), offset=5, **kwargs )
+            self.assertEqual( data, expected )
+            self.assertEqual( indexed.index_requests, 0 )
+
+
 if __name__ == '__main__':
     unittest.main()
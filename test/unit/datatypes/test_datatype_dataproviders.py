@@ -0,0 +1,59 @@
+"""
+Unit tests for the dataproviders datatypes declare.
+.. seealso:: galaxy.datatypes.dataproviders.decorators
+"""
+
+import os
+import tempfile
+import unittest
+
+import galaxy.model  # noqa, the datatypes cannot be imported before the model
+from galaxy.datatypes import data, interval, sequence, tabular
+
+
+class DatatypeDataprovidersTestCase( unittest.TestCase ):
+
+    def test_text( self ):
+        """Text and its subclasses should provide lines
+        """
+        for datatype_class in ( data.Text, tabular.Tabular, sequence.Fasta, interval.Bed ):
+            self.assertIn( 'line', datatype_class.dataproviders, datatype_class )
+            self.assertIn( 'regex-line', datatype_class.dataproviders, datatype_class )
+
+    def test_data( self ):
+        """Data should only provide chunks
+        """
+        self.assertIn( 'chunk', data.Data.dataproviders )
+        self.assertNotIn( 'line', data.Data.dataproviders )
+
+    def test_gff_chromosome_summary( self ):
+        """Gff should summarize 1-based features, in the columns requested
+        """
+        fd, filename = tempfile.mkstemp()
+        try:
+            with os.fdopen( fd, 'w' ) as gff_file:
+                gff_file.write( "chr1\tsrc\tgene\t11\t20\t.\t+\t.\tID=a\n"
+                                "chr1\tsrc\tgene\t31\t31\t.\t+\t.\tID=b\n" )
+            dataset = FileDataset( filename )
+            summary = list( interval.Gff().chromosome_summary_dataprovider( dataset ) )
+            self.assertEqual( summary, [ dict( chrom='chr1', count=2, start=11, end=31, length=11 ) ] )
+            # columns given in the query string replace the defaults
+            summary = list( interval.Gff().chromosome_summary_dataprovider( dataset, chrom_column=2, start_column=3 ) )
+            self.assertEqual( summary, [ dict( chrom='gene', count=2, start=11, end=31, length=11 ) ] )
+        finally:
+            os.remove( filename )
+
+
+class FileDataset( object ):
+    """
+    DatasetInstance providing just its file.
+    """
+    def __init__( self, filename ):
+        self.filename = filename
+
+    def open_range( self ):
+        return open( self.filename )
+
+
+if __name__ == '__main__':
+    unittest.main()
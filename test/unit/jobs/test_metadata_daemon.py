@@ -0,0 +1,146 @@
+"""
+Unit tests for the metadata daemon's request/response protocol and the
+fallback to setting metadata locally.
+.. seealso:: galaxy_ext.metadata.daemon
+"""
+import json
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from StringIO import StringIO
+
+from galaxy_ext.metadata import daemon
+from galaxy_ext.metadata import set_metadata
+
+DATATYPES_CONFIG = "datatypes_conf.xml"
+
+
+class MetadataDaemonTestCase( unittest.TestCase ):
+
+    def setUp( self ):
+        self.temp_directory = tempfile.mkdtemp()
+        self.job_directory = os.path.join( self.temp_directory, "job" )
+        os.mkdir( self.job_directory )
+        open( os.path.join( self.job_directory, DATATYPES_CONFIG ), "w" ).write( "<datatypes/>" )
+        self.socket_path = os.path.join( self.temp_directory, "metadata.sock" )
+        self.server = daemon.MetadataDaemon( self.socket_path, request_timeout=5 )
+        self.loaded_registries = []
+
+        def load_datatypes_registry( datatypes_config ):
+            self.loaded_registries.append( datatypes_config )
+            return "registry of %s" % datatypes_config
+
+        self.server._load_datatypes_registry = load_datatypes_registry
+        self.server.set_metadata = _record_set_metadata
+        self.original_directory = os.getcwd()
+        os.chdir( self.job_directory )
+
+    def tearDown( self ):
+        os.chdir( self.original_directory )
+        self.server.server_close()
+        shutil.rmtree( self.temp_directory )
+
+    def test_request( self ):
+        self._handle_request( lambda: daemon.set_metadata_via_daemon( self.socket_path, processes=2, argv=self._argv() ) )
+        recorded = self._recorded()
+        self.assertEqual( recorded[ "cwd" ], os.path.realpath( self.job_directory ) )
+        self.assertEqual( recorded[ "argv" ], [ "set_metadata" ] + self._argv()[1:] )
+        self.assertEqual( recorded[ "processes" ], 2 )
+        self.assertEqual( recorded[ "datatypes_registry" ], "registry of %s" % os.path.join( self.job_directory, DATATYPES_CONFIG ) )
+
+    def test_registry_reused( self ):
+        for i in range( 2 ):
+            self._handle_request( lambda: daemon.set_metadata_via_daemon( self.socket_path, argv=self._argv() ) )
+        # loaded by the first request's child, then by the daemon itself
+        self.assertEqual( self.loaded_registries, [ os.path.join( self.job_directory, DATATYPES_CONFIG ) ] )
+        # the second request's child used the daemon's registry
+        self.assertRaises( OSError, os.read, self.server._loaded_read, 4096 )
+
+    def test_stalled_client( self ):
+        # a client that never sends its request does not hold up the others
+        self.server.request_timeout = 60
+        stalled = socket.socket( socket.AF_UNIX, socket.SOCK_STREAM )
+        stalled.connect( self.socket_path )
+        try:
+            start = time.time()
+            self._handle_request( lambda: None )
+            self._handle_request( lambda: daemon.set_metadata_via_daemon( self.socket_path, argv=self._argv() ) )
+            self.assertTrue( time.time() - start < 30 )
+            self.assertEqual( self._recorded()[ "argv" ], [ "set_metadata" ] + self._argv()[1:] )
+        finally:
+            stalled.close()
+
+    def test_failure( self ):
+        self.server.set_metadata = _fail_set_metadata
+        stderr = StringIO()
+        original_stderr, sys.stderr = sys.stderr, stderr
+        try:
+            with self.assertRaises( SystemExit ) as context:
+                self._handle_request( lambda: daemon.set_metadata_via_daemon( self.socket_path, argv=self._argv() ) )
+        finally:
+            sys.stderr = original_stderr
+        self.assertEqual( context.exception.code, 1 )
+        self.assertIn( "Failed to set metadata: no metadata for you", stderr.getvalue() )
+
+    def test_malformed_request( self ):
+        def send_malformed_request():
+            sock = socket.socket( socket.AF_UNIX, socket.SOCK_STREAM )
+            sock.connect( self.socket_path )
+            try:
+                sock.sendall( "not json\n" )
+                return json.loads( sock.makefile( "rb" ).readline() )
+            finally:
+                sock.close()
+        response = self._handle_request( send_malformed_request )
+        self.assertEqual( response[ "status" ], 1 )
+        self.assertIn( "Malformed metadata request", response[ "message" ] )
+
+    def test_fallback_to_local( self ):
+        self.server.server_close()
+        calls = []
+        original_set_metadata = set_metadata.set_metadata
+        set_metadata.set_metadata = lambda **kwds: calls.append( kwds )
+        stderr = StringIO()
+        original_stderr, sys.stderr = sys.stderr, stderr
+        try:
+            daemon.set_metadata_via_daemon( self.socket_path, processes=3, argv=self._argv() )
+        finally:
+            sys.stderr = original_stderr
+            set_metadata.set_metadata = original_set_metadata
+        self.assertEqual( calls, [ dict( processes=3 ) ] )
+        self.assertIn( "setting metadata locally", stderr.getvalue() )
+
+    def _argv( self ):
+        return [ "-c", DATATYPES_CONFIG, "None", "in,kwds,out,results,dataset.dat" ]
+
+    def _handle_request( self, client ):
+        # the server forks a child handling the request, the client runs here
+        server_thread = threading.Thread( target=self.server.handle_request )
+        server_thread.start()
+        try:
+            return client()
+        finally:
+            server_thread.join()
+            self.server.collect_children()
+
+    def _recorded( self ):
+        return json.load( open( os.path.join( self.job_directory, "recorded.json" ) ) )
+
+
+def _record_set_metadata( processes=None, datatypes_registry=None ):
+    # runs in the forked child, so record the call in the working directory
+    recorded = dict( cwd=os.getcwd(), argv=sys.argv, processes=processes, datatypes_registry=datatypes_registry )
+    json.dump( recorded, open( "recorded.json", "w" ) )
+
+
+def _fail_set_metadata( processes=None, datatypes_registry=None ):
+    raise Exception( "no metadata for you" )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+from unittest import TestCase
+
+import galaxy.model.mapping as mapping
+from galaxy.jobs.readiness import JobReadinessTracker
+
+HANDLER_ID = "handler0"
+
+
+class JobReadinessTrackerTestCase( TestCase ):
+
+    def setUp( self ):
+        self.model = mapping.init( "/tmp", "sqlite:///:memory:", create_tables=True )
+        self.history = self.model.History()
+        self._persist( self.history )
+        self.tracker = JobReadinessTracker( self.model.context, HANDLER_ID, sweep_interval=3600 )
+
+    def test_sweep_finds_ready_jobs( self ):
+        ok_hda = self._new_hda( self.model.Dataset.states.OK )
+        queued_hda = self._new_hda( self.model.Dataset.states.QUEUED )
+        ready_job = self._new_job( ok_hda )
+        waiting_job = self._new_job( ok_hda, queued_hda )
+        no_input_job = self._new_job()
+        self._new_job( ok_hda, handler="other_handler" )
+
+        assert self.tracker.ready_job_ids() == [ ready_job.id, no_input_job.id ]
+        assert self.tracker.waiting_on == { waiting_job.id: set( [ queued_hda.dataset.id ] ) }
+
+    def test_new_jobs_picked_up_without_sweep( self ):
+        ok_hda = self._new_hda( self.model.Dataset.states.OK )
+        assert self.tracker.ready_job_ids() == []
+        job = self._new_job( ok_hda )
+        assert self.tracker.ready_job_ids() == [ job.id ]
+
+    def test_notified_dataset_change_releases_job( self ):
+        hda = self._new_hda( self.model.Dataset.states.RUNNING )
+        job = self._new_job( hda )
+        assert self.tracker.ready_job_ids() == []
+
+        self._set_dataset_state( hda, self.model.Dataset.states.OK )
+        self.tracker.datasets_changed( [ hda.dataset.id ] )
+        assert self.tracker.ready_job_ids() == [ job.id ]
+        assert not self.tracker.waiting_on
+        assert not self.tracker.blocking
+
+    def test_recently_updated_datasets_release_jobs( self ):
+        hda = self._new_hda( self.model.Dataset.states.RUNNING )
+        job = self._new_job( hda )
+        assert self.tracker.ready_job_ids() == []
+
+        # Not notified, e.g. the job producing hda finished in another process
+        self._set_dataset_state( hda, self.model.Dataset.states.OK )
+        assert self.tracker.ready_job_ids() == [ job.id ]
+
+    def test_jobs_assigned_a_handler_later_picked_up( self ):
+        ok_hda = self._new_hda( self.model.Dataset.states.OK )
+        job = self._new_job( ok_hda, handler=None )
+        later_job = self._new_job( ok_hda )
+        assert self.tracker.ready_job_ids() == [ later_job.id ]
+
+        # e.g. jobs created in bulk are assigned to a handler once flushed
+        job.handler = HANDLER_ID
+        self._persist( job )
+        assert self.tracker.ready_job_ids() == [ job.id, later_job.id ]
+
+    def test_forget( self ):
+        hda = self._new_hda( self.model.Dataset.states.RUNNING )
+        job = self._new_job( hda )
+        self.tracker.ready_job_ids()
+        self.tracker.forget( job.id )
+        assert not self.tracker.waiting_on
+        assert not self.tracker.blocking
+
+    def _new_hda( self, state ):
+        hda = self.model.HistoryDatasetAssociation( history=self.history, create_dataset=True, sa_session=self.model.context )
+        hda.dataset.state = state
+        self._persist( hda )
+        return hda
+
+    def _new_job( self, *input_hdas, **kwds ):
+        job = self.model.Job()
+        job.tool_id = "cat1"
+        job.state = self.model.Job.states.NEW
+        job.handler = kwds.get( "handler", HANDLER_ID )
+        for i, hda in enumerate( input_hdas ):
+            job.add_input_dataset( "input%d" % i, hda )
+        self._persist( job )
+        return job
+
+    def _set_dataset_state( self, hda, state ):
+        hda.dataset.state = state
+        self._persist( hda.dataset )
+
+    def _persist( self, obj ):
+        self.model.context.add( obj )
+        self.model.context.flush()
@@ -0,0 +1,68 @@
+import threading
+from unittest import TestCase
+
+from galaxy.util import bunch
+from galaxy.jobs import JobDestination
+from galaxy.jobs.runners import (
+    AsynchronousJobRunner,
+    AsynchronousJobState,
+    STOP_SIGNAL
+)
+
+
+class AsynchronousJobRunnerTestCase( TestCase ):
+
+    def setUp( self ):
+        self.runner = MockAsynchronousJobRunner( max_poll_interval="30", poll_interval_age_factor="60" )
+
+    def test_new_jobs_use_min_interval( self ):
+        job_state = self._job_state()
+        self.runner.schedule_check( job_state, now=100 )
+        assert job_state.watch_start_time == 100
+        assert self.runner.check_schedule[ 0 ][ 0 ] == 101
+
+    def test_interval_grows_with_age( self ):
+        job_state = self._job_state()
+        job_state.watch_start_time = 0
+        assert self.runner.next_check_interval( job_state, 30 ) == 1
+        assert self.runner.next_check_interval( job_state, 600 ) == 10
+        assert self.runner.next_check_interval( job_state, 7200 ) == 30
+
+    def test_destination_overrides( self ):
+        job_state = self._job_state( max_poll_interval="300", min_poll_interval="5" )
+        job_state.watch_start_time = 0
+        assert self.runner.next_check_interval( job_state, 30 ) == 5
+        assert self.runner.next_check_interval( job_state, 7200 ) == 120
+        assert self.runner.next_check_interval( job_state, 72000 ) == 300
+
+    def test_monitor_checks_due_jobs( self ):
+        self.runner.checked_event = threading.Event()
+        monitor_thread = threading.Thread( target=self.runner.monitor )
+        monitor_thread.setDaemon( True )
+        monitor_thread.start()
+        job_state = self._job_state()
+        self.runner.monitor_queue.put( job_state )
+        assert self.runner.checked_event.wait( 5 )
+        self.runner.monitor_queue.put( STOP_SIGNAL )
+        monitor_thread.join( 5 )
+        assert not monitor_thread.isAlive()
+        assert self.runner.checked == [ job_state ]
+
+    def _job_state( self, **params ):
+        return AsynchronousJobState( job_destination=JobDestination( id="test", runner="test", params=params ) )
+
+
+class MockAsynchronousJobRunner( AsynchronousJobRunner ):
+    runner_name = "MockRunner"
+
+    def __init__( self, **kwargs ):
+        app = bunch.Bunch( model=bunch.Bunch( context=None ) )
+        super( MockAsynchronousJobRunner, self ).__init__( app, 1, **kwargs )
+        self.checked = []
+        self.checked_event = None
+
+    def check_watched_item( self, job_state ):
+        self.checked.append( job_state )
+        self.checked_event.set()
+        # Stop watching the job
+        return None
@@ -0,0 +1,212 @@
+import itertools
+import time
+from unittest import TestCase
+
+from galaxy import model
+from galaxy.util import bunch
+from galaxy.jobs import JobDestination
+from galaxy.jobs.runners import AsynchronousJobState
+from galaxy.jobs.runners import drmaa as drmaa_runner
+
+SQUEUE_OUTPUT = """JOBID ST
+1 PD
+2 R
+3 CG
+4 CD
+5 F
+6 R
+"""
+
+
+class CliBulkJobStatusTestCase( TestCase ):
+
+    def setUp( self ):
+        self.bulk_status = drmaa_runner.CliBulkJobStatus( 'Slurm', 'LocalShell', MockDrmaa.JobState )
+        self.shell = MockShell( SQUEUE_OUTPUT )
+        self.bulk_status.shell = self.shell
+
+    def test_maps_queued_and_running_states( self ):
+        states = self.bulk_status.get_states( [ '1', '2', '3', '4', '5' ] )
+        assert states == {
+            '1': MockDrmaa.JobState.QUEUED_ACTIVE,
+            '2': MockDrmaa.JobState.RUNNING,
+            '3': MockDrmaa.JobState.RUNNING,
+        }
+        assert self.shell.commands == [ "squeue -a -o '%A %t'" ]
+
+    def test_failed_command( self ):
+        self.shell.returncode = 1
+        assert self.bulk_status.get_states( [ '1', '2' ] ) == {}
+
+
+class DRMAAJobRunnerTestCase( TestCase ):
+
+    def setUp( self ):
+        self.real_drmaa = drmaa_runner.drmaa
+        drmaa_runner.drmaa = MockDrmaa
+        self.bulk_status = MockBulkStatus( { '1': MockDrmaa.JobState.RUNNING } )
+        self.runner = MockDRMAAJobRunner( self.bulk_status )
+        self.runner.ds.states = { '2': MockDrmaa.JobState.QUEUED_ACTIVE, '3': MockDrmaa.JobState.DONE }
+
+    def tearDown( self ):
+        drmaa_runner.drmaa = self.real_drmaa
+
+    def test_bulk_states( self ):
+        job_states = self._watch( '1', '2', '3' )
+        self.runner.check_watched_items()
+        assert self.bulk_status.job_ids == [ [ '1', '2', '3' ] ]
+        # jobs missing from the bulk result are checked individually
+        assert self.runner.ds.checked == [ '2', '3' ]
+        assert job_states[ 0 ].running
+        assert job_states[ 0 ].job_wrapper.state == model.Job.states.RUNNING
+        assert not job_states[ 1 ].running
+        assert self.runner.completed == [ ( '3', MockDrmaa.JobState.DONE ) ]
+        assert self.runner.watched == job_states[ :2 ]
+        assert self.runner.poll_stats[ 'bulk' ] == 1
+        assert self.runner.poll_stats[ 'individual' ] == 2
+
+    def test_bulk_status_failure( self ):
+        self.runner.ds.states[ '1' ] = MockDrmaa.JobState.RUNNING
+
+        def failing_get_states( job_ids ):
+            raise Exception( "squeue not found" )
+        self.bulk_status.get_states = failing_get_states
+        job_states = self._watch( '1', '2' )
+        self.runner.check_watched_items()
+        assert self.runner.ds.checked == [ '1', '2' ]
+        assert self.runner.watched == job_states
+
+    def test_without_bulk_status( self ):
+        self.runner.bulk_status = None
+        self.runner.ds.states[ '1' ] = MockDrmaa.JobState.QUEUED_ACTIVE
+        self._watch( '1', '2' )
+        self.runner.check_watched_items()
+        assert self.runner.ds.checked == [ '1', '2' ]
+        assert self.runner.poll_stats[ 'bulk' ] == 0
+
+    def test_poll_schedule( self ):
+        job_state, = self._watch( '1' )
+        self.runner.schedule_check( job_state, now=100 )
+        assert self.runner.check_schedule[ 0 ][ 0 ] == 101
+        # checked less often as the job gets older
+        assert self.runner.next_check_interval( job_state, 130 ) == 1
+        assert self.runner.next_check_interval( job_state, 700 ) == 10
+        assert self.runner.next_check_interval( job_state, 7300 ) == 30
+        job_state.job_destination.params.update( min_poll_interval="5", max_poll_interval="300" )
+        assert self.runner.next_check_interval( job_state, 130 ) == 5
+        assert self.runner.next_check_interval( job_state, 72100 ) == 300
+
+    def _watch( self, *job_ids ):
+        job_states = []
+        for job_id in job_ids:
+            job_state = AsynchronousJobState( job_wrapper=MockJobWrapper( job_id ), job_id=job_id,
+                                              job_destination=JobDestination( id="test", runner="drmaa", params={} ) )
+            job_state.old_state = MockDrmaa.JobState.QUEUED_ACTIVE
+            job_states.append( job_state )
+        self.runner.watched = list( job_states )
+        return job_states
+
+
+class MockDrmaa( object ):
+
+    class JobState( object ):
+        UNDETERMINED = 'undetermined'
+        QUEUED_ACTIVE = 'queued_active'
+        RUNNING = 'running'
+        DONE = 'done'
+        FAILED = 'failed'
+
+    class InternalException( Exception ):
+        pass
+
+    class InvalidJobException( Exception ):
+        pass
+
+    class DrmCommunicationException( Exception ):
+        pass
+
+
+class MockShell( object ):
+
+    def __init__( self, stdout ):
+        self.stdout = stdout
+        self.returncode = 0
+        self.commands = []
+
+    def execute( self, cmd ):
+        self.commands.append( cmd )
+        return bunch.Bunch( stdout=self.stdout, stderr='', returncode=self.returncode )
+
+
+class MockBulkStatus( object ):
+
+    def __init__( self, states ):
+        self.states = states
+        self.job_ids = []
+
+    def get_states( self, job_ids ):
+        self.job_ids.append( job_ids )
+        return self.states
+
+
+class MockSession( object ):
+
+    def __init__( self ):
+        self.states = {}
+        self.checked = []
+
+    def jobStatus( self, job_id ):
+        self.checked.append( job_id )
+        return self.states[ job_id ]
+
+
+class MockJobWrapper( object ):
+
+    def __init__( self, job_id ):
+        self.job_id = job_id
+        self.state = model.Job.states.QUEUED
+        self.tool = bunch.Bunch( old_id="test_tool" )
+        self.user = "test@example.org"
+
+    def get_id_tag( self ):
+        return self.job_id
+
+    def change_state( self, state ):
+        self.state = state
+
+    def has_limits( self ):
+        return False
+
+
+class MockDRMAAJobRunner( drmaa_runner.DRMAAJobRunner ):
+
+    def __init__( self, bulk_status ):
+        # Neither the DRMAA library nor the runner's threads are needed to
+        # check job states.
+        self.ds = MockSession()
+        self.bulk_status = bulk_status
+        self.drmaa_job_state_strings = dict( ( state, state ) for state in ( 'undetermined', 'queued_active', 'running', 'done', 'failed' ) )
+        self.runner_params = dict( invalidjobexception_retries=0,
+                                   invalidjobexception_state=model.Job.states.OK,
+                                   internalexception_retries=0,
+                                   internalexception_state=model.Job.states.OK,
+                                   min_poll_interval=1.0,
+                                   max_poll_interval=30.0,
+                                   poll_interval_age_factor=60.0 )
+        self.work_queue = MockWorkQueue()
+        self.watched = []
+        self.check_schedule = []
+        self.check_sequence = itertools.count()
+        self.statsd_client = None
+        self.poll_stats = dict( ticks=0, jobs=0, bulk=0, individual=0, time=0.0 )
+        self.poll_stats_reported = time.time()
+        self.completed = []
+
+    def _complete_terminal_job( self, ajs, drmaa_state, **kwargs ):
+        self.completed.append( ( ajs.job_id, drmaa_state ) )
+
+
+class MockWorkQueue( list ):
+
+    def put( self, item ):
+        self.append( item )
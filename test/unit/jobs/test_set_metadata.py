@@ -0,0 +1,96 @@
+"""
+Unit tests for setting metadata externally, in process and with a pool of
+worker processes.
+.. seealso:: galaxy_ext.metadata.set_metadata
+"""
+import cPickle
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from galaxy import model
+import galaxy.model.mapping  # noqa, pickling datasets needs their mappers
+
+GALAXY_ROOT = os.path.abspath( os.path.join( os.path.dirname( __file__ ), os.pardir, os.pardir, os.pardir ) )
+DATATYPES_CONFIG = """<?xml version="1.0"?>
+<datatypes>
+    <registration>
+        <datatype extension="txt" type="galaxy.datatypes.data:Text"/>
+    </registration>
+</datatypes>
+"""
+# Jobs run this very code, see JobExternalOutputMetadataWrapper.
+SET_METADATA_SCRIPT = "from galaxy_ext.metadata.set_metadata import set_metadata; set_metadata(processes=%d)"
+
+
+class SetMetadataTestCase( unittest.TestCase ):
+
+    def setUp( self ):
+        self.job_directory = tempfile.mkdtemp()
+        self.datatypes_config = self._write( "datatypes_conf.xml", DATATYPES_CONFIG )
+
+    def tearDown( self ):
+        shutil.rmtree( self.job_directory )
+
+    def test_in_process( self ):
+        outputs = [ self._output( 1, "a\nb\n" ) ]
+        self._set_metadata( outputs, processes=1 )
+        self.assertEqual( self._results( outputs[0] ), [ True, "Metadata has been set successfully" ] )
+        self.assertEqual( self._metadata( outputs[0] )[ "data_lines" ], 2 )
+
+    def test_pool( self ):
+        outputs = [ self._output( i, "line\n" * i ) for i in range( 1, 5 ) ]
+        self._set_metadata( outputs, processes=2 )
+        for i, output in enumerate( outputs, start=1 ):
+            self.assertEqual( self._results( output )[0], True )
+            self.assertEqual( self._metadata( output )[ "data_lines" ], i )
+
+    def test_pool_errors( self ):
+        outputs = [ self._output( 1, "a\n" ), self._output( 2, "a\n" ), self._output( 3, "a\nb\nc\n" ) ]
+        # a missing dataset fails its output only
+        os.remove( outputs[1][ "in" ] )
+        self._set_metadata( outputs, processes=2 )
+        succeeded, message = self._results( outputs[1] )
+        self.assertFalse( succeeded )
+        self.assertIn( "No such file or directory", message )
+        self.assertEqual( self._results( outputs[0] )[0], True )
+        self.assertEqual( self._metadata( outputs[2] )[ "data_lines" ], 3 )
+
+    def _output( self, id, contents ):
+        dataset = model.Dataset( id=id, state=model.Dataset.states.OK )
+        hda = model.HistoryDatasetAssociation( id=id, dataset=dataset, extension="txt", create_dataset=False )
+        output = dict( ( name, os.path.join( self.job_directory, "%s_%d" % ( name, id ) ) )
+                       for name in ( "in", "kwds", "out", "results", "dataset" ) )
+        cPickle.dump( hda, open( output[ "in" ], "wb" ) )
+        self._write( output[ "kwds" ], "{}" )
+        self._write( output[ "dataset" ], contents )
+        return output
+
+    def _set_metadata( self, outputs, processes ):
+        argv = [ self.datatypes_config, "None" ]
+        for output in outputs:
+            argv.append( ",".join( output[ name ] for name in ( "in", "kwds", "out", "results", "dataset" ) ) )
+        env = dict( os.environ, PYTHONPATH=os.path.join( GALAXY_ROOT, "lib" ) )
+        command = [ sys.executable, "-c", SET_METADATA_SCRIPT % processes ] + argv
+        process = subprocess.Popen( command, cwd=self.job_directory, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT )
+        output = process.communicate()[0]
+        self.assertEqual( process.returncode, 0, output )
+
+    def _results( self, output ):
+        return json.load( open( output[ "results" ] ) )
+
+    def _metadata( self, output ):
+        return json.load( open( output[ "out" ] ) )
+
+    def _write( self, name, contents ):
+        path = os.path.join( self.job_directory, name )
+        open( path, "w" ).write( contents )
+        return path
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+"""
+import os
+import imp
+import unittest
+
+test_utils = imp.load_source( 'test_utils',
+    os.path.join( os.path.dirname( __file__), '../unittest_utils/utility.py' ) )
+
+from galaxy import model
+import galaxy.queue_worker
+
+from base import BaseTestCase
+from galaxy.managers import api_keys
+
+
+# =============================================================================
+class ApiKeyManagerTestCase( BaseTestCase ):
+
+    def set_up_managers( self ):
+        super( ApiKeyManagerTestCase, self ).set_up_managers()
+        self.api_key_manager = api_keys.ApiKeyManager( self.app )
+        self.app.api_key_principals = api_keys.ApiKeyPrincipalCache()
+        self.control_tasks = []
+        self.send_control_task = galaxy.queue_worker.send_control_task
+        galaxy.queue_worker.send_control_task = lambda app, task, **kwargs: self.control_tasks.append( task )
+
+    def tearDown( self ):
+        galaxy.queue_worker.send_control_task = self.send_control_task
+        super( ApiKeyManagerTestCase, self ).tearDown()
+
+    def principal( self, key ):
+        return self.app.api_key_principals.get_principal( self.trans.sa_session, model, key )
+
+    def test_principals( self ):
+        user = self.admin_user
+        self.log( "should load the principal of a key" )
+        self.assertEqual( self.principal( 'unknown' ), None )
+        first_key = self.api_key_manager.create_api_key( user )
+        self.assertEqual( self.principal( first_key ), ( user.id, True, False ) )
+
+        self.log( "should remember principals" )
+        user.deleted = True
+        self.trans.sa_session.flush()
+        self.assertEqual( self.principal( first_key ), ( user.id, True, False ) )
+
+        self.log( "should forget principals and notify other processes when keys are created" )
+        second_key = self.api_key_manager.create_api_key( user )
+        self.assertEqual( self.control_tasks, [ 'invalidate_api_key_principals' ] * 2 )
+        self.assertEqual( self.principal( first_key ), ( user.id, False, True ) )
+        self.assertEqual( self.principal( second_key ), ( user.id, True, True ) )
+
+        self.log( "should forget principals when notified" )
+        user.deleted = False
+        self.trans.sa_session.flush()
+        galaxy.queue_worker.invalidate_api_key_principals( self.app )
+        self.assertEqual( self.principal( second_key ), ( user.id, True, False ) )
+
+
+# =============================================================================
+if __name__ == '__main__':
+    # or more generally, nosetests test_resourcemanagers.py -s -v
+    unittest.main()
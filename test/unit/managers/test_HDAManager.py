@@ -478,6 +478,21 @@ class HDASerializerTestCase( HDATestCase ):
         self.log( 'serialized should jsonify well' )
         self.assertIsJsonifyable( serialized )
 
+    def test_encoded_ids( self ):
+        hda = self._create_vanilla_hda()
+        keys = [ 'id', 'type_id', 'url', 'urls' ]
+
+        self.log( 'ids encoded beforehand should be used' )
+        serialized = self.hda_serializer.serialize( hda, keys, encoded_ids={ hda.id: 'encoded-hda' } )
+        self.assertEqual( serialized[ 'id' ], 'encoded-hda' )
+        self.assertEqual( serialized[ 'type_id' ], 'dataset-encoded-hda' )
+        self.assertTrue( 'encoded-hda' in serialized[ 'url' ] )
+        self.assertTrue( 'encoded-hda' in serialized[ 'urls' ][ 'display' ] )
+
+        self.log( 'ids not encoded beforehand should be encoded' )
+        serialized = self.hda_serializer.serialize( hda, keys, encoded_ids={ hda.id + 1: 'encoded-other' } )
+        self.assertEqual( serialized[ 'id' ], self.app.security.encode_id( hda.id ) )
+
     def test_file_name_serializers( self ):
         hda = self._create_vanilla_hda()
         owner = hda.history.user
@@ -508,6 +523,94 @@ class HDASerializerTestCase( HDATestCase ):
 
         # TODO: test extra_files_path as well
 
+    def _create_serializable_hdas( self, owner, history, count ):
+        """
+        Create `count` tagged, annotated hdas created by (resubmitted) jobs,
+        then clear the session so the hdas are loaded again lazily.
+
+        Returns the owner and all the hdas of the history, loaded again.
+        """
+        session = self.trans.sa_session
+        owner = session.query( model.User ).get( owner.id )
+        history = session.query( model.History ).get( history.id )
+        for i in range( count ):
+            hda = self.hda_manager.create( history=history, dataset=self.dataset_manager.create() )
+            self.hda_manager.set_tags( hda, [ u'tag-%d' % i, u'name:batch' ], user=owner )
+            self.hda_manager.annotate( hda, u'annotation %d' % i, user=owner )
+            job = model.Job()
+            job.user = owner
+            job.tool_id = 'cat1'
+            job.add_output_dataset( 'out_file1', hda )
+            session.add( job )
+            session.flush()
+            job.set_state( model.Job.states.RESUBMITTED if i % 2 else model.Job.states.OK )
+            session.flush()
+        owner_id, history_id = owner.id, history.id
+        session.expunge_all()
+        owner = session.query( model.User ).get( owner_id )
+        hdas = self.hda_manager.list( filters=[ model.HistoryDatasetAssociation.history_id == history_id ],
+                                      order_by=model.HistoryDatasetAssociation.hid )
+        return owner, hdas
+
+    def _count_queries( self, fn ):
+        queries = []
+
+        def count( *args ):
+            queries.append( args[2] )
+        sqlalchemy.event.listen( self.app.model.engine, 'before_cursor_execute', count )
+        try:
+            returned = fn()
+        finally:
+            sqlalchemy.event.remove( self.app.model.engine, 'before_cursor_execute', count )
+        return returned, len( queries )
+
+    def test_serialize_many( self ):
+        owner = self.user_manager.create( **user2_data )
+        history = self.history_manager.create( name='history1', user=owner )
+        owner, hdas = self._create_serializable_hdas( owner, history, 4 )
+        # the mock app has no toolbox to check whether jobs are rerunnable
+        keys = [ key for key in self.hda_serializer.serializable_keyset if key != 'rerunnable' ]
+
+        self.log( 'serialize_many should serialize as serialize does' )
+        serialized_many = self.hda_serializer.serialize_many( hdas, keys=keys, user=owner )
+        self.assertEqual( len( serialized_many ), len( hdas ) )
+        for hda, serialized in zip( hdas, serialized_many ):
+            self.assertEqual( serialized, self.hda_serializer.serialize( hda, list( keys ), user=owner ) )
+        self.assertEqual( [ serialized[ 'resubmitted' ] for serialized in serialized_many ],
+                          [ False, True, False, True ] )
+        self.assertEqual( serialized_many[1][ 'annotation' ], u'annotation 1' )
+        self.assertEqual( sorted( serialized_many[1][ 'tags' ] ), [ u'name:batch', u'tag-1' ] )
+
+        self.log( 'serialize_many should serialize to views' )
+        serialized_many = self.hda_serializer.serialize_many( hdas, view='summary', user=owner )
+        self.assertKeys( serialized_many[0], self.hda_serializer.views[ 'summary' ] )
+        self.assertEqual( serialized_many[0], self.hda_serializer.serialize_to_view( hdas[0], view='summary', user=owner ) )
+        self.assertEqual( self.hda_serializer.serialize_many( [], view='summary' ), [] )
+
+    def test_serialize_many_queries( self ):
+        owner = self.user_manager.create( **user2_data )
+        history = self.history_manager.create( name='history1', user=owner )
+        keys = [ 'id', 'name', 'tags', 'annotation', 'creating_job', 'permissions', 'resubmitted', 'metadata' ]
+
+        def serialize_many( count ):
+            user, hdas = self._create_serializable_hdas( owner, history, count )
+            return self._count_queries( lambda: self.hda_serializer.serialize_many( hdas, keys=keys, user=user ) )
+
+        def serialize_each( count ):
+            user, hdas = self._create_serializable_hdas( owner, history, count )
+            return self._count_queries( lambda: [ self.hda_serializer.serialize( hda, list( keys ), user=user ) for hda in hdas ] )
+
+        self.log( 'the number of queries of serialize_many should not grow with the number of hdas' )
+        few, few_queries = serialize_many( 3 )
+        many, many_queries = serialize_many( 6 )
+        self.assertEqual( ( len( few ), len( many ) ), ( 3, 9 ) )
+        self.assertEqual( few_queries, many_queries )
+
+        self.log( 'serialize_many should query less than serializing each hda' )
+        each, each_queries = serialize_each( 3 )
+        self.assertEqual( len( each ), 12 )
+        self.assertTrue( many_queries < each_queries, ( many_queries, each_queries ) )
+
 
 # =============================================================================
 class HDADeserializerTestCase( HDATestCase ):
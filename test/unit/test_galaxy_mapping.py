@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
+import time
 import unittest
 import galaxy.model.mapping as mapping
+from galaxy.model.orm.now import now
 import uuid
 
 
@@ -356,6 +358,65 @@ class MappingTests( unittest.TestCase ):
 
         assert contents_iter_names( ids=[ d1.id, d3.id ] ) == [ "1", "3" ]
 
+    def test_history_contents_pagination_and_filters( self ):
+        model = self.model
+        u = model.User( email="contentspages@foo.bar.baz", password="password" )
+        h1 = model.History( name="HistoryContentsHistory2", user=u )
+        self.persist( u, h1, expunge=False )
+
+        d1 = self.new_hda( h1, name="1", extension="txt" )
+        d2 = self.new_hda( h1, name="2", extension="bed" )
+        c3 = h1.add_dataset_collection( model.HistoryDatasetCollectionAssociation(
+            name="3", collection=model.DatasetCollection( collection_type="list", populated=True ) ) )
+        d4 = self.new_hda( h1, name="4", extension="txt" )
+        self.session().flush()
+        d2.dataset.state = model.Dataset.states.ERROR
+        d4.dataset.state = model.Dataset.states.OK
+        d1.dataset.state = model.Dataset.states.OK
+        d1._state = model.Dataset.states.FAILED_METADATA
+        self.session().flush()
+
+        def contents_iter_names( **kwds ):
+            kwds.setdefault( 'types', [ 'dataset', 'dataset_collection' ] )
+            return [ content.name for content in h1.contents_iter( **kwds ) ]
+
+        assert contents_iter_names() == [ "1", "2", "3", "4" ]
+        assert contents_iter_names( limit=2 ) == [ "1", "2" ]
+        assert contents_iter_names( hid_gt=d2.hid, limit=1 ) == [ "3" ]
+        assert contents_iter_names( hid_gt=c3.hid, limit=2 ) == [ "4" ]
+        assert contents_iter_names( hid_lt=d4.hid, order='hid-dsc', limit=2 ) == [ "3", "2" ]
+        assert contents_iter_names( order='hid-dsc' ) == [ "4", "3", "2", "1" ]
+        # loaded a page at a time
+        assert contents_iter_names( page_size=1 ) == [ "1", "2", "3", "4" ]
+        assert contents_iter_names( page_size=1, order='hid-dsc', limit=3 ) == [ "4", "3", "2" ]
+        assert contents_iter_names( page_size=2, hid_gt=d1.hid, extension=[ "txt", "bed" ] ) == [ "2", "4" ]
+
+        assert contents_iter_names( extension=[ "txt" ] ) == [ "1", "4" ]
+        assert contents_iter_names( state=[ "ok" ] ) == [ "3", "4" ]
+        assert contents_iter_names( state=[ "error", "failed_metadata" ] ) == [ "1", "2" ]
+        assert contents_iter_names( state="ok", types=[ "dataset" ] ) == [ "4" ]
+
+        ids = [ d1.id, d2.id, d4.id ]
+        assert contents_iter_names( ids=ids, max_in_filter_length=2 ) == [ "1", "2", "4" ]
+        assert contents_iter_names( ids=ids, max_in_filter_length=2, order='hid-dsc', limit=2 ) == [ "4", "2" ]
+
+        # contents changed (themselves, their dataset or their collection) since
+        # update times are in UTC
+        since = now()
+        time.sleep( 0.01 )
+        d2.name = "2 renamed"
+        d4.dataset.state = model.Dataset.states.ERROR
+        self.session().flush()
+        assert contents_iter_names( update_time_gt=since ) == [ "2 renamed", "4" ]
+        c3.visible = False
+        self.session().flush()
+        assert contents_iter_names( update_time_gt=since ) == [ "2 renamed", "3", "4" ]
+        since = now()
+        time.sleep( 0.01 )
+        c3.collection.populated_state = "failed"
+        self.session().flush()
+        assert contents_iter_names( update_time_gt=since ) == [ "3" ]
+
     def test_workflows( self ):
         model = self.model
         user = model.User(
@@ -0,0 +1,75 @@
+import threading
+import time
+
+from galaxy.util.lrucache import LRUCache
+
+
+def test_lru():
+    lru = LRUCache( 2 )
+    for i in range( 0, 4 ):  # Insert 4 numbers
+        lru[ i ] = i
+    assert lru[ 0 ] is None
+    assert lru[ 1 ] is None
+    assert lru[ 2 ] == 2
+    assert lru[ 3 ] == 3
+
+    lru.clear()
+    assert lru[ 3 ] is None
+
+    # Recently used item is kept
+    lru[ 0 ] = 0
+    lru[ 1 ] = 1
+    assert lru[ 0 ] == 0
+    lru[ 2 ] = 2
+    assert lru[ 0 ] == 0
+    assert lru[ 1 ] is None
+    assert lru[ 2 ] == 2
+
+
+def test_max_bytes():
+    lru = LRUCache( max_bytes=10, sizeof=len )
+    lru[ 'a' ] = 'x' * 4
+    lru[ 'b' ] = 'x' * 4
+    lru[ 'c' ] = 'x' * 4
+    assert 'a' not in lru and 'b' in lru and 'c' in lru
+    # Values larger than the cache are not cached
+    lru[ 'b' ] = 'x' * 11
+    assert 'b' not in lru
+    assert lru.stats()[ 'bytes' ] == 4
+
+
+def test_ttl():
+    lru = LRUCache( ttl=0.01 )
+    lru[ 'a' ] = 1
+    assert lru[ 'a' ] == 1
+    time.sleep( 0.02 )
+    assert 'a' not in lru
+    assert lru[ 'a' ] is None
+
+
+def test_none_values():
+    lru = LRUCache( 2 )
+    calls = []
+    for i in range( 2 ):
+        assert lru.get_or_set( 'a', lambda: calls.append( 1 ) ) is None
+    assert len( calls ) == 1
+    stats = lru.stats()
+    assert ( stats[ 'hits' ], stats[ 'misses' ], stats[ 'hit_rate' ] ) == ( 1, 1, 0.5 )
+
+
+def test_threads():
+    lru = LRUCache( 50 )
+
+    def use():
+        for i in range( 2000 ):
+            lru[ i % 100 ] = i
+            lru.get( ( i * 7 ) % 100 )
+
+    threads = [ threading.Thread( target=use ) for i in range( 4 ) ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len( lru ) == 50
+    stats = lru.stats()
+    assert stats[ 'hits' ] + stats[ 'misses' ] == 8000
@@ -1,11 +1,15 @@
 import os
+import threading
+import time
 from shutil import rmtree
 from string import Template
 from tempfile import mkdtemp
 try:
     from galaxy import objectstore
+    from galaxy.objectstore.caching import CacheIndex, DetachedObject, LocationCache
 except ImportError:
     from lwr import objectstore
+    from lwr.objectstore.caching import CacheIndex, DetachedObject, LocationCache
 from contextlib import contextmanager
 
 DISK_TEST_CONFIG = """<?xml version="1.0"?>
@@ -43,6 +47,11 @@ def test_disk_store():
         data = object_store.get_data(hello_world_dataset, start=1, count=6)
         assert data == b"ello W"
 
+        # Test open_range
+        data_file = object_store.open_range(hello_world_dataset, start=6)
+        assert data_file.read() == b"World!"
+        data_file.close()
+
         # Test Size
 
         # Test absent and empty datasets yield size of 0.
@@ -75,7 +84,7 @@ def test_disk_store():
 
 HIERARCHICAL_TEST_CONFIG = """<?xml version="1.0"?>
 <object_store type="hierarchical">
-    <backends>
+    <backends location_cache="${temp_directory}/locations.sqlite">
         <backend id="files1" type="disk" weight="1" order="0">
             <files_dir path="${temp_directory}/files1"/>
             <extra_dir type="temp" path="${temp_directory}/tmp1"/>
@@ -114,6 +123,15 @@ def test_hierarchical_store():
             object_store.create(dataset)
             assert object_store.get_filename(dataset).find("files1") > 0
 
+        # The location of dataset 2 is cached, so only its backend is checked.
+        checked = []
+        for backend in object_store.backends.values():
+            backend.exists = __recording(checked, backend.exists)
+        assert object_store.get_filename(MockDataset(2)).find("files2") > 0
+        assert checked == [MockDataset(2).id]
+        # Locations persist in the location cache database.
+        assert LocationCache(os.path.join(directory.temp_directory, "locations.sqlite")).get(MockDataset(2)) == "1"
+
 
 DISTRIBUTED_TEST_CONFIG = """<?xml version="1.0"?>
 <object_store type="distributed">
@@ -148,6 +166,326 @@ def test_distributed_store():
         assert backend_2_count > 0
         assert backend_1_count > backend_2_count
 
+        # Free space is taken into account when selecting backends.
+        object_store.update_placement({"files1": 95.0, "files2": 5.0})
+        with __stubbed_persistence() as persisted_ids:
+            for i in range(100):
+                object_store.create(MockDataset(200 + i))
+        assert len([v for v in persisted_ids.values() if v == "files2"]) > 70
+
+        # Full backends are not used.
+        object_store.global_max_percent_full = 90.0
+        object_store.update_placement({"files1": 95.0, "files2": 5.0})
+        assert set(object_store.weighted_backend_ids) == set(["files2"])
+        with __stubbed_persistence() as persisted_ids:
+            for i in range(20):
+                object_store.create(MockDataset(300 + i))
+        assert set(persisted_ids.values()) == set(["files2"])
+
+        # Datasets without a backend id are located once.
+        directory.write(b"Hello World!", "files2/000/dataset_4.dat")
+        checked = []
+        for backend in object_store.backends.values():
+            backend.exists = __recording(checked, backend.exists)
+        with __stubbed_persistence() as persisted_ids:
+            assert object_store.get_data(MockDataset(4)) == "Hello World!"
+            assert persisted_ids == {4: "files2"}
+            checked_count = len(checked)
+            # The recorded location is checked rather than every backend.
+            assert object_store.get_data(MockDataset(4)) == "Hello World!"
+            assert len(checked) == checked_count + 1
+
+        # Stale recorded locations are not persisted.
+        directory.write(b"Moved", "files2/000/dataset_5.dat")
+        object_store.location_cache.set(MockDataset(5), "files1")
+        with __stubbed_persistence() as persisted_ids:
+            assert object_store.get_data(MockDataset(5)) == "Moved"
+            assert persisted_ids == {5: "files2"}
+        assert object_store.location_cache.get(MockDataset(5)) == "files2"
+        object_store.location_cache.set(MockDataset(6), "files1")
+        with __stubbed_persistence() as persisted_ids:
+            assert not object_store.exists(MockDataset(6))
+            assert persisted_ids == {}
+        assert object_store.location_cache.get(MockDataset(6)) is None
+
+        # Objects used outside of their session (by write-back uploads) are
+        # located like the objects themselves, but not persisted.
+        directory.write(b"Detached", "files2/000/dataset_7.dat")
+        detached = DetachedObject(MockDataset(7))
+        detached.object_store_id = "unknown"
+        with __stubbed_persistence() as persisted_ids:
+            assert object_store.get_data(detached) == "Detached"
+            assert persisted_ids == {}
+        assert detached.object_store_id == "files2"
+        assert object_store.location_cache.get(MockDataset(7)) == "files2"
+
+
+CACHING_TEST_CONFIG = """<?xml version="1.0"?>
+<object_store type="caching">
+    <cache path="${temp_directory}/cache" size="0.00000005" write_back="True" upload_threads="2"/>
+    <backend type="disk">
+        <files_dir path="${temp_directory}/files1"/>
+        <extra_dir type="temp" path="${temp_directory}/tmp1"/>
+        <extra_dir type="job_work" path="${temp_directory}/job_working_directory1"/>
+    </backend>
+</object_store>
+"""
+
+
+def test_caching_store():
+    with TestConfig(CACHING_TEST_CONFIG) as (directory, object_store):
+        cache_directory = os.path.join(directory.temp_directory, "cache")
+        backend = object_store.backend
+
+        # Reads are served from a copy of the backend's file in the cache.
+        directory.write(b"Hello World!", "files1/000/dataset_1.dat")
+        hello_world_dataset = MockDataset(1)
+        assert object_store.exists(hello_world_dataset)
+        path = object_store.get_filename(hello_world_dataset)
+        assert path.startswith(cache_directory)
+        assert open(path).read() == "Hello World!"
+        assert object_store.get_data(hello_world_dataset, start=1, count=4) == "ello"
+        statistics = object_store.cache_statistics()
+        assert statistics["misses"] == 1
+        assert statistics["hits"] == 1
+
+        # Concurrent reads of an uncached dataset only fetch it once.
+        directory.write(b"Fetched once", "files1/000/dataset_2.dat")
+        fetched = []
+        real_get_filename = backend.get_filename
+
+        def slow_get_filename(obj, **kwargs):
+            fetched.append(obj.id)
+            time.sleep(0.2)
+            return real_get_filename(obj, **kwargs)
+        backend.get_filename = slow_get_filename
+        paths = []
+        threads = [threading.Thread(target=lambda: paths.append(object_store.get_filename(MockDataset(2)))) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        backend.get_filename = real_get_filename
+        assert fetched == [2]
+        assert len(set(paths)) == 1
+        assert open(paths[0]).read() == "Fetched once"
+
+        # New datasets are written in the cache and written back to the backend.
+        output_dataset = MockDataset(3)
+        object_store.create(output_dataset)
+        output_path = object_store.get_filename(output_dataset)
+        assert output_path.startswith(cache_directory)
+        # Created datasets are pinned while they are written.
+        assert object_store.cache_statistics()["pinned"] == 1
+        open(output_path, "w").write("NEW CONTENTS")
+        object_store.update_from_file(output_dataset)
+        working_path = directory.write(b"MORE CONTENTS", "job_working_directory1/example_output")
+        object_store.update_from_file(MockDataset(4), file_name=working_path, create=True)
+        object_store.flush_uploads()
+        assert open(backend.get_filename(output_dataset)).read() == "NEW CONTENTS"
+        assert open(backend.get_filename(MockDataset(4))).read() == "MORE CONTENTS"
+        assert object_store.cache_statistics()["pinned"] == 0
+
+        # Failed uploads are retried.
+        object_store.UPLOAD_RETRY_DELAY = 0.01
+        real_update_from_file = backend.update_from_file
+        failures = []
+        backend_failures = [2]
+
+        def failing_update_from_file(obj, **kwargs):
+            if len(failures) < backend_failures[0]:
+                failures.append(obj.id)
+                raise IOError("backend unavailable")
+            return real_update_from_file(obj, **kwargs)
+        backend.update_from_file = failing_update_from_file
+        object_store.update_from_file(MockDataset(7), file_name=working_path, create=True)
+        assert object_store.flush_uploads() == {}
+        assert failures == [7, 7]
+        assert open(backend.get_filename(MockDataset(7))).read() == "MORE CONTENTS"
+        assert object_store.cache_statistics()["pinned"] == 0
+
+        # Files that failed every retry are reported and stay pinned.
+        backend_failures[0] = 100
+        object_store.update_from_file(MockDataset(6), file_name=working_path, create=True)
+        failed_uploads = object_store.flush_uploads()
+        backend.update_from_file = real_update_from_file
+        assert list(failed_uploads.values()) == ["backend unavailable"]
+        assert object_store.cache_statistics()["failed_uploads"] == 1
+        assert object_store.cache_statistics()["pinned"] == 1
+        object_store.delete(MockDataset(6))
+        assert object_store.cache_statistics()["pinned"] == 0
+        assert object_store.flush_uploads() == {}
+
+        # Failed fetches do not leave partial files in the cache.
+        directory.write(b"Not fetched", "files1/000/dataset_8.dat")
+        real_rename = os.rename
+
+        def failing_rename(source, target):
+            raise OSError("rename failed")
+        os.rename = failing_rename
+        try:
+            object_store.get_filename(MockDataset(8))
+            assert False, "failed fetch not raised"
+        except OSError:
+            pass
+        finally:
+            os.rename = real_rename
+        assert not [f for f in os.listdir(os.path.join(cache_directory, "000")) if f.endswith(".part")]
+
+        # The least recently used files are evicted once over the size limit.
+        object_store.get_filename(hello_world_dataset)
+        object_store._clean_cache()
+        assert not os.path.exists(paths[0])
+        assert os.path.exists(path)
+        assert object_store.cache_statistics()["evictions"] >= 1
+        # Evicted datasets are fetched again
+        assert object_store.get_data(MockDataset(2)) == "Fetched once"
+
+        # Partial reads of uncached datasets do not fetch them into the cache.
+        directory.write(b"Read in place", "files1/000/dataset_5.dat")
+        data_file = object_store.open_range(MockDataset(5), start=5)
+        assert data_file.read(2) == b"in"
+        data_file.close()
+        assert not os.path.exists(os.path.join(cache_directory, "000", "dataset_5.dat"))
+
+        # Deleting removes the dataset from the cache and the backend.
+        assert object_store.delete(hello_world_dataset)
+        assert not os.path.exists(path)
+        assert not object_store.exists(hello_world_dataset)
+        object_store.shutdown()
+
+
+def test_caching_store_output_lease():
+    with TestConfig(CACHING_TEST_CONFIG) as (directory, object_store):
+        backend = object_store.backend
+
+        # Files of created datasets are not evicted before they are updated.
+        output_dataset = MockDataset(1)
+        object_store.create(output_dataset)
+        output_path = object_store.get_filename(output_dataset)
+        open(output_path, "w").write("NEW CONTENTS")
+        object_store.cache_index.add(output_path)
+        object_store.cache_index.evict(0)
+        assert os.path.exists(output_path)
+        object_store.update_from_file(output_dataset, create=True)
+        object_store.flush_uploads()
+        assert open(backend.get_filename(output_dataset)).read() == "NEW CONTENTS"
+        assert object_store.cache_statistics()["pinned"] == 0
+
+        # Unless the lease expires, updating them then fails.
+        object_store.output_lease = 0
+        lost_dataset = MockDataset(2)
+        object_store.create(lost_dataset)
+        lost_path = object_store.get_filename(lost_dataset)
+        open(lost_path, "w").write("LOST CONTENTS" * 10)
+        object_store.cache_index.add(lost_path)
+        object_store._clean_cache()
+        assert not os.path.exists(lost_path)
+        try:
+            object_store.update_from_file(lost_dataset, create=True)
+            assert False, "update of evicted file not raised"
+        except objectstore.ObjectNotFound:
+            pass
+        assert object_store.cache_statistics()["pinned"] == 0
+        object_store.shutdown()
+
+
+def test_caching_store_write_through():
+    config_xml = CACHING_TEST_CONFIG.replace('write_back="True"', 'write_back="False"')
+    with TestConfig(config_xml) as (directory, object_store):
+        backend = object_store.backend
+        working_path = directory.write(b"NEW CONTENTS", "job_working_directory1/example_output")
+        object_store.update_from_file(MockDataset(1), file_name=working_path, create=True)
+        assert open(backend.get_filename(MockDataset(1))).read() == "NEW CONTENTS"
+
+        # Failed writes are raised to the caller and do not pin the file.
+        def failing_update_from_file(obj, **kwargs):
+            raise IOError("backend unavailable")
+        backend.update_from_file = failing_update_from_file
+        try:
+            object_store.update_from_file(MockDataset(2), file_name=working_path, create=True)
+            assert False, "failed write not raised"
+        except IOError:
+            pass
+        assert object_store.cache_statistics()["pinned"] == 0
+        object_store.shutdown()
+
+
+def test_location_cache():
+    temp_directory = mkdtemp()
+    try:
+        path = os.path.join(temp_directory, "locations", "cache.sqlite")
+        cache = LocationCache(path, max_entries=2)
+        assert cache.get(MockDataset(1)) is None
+        cache.set(MockDataset(1), "files1")
+        cache.set_many([(MockDataset(2), 0), (MockDataset(3), "files2")])
+        assert cache.get(MockDataset(1)) == "files1"
+        assert cache.get(MockDataset(2)) == "0"
+        assert len(cache._entries) == 2
+        cache.remove(MockDataset(3))
+        assert cache.get(MockDataset(3)) is None
+        cache.close()
+
+        # Locations are read back from the database.
+        cache = LocationCache(path)
+        assert cache.get(MockDataset(1)) == "files1"
+        assert cache.get(MockDataset(2)) == "0"
+        assert cache.get(MockDataset(3)) is None
+        cache.close()
+
+        # Without a path locations are only kept in memory.
+        cache = LocationCache()
+        cache.set(MockDataset(1), "files1")
+        assert cache.get(MockDataset(1)) == "files1"
+    finally:
+        rmtree(temp_directory)
+
+
+def test_cache_index():
+    temp_directory = mkdtemp()
+    try:
+        def write(name, size):
+            path = os.path.join(temp_directory, name)
+            if not os.path.exists(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            open(path, "w").write("x" * size)
+            return path
+
+        old = write("000/dataset_1.dat", 10)
+        os.utime(old, (1, 1))
+        newer = write("000/dataset_2.dat", 20)
+        os.utime(newer, (2, 2))
+        index = CacheIndex(temp_directory)
+        index.rebuild()
+        assert len(index) == 2
+        assert index.size == 30
+
+        # Files added to the cache or read from it become most recently used.
+        added = write("001/dataset_1001.dat", 30)
+        index.add(added)
+        index.touch(old)
+        index.miss()
+        assert index.size == 60
+
+        # Eviction removes least recently used files until under the target.
+        assert index.evict(40) == 20
+        assert not os.path.exists(newer)
+        assert os.path.exists(old) and os.path.exists(added)
+        assert index.size == 40
+
+        index.remove_tree(os.path.join(temp_directory, "001"))
+        assert added not in index
+        assert index.size == 10
+
+        statistics = index.statistics()
+        assert statistics["hits"] == 1
+        assert statistics["misses"] == 1
+        assert statistics["evictions"] == 1
+        assert statistics["evicted_bytes"] == 20
+        assert statistics["files"] == 1
+    finally:
+        rmtree(temp_directory)
+
 
 class TestConfig(object):
     def __init__(self, config_xml):
@@ -190,6 +528,13 @@ class MockDataset(object):
         self.object_store_id = None
 
 
+def __recording(checked, method):
+    def record(obj, **kwargs):
+        checked.append(obj.id)
+        return method(obj, **kwargs)
+    return record
+
+
 # Poor man's mocking. Need to get a real mocking library as real Galaxy development
 # dependnecy.
 PERSIST_METHOD_NAME = "create_object_in_session"
@@ -0,0 +1,221 @@
+""" Test parallel S3 transfers against a minimal in-process stand-in for S3.
+"""
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import threading
+import unittest
+import urlparse
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+
+try:
+    import boto
+    from boto.s3.connection import OrdinaryCallingFormat, S3Connection
+except ImportError:
+    boto = None
+
+from galaxy.objectstore import s3_transfer
+
+MB = 1024 * 1024
+BUCKET = "test-bucket"
+
+
+class FakeS3Handler(BaseHTTPRequestHandler):
+    """ Implements just enough of the S3 REST API for boto keys and multipart
+    uploads: HEAD, (ranged) GET and PUT of objects and the multipart upload
+    calls. """
+
+    def log_message(self, *args):
+        pass
+
+    def _parse(self):
+        url = urlparse.urlparse(self.path)
+        key_name = url.path.split("/", 2)[2]
+        return key_name, urlparse.parse_qs(url.query, keep_blank_values=True)
+
+    def _body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _respond(self, status, body="", headers={}):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _object_headers(self, key_name):
+        data, etag = self.server.objects[key_name]
+        return {"ETag": '"%s"' % etag, "Last-Modified": "Wed, 01 Jan 2014 00:00:00 GMT", "Content-Type": "application/octet-stream"}
+
+    def do_HEAD(self):
+        key_name, _ = self._parse()
+        if key_name not in self.server.objects:
+            return self._respond(404)
+        self.send_response(200)
+        for name, value in self._object_headers(key_name).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(self.server.objects[key_name][0])))
+        self.end_headers()
+
+    def do_GET(self):
+        key_name, query = self._parse()
+        if "uploadId" in query:
+            upload_id = query["uploadId"][0]
+            parts = "".join("<Part><PartNumber>%d</PartNumber><ETag>\"%s\"</ETag><Size>%d</Size></Part>" % (n, hashlib.md5(data).hexdigest(), len(data))
+                            for n, data in sorted(self.server.uploads[upload_id].items()))
+            return self._respond(200, "<ListPartsResult><Bucket>%s</Bucket><Key>%s</Key><UploadId>%s</UploadId><IsTruncated>false</IsTruncated>%s</ListPartsResult>" % (BUCKET, key_name, upload_id, parts))
+        if key_name not in self.server.objects:
+            return self._respond(404)
+        data = self.server.objects[key_name][0]
+        headers = self._object_headers(key_name)
+        byte_range = re.match(r"bytes=(\d+)-(\d+)", self.headers.get("Range", ""))
+        with self.server.lock:
+            self.server.gets.append(byte_range and byte_range.group(0))
+        if byte_range:
+            start, end = int(byte_range.group(1)), int(byte_range.group(2))
+            headers["Content-Range"] = "bytes %d-%d/%d" % (start, end, len(data))
+            return self._respond(206, data[start:end + 1], headers)
+        self._respond(200, data, headers)
+
+    def do_PUT(self):
+        key_name, query = self._parse()
+        data = self._body()
+        etag = hashlib.md5(data).hexdigest()
+        if "uploadId" in query:
+            self.server.uploads[query["uploadId"][0]][int(query["partNumber"][0])] = data
+        else:
+            self.server.objects[key_name] = (data, etag)
+        self._respond(200, headers={"ETag": '"%s"' % etag})
+
+    def do_POST(self):
+        key_name, query = self._parse()
+        body = self._body()
+        if "uploads" in query:
+            upload_id = "upload%d" % len(self.server.uploads)
+            self.server.uploads[upload_id] = {}
+            return self._respond(200, "<InitiateMultipartUploadResult><Bucket>%s</Bucket><Key>%s</Key><UploadId>%s</UploadId></InitiateMultipartUploadResult>" % (BUCKET, key_name, upload_id))
+        parts = self.server.uploads.pop(query["uploadId"][0])
+        numbers = [int(n) for n in re.findall(r"<PartNumber>(\d+)</PartNumber>", body)]
+        assert numbers == sorted(parts)
+        data = "".join(parts[n] for n in numbers)
+        digests = "".join(hashlib.md5(parts[n]).digest() for n in numbers)
+        etag = "%s-%d" % (hashlib.md5(digests).hexdigest(), len(numbers))
+        self.server.objects[key_name] = (data, etag)
+        self._respond(200, "<CompleteMultipartUploadResult><Location>here</Location><Bucket>%s</Bucket><Key>%s</Key><ETag>\"%s\"</ETag></CompleteMultipartUploadResult>" % (BUCKET, key_name, etag))
+
+    def do_DELETE(self):
+        key_name, query = self._parse()
+        self.server.uploads.pop(query["uploadId"][0], None)
+        self._respond(204)
+
+
+class FakeS3Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        HTTPServer.__init__(self, ("127.0.0.1", 0), FakeS3Handler)
+        self.objects = {}
+        self.uploads = {}
+        self.gets = []
+        self.lock = threading.Lock()
+
+
+@unittest.skipIf(boto is None, "boto not available")
+class S3TransferTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeS3Server()
+        self.server_thread = threading.Thread(target=self.server.serve_forever)
+        self.server_thread.setDaemon(True)
+        self.server_thread.start()
+        conn = S3Connection("access", "secret", is_secure=False, host="127.0.0.1", port=self.server.server_address[1],
+                            calling_format=OrdinaryCallingFormat())
+        self.bucket = conn.get_bucket(BUCKET, validate=False)
+        self.temp_directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.temp_directory)
+
+    def _write(self, name, size):
+        path = os.path.join(self.temp_directory, name)
+        with open(path, "wb") as fh:
+            fh.write(os.urandom(size))
+        return path
+
+    def _put(self, name, data):
+        self.server.objects[name] = (data, hashlib.md5(data).hexdigest())
+        return self.bucket.get_key(name)
+
+    def test_parallel_download(self):
+        data = open(self._write("source", 100000)).read()
+        key = self._put("dataset_1.dat", data)
+        path = os.path.join(self.temp_directory, "dataset_1.dat")
+        s3_transfer.parallel_download(key, path, part_size=8192, threads=4)
+        assert open(path).read() == data
+        assert len(self.server.gets) == 13
+        assert all(self.server.gets)
+        assert not os.path.exists(path + s3_transfer.PARTIAL_SUFFIX)
+        assert not os.path.exists(path + s3_transfer.PROGRESS_SUFFIX)
+
+    def test_download_empty(self):
+        key = self._put("empty.dat", "")
+        path = os.path.join(self.temp_directory, "empty.dat")
+        s3_transfer.parallel_download(key, path, part_size=8192, threads=4)
+        assert open(path).read() == ""
+
+    def test_resume_download(self):
+        data = open(self._write("source", 50000)).read()
+        key = self._put("dataset_2.dat", data)
+        path = os.path.join(self.temp_directory, "dataset_2.dat")
+
+        def interrupt(transferred, total):
+            if transferred >= 20000:
+                raise KeyboardInterrupt()
+        self.assertRaises(KeyboardInterrupt, s3_transfer.parallel_download, key, path, part_size=10000, threads=1, cb=interrupt)
+        assert len(self.server.gets) == 2
+        assert not os.path.exists(path)
+        s3_transfer.parallel_download(key, path, part_size=10000, threads=2)
+        assert len(self.server.gets) == 5
+        assert open(path).read() == data
+
+    def test_download_checksum_mismatch(self):
+        data = open(self._write("source", 30000)).read()
+        key = self._put("dataset_3.dat", data)
+        self.server.objects["dataset_3.dat"] = (data[::-1], key.etag.strip('"'))
+        path = os.path.join(self.temp_directory, "dataset_3.dat")
+        self.assertRaises(IOError, s3_transfer.parallel_download, key, path, part_size=8192, threads=4)
+        assert not os.path.exists(path)
+
+    def test_parallel_upload_and_download(self):
+        source = self._write("source", 12 * MB + 1234)
+        s3_transfer.parallel_upload(self.bucket, "dataset_4.dat", source, part_size=5 * MB, threads=3)
+        data, etag = self.server.objects["dataset_4.dat"]
+        assert data == open(source).read()
+        assert etag == s3_transfer.multipart_etag(source, 5 * MB)
+        assert not self.server.uploads
+        # The multipart ETag is verified using the part size
+        path = os.path.join(self.temp_directory, "dataset_4.dat")
+        s3_transfer.parallel_download(self.bucket.get_key("dataset_4.dat"), path, part_size=5 * MB, threads=3)
+        assert open(path).read() == data
+
+    def test_open_key(self):
+        data = "".join("line %d\n" % i for i in range(20000))
+        key = self._put("dataset_5.dat", data)
+        data_file = s3_transfer.open_key(key, start=1000, buffer_size=8192)
+        assert data_file.read(10) == data[1000:1010]
+        assert self.server.gets == ["bytes=1000-9191"]
+        assert data_file.readline() == data[1010:data.index("\n", 1010) + 1]
+        assert len(self.server.gets) == 1
+        data_file.seek(-5, os.SEEK_END)
+        assert data_file.read() == data[-5:]
+        data_file.seek(0)
+        lines = list(data_file)
+        assert lines == data.splitlines(True)
+        data_file.close()
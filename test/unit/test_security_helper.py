@@ -12,6 +12,27 @@ def test_encode_decode():
     assert 1 == test_helper_1.decode_id( test_helper_1.encode_id( 1 ) )
 
 
+def test_encode_decode_ids():
+    ids = [ 1, 2, 123456789, 1, 3 ]
+    helper = security.SecurityHelper( id_secret="sec1" )
+    # Each id is encoded as on its own, whether encoded before or not
+    helper.encode_id( 2 )
+    encoded_ids = helper.encode_ids( ids )
+    assert encoded_ids == [ test_helper_1.encode_id( i ) for i in ids ]
+    assert helper.encode_ids( ids, kind="k1" ) == [ test_helper_1.encode_id( i, kind="k1" ) for i in ids ]
+    helper.decode_id( encoded_ids[ 0 ] )
+    assert helper.decode_ids( encoded_ids ) == ids
+    assert security.SecurityHelper( id_secret="sec1" ).decode_ids( encoded_ids ) == ids
+    # Invalid ids raise the errors decode_id raises
+    for invalid_id in ( "abc", encoded_ids[ 0 ] + "0", 5 ):
+        try:
+            helper.decode_ids( encoded_ids + [ invalid_id ] )
+        except Exception:
+            pass
+        else:
+            assert False, "%s decoded" % invalid_id
+
+
 def test_nested_encoding():
     # Does nothing if not a dict
     assert test_helper_1.encode_all_ids( 1 ) == 1
@@ -31,6 +52,13 @@ def test_nested_encoding():
     assert test_helper_1.encode_all_ids( nested_dict, recursive=False )[ "objects" ][ "history_ids" ] == [ 1, 2 ]
     assert test_helper_1.encode_all_ids( nested_dict, recursive=True )[ "objects" ][ "history_ids" ] == expected_ids
 
+    # Lists of dictionaries are encoded if recursive, ids that cannot be
+    # encoded are left as they are
+    nested_dict = dict( id=1, elements=[ dict( id=2, object=dict( dataset_id=3 ) ), 4 ], tool_id=5, job_ids=[ 6, None ] )
+    encoded = test_helper_1.encode_all_ids( nested_dict, recursive=True )
+    assert encoded == dict( id=test_helper_1.encode_id( 1 ), tool_id=5, job_ids=[ 6, None ],
+                            elements=[ dict( id=test_helper_1.encode_id( 2 ), object=dict( dataset_id=test_helper_1.encode_id( 3 ) ) ), 4 ] )
+
 
 def test_per_kind_encode_deocde():
     # Different ids are encoded differently
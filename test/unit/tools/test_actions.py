@@ -4,6 +4,7 @@ import unittest
 from galaxy import model
 from galaxy.tools import ToolOutput
 from galaxy.tools.actions import DefaultToolAction
+from galaxy.tools.actions import ToolExecutionCache
 from galaxy.tools.actions import on_text_for_names
 from galaxy.tools.actions import determine_output_format
 from xml.etree.ElementTree import XML
@@ -116,6 +117,44 @@ class DefaultToolActionTestCase( unittest.TestCase, tools_support.UsesApp, tools
         job, _ = self._simple_execute()
         assert job.handler == TEST_HANDLER_NAME
 
+    def test_deferred_jobs( self ):
+        execution_cache = ToolExecutionCache( self.trans )
+        job, output = self._simple_execute( contents=TWO_OUTPUTS, execution_cache=execution_cache, flush_job=False )
+        # Nothing persisted or created in the object store yet.
+        assert job.id is None and output[ "out1" ].id is None
+        assert job.handler is None
+        assert not self.app.object_store.created_datasets
+
+        assert execution_cache.flush_deferred_jobs() == [ job ]
+        assert not execution_cache.deferred_jobs
+        assert job.id is not None and output[ "out1" ].id is not None
+        assert job.handler == TEST_HANDLER_NAME
+        assert job.object_store_id == "mycoolid"
+        assert len( self.app.object_store.created_datasets ) == 2
+        assert output[ "out2" ].dataset.object_store_id == "mycoolid"
+
+    def test_deferred_jobs_registered_user( self ):
+        user = model.User( email="user@example.org", password="password" )
+        self.history.user = user
+        self.trans.user = user
+        self.app.model.context.add( user )
+        self.app.model.context.flush()
+        # sizing outputs for the quota requires the object store
+        original_object_store = model.Dataset.object_store
+        model.Dataset.object_store = self.app.object_store
+        try:
+            execution_cache = ToolExecutionCache( self.trans )
+            job, output = self._simple_execute( contents=TWO_OUTPUTS, execution_cache=execution_cache, flush_job=False )
+            assert job.id is None and output[ "out1" ].id is None
+            assert execution_cache.flush_deferred_jobs() == [ job ]
+        finally:
+            model.Dataset.object_store = original_object_store
+        assert job.user_id == user.id
+        assert job.handler == TEST_HANDLER_NAME
+        assert output[ "out1" ].dataset.total_size == 0
+        assert output[ "out2" ].history == self.history
+        assert user.total_disk_usage == 0
+
     def __add_dataset( self, state='ok' ):
         hda = model.HistoryDatasetAssociation()
         hda.dataset = model.Dataset()
@@ -125,7 +164,7 @@ class DefaultToolActionTestCase( unittest.TestCase, tools_support.UsesApp, tools
         self.app.model.context.flush()
         return hda
 
-    def _simple_execute( self, contents=None, incoming=None ):
+    def _simple_execute( self, contents=None, incoming=None, **kwds ):
         if contents is None:
             contents = tools_support.SIMPLE_TOOL_CONTENTS
         if incoming is None:
@@ -136,6 +175,7 @@ class DefaultToolActionTestCase( unittest.TestCase, tools_support.UsesApp, tools
             trans=self.trans,
             history=self.history,
             incoming=incoming,
+            **kwds
         )
 
 
@@ -244,3 +284,9 @@ class MockObjectStore( object ):
             dataset.object_store_id = self.object_store_id
         else:
             assert dataset.object_store_id == self.object_store_id
+
+    def exists( self, dataset, **kwds ):
+        return False
+
+    def size( self, dataset ):
+        return 0
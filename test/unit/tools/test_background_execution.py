@@ -0,0 +1,126 @@
+""" Test executing tool requests in the background and reporting their
+failures.
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import TestCase
+
+from galaxy.model import mapping
+from galaxy.tools.execute import BackgroundToolExecutor
+from galaxy.util.bunch import Bunch
+from galaxy.web.security import SecurityHelper
+
+
+class BackgroundToolExecutorTestCase( TestCase ):
+
+    def setUp( self ):
+        self.test_directory = tempfile.mkdtemp()
+        # a database file, the executor's thread has its own connection
+        database_path = os.path.join( self.test_directory, "universe.sqlite" )
+        self.model = mapping.init( self.test_directory, "sqlite:///%s" % database_path, create_tables=True )
+        self.tools = {}
+        self.app = Bunch(
+            model=self.model,
+            security=SecurityHelper( id_secret="background" ),
+            security_agent=self.model.security_agent,
+            toolbox=Bunch( get_tool=lambda tool_id, tool_version: self.tools.get( tool_id ) ),
+        )
+        user = self.model.User( email="background@example.org", password="password" )
+        self.history = self.model.History( name="Background", user=user )
+        self.model.context.add_all( [ user, self.history ] )
+        self.model.context.flush()
+        self.executor = BackgroundToolExecutor( self.app )
+
+    def tearDown( self ):
+        self.model.context.remove()
+        shutil.rmtree( self.test_directory )
+
+    def test_tool_not_found( self ):
+        self._put( "missing_tool" )
+        self._executed()
+        self.assertEquals( self._reported(), [ ( "missing_tool (jobs not created)", "The tool was not found, the jobs were not created." ) ] )
+
+    def test_invalid_parameters( self ):
+        self.tools[ "test_tool" ] = MockTool( vars=dict( errors={ "param1": "No dataset" } ) )
+        self._put( "test_tool" )
+        self._executed()
+        [ ( name, info ) ] = self._reported()
+        self.assertEquals( name, "Test Tool (jobs not created)" )
+        assert "Invalid parameters" in info and "No dataset" in info, info
+
+    def test_job_errors( self ):
+        self.tools[ "test_tool" ] = MockTool( vars=dict( jobs=[ "job" ], job_errors=[ "Error executing tool: disk full" ] ) )
+        self._put( "test_tool" )
+        self._executed()
+        self.assertEquals( self._reported(), [ ( "Test Tool (jobs not created)", "1 of the jobs were not created: Error executing tool: disk full" ) ] )
+
+    def test_exception( self ):
+        self.tools[ "test_tool" ] = MockTool( exception=Exception( "no more jobs" ) )
+        self._put( "test_tool" )
+        self._executed()
+        self.assertEquals( self._reported(), [ ( "test_tool (jobs not created)", "Error creating the jobs: no more jobs" ) ] )
+
+    def test_success( self ):
+        self.tools[ "test_tool" ] = MockTool( vars=dict( jobs=[ "job" ] ) )
+        self._put( "test_tool" )
+        self._executed()
+        self.assertEquals( self._reported(), [] )
+
+    def test_queued_at_shutdown( self ):
+        executing = threading.Event()
+        release = threading.Event()
+
+        def wait( trans, incoming ):
+            executing.set()
+            release.wait( 10 )
+        self.tools[ "test_tool" ] = MockTool( vars=dict( jobs=[ "job" ] ), wait=wait )
+        self._put( "test_tool" )
+        self._put( "test_tool" )
+        executing.wait( 10 )
+        shutdown_thread = threading.Thread( target=self.executor.shutdown )
+        shutdown_thread.start()
+        while not self.executor.stopping:
+            time.sleep( 0.01 )
+        release.set()
+        shutdown_thread.join()
+        # the request being executed completes, the queued one is reported
+        self.assertEquals( len( self.tools[ "test_tool" ].executed ), 1 )
+        [ ( name, info ) ] = self._reported()
+        assert "restarted" in info, info
+
+    def _put( self, tool_id ):
+        self.executor.put( tool_id, "1.0", self.history.user.id, self.history.id, { "param1": "1" } )
+
+    def _executed( self ):
+        self.executor.queue.join()
+        self.executor.shutdown()
+
+    def _reported( self ):
+        self.model.context.expire_all()
+        history = self.model.context.query( self.model.History ).get( self.history.id )
+        reported = []
+        for hda in history.datasets:
+            assert hda.state == hda.states.ERROR
+            reported.append( ( hda.name, hda.info ) )
+        return reported
+
+
+class MockTool( object ):
+
+    def __init__( self, vars=None, exception=None, wait=None ):
+        self.name = "Test Tool"
+        self.vars = vars
+        self.exception = exception
+        self.wait = wait
+        self.executed = []
+
+    def handle_input( self, trans, incoming, history=None, process_state='update', source='html' ):
+        if self.wait:
+            self.wait( trans, incoming )
+        if self.exception:
+            raise self.exception
+        self.executed.append( incoming )
+        return "tool_executed.mako", self.vars
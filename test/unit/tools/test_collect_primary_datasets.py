@@ -1,3 +1,4 @@
+import io
 import os
 import json
 import unittest
@@ -267,5 +268,10 @@ class MockObjectStore( object ):
     def get_filename( self, dataset ):
         return self.created_datasets[ dataset ]
 
+    def open_range( self, dataset, start=0 ):
+        data_file = io.open( self.created_datasets[ dataset ], 'rb' )
+        data_file.seek( start )
+        return data_file
+
     def assert_created_with_path( self, dataset, file_name ):
         assert self.created_datasets[ dataset ] == file_name
@@ -230,6 +230,26 @@ class ToolExecutionTestCase( TestCase, tools_support.UsesApp, tools_support.Uses
         self.assertEquals( self.tool_action.execution_call_args[ 1 ][ "incoming" ][ "param1" ], hda2 )
         self.assertEquals( len( template_vars[ "jobs" ] ), 2 )
 
+    def test_check_input( self ):
+        hda1, hda2 = self.__setup_multirun_job()
+        incoming = { "param1|__multirun__": [ 1, 2 ], "runtool_btn": "dummy" }
+        assert self.tool.check_input( self.trans, incoming, process_state="populate" ) == {}
+        # checked, not executed, and the incoming parameters are left as is
+        assert len( self.tool_action.execution_call_args ) == 0
+        assert incoming == { "param1|__multirun__": [ 1, 2 ], "runtool_btn": "dummy" }
+
+    def test_check_input_errors( self ):
+        hda1, hda2 = self.__setup_multirun_job()
+        hda1.dataset.state = galaxy.model.Dataset.states.ERROR
+        errors = self.tool.check_input( self.trans, { "param1|__multirun__": [ 1, 2 ] }, process_state="populate" )
+        assert "param1" in errors, errors
+
+    def test_check_input_only_checks_first_execution( self ):
+        hda1, hda2 = self.__setup_multirun_job()
+        # errors of later executions are left to handle_input
+        hda2.dataset.state = galaxy.model.Dataset.states.ERROR
+        assert self.tool.check_input( self.trans, { "param1|__multirun__": [ 1, 2 ] }, process_state="populate" ) == {}
+
     def test_cannot_multirun_and_remap( self ):
         hda1, hda2 = self.__setup_multirun_job()
         template, template_vars = self.__handle_with_incoming( **{
@@ -0,0 +1,185 @@
+"""
+Test lib/galaxy/visualization/data_providers/cache.
+"""
+import os
+import imp
+import unittest
+
+test_utils = imp.load_source( 'test_utils',
+    os.path.join( os.path.dirname( __file__), os.pardir, os.pardir, 'unittest_utils', 'utility.py' ) )
+
+from galaxy import model  # noqa: loads datatypes before genome imports them
+from galaxy.visualization.data_providers import cache
+from galaxy.visualization.data_providers import genome
+
+
+class MockFile( object ):
+
+    def __init__( self ):
+        self.closed = False
+
+    def close( self ):
+        self.closed = True
+
+
+class MockDataset( object ):
+
+    def __init__( self, id ):
+        self.id = id
+        self.update_time = None
+
+
+class MockBedDataProvider( genome.BedDataProvider ):
+    """
+    Provides BED features from a list of lines.
+    """
+    features_from_tiles = True
+
+    def __init__( self, lines, **kwargs ):
+        super( MockBedDataProvider, self ).__init__( original_dataset=MockDataset( 1 ), **kwargs )
+        self.lines = lines
+        self.reads = []
+        self.files = []
+
+    def get_data_file_key( self ):
+        return ( 'mock', self.original_dataset.id )
+
+    def open_data_file( self ):
+        self.files.append( MockFile() )
+        return self.files[ -1 ]
+
+    def get_iterator( self, data_file, chrom, start, end, **kwargs ):
+        self.reads.append( ( start, end ) )
+        for line in self.lines:
+            fields = line.split()
+            if fields[0] == chrom and int( fields[1] ) < end and int( fields[2] ) > start:
+                yield line
+
+
+# -----------------------------------------------------------------------------
+class RegionCache_TestCase( test_utils.unittest.TestCase ):
+
+    def test_get_set( self ):
+        region_cache = cache.RegionCache()
+        self.assertEqual( region_cache.get( 'a' ), None )
+        region_cache.set( 'a', { 'data': [ 1, 2 ] } )
+        data = region_cache.get( 'a' )
+        self.assertEqual( data, { 'data': [ 1, 2 ] } )
+        # hits are copies
+        data[ 'data' ].append( 3 )
+        self.assertEqual( region_cache.get( 'a' ), { 'data': [ 1, 2 ] } )
+        stats = region_cache.stats()
+        self.assertEqual( ( stats[ 'hits' ], stats[ 'misses' ], stats[ 'entries' ] ), ( 2, 1, 1 ) )
+        self.assertAlmostEqual( stats[ 'hit_rate' ], 2.0 / 3 )
+
+    def test_eviction( self ):
+        region_cache = cache.RegionCache( max_bytes=30 )
+        region_cache.set( 'a', 'x' * 10 )
+        region_cache.set( 'b', 'x' * 10 )
+        region_cache.get( 'a' )
+        region_cache.set( 'c', 'x' * 10 )
+        # least recently used is evicted
+        self.assertEqual( region_cache.get( 'b' ), None )
+        self.assertEqual( region_cache.get( 'a' ), 'x' * 10 )
+        self.assertEqual( region_cache.stats()[ 'evictions' ], 1 )
+        self.assertTrue( region_cache.stats()[ 'bytes' ] <= 30 )
+        # too large to cache
+        region_cache.set( 'd', 'x' * 40 )
+        self.assertEqual( region_cache.get( 'd' ), None )
+
+        region_cache = cache.RegionCache( max_entries=2 )
+        for key in 'abc':
+            region_cache.set( key, key )
+        self.assertEqual( region_cache.get( 'a' ), None )
+        self.assertEqual( region_cache.stats()[ 'entries' ], 2 )
+
+
+class FileHandlePool_TestCase( test_utils.unittest.TestCase ):
+
+    def test_reuse( self ):
+        pool = cache.FileHandlePool()
+        with pool.open( 'a', MockFile ) as first:
+            # files in use are not shared
+            with pool.open( 'a', MockFile ) as second:
+                self.assertFalse( first is second )
+        with pool.open( 'a', MockFile ) as reused:
+            self.assertTrue( reused is first or reused is second )
+        self.assertFalse( reused.closed )
+        stats = pool.stats()
+        self.assertEqual( ( stats[ 'opens' ], stats[ 'reuses' ], stats[ 'idle' ] ), ( 2, 1, 2 ) )
+        pool.clear()
+        self.assertTrue( first.closed and second.closed )
+
+    def test_close( self ):
+        pool = cache.FileHandlePool( max_open_files=1 )
+        with pool.open( 'a', MockFile ) as first:
+            pass
+        with pool.open( 'b', MockFile ) as second:
+            pass
+        self.assertTrue( first.closed )
+        self.assertFalse( second.closed )
+        try:
+            with pool.open( 'b', MockFile ) as failed:
+                raise ValueError()
+        except ValueError:
+            pass
+        self.assertTrue( failed.closed )
+        self.assertEqual( pool.stats()[ 'idle' ], 0 )
+
+        pool = cache.FileHandlePool( max_idle_time=-1 )
+        with pool.open( 'a', MockFile ) as expired:
+            pass
+        with pool.open( 'a', MockFile ) as opened:
+            self.assertFalse( opened is expired )
+        self.assertTrue( expired.closed )
+
+
+class GenomeDataProvider_TestCase( test_utils.unittest.TestCase ):
+    lines = [ 'chr1\t%d\t%d\tf%d' % ( start, start + 5, start ) for start in range( 0, 1000, 10 ) ]
+
+    def setUp( self ):
+        cache.configure()
+
+    def tearDown( self ):
+        cache.configure()
+
+    def features( self, data ):
+        return [ feature[1:4] for feature in data[ 'data' ] ]
+
+    def test_tiles( self ):
+        provider = MockBedDataProvider( self.lines )
+        uncached = MockBedDataProvider( self.lines )
+        uncached.get_cache_key = lambda chrom, **kwargs: None
+        for start, end in [ ( 100, 150 ), ( 120, 170 ), ( 102, 148 ), ( 44, 46 ) ]:
+            self.assertEqual( provider.get_data( 'chr1', start, end, max_vals=10 ),
+                              uncached.get_data( 'chr1', start, end, max_vals=10 ) )
+        # neighbouring regions share a tile
+        self.assertEqual( provider.reads, [ ( 64, 192 ), ( 44, 48 ) ] )
+        self.assertEqual( self.features( provider.get_data( 'chr1', 102, 148, max_vals=10 ) ),
+                          [ [ 100, 105, 'f100' ], [ 110, 115, 'f110' ], [ 120, 125, 'f120' ],
+                            [ 130, 135, 'f130' ], [ 140, 145, 'f140' ] ] )
+        # data files are pooled
+        self.assertEqual( len( provider.files ), 1 )
+
+    def test_truncated_tiles( self ):
+        provider = MockBedDataProvider( self.lines )
+        data = provider.get_data( 'chr1', 100, 150, max_vals=2 )
+        self.assertEqual( self.features( data ), [ [ 100, 105, 'f100' ], [ 110, 115, 'f110' ] ] )
+        self.assertTrue( data[ 'message' ] )
+        # too many features in the tile, so the region was read
+        self.assertEqual( provider.reads, [ ( 64, 192 ), ( 100, 150 ) ] )
+        provider.get_data( 'chr1', 100, 150, max_vals=2 )
+        self.assertEqual( len( provider.reads ), 2 )
+
+    def test_params( self ):
+        provider = MockBedDataProvider( self.lines )
+        provider.get_data( 'chr1', 100, 150, start_val=1, max_vals=2 )
+        provider.get_data( 'chr1', 100, 150, start_val=1, max_vals=2 )
+        provider.get_data( 'chr1', 100, 150, start_val=1, max_vals=2, no_detail=True )
+        provider.get_data( 'chr2', 100, 150, start_val=1, max_vals=2 )
+        self.assertEqual( len( provider.reads ), 3 )
+        self.assertEqual( cache.region_cache.stats()[ 'hits' ], 1 )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+from galaxy import exceptions
+from galaxy.util.json import loads, STREAM_CHUNK_SIZE
+from galaxy.web.framework import base
+from galaxy.web.framework.decorators import _future_expose_api, expose_api
+
+
+class StubRequest( object ):
+
+    def __init__( self, accept=None ):
+        self.body = ''
+        self.headers = {}
+        if accept:
+            self.headers[ 'Accept' ] = accept
+
+
+class StubTrans( object ):
+
+    def __init__( self, accept=None ):
+        self.error_message = None
+        self.anonymous = False
+        self.galaxy_session = True
+        self.debug = False
+        self.request = StubRequest( accept )
+        self.response = base.Response()
+
+
+class StubController( object ):
+
+    def __init__( self ):
+        self.served = []
+
+    def index( self, trans, fail_at=None, padding=None, **kwd ):
+        def items():
+            for i in range( 3 ):
+                if i == fail_at:
+                    raise exceptions.ObjectNotFound( 'no item %d' % i )
+                if str( i ) == fail_at:
+                    raise Exception( 'unexpected' )
+                self.served.append( i )
+                yield dict( id=i, padding=padding ) if padding else dict( id=i )
+        return items()
+
+    def show( self, trans, **kwd ):
+        return dict( metadata=dict( name='folder' ), contents=( i for i in range( 2 ) ) )
+
+    def empty( self, trans, **kwd ):
+        return ( i for i in [] )
+
+
+def _call( method, trans=None, decorator=_future_expose_api, **kwd ):
+    controller = StubController()
+    trans = trans or StubTrans()
+    body = decorator( getattr( StubController, method ) )( controller, trans, **kwd )
+    return controller, trans, body
+
+
+def test_streamed_array():
+    # items big enough to fill a chunk each
+    padding = 'x' * STREAM_CHUNK_SIZE
+    controller, trans, body = _call( 'index', padding=padding )
+    # nothing is serialized but the first chunk until the body is iterated
+    assert controller.served == [ 0 ]
+    assert not isinstance( body, basestring )
+    assert loads( ''.join( body ) ) == [ dict( id=i, padding=padding ) for i in range( 3 ) ]
+    assert controller.served == [ 0, 1, 2 ]
+    assert trans.response.get_content_type() == 'application/json'
+
+
+def test_streamed_ndjson():
+    controller, trans, body = _call( 'index', trans=StubTrans( accept='application/x-ndjson' ) )
+    lines = ''.join( body ).splitlines()
+    assert [ loads( line ) for line in lines ] == [ dict( id=0 ), dict( id=1 ), dict( id=2 ) ]
+    assert trans.response.get_content_type() == 'application/x-ndjson'
+
+
+def test_streamed_dict():
+    controller, trans, body = _call( 'show', trans=StubTrans( accept='application/x-ndjson' ) )
+    assert loads( ''.join( body ) ) == dict( metadata=dict( name='folder' ), contents=[ 0, 1 ] )
+    assert trans.response.get_content_type() == 'application/json'
+
+
+def test_streamed_empty():
+    controller, trans, body = _call( 'empty', decorator=expose_api )
+    assert loads( ''.join( body ) ) == []
+
+
+def test_error_before_first_item():
+    controller, trans, body = _call( 'index', fail_at=0 )
+    assert trans.response.status == 404
+    assert loads( body )[ 'err_code' ] == exceptions.ObjectNotFound.err_code.code
+
+
+def test_error_while_streaming():
+    # items big enough to be sent before the error
+    padding = 'x' * STREAM_CHUNK_SIZE
+    controller, trans, body = _call( 'index', fail_at=2, padding=padding )
+    streamed = ''.join( body )
+    # the response ends early, which clients see as invalid JSON
+    truncated, error = streamed.rstrip( '\n' ).rsplit( '\n', 1 )
+    assert truncated.startswith( '[{' ) and '"id": 1' in truncated
+    try:
+        loads( streamed )
+        assert False, "Expected invalid JSON"
+    except ValueError:
+        pass
+    # ending with the error
+    assert loads( error ) == dict( err_msg='no item 2', err_code=exceptions.ObjectNotFound.err_code.code )
+
+
+def test_error_while_streaming_ndjson():
+    padding = 'x' * STREAM_CHUNK_SIZE
+    controller, trans, body = _call( 'index', trans=StubTrans( accept='application/x-ndjson' ), fail_at=2, padding=padding )
+    records = [ loads( line ) for line in ''.join( body ).splitlines() ]
+    # the last record is the error, which clients have to check for
+    assert records[ :-1 ] == [ dict( id=0, padding=padding ), dict( id=1, padding=padding ) ]
+    assert records[ -1 ] == dict( err_msg='no item 2', err_code=exceptions.ObjectNotFound.err_code.code )
+
+
+def test_unexpected_error_while_streaming_ndjson():
+    padding = 'x' * STREAM_CHUNK_SIZE
+    controller, trans, body = _call( 'index', trans=StubTrans( accept='application/x-ndjson' ), fail_at='2', padding=padding )
+    records = [ loads( line ) for line in ''.join( body ).splitlines() ]
+    assert records[ -1 ][ 'err_code' ] == exceptions.error_codes.UNKNOWN.code
+
+
+def test_error_before_anything_sent():
+    controller, trans, body = _call( 'index', fail_at=2 )
+    # the buffered items are dropped, leaving the usual error response
+    assert trans.response.status == 404
+    assert loads( body ) == dict( err_msg='no item 2', err_code=exceptions.ObjectNotFound.err_code.code )
+
+
+def test_ndjson_error_before_anything_sent():
+    controller, trans, body = _call( 'index', trans=StubTrans( accept='application/x-ndjson' ), fail_at=1 )
+    assert trans.response.status == 404
+    assert loads( body )[ 'err_code' ] == exceptions.ObjectNotFound.err_code.code
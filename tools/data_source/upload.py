@@ -301,7 +301,7 @@ def add_file( dataset, registry, json_file, output_path ):
                         else:
                             line_count, converted_path = sniff.convert_newlines( dataset.path, in_place=in_place, tmp_dir=tmpdir, tmp_prefix=tmp_prefix )
                 if dataset.file_type == 'auto':
-                    ext = sniff.guess_ext( dataset.path, registry.sniff_order )
+                    ext = sniff.guess_ext( dataset.path, registry.sniff_order, sniff_index=registry.sniff_index )
                 else:
                     ext = dataset.file_type
                 data_type = ext